@@ -0,0 +1,110 @@
+"""Benchmark building record filter expressions
+
+Compares the cost per query of chaining boto3 Attr conditions and rendering
+them with boto3's ConditionExpressionBuilder (what every request used to pay)
+against binding values to a filter compiled by service.query_compiler.
+
+    poetry run python benchmarks/filter_compile.py --conditions 5 --number 20000
+"""
+
+import argparse
+import datetime
+import pathlib
+import sys
+import timeit
+
+import reporting
+from boto3.dynamodb.conditions import Attr, ConditionExpressionBuilder
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import schema  # noqa: E402  pylint: disable=wrong-import-position
+from service import query_compiler  # noqa: E402  pylint: disable=wrong-import-position
+
+LEGACY_OPERATORS = {
+    schema.common.Operator.EQ: lambda attr, value: attr.eq(value),
+    schema.common.Operator.NE: lambda attr, value: attr.ne(value),
+    schema.common.Operator.GT: lambda attr, value: attr.gt(value),
+    schema.common.Operator.GTE: lambda attr, value: attr.gte(value),
+    schema.common.Operator.LT: lambda attr, value: attr.lt(value),
+    schema.common.Operator.LTE: lambda attr, value: attr.lte(value),
+    schema.common.Operator.CONTAINS: lambda attr, value: attr.contains(value),
+    schema.common.Operator.BEGINS_WITH: lambda attr, value: attr.begins_with(value),
+}
+
+
+def legacy_filter(category, created_after, created_before, record_condition):
+    """Attr chain + ConditionExpressionBuilder, as before the compiler"""
+    condition = Attr("category").eq(category)
+    if created_after and created_before:
+        condition &= Attr("record_created_at").between(
+            created_after.timestamp(), created_before.timestamp()
+        )
+    for field_condition in record_condition:
+        condition &= LEGACY_OPERATORS[field_condition.operation](
+            Attr(f"record.{field_condition.field}"), field_condition.value
+        )
+    return ConditionExpressionBuilder().build_expression(condition)
+
+
+def compiled_filter(category, created_after, created_before, record_condition):
+    """bind values to a compiled (cached) filter"""
+    return query_compiler.compile_filter(
+        category=category,
+        created_after=created_after,
+        created_before=created_before,
+        record_condition=record_condition,
+    )
+
+
+def make_conditions(count: int) -> list[schema.request.FieldCondition]:
+    """count number conditions on distinct fields"""
+    operators = list(LEGACY_OPERATORS)
+    return [
+        schema.request.FieldCondition(
+            field=f"field_{index}",
+            field_type=schema.common.FieldType.NUMBER,
+            operation=operators[index % len(operators)],
+            value=index,
+        )
+        for index in range(count)
+    ]
+
+
+def main():
+    """run benchmark and print JSON results"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conditions", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="also write results document to file")
+    args = parser.parse_args()
+
+    arguments = (
+        schema.common.RecordCategory.RECORD,
+        datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+        make_conditions(args.conditions),
+    )
+    results = {}
+    for name, build in (("legacy", legacy_filter), ("compiled", compiled_filter)):
+        best = min(
+            timeit.repeat(
+                lambda: build(*arguments), number=args.number, repeat=args.repeat
+            )
+        )
+        results[name] = {"us_per_query": round(best / args.number * 1e6, 3)}
+    results["speedup"] = round(
+        results["legacy"]["us_per_query"] / results["compiled"]["us_per_query"], 2
+    )
+    results["compiled_cache"] = query_compiler.compile_shape.cache_info()._asdict()
+    reporting.emit(
+        "filter_compile",
+        {key: value for key, value in vars(args).items() if key != "output"},
+        results,
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
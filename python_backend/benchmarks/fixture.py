@@ -0,0 +1,249 @@
+"""Local dynamo db backend and synthetic data of the benchmarks
+
+Starts an in-process moto server, or uses an existing endpoint such as
+DynamoDB Local, creates the record table with the
+table_id-category_created_at-index GSI and the master table with the
+membership index, and seeds virtual tables with synthetic records. Records
+are written through service.record.record_item, so they carry the same index
+attributes as records created by the API.
+
+Seeding is deterministic for a given --seed, so two runs of a benchmark on
+different commits read the same data.
+"""
+
+import dataclasses
+import datetime
+import logging
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import boto3
+import httpx
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import schema  # noqa: E402  pylint: disable=wrong-import-position
+import stores  # noqa: E402  pylint: disable=wrong-import-position
+from service import record  # noqa: E402  pylint: disable=wrong-import-position
+from service import table_index  # noqa: E402  pylint: disable=wrong-import-position
+
+RECORD_TABLE = "record_project_record_table"
+MASTER_TABLE = "record_project_master_table"
+BENCH_TABLE_ID = "benchmark-table"
+
+
+@dataclasses.dataclass
+class Dataset:
+    """shape of the seeded data
+
+    Attributes:
+        tables (int): virtual tables, named benchmark-table-<n>
+        records (int): records per virtual table
+        width (int): fields of the record content of each record
+        categories (dict[str, float]): share of records per category
+        seed (int): seed of the random generator
+    """
+
+    tables: int = 1
+    records: int = 1000
+    width: int = 8
+    categories: dict[str, float] = dataclasses.field(
+        default_factory=lambda: {schema.common.RecordCategory.RECORD: 1.0}
+    )
+    seed: int = 0
+
+    def table_ids(self) -> list[str]:
+        """ids of the seeded virtual tables"""
+        return [f"{BENCH_TABLE_ID}-{index}" for index in range(self.tables)]
+
+
+def parse_categories(value: str) -> dict[str, float]:
+    """parse "RECORD=0.8,TEMPLATE=0.2" into {category: share}
+
+    Raises:
+        ValueError: an entry is not category=share or names no category
+    """
+    categories = {}
+    for entry in value.split(","):
+        name, separator, share = entry.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid category share: {entry!r}")
+        categories[schema.common.RecordCategory(name.strip().upper())] = float(share)
+    return categories
+
+
+def ensure_credentials():
+    """dummy credentials and region for moto, kept when already set"""
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+
+def free_port() -> int:
+    """find an unused local port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_moto() -> str:
+    """start in-process moto server, return its endpoint"""
+    from moto.server import (  # pylint: disable=import-outside-toplevel
+        ThreadedMotoServer,
+    )
+
+    # werkzeug logs every request of the server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    port = free_port()
+    ThreadedMotoServer(port=port, verbose=False).start()
+    return f"http://127.0.0.1:{port}"
+
+
+def create_tables(endpoint_url: str):
+    """create the record and master tables with their indexes, if missing"""
+    dynamodb = boto3.resource("dynamodb", endpoint_url=endpoint_url)
+    existing = {table.name for table in dynamodb.tables.all()}
+    if RECORD_TABLE not in existing:
+        dynamodb.create_table(
+            TableName=RECORD_TABLE,
+            KeySchema=[
+                {"AttributeName": "id", "KeyType": "HASH"},
+                {"AttributeName": "table_id", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "id", "AttributeType": "S"},
+                {"AttributeName": "table_id", "AttributeType": "S"},
+                {"AttributeName": "category_created_at", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": stores.dynamo_db.RECORD_TABLE_INDEX,
+                    "KeySchema": [
+                        {"AttributeName": "table_id", "KeyType": "HASH"},
+                        {"AttributeName": "category_created_at", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        ).wait_until_exists()
+    if MASTER_TABLE not in existing:
+        dynamodb.create_table(
+            TableName=MASTER_TABLE,
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "id", "AttributeType": "S"},
+                {"AttributeName": table_index.MEMBER_USER_ID, "AttributeType": "S"},
+                {"AttributeName": table_index.MEMBER_KEY, "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[table_index.MEMBER_INDEX_DEFINITION],
+            BillingMode="PAY_PER_REQUEST",
+        ).wait_until_exists()
+
+
+def synthetic_content(rng: random.Random, width: int) -> dict:
+    """record content of width fields, cycling numbers, strings, flags, maps"""
+    content = {}
+    for index in range(width):
+        kind = index % 4
+        if kind == 0:
+            value = rng.randint(0, 1_000_000)
+        elif kind == 1:
+            value = "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=16))
+        elif kind == 2:
+            value = rng.random() < 0.5
+        else:
+            value = {"count": rng.randint(0, 100), "ratio": round(rng.random(), 4)}
+        content[f"field_{index}"] = value
+    return content
+
+
+def synthetic_record(
+    rng: random.Random, table_id: str, dataset: Dataset
+) -> schema.table.Record:
+    """record of table_id with a category drawn from the dataset mix"""
+    categories = list(dataset.categories)
+    category = rng.choices(categories, weights=list(dataset.categories.values()))[0]
+    created_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC) + (
+        datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+    )
+    return schema.table.Record(
+        id=f"{rng.getrandbits(128):032x}",
+        table_id=table_id,
+        category=category,
+        record_created_at=created_at,
+        record_updated_at=created_at,
+        record=synthetic_content(rng, dataset.width),
+    )
+
+
+def seed(endpoint_url: str, dataset: Dataset) -> dict[str, list[str]]:
+    """write the records of dataset, return record ids per virtual table"""
+    rng = random.Random(dataset.seed)
+    table = boto3.resource("dynamodb", endpoint_url=endpoint_url).Table(RECORD_TABLE)
+    record_ids: dict[str, list[str]] = {}
+    with table.batch_writer() as writer:
+        for table_id in dataset.table_ids():
+            record_ids[table_id] = []
+            for _ in range(dataset.records):
+                row = synthetic_record(rng, table_id, dataset)
+                writer.put_item(
+                    Item=stores.dynamo_db.to_dynamo_value(record.record_item(row))
+                )
+                record_ids[table_id].append(row.id)
+    return record_ids
+
+
+def start_server(
+    io_mode: str, endpoint_url: str, env: dict[str, str] | None = None
+) -> tuple[subprocess.Popen, str]:
+    """launch uvicorn serving main:app in given io mode
+
+    Args:
+        io_mode (str): "sync" or "async"
+        endpoint_url (str): dynamo db endpoint
+        env (dict[str, str] | None): extra environment, e.g. RECORD_PROJECT_*
+            settings
+    """
+    port = free_port()
+    env = dict(
+        os.environ,
+        RECORD_PROJECT_IO_MODE=io_mode,
+        RECORD_PROJECT_DYNAMO_ENDPOINT_URL=endpoint_url,
+        RECORD_PROJECT_DYNAMO_MAX_POOL_CONNECTIONS="500",
+        RECORD_PROJECT_ACCESS_LOG="false",
+        **(env or {}),
+    )
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+            "--backlog",
+            "4096",
+        ],
+        cwd=SRC_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/probes/healthiness").status_code == 200:
+                return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server in {io_mode} mode did not start")
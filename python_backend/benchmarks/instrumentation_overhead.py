@@ -0,0 +1,132 @@
+"""Benchmark the cost of telemetry on requests
+
+Calls a FastAPI app in-process through ASGI, without a server or network, with
+and without telemetry.middleware.TimingMiddleware, and times
+telemetry.tracing.record_call on its own. The route does no I/O, so the
+share of the no-I/O request is an upper bound. The share of a request of
+--request-ms, which makes --calls dynamo db calls, is what requests that wait
+on dynamo db for milliseconds pay.
+
+    poetry run python benchmarks/instrumentation_overhead.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+
+import fastapi
+import reporting
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import telemetry  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def make_app(instrumented: bool, server_timing: bool) -> fastapi.FastAPI:
+    """app with one async route returning a small document"""
+    app = fastapi.FastAPI()
+
+    @app.get("/table/{table_id}/record/{record_id}")
+    async def get_record(table_id: str, record_id: str):
+        return {"tableId": table_id, "id": record_id}
+
+    if instrumented:
+        app.add_middleware(
+            telemetry.middleware.TimingMiddleware, server_timing=server_timing
+        )
+    return app
+
+
+async def call(app: fastapi.FastAPI, requests: int) -> float:
+    """seconds per request, best of 5 runs"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/table/t/record/r",
+        "raw_path": b"/table/t/record/r",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await app(dict(scope), receive, send)
+        best = min(best, (time.perf_counter() - start) / requests)
+    return best
+
+
+def record_call_cost(calls: int) -> float:
+    """seconds per recorded span, inside a request trace"""
+    response = {"Count": 10, "ScannedCount": 12, "Items": []}
+    token = telemetry.tracing.current_trace.set(telemetry.tracing.RequestTrace())
+    start = time.perf_counter()
+    for _ in range(calls):
+        telemetry.tracing.record_call(
+            "query", "table", "read", 0.004, response=response, consumed_units=1.5
+        )
+    elapsed = time.perf_counter() - start
+    telemetry.tracing.current_trace.reset(token)
+    return elapsed / calls
+
+
+def main():
+    """run benchmark and print JSON results"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--request-ms", type=float, default=5.0)
+    parser.add_argument("--calls", type=int, default=2)
+    parser.add_argument("--output", help="also write results document to file")
+    args = parser.parse_args()
+
+    results = {"requests": args.requests}
+    for name, instrumented, server_timing in (
+        ("plain", False, False),
+        ("instrumented", True, False),
+        ("instrumented_server_timing", True, True),
+    ):
+        seconds = asyncio.run(
+            call(make_app(instrumented, server_timing), args.requests)
+        )
+        results[f"{name}_us_per_request"] = round(seconds * 1e6, 2)
+    for name in ("instrumented", "instrumented_server_timing"):
+        overhead = results[f"{name}_us_per_request"] - results["plain_us_per_request"]
+        results[f"{name}_overhead_us"] = round(overhead, 2)
+        results[f"{name}_overhead_percent"] = round(
+            overhead / results["plain_us_per_request"] * 100, 2
+        )
+    results["record_call_us"] = round(record_call_cost(args.requests) * 1e6, 2)
+    overhead = (
+        results["instrumented_server_timing_overhead_us"]
+        + args.calls * results["record_call_us"]
+    )
+    results["overhead_percent_of_request"] = round(
+        overhead / (args.request_ms * 1000) * 100, 3
+    )
+    reporting.emit(
+        "instrumentation_overhead",
+        {key: value for key, value in vars(args).items() if key != "output"},
+        results,
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Load scenarios of the HTTP API against a local dynamo db
+
+Seeds virtual tables (see fixture.Dataset), then for each io mode launches a
+uvicorn server and runs each scenario for --duration seconds with
+--concurrency concurrent connections. A scenario is a weighted mix of
+operations:
+
+- get: GET /table/{table_id}/record/{record_id} of a seeded record
+- query: GET /table/{table_id}/record/query of a page of a category
+- create: POST /record/{table_id} of a synthetic record
+- patch: PATCH /table/{table_id}/record/{record_id} of one field
+
+Reports throughput and p50/p95/p99 latency per scenario and per operation as
+a results document (see reporting.py). Scenarios run one after the other on the
+same server, so later scenarios see the records created by earlier ones.
+
+    poetry run python benchmarks/load.py --scenarios mixed --output results/load.json
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import fixture
+import httpx
+import reporting
+
+SCENARIOS = {
+    "read-heavy": {"get": 0.8, "query": 0.15, "create": 0.05},
+    "write-heavy": {"create": 0.5, "patch": 0.4, "get": 0.1},
+    "mixed": {"get": 0.5, "query": 0.2, "patch": 0.2, "create": 0.1},
+}
+
+
+class Workload:
+    """requests of the operations of a scenario
+
+    Args:
+        dataset (fixture.Dataset): shape of created records
+        record_ids (dict[str, list[str]]): seeded record ids per table
+    """
+
+    def __init__(self, dataset: fixture.Dataset, record_ids: dict[str, list[str]]):
+        self.dataset = dataset
+        self.record_ids = record_ids
+        self.table_ids = list(record_ids)
+        self.categories = list(dataset.categories)
+
+    def request(self, operation: str, rng: random.Random) -> tuple[str, str, dict]:
+        """method, url and keyword arguments of one request of operation"""
+        table_id = rng.choice(self.table_ids)
+        if operation == "get":
+            record_id = rng.choice(self.record_ids[table_id])
+            return "GET", f"/table/{table_id}/record/{record_id}", {}
+        if operation == "query":
+            category = rng.choice(self.categories)
+            params = {"category": category, "limit": 20}
+            return "GET", f"/table/{table_id}/record/query", {"params": params}
+        if operation == "create":
+            record = fixture.synthetic_record(rng, table_id, self.dataset)
+            body = record.model_dump(mode="json", by_alias=True, exclude_none=True)
+            return "POST", f"/record/{table_id}", {"json": body}
+        if operation == "patch":
+            record_id = rng.choice(self.record_ids[table_id])
+            patch = {"record": {"field_0": rng.randint(0, 1_000_000)}}
+            return "PATCH", f"/table/{table_id}/record/{record_id}", {"json": patch}
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+async def run_scenario(
+    base_url: str,
+    workload: Workload,
+    mix: dict[str, float],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> dict:
+    """run the operations of mix from concurrency workers for duration seconds"""
+    operations = list(mix)
+    weights = list(mix.values())
+    latencies: dict[str, list[float]] = {operation: [] for operation in operations}
+    errors = dict.fromkeys(operations, 0)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(rng: random.Random):
+            while time.perf_counter() < deadline:
+                operation = rng.choices(operations, weights=weights)[0]
+                method, url, kwargs = workload.request(operation, rng)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    if response.status_code >= 400:
+                        errors[operation] += 1
+                except httpx.HTTPError:
+                    errors[operation] += 1
+                latencies[operation].append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(random.Random(seed * 100_003 + n)) for n in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started
+
+    every = [latency for values in latencies.values() for latency in values]
+    return {
+        "total": reporting.latency_summary(every, sum(errors.values()), elapsed),
+        "operations": {
+            operation: reporting.latency_summary(
+                latencies[operation], errors[operation], elapsed
+            )
+            for operation in operations
+        },
+    }
+
+
+def main():
+    """run the scenarios for each io mode"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS)
+    )
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--tables", type=int, default=1)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument(
+        "--categories",
+        default="RECORD=0.7,TEMPLATE=0.2,REMARK=0.1",
+        help="share of seeded and created records per category",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endpoint-url", help="use existing dynamo db endpoint")
+    parser.add_argument("--output", help="also write results document to file")
+    args = parser.parse_args()
+
+    dataset = fixture.Dataset(
+        tables=args.tables,
+        records=args.records,
+        width=args.width,
+        categories=fixture.parse_categories(args.categories),
+        seed=args.seed,
+    )
+    fixture.ensure_credentials()
+    endpoint_url = args.endpoint_url or fixture.start_moto()
+    fixture.create_tables(endpoint_url)
+    workload = Workload(dataset, fixture.seed(endpoint_url, dataset))
+
+    report = {}
+    for io_mode in args.modes:
+        process, base_url = fixture.start_server(io_mode, endpoint_url)
+        try:
+            report[io_mode] = {}
+            for scenario in args.scenarios:
+                report[io_mode][scenario] = asyncio.run(
+                    run_scenario(
+                        base_url,
+                        workload,
+                        SCENARIOS[scenario],
+                        args.concurrency,
+                        args.duration,
+                        args.seed,
+                    )
+                )
+                print(
+                    io_mode,
+                    scenario,
+                    report[io_mode][scenario]["total"],
+                    file=sys.stderr,
+                )
+        finally:
+            process.terminate()
+            process.wait()
+    parameters = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "endpoint_url")
+    }
+    parameters["backend"] = "endpoint" if args.endpoint_url else "moto"
+    reporting.emit("load", parameters, report, args.output)
+
+
+if __name__ == "__main__":
+    main()
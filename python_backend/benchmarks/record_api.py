@@ -0,0 +1,100 @@
+"""Benchmark the record API in sync and async io mode
+
+Starts a moto dynamo db server (or uses --endpoint-url, e.g. DynamoDB Local),
+seeds a record table, then for each io mode launches a uvicorn server and
+hammers GET /table/{table_id}/record/{record_id} with --concurrency concurrent
+connections, reporting requests/sec and latency percentiles as a results
+document (see reporting.py). See load.py for mixed read and write scenarios.
+
+    poetry run python benchmarks/record_api.py --concurrency 500 --duration 20
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import fixture
+import httpx
+import reporting
+
+
+async def run_load(
+    base_url: str,
+    table_id: str,
+    record_ids: list[str],
+    concurrency: int,
+    duration: float,
+) -> dict:
+    """issue GET requests from concurrency workers for duration seconds"""
+    latencies: list[float] = []
+    errors = 0
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                record_id = random.choice(record_ids)
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"/table/{table_id}/record/{record_id}")
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return reporting.latency_summary(latencies, errors, elapsed)
+
+
+def main():
+    """run benchmark for each io mode"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--endpoint-url", help="use existing dynamo db endpoint")
+    parser.add_argument("--output", help="also write results document to file")
+    args = parser.parse_args()
+
+    fixture.ensure_credentials()
+    endpoint_url = args.endpoint_url or fixture.start_moto()
+    fixture.create_tables(endpoint_url)
+    dataset = fixture.Dataset(records=args.records)
+    [(table_id, record_ids)] = fixture.seed(endpoint_url, dataset).items()
+
+    report = {}
+    for io_mode in args.modes:
+        process, base_url = fixture.start_server(io_mode, endpoint_url)
+        try:
+            report[io_mode] = asyncio.run(
+                run_load(
+                    base_url, table_id, record_ids, args.concurrency, args.duration
+                )
+            )
+        finally:
+            process.terminate()
+            process.wait()
+        print(io_mode, report[io_mode], file=sys.stderr)
+    parameters = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "endpoint_url")
+    }
+    reporting.emit("record_api", parameters, report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark serialising a page of records for list responses
+
+Compares the response_model path (validate boto3 items as
+list[schema.table.Record], dump to json types, json.dumps, as FastAPI does)
+against service.record_row (convert once into slots rows, orjson to bytes).
+Reports CPU time per row, peak allocated memory per row while serialising and
+retained memory per row of the intermediate representation.
+
+    poetry run python benchmarks/record_serialization.py --rows 1000
+"""
+
+import argparse
+import decimal
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+import uuid
+
+import pydantic
+import reporting
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import schema  # noqa: E402  pylint: disable=wrong-import-position
+from service import record_row  # noqa: E402  pylint: disable=wrong-import-position
+
+RECORDS = pydantic.TypeAdapter(list[schema.table.Record])
+
+
+def make_items(rows: int) -> list[dict]:
+    """boto3 items of a record table page"""
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "table_id": "benchmark-table",
+            "category": "RECORD",
+            "category_created_at": f"RECORD#{1700000000 + index:017.6f}",
+            "record_created_at": decimal.Decimal(1700000000 + index),
+            "record_updated_at": decimal.Decimal("1700000000.123456"),
+            "record": {
+                "name": f"item {index}",
+                "amount": decimal.Decimal(index),
+                "price": decimal.Decimal("19.99"),
+                "paid": index % 2 == 0,
+                "tags": ["a", "b", "c"],
+                "detail": {"count": decimal.Decimal(3), "note": "x" * 40},
+            },
+        }
+        for index in range(rows)
+    ]
+
+
+def response_model_path(items: list[dict]) -> bytes:
+    """what response_model=list[schema.table.Record] costs"""
+    records = RECORDS.validate_python(items)
+    content = RECORDS.dump_python(records, mode="json", by_alias=True)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def record_row_path(items: list[dict]) -> bytes:
+    """convert once into slots rows, orjson to bytes"""
+    return record_row.dumps_rows(record_row.from_items(items))
+
+
+def cpu_per_row(serialise, items: list[dict], repeat: int) -> float:
+    """best CPU microseconds per row"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        serialise(items)
+        best = min(best, time.process_time() - start)
+    return best / len(items) * 1e6
+
+
+def peak_bytes_per_row(serialise, items: list[dict]) -> float:
+    """peak bytes allocated per row while serialising"""
+    tracemalloc.start()
+    serialise(items)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / len(items)
+
+
+def retained_bytes_per_row(convert, items: list[dict]) -> float:
+    """bytes per row held by the intermediate representation"""
+    tracemalloc.start()
+    converted = convert(items)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del converted
+    return current / len(items)
+
+
+def main():
+    """run benchmark and print JSON results"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="also write results document to file")
+    args = parser.parse_args()
+
+    items = make_items(args.rows)
+    results = {"rows": args.rows}
+    for name, serialise, convert in (
+        ("response_model", response_model_path, RECORDS.validate_python),
+        ("record_row", record_row_path, record_row.from_items),
+    ):
+        results[name] = {
+            "cpu_us_per_row": round(cpu_per_row(serialise, items, args.repeat), 3),
+            "peak_bytes_per_row": round(peak_bytes_per_row(serialise, items)),
+            "retained_bytes_per_row": round(retained_bytes_per_row(convert, items)),
+        }
+    results["cpu_speedup"] = round(
+        results["response_model"]["cpu_us_per_row"]
+        / results["record_row"]["cpu_us_per_row"],
+        2,
+    )
+    reporting.emit(
+        "record_serialization",
+        {key: value for key, value in vars(args).items() if key != "output"},
+        results,
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""JSON results of the benchmarks, and their comparison between commits
+
+Every benchmark prints one document, and writes it to --output when given:
+
+    {
+      "benchmark": "load",
+      "commit": "<git commit>", "dirty": false,
+      "python": "3.12.3", "platform": "Linux-...",
+      "created_at": "2025-01-01T00:00:00+00:00",
+      "parameters": {...arguments of the run...},
+      "results": {...numbers of the benchmark...}
+    }
+
+Comparing two documents lists every number of "results" present in both,
+with its relative change:
+
+    poetry run python benchmarks/reporting.py before.json after.json
+"""
+
+import argparse
+import datetime
+import json
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+
+
+def git_state() -> tuple[str | None, bool]:
+    """current commit and whether the work tree has changes"""
+    root = pathlib.Path(__file__).resolve().parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def document(benchmark: str, parameters: dict, results: dict) -> dict:
+    """results document of a run"""
+    commit, dirty = git_state()
+    return {
+        "benchmark": benchmark,
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "parameters": parameters,
+        "results": results,
+    }
+
+
+def emit(benchmark: str, parameters: dict, results: dict, output: str | None):
+    """print the results document, and write it to output when given"""
+    text = json.dumps(document(benchmark, parameters, results), indent=2)
+    print(text)
+    if output is not None:
+        path = pathlib.Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text + "\n", encoding="utf-8")
+
+
+def latency_summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """throughput and latency percentiles of requests taking latencies seconds"""
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    )
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    """numbers of nested results keyed by their dotted path"""
+    numbers = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            numbers.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            numbers[path] = value
+    return numbers
+
+
+def compare(before: dict, after: dict) -> list[dict]:
+    """change of every number of the results of two documents"""
+    old = flatten(before["results"])
+    new = flatten(after["results"])
+    changes = []
+    for path in old.keys() & new.keys():
+        change = (new[path] - old[path]) / old[path] * 100 if old[path] else None
+        changes.append(
+            {
+                "metric": path,
+                "before": old[path],
+                "after": new[path],
+                "change_percent": round(change, 2) if change is not None else None,
+            }
+        )
+    return sorted(changes, key=lambda change: change["metric"])
+
+
+def main():
+    """print the comparison of two results documents"""
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+
+    before = json.loads(pathlib.Path(args.before).read_text(encoding="utf-8"))
+    after = json.loads(pathlib.Path(args.after).read_text(encoding="utf-8"))
+    if before["benchmark"] != after["benchmark"]:
+        sys.exit(f"Cannot compare {before['benchmark']} with {after['benchmark']}")
+    changes = compare(before, after)
+    if args.json:
+        print(json.dumps(changes, indent=2))
+        return
+    print(f"{before['commit']} -> {after['commit']}")
+    for change in changes:
+        percent = change["change_percent"]
+        print(
+            f"{change['metric']:<50} {change['before']:>12} {change['after']:>12} "
+            f"{'' if percent is None else f'{percent:+.2f}%':>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Cold start of a server worker: import time, readiness and first requests
+
+An autoscaled pod serves nothing until its workers imported the application
+and warmed up, and serves slowly while they create on first use what the
+warm-up did not. For each io mode this reports:
+
+- import: `python -X importtime -c "import main"`, median of --import-runs
+  runs, with the packages taking the most import time
+- startup: `python main.py` serving one worker, with warm-up on and off, the
+  milliseconds until /probes/healthiness answers, the latency of the first
+  record read and record query, and the median of the following ones
+
+as a results document (see reporting.py). Exits with status 1 when the median
+import time of a mode is above --import-budget-ms, so CI can keep cold start
+under a target.
+
+    poetry run python benchmarks/startup.py --output results/startup.json
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import fixture
+import httpx
+import reporting
+
+
+def import_times(io_mode: str) -> tuple[float, dict[str, float]]:
+    """milliseconds importing main and self milliseconds per top-level package"""
+    env = dict(os.environ, RECORD_PROJECT_IO_MODE=io_mode)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=fixture.SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    total = 0.0
+    packages: dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+        if name == "main":
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def import_profile(io_mode: str, runs: int, top: int) -> dict:
+    """median import time of main over runs and the slowest packages"""
+    totals = []
+    packages: dict[str, list[float]] = {}
+    for _ in range(runs):
+        total, run_packages = import_times(io_mode)
+        totals.append(total)
+        for package, milliseconds in run_packages.items():
+            packages.setdefault(package, []).append(milliseconds)
+    medians = {
+        package: round(statistics.median(values), 2)
+        for package, values in packages.items()
+    }
+    slowest = sorted(medians.items(), key=lambda entry: entry[1], reverse=True)
+    return {
+        "import_ms": round(statistics.median(totals), 2),
+        "packages_ms": dict(slowest[:top]),
+    }
+
+
+def _request_ms(client: httpx.Client, url: str, **kwargs) -> float:
+    start = time.perf_counter()
+    client.get(url, **kwargs).raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def startup_profile(
+    io_mode: str,
+    endpoint_url: str,
+    table_id: str,
+    record_ids: list[str],
+    warmup: bool,
+    requests: int,
+) -> dict:
+    """readiness and first request latencies of a freshly started worker"""
+    port = fixture.free_port()
+    env = dict(
+        os.environ,
+        RECORD_PROJECT_IO_MODE=io_mode,
+        RECORD_PROJECT_DYNAMO_ENDPOINT_URL=endpoint_url,
+        RECORD_PROJECT_SERVER_HOST="127.0.0.1",
+        RECORD_PROJECT_SERVER_PORT=str(port),
+        RECORD_PROJECT_SERVER_WORKERS="1",
+        RECORD_PROJECT_WARMUP=str(warmup).lower(),
+        RECORD_PROJECT_SEARCH_INDEX_PATH=":memory:",
+        RECORD_PROJECT_ACCESS_LOG="false",
+        RECORD_PROJECT_LOG_LEVEL="WARNING",
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "main.py"], cwd=fixture.SRC_DIR, env=env
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+            deadline = started + 60
+            while True:
+                try:
+                    if client.get("/probes/healthiness").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.perf_counter() > deadline:
+                    raise RuntimeError(f"server in {io_mode} mode did not start")
+                time.sleep(0.01)
+            ready_ms = (time.perf_counter() - started) * 1000
+            query_url = f"/table/{table_id}/record/query"
+            gets = [
+                _request_ms(client, f"/table/{table_id}/record/{record_id}")
+                for record_id in record_ids[: requests + 1]
+            ]
+            queries = [
+                _request_ms(client, query_url, params={"limit": 10})
+                for _ in range(requests + 1)
+            ]
+    finally:
+        stopping = time.perf_counter()
+        process.terminate()
+        process.wait()
+        shutdown_ms = (time.perf_counter() - stopping) * 1000
+    return {
+        "ready_ms": round(ready_ms, 2),
+        "first_get_ms": round(gets[0], 2),
+        "next_get_ms": round(statistics.median(gets[1:]), 2),
+        "first_query_ms": round(queries[0], 2),
+        "next_query_ms": round(statistics.median(queries[1:]), 2),
+        "shutdown_ms": round(shutdown_ms, 2),
+    }
+
+
+def main():
+    """profile imports, then start a worker per io mode and warm-up setting"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="packages reported")
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--records", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--endpoint-url", help="use existing dynamo db endpoint")
+    parser.add_argument("--output", help="also write results document to file")
+    args = parser.parse_args()
+
+    dataset = fixture.Dataset(
+        records=max(args.records, args.requests + 1), seed=args.seed
+    )
+    fixture.ensure_credentials()
+    endpoint_url = args.endpoint_url or fixture.start_moto()
+    fixture.create_tables(endpoint_url)
+    record_ids = fixture.seed(endpoint_url, dataset)
+    table_id = dataset.table_ids()[0]
+
+    report = {}
+    over_budget = []
+    for io_mode in args.modes:
+        report[io_mode] = {
+            "import": import_profile(io_mode, args.import_runs, args.top)
+        }
+        if report[io_mode]["import"]["import_ms"] > args.import_budget_ms:
+            over_budget.append(io_mode)
+        for warmup in (True, False):
+            report[io_mode]["warm" if warmup else "cold"] = startup_profile(
+                io_mode,
+                endpoint_url,
+                table_id,
+                record_ids[table_id],
+                warmup,
+                args.requests,
+            )
+        print(io_mode, report[io_mode]["import"]["import_ms"], file=sys.stderr)
+    parameters = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "endpoint_url")
+    }
+    parameters["backend"] = "endpoint" if args.endpoint_url else "moto"
+    reporting.emit("startup", parameters, report, args.output)
+    if over_budget:
+        sys.exit(
+            f"Import time of {', '.join(over_budget)} above "
+            f"{args.import_budget_ms} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Backfill index attributes of records written before they were maintained
+
+Records are found through the table_id-category_created_at-index GSI, which
+only contains items carrying category_created_at. Scan the record table for
+records without it and set it, so that queries planned on the index see them.
+Safe to rerun, already backfilled records are skipped.
+
+    poetry run python scripts/backfill_record_index.py --table record_project_record_table
+"""
+
+import argparse
+import pathlib
+import sys
+
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import config  # noqa: E402  pylint: disable=wrong-import-position
+import stores  # noqa: E402  pylint: disable=wrong-import-position
+from service import query_planner  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def backfill(db_client: stores.dynamo_db.DynamoClient, page_size: int) -> int:
+    """set category_created_at on records missing it, return records updated"""
+    key_attributes = db_client.metadata.key_attributes
+
+    def update(item: dict):
+        db_client.update_item(
+            *(item[key] for key in key_attributes),
+            updates={
+                query_planner.CATEGORY_CREATED_AT: query_planner.category_created_at(
+                    item["category"], item["record_created_at"]
+                )
+            },
+        )
+
+    updated = 0
+    for page in db_client.iter_scan_pages(
+        filter_expression=Attr(query_planner.CATEGORY_CREATED_AT).not_exists()
+        & Attr("category").exists()
+        & Attr("record_created_at").exists(),
+        page_size=page_size,
+    ):
+        items = page.get("Items", [])
+        list(db_client.pool.executor.map(update, items))
+        updated += len(items)
+        print(f"updated {updated} records", file=sys.stderr)
+    return updated
+
+
+def main():
+    """run backfill"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table", default=config.settings.record_table_name)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    pool = stores.dynamo_db.DynamoClientPool(
+        region_name=config.settings.aws_region,
+        endpoint_url=config.settings.dynamo_endpoint_url,
+        max_workers=config.settings.dynamo_max_workers,
+    )
+    try:
+        print(backfill(pool.get_client(args.table), args.page_size))
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
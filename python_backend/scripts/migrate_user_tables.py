@@ -0,0 +1,108 @@
+"""Move tables embedded in user items to table and membership items
+
+Adds the member_user_id-member_key-index GSI to the master table when it is
+missing, then scans the master table for user items that still carry a
+"table" list, writes a table item and the memberships of every table they
+list (see service.table_index) and removes the list from the user item.
+Safe to rerun, tables that already have a table item are kept as they are
+and migrated users are skipped.
+
+    poetry run python scripts/migrate_user_tables.py --table record_project_master_table
+"""
+
+import argparse
+import pathlib
+import sys
+
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import config  # noqa: E402  pylint: disable=wrong-import-position
+import service  # noqa: E402  pylint: disable=wrong-import-position
+import stores  # noqa: E402  pylint: disable=wrong-import-position
+
+table_index = service.table_index
+
+
+def ensure_member_index(db_client: stores.dynamo_db.DynamoClient) -> bool:
+    """create the membership GSI when missing, True when created"""
+    metadata = db_client.metadata
+    if any(index.name == table_index.MEMBER_INDEX for index in metadata.indexes):
+        return False
+    index = dict(table_index.MEMBER_INDEX_DEFINITION)
+    if metadata.read_capacity_units is not None:
+        index["ProvisionedThroughput"] = {
+            "ReadCapacityUnits": metadata.read_capacity_units,
+            "WriteCapacityUnits": metadata.write_capacity_units,
+        }
+    db_client.dynamodb.meta.client.update_table(
+        TableName=db_client.table_name,
+        AttributeDefinitions=[
+            {"AttributeName": table_index.MEMBER_USER_ID, "AttributeType": "S"},
+            {"AttributeName": table_index.MEMBER_KEY, "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexUpdates=[{"Create": index}],
+    )
+    db_client.pool.metadata_cache.invalidate(db_client.table_name)
+    return True
+
+
+def migrate(
+    user_service: service.user.UserService, page_size: int, dry_run: bool
+) -> tuple[int, int]:
+    """migrate users with embedded tables, return users and tables migrated"""
+    db_client = user_service.db_client
+    remove_tables = stores.expression.Expression(
+        expression="REMOVE #t", names={"#t": "table"}, values={}
+    )
+    users = tables = 0
+    for page in db_client.iter_scan_pages(
+        filter_expression=Attr("table").exists(), page_size=page_size
+    ):
+        for item in page.get("Items", []):
+            embedded = [table_index.table_from_item(table) for table in item["table"]]
+            if not dry_run:
+                for table in embedded:
+                    try:
+                        user_service.create_table(table)
+                    except table_index.TableExistsError:
+                        # migrated with another user or by an earlier run
+                        pass
+                db_client.patch_item(
+                    *(item[key] for key in db_client.metadata.key_attributes),
+                    update=remove_tables,
+                )
+            users += 1
+            tables += len(embedded)
+        print(f"migrated {users} users, {tables} tables", file=sys.stderr)
+    return users, tables
+
+
+def main():
+    """run migration"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table", default=config.settings.master_table_name)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="count users and tables only"
+    )
+    args = parser.parse_args()
+
+    pool = stores.dynamo_db.DynamoClientPool(
+        region_name=config.settings.aws_region,
+        endpoint_url=config.settings.dynamo_endpoint_url,
+        max_workers=config.settings.dynamo_max_workers,
+    )
+    try:
+        user_service = service.user.UserService(args.table, pool=pool)
+        if not args.dry_run and ensure_member_index(user_service.db_client):
+            print(f"creating {table_index.MEMBER_INDEX}", file=sys.stderr)
+        users, tables = migrate(user_service, args.page_size, args.dry_run)
+        print(f"{users} users, {tables} tables")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
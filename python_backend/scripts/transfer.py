@@ -0,0 +1,91 @@
+"""Export or import a virtual table from the command line
+
+Runs the same export and import as the /table/{table_id}/export and
+/table/{table_id}/import background jobs. Running a command again with the
+same directory resumes it from its checkpoint.
+
+    poetry run python scripts/transfer.py export --table-id TABLE --directory backup/
+    poetry run python scripts/transfer.py import --table-id TABLE --directory backup/
+"""
+
+import argparse
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+import config  # noqa: E402  pylint: disable=wrong-import-position
+import stores  # noqa: E402  pylint: disable=wrong-import-position
+from service import transfer  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def print_progress(checkpoint: dict):
+    """report progress on stderr"""
+    print(
+        f"{checkpoint['rows']} records, {checkpoint.get('failed', 0)} failed",
+        file=sys.stderr,
+    )
+
+
+def main():
+    """run export or import"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--table-id", required=True)
+    parser.add_argument("--directory", required=True)
+    parser.add_argument("--table", default=config.settings.record_table_name)
+    parser.add_argument("--format", choices=transfer.FORMATS, default="ndjson")
+    parser.add_argument(
+        "--segments", type=int, default=config.settings.transfer_segments
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, default=config.settings.transfer_chunk_rows
+    )
+    parser.add_argument(
+        "--page-size", type=int, default=config.settings.transfer_page_size
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=config.settings.transfer_batch_size
+    )
+    parser.add_argument(
+        "--write-units-per-second",
+        type=float,
+        default=None,
+        help="defaults to a share of the provisioned write capacity",
+    )
+    args = parser.parse_args()
+
+    pool = stores.dynamo_db.DynamoClientPool(
+        region_name=config.settings.aws_region,
+        endpoint_url=config.settings.dynamo_endpoint_url,
+        max_workers=config.settings.dynamo_max_workers,
+    )
+    db_client = pool.get_client(args.table)
+    try:
+        if args.command == "export":
+            checkpoint = transfer.export_table(
+                db_client,
+                args.table_id,
+                args.directory,
+                file_format=args.format,
+                segments=args.segments,
+                chunk_rows=args.chunk_rows,
+                page_size=args.page_size,
+                progress=print_progress,
+            )
+        else:
+            checkpoint = transfer.import_table(
+                db_client,
+                args.table_id,
+                args.directory,
+                batch_size=args.batch_size,
+                write_units_per_second=args.write_units_per_second,
+                progress=print_progress,
+            )
+    finally:
+        pool.close()
+    print_progress(checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""configuration for backend server
+
+Every setting can be overridden by an environment variable named
+``RECORD_PROJECT_<SETTING_NAME>``, e.g. ``RECORD_PROJECT_DYNAMO_MAX_POOL_CONNECTIONS=100``.
+"""
+
+import os
+import secrets
+from typing import Literal
+
+import pydantic
+
+ENV_PREFIX = "RECORD_PROJECT_"
+
+
+class Settings(pydantic.BaseModel):
+    """Settings for backend server
+
+    Attributes:
+        record_table_name (str): dynamo db table storing records of virtual tables
+        master_table_name (str): dynamo db table storing user and table information
+        io_mode (str): "sync" serves records from threadpool handlers with boto3,
+            "async" serves them from async handlers with aiobotocore
+        storage_backend (str): "dynamodb", or "sqlite" for an embedded database
+            holding the record and master tables, see stores.sqlite_db
+        sqlite_path (str): database file of the sqlite backend, ":memory:" for
+            a database living as long as the process
+        sqlite_max_connections (int): connections of the sqlite backend
+        sqlite_busy_timeout (float): seconds a sqlite write waits for another
+        server_host (str): address the server listens on
+        server_port (int): port the server listens on
+        server_workers (int): server processes, 0 for one per available core.
+            Workers share no memory, so with more than one the record cache
+            and the change feed must be "redis" or "none", and sqlite_path a
+            file; the count, aggregate and access caches stay per worker and
+            lag behind the writes of others by up to their ttl
+        server_loop (str): event loop, "auto" takes uvloop when installed
+        server_http (str): HTTP parser, "auto" takes httptools when installed
+        server_keep_alive (int): seconds an idle connection is kept open, above
+            the idle timeout of the load balancer in front so that it never
+            reuses a connection the server is closing
+        server_backlog (int): connections waiting to be accepted
+        server_graceful_timeout (float): seconds in-flight requests may take to
+            complete on shutdown before the worker is stopped
+        threadpool_size (int): threads serving the sync routes and the sync
+            dependencies of a worker
+        warmup (bool): create the clients, describe the tables and run the
+            request models once on startup, before serving, see service.warmup
+        aws_region (str | None): aws region, default to boto3 resolution when None
+        dynamo_endpoint_url (str | None): custom endpoint, e.g. dynamo db local
+        dynamo_max_pool_connections (int): size of each botocore connection
+            pool, not a process total. In sync mode the shared client has one
+            pool and the resource of every thread another, up to about
+            (threadpool_size + 1) times this value, see
+            stores.dynamo_db.DynamoClientPool. Async mode has one pool
+        dynamo_tcp_keepalive (bool): enable tcp keep-alive on pooled connections
+        dynamo_connect_timeout (float): seconds to wait for a new connection
+        dynamo_read_timeout (float): seconds to wait for a response
+        dynamo_metadata_ttl (float): seconds to cache DescribeTable results
+        dynamo_retry_max_attempts (int): attempts of a throttled or failed
+            request before giving up
+        dynamo_capacity_max_wait (float): seconds a request may wait for table
+            capacity before failing with 503
+        dynamo_read_units_per_second (float): read rate of on-demand tables, 0
+            for unlimited until throttled
+        dynamo_write_units_per_second (float): write rate of on-demand tables,
+            0 for unlimited until throttled
+        dynamo_coalesce_reads (bool): send concurrent single record reads of a
+            table together as BatchGetItem requests
+        dynamo_coalesce_window (float): seconds a coalesced read waits for others
+        cursor_secret (str): key signing pagination cursors, random per process
+            unless set, so set it when running several workers or replicas
+        dynamo_max_workers (int): threads fanning out dynamo db calls, e.g. the
+            segments of a parallel scan
+        record_count_segments (int): count records with a parallel scan of this
+            many segments instead of a sequential query when above 1
+        count_cache_size (int): maximum number of cached record counts
+        count_cache_ttl (float): seconds a cached record count stays valid
+        aggregate_cache_size (int): maximum number of cached aggregate results
+        aggregate_cache_ttl (float): seconds a cached aggregate result stays valid
+        aggregate_max_groups (int): groups an aggregate query may return
+        aggregate_sample_size (int): values kept per group and field for
+            percentiles, exact up to this many values and sampled beyond
+        aggregate_page_size (int): records read per page by an aggregate query
+        table_stats (bool): maintain the record counts, size and last write
+            time of every table on record writes, see service.table_stats
+        change_feed_backend (str): "memory" to publish record writes to the
+            subscribers of this process, "redis" to share them between
+            workers, "none" to disable the change feed
+        change_feed_history (int): events kept per table for resuming
+        change_feed_buffer (int): events buffered per subscriber, a subscriber
+            falling further behind is disconnected and has to resume
+        change_feed_max_tables (int): tables whose recent events are kept
+        change_feed_heartbeat (float): seconds between keep-alive comments of
+            an idle change stream
+        change_feed_redis_url (str): redis url of the redis change feed
+        search_backend (str): "none" to disable record search, "sqlite" to
+            keep a full-text index of the record strings updated on every
+            write, see service.search. The index is a local file: it only
+            sees the writes of the workers of its host, so run a single host,
+            or rebuild the index of a table written by other hosts
+        search_index_path (str): database file of the sqlite search index,
+            shared by the workers of a host
+        filter_cache_size (int): maximum number of compiled filter shapes kept
+        read_coalescing (bool): identical record reads in flight at the same
+            time share one dynamo db call
+        record_cache_backend (str): "memory" for an in-process LRU, "redis" to
+            share cached records between workers, "none" to disable
+        record_cache_size (int): maximum number of records in memory cache
+        record_cache_ttl (float): seconds a cached record stays valid
+        record_cache_negative_ttl (float): seconds a missing record stays cached
+        record_cache_redis_url (str): redis url of the redis record cache
+        access_control (bool): check the access level of the requesting user
+            on the table of record and table routes
+        user_id_header (str): request header carrying the id of the user,
+            requests without it are anonymous and only read public tables. The
+            header is trusted as is, so the server must only be reachable
+            through a gateway that authenticates users and replaces any
+            client-supplied value, see gateway_secret
+        gateway_secret (str | None): when set, user_id_header is only
+            trusted on requests carrying this value in gateway_secret_header,
+            other requests are anonymous
+        gateway_secret_header (str): request header the gateway puts
+            gateway_secret in
+        access_cache_size (int): maximum number of cached (table, user) levels
+        access_cache_ttl (float): seconds a cached access level stays valid,
+            the delay before other workers see a change of table users
+        server_timing (bool): report request and dynamo db time and capacity in
+            a Server-Timing response header
+        slow_request_threshold (float): seconds from which requests are
+            profiled and reported, 0 to disable the sampling profiler
+        slow_request_sample_interval (float): seconds between profiler samples
+        log_level (str): minimum level logged, DEBUG also logs record bodies
+        log_format (str): "text" for key=value lines, "json" for one JSON
+            object per line
+        log_enqueue (bool): write logs from a background thread
+        access_log (bool): log every request with its route, path parameters,
+            status, latency and dynamo db usage
+        log_sample_rate (float): share of request lines below WARNING logged
+        log_route_sample_rates (str): sample rate per route, e.g.
+            "GET /table/{table_id}/record/{record_id}=0.01,GET /metrics=0"
+        log_route_levels (str): minimum level per route, e.g.
+            "GET /probes/healthiness=WARNING"
+        transfer_dir (str): directory of export and import job files
+        transfer_max_jobs (int): export and import jobs running at once
+        transfer_segments (int): parallel scan segments of an export
+        transfer_export_threads (int): streams of an export read at once, the
+            other segments wait for a thread
+        transfer_chunk_rows (int): rows per exported part file
+        transfer_page_size (int): items read per request of an export
+        transfer_batch_size (int): records written per import checkpoint
+        transfer_write_capacity_ratio (float): share of provisioned write
+            capacity an import may use
+        transfer_write_units_per_second (float): import write rate on on-demand
+            tables, 0 for unlimited
+    """
+
+    record_table_name: str = "record_project_record_table"
+    master_table_name: str = "record_project_master_table"
+    io_mode: Literal["sync", "async"] = "sync"
+    storage_backend: Literal["dynamodb", "sqlite"] = "dynamodb"
+    sqlite_path: str = "record_project.db"
+    sqlite_max_connections: int = 8
+    sqlite_busy_timeout: float = 5
+
+    server_host: str = "0.0.0.0"
+    server_port: int = 8888
+    server_workers: int = 1
+    server_loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    server_http: Literal["auto", "h11", "httptools"] = "auto"
+    server_keep_alive: int = 65
+    server_backlog: int = 2048
+    server_graceful_timeout: float = 30
+    threadpool_size: int = 40
+    warmup: bool = True
+
+    aws_region: str | None = None
+    dynamo_endpoint_url: str | None = None
+    dynamo_max_pool_connections: int = 50
+    dynamo_tcp_keepalive: bool = True
+    dynamo_connect_timeout: float = 5
+    dynamo_read_timeout: float = 10
+    dynamo_metadata_ttl: float = 300
+    dynamo_retry_max_attempts: int = 8
+    dynamo_capacity_max_wait: float = 2
+    dynamo_read_units_per_second: float = 0
+    dynamo_write_units_per_second: float = 0
+    dynamo_coalesce_reads: bool = False
+    dynamo_coalesce_window: float = 0.002
+
+    cursor_secret: str = pydantic.Field(
+        default_factory=lambda: secrets.token_urlsafe(32)
+    )
+
+    dynamo_max_workers: int = 16
+    record_count_segments: int = 1
+    count_cache_size: int = 1024
+    count_cache_ttl: float = 60
+    aggregate_cache_size: int = 256
+    aggregate_cache_ttl: float = 60
+    aggregate_max_groups: int = 10_000
+    aggregate_sample_size: int = 10_000
+    aggregate_page_size: int = 1000
+    table_stats: bool = True
+    change_feed_backend: Literal["memory", "redis", "none"] = "memory"
+    change_feed_history: int = 1000
+    change_feed_buffer: int = 256
+    change_feed_max_tables: int = 10_000
+    change_feed_heartbeat: float = 15
+    change_feed_redis_url: str = "redis://localhost:6379/0"
+    search_backend: Literal["sqlite", "none"] = "none"
+    search_index_path: str = "record_project_search.db"
+    filter_cache_size: int = 512
+    read_coalescing: bool = True
+
+    record_cache_backend: Literal["memory", "redis", "none"] = "memory"
+    record_cache_size: int = 10_000
+    record_cache_ttl: float = 30
+    record_cache_negative_ttl: float = 5
+    record_cache_redis_url: str = "redis://localhost:6379/0"
+
+    access_control: bool = False
+    user_id_header: str = "X-User-Id"
+    gateway_secret: str | None = None
+    gateway_secret_header: str = "X-Gateway-Secret"
+    access_cache_size: int = 100_000
+    access_cache_ttl: float = 30
+
+    server_timing: bool = False
+    slow_request_threshold: float = 0
+    slow_request_sample_interval: float = 0.005
+
+    log_level: str = "INFO"
+    log_format: Literal["text", "json"] = "text"
+    log_enqueue: bool = True
+    access_log: bool = True
+    log_sample_rate: float = 1.0
+    log_route_sample_rates: str = ""
+    log_route_levels: str = ""
+
+    transfer_dir: str = "transfers"
+    transfer_max_jobs: int = 2
+    transfer_segments: int = 4
+    transfer_export_threads: int = 8
+    transfer_chunk_rows: int = 100_000
+    transfer_page_size: int = 1000
+    transfer_batch_size: int = 500
+    transfer_write_capacity_ratio: float = 0.8
+    transfer_write_units_per_second: float = 0
+
+
+def load_settings() -> Settings:
+    """load settings from environment variables"""
+    overrides = {}
+    for field_name in Settings.model_fields:
+        env_value = os.environ.get(ENV_PREFIX + field_name.upper())
+        if env_value is not None:
+            overrides[field_name] = env_value
+    return Settings.model_validate(overrides)
+
+
+settings = load_settings()
@@ -1,19 +1,101 @@
 """program entry point"""
 
+import math
+import os
 from contextlib import asynccontextmanager
 
+import anyio
+import config
 import fastapi
 import routers
+import service
+import stores
+import telemetry
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
+telemetry.logs.configure(
+    level=config.settings.log_level,
+    serialize=config.settings.log_format == "json",
+    enqueue=config.settings.log_enqueue,
+    route_filter=telemetry.logs.RouteFilter(
+        sample_rate=config.settings.log_sample_rate,
+        route_sample_rates=telemetry.logs.parse_route_options(
+            config.settings.log_route_sample_rates, float
+        ),
+        route_levels=telemetry.logs.parse_route_options(
+            config.settings.log_route_levels, str
+        ),
+    ),
+)
+slow_request_profiler = None
+if config.settings.slow_request_threshold > 0:
+    slow_request_profiler = telemetry.profiler.SlowRequestProfiler(
+        threshold=config.settings.slow_request_threshold,
+        interval=config.settings.slow_request_sample_interval,
+    )
+# one governor per table for the sync and async clients
+throughput_registry = stores.rate_limit.ThroughputRegistry(
+    read_units_per_second=config.settings.dynamo_read_units_per_second,
+    write_units_per_second=config.settings.dynamo_write_units_per_second,
+    max_attempts=config.settings.dynamo_retry_max_attempts,
+    max_wait=config.settings.dynamo_capacity_max_wait,
+)
+telemetry.metrics.registry.add_collector(
+    telemetry.collectors.throughput_collector(throughput_registry.snapshot)
+)
+telemetry.metrics.registry.add_collector(
+    telemetry.collectors.coalescing_collector(service.record.flight_stats.snapshot)
+)
+
 
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):
     logger.info("Starting backend server")
+    settings = config.settings
+    # threads of the sync routes, run_in_threadpool takes from this limiter
+    anyio.to_thread.current_default_thread_limiter().total_tokens = (
+        settings.threadpool_size
+    )
+    if settings.access_control and settings.gateway_secret is None:
+        logger.warning(
+            "Access control trusts the {} header of every request,"
+            " only expose the server behind a gateway setting it",
+            settings.user_id_header,
+        )
+    app.state.dynamo_pool = service.storage.create_pool(settings, throughput_registry)
+    app.state.async_dynamo_pool = None
+    if settings.io_mode == "async":
+        app.state.async_dynamo_pool = await service.storage.open_async_pool(
+            settings, throughput_registry, app.state.dynamo_pool
+        )
+    if slow_request_profiler is not None:
+        slow_request_profiler.start()
+    app.state.job_manager = service.jobs.JobManager(
+        app.state.dynamo_pool,
+        directory=settings.transfer_dir,
+        max_workers=settings.transfer_max_jobs,
+    )
+    service.record.change_broker.start()
+    if settings.warmup:
+        timings = service.warmup.warm_up(app.state.dynamo_pool, settings)
+        if app.state.async_dynamo_pool is not None:
+            timings["async_tables_ms"] = await service.warmup.warm_async_pool(
+                app.state.async_dynamo_pool, settings
+            )
+        logger.info("Warmed up", **timings)
     yield
+    service.record.change_broker.close()
+    app.state.job_manager.shutdown()
+    service.record.search_index.close()
+    if slow_request_profiler is not None:
+        slow_request_profiler.stop()
+    if app.state.async_dynamo_pool is not None:
+        await app.state.async_dynamo_pool.close()
+    app.state.dynamo_pool.close()
     logger.info("Stopping backend server")
+    await logger.complete()
 
 
 app = fastapi.FastAPI(lifespan=lifespan)
@@ -32,9 +114,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[routers.pagination.NEXT_CURSOR_HEADER, "Server-Timing"],
+)
+app.add_middleware(
+    telemetry.middleware.TimingMiddleware,
+    server_timing=config.settings.server_timing,
+    slow_request_profiler=slow_request_profiler,
+    access_log=config.settings.access_log,
 )
 
-app.include_router(routers.record.router, tags=["record"])
+if config.settings.io_mode == "async":
+    app.include_router(routers.async_record.router, tags=["record"])
+else:
+    app.include_router(routers.record.router, tags=["record"])
+app.include_router(routers.transfer.router, tags=["transfer"])
+app.include_router(routers.table.router, tags=["table"])
+app.include_router(routers.changes.router, tags=["changes"])
+
+
+@app.exception_handler(stores.rate_limit.CapacityExceededError)
+async def capacity_exceeded(
+    unused_request: fastapi.Request, exc: stores.rate_limit.CapacityExceededError
+):
+    return fastapi.responses.JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
 
 
 @app.get("/probes/healthiness")
@@ -42,6 +148,100 @@ def healthiness():
     return
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """metrics in the Prometheus text format"""
+    return fastapi.responses.PlainTextResponse(
+        telemetry.metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/probes/throughput")
+def throughput():
+    """read and write rates and throttling counters per dynamo db table"""
+    return throughput_registry.snapshot()
+
+
+@app.get("/probes/coalescing")
+def coalescing():
+    """record reads per operation and how many shared a call in flight"""
+    return service.record.flight_stats.snapshot()
+
+
+def worker_count(settings: config.Settings) -> int:
+    """server processes, one per core available to the process when 0"""
+    if settings.server_workers > 0:
+        return settings.server_workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def server_options(settings: config.Settings) -> dict:
+    """uvicorn.run arguments serving main:app with settings"""
+    return {
+        "host": settings.server_host,
+        "port": settings.server_port,
+        "workers": worker_count(settings),
+        "loop": settings.server_loop,
+        "http": settings.server_http,
+        "timeout_keep_alive": settings.server_keep_alive,
+        "backlog": settings.server_backlog,
+        "timeout_graceful_shutdown": math.ceil(settings.server_graceful_timeout),
+        # the access log of TimingMiddleware replaces the one of uvicorn
+        "access_log": not settings.access_log,
+    }
+
+
+def multi_worker_errors(settings: config.Settings) -> list[str]:
+    """settings keeping in one process state that every worker has to share"""
+    problems = []
+    if settings.record_cache_backend == "memory":
+        problems.append(
+            "record_cache_backend is memory: a worker would serve records other "
+            "workers changed, use redis or none"
+        )
+    if settings.change_feed_backend == "memory":
+        problems.append(
+            "change_feed_backend is memory: subscribers would miss the writes of "
+            "other workers, use redis or none"
+        )
+    if (
+        settings.storage_backend == "sqlite"
+        and settings.sqlite_path == stores.sqlite_db.MEMORY
+    ):
+        problems.append(
+            "sqlite_path is :memory: and every worker would have its own database"
+        )
+    return problems
+
+
+def main():
+    """serve the app with uvicorn, in several workers when configured"""
+    options = server_options(config.settings)
+    workers = options["workers"]
+    if workers > 1:
+        problems = multi_worker_errors(config.settings)
+        for problem in problems:
+            logger.error(problem)
+        if problems:
+            raise SystemExit(f"Cannot run {workers} workers")
+        # every worker loads the settings again, they must sign cursors alike
+        os.environ.setdefault(
+            config.ENV_PREFIX + "CURSOR_SECRET", config.settings.cursor_secret
+        )
+        logger.warning(
+            "Count, aggregate and access caches are per worker, other workers "
+            "see a write once their entry expires",
+            count_cache_ttl=config.settings.count_cache_ttl,
+            aggregate_cache_ttl=config.settings.aggregate_cache_ttl,
+            access_cache_ttl=config.settings.access_cache_ttl,
+        )
+    logger.info("Starting fastapi server", workers=workers)
+    uvicorn.run("main:app", **options)
+
+
 if __name__ == "__main__":
-    logger.info("Starting fastapi server")
-    uvicorn.run("main:app", host="0.0.0.0", port=8888)
+    main()
@@ -1 +1,8 @@
+from routers import pagination
+from routers import responses
+from routers import record_routes
 from routers import record
+from routers import async_record
+from routers import transfer
+from routers import table
+from routers import changes
@@ -0,0 +1,71 @@
+"""Router for the change feed of record writes, see service.change_feed"""
+
+import asyncio
+from typing import AsyncIterator
+
+import config
+import fastapi
+import service
+from routers import dependencies
+
+router = fastapi.APIRouter()
+
+read_access = [fastapi.Depends(dependencies.require_access(service.access.READ))]
+
+
+async def _stream(
+    broker: service.change_feed.ChangeBroker,
+    subscription: service.change_feed.Subscription,
+) -> AsyncIterator[bytes]:
+    try:
+        # reconnect quickly after an overflow or a restart
+        yield b"retry: 1000\n\n"
+        while True:
+            events = await subscription.next_events(
+                config.settings.change_feed_heartbeat
+            )
+            if events is None:
+                return
+            if not events:
+                yield b": keep-alive\n\n"
+                continue
+            yield b"".join(
+                service.change_feed.sse_message(broker, event) for event in events
+            )
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/table/{table_id}/changes", dependencies=read_access)
+async def stream_changes(
+    table_id: str,
+    after: str | None = None,
+    last_event_id: str | None = fastapi.Header(None),
+):
+    """Server-sent events of the record writes of a table
+
+    Events are named after the operation: create, update, patch and delete
+    carry the record id and version, reload means many records changed and
+    reset that events were missed; after both the client reloads the table.
+    A client that falls behind is disconnected, and resumes after the id of
+    the last event it received with the Last-Event-ID header, which browsers
+    send on reconnect, or the after parameter.
+    """
+    broker = service.record.change_broker
+    if not broker.enabled:
+        raise fastapi.HTTPException(status_code=404, detail="Change feed disabled")
+    resume_after = after or last_event_id
+    subscription = broker.subscribe(
+        table_id,
+        (
+            service.change_feed.EventId.parse(resume_after)
+            if resume_after is not None
+            else None
+        ),
+        asyncio.get_running_loop(),
+    )
+    return fastapi.responses.StreamingResponse(
+        _stream(broker, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
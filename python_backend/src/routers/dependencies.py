@@ -0,0 +1,181 @@
+"""Shared dependencies for routers"""
+
+import hmac
+from typing import Awaitable, Callable
+
+import config
+import fastapi
+import schema
+import service
+import stores
+from starlette.concurrency import run_in_threadpool
+
+
+def get_dynamo_pool(request: fastapi.Request) -> stores.backend.StoragePool:
+    """get process-wide storage pool created in lifespan"""
+    return request.app.state.dynamo_pool
+
+
+def get_record_service(
+    pool: stores.backend.StoragePool = fastapi.Depends(get_dynamo_pool),
+) -> service.record.RecordService:
+    """get record service backed by shared pool"""
+    return service.record.RecordService(config.settings.record_table_name, pool=pool)
+
+
+def get_user_service(
+    pool: stores.backend.StoragePool = fastapi.Depends(get_dynamo_pool),
+) -> service.user.UserService:
+    """get user service backed by shared pool"""
+    return service.user.UserService(config.settings.master_table_name, pool=pool)
+
+
+def get_table_stats_service(
+    pool: stores.backend.StoragePool = fastapi.Depends(get_dynamo_pool),
+) -> service.table_stats.TableStatsService:
+    """get table statistics service backed by shared pool"""
+    return service.table_stats.TableStatsService(
+        config.settings.master_table_name, pool=pool
+    )
+
+
+def get_async_dynamo_pool(
+    request: fastapi.Request,
+) -> stores.backend.AsyncStoragePool:
+    """get process-wide async storage pool created in lifespan"""
+    return request.app.state.async_dynamo_pool
+
+
+def get_async_record_service(
+    pool: stores.backend.AsyncStoragePool = fastapi.Depends(get_async_dynamo_pool),
+) -> service.async_record.AsyncRecordService:
+    """get async record service backed by shared pool"""
+    return service.async_record.AsyncRecordService(
+        config.settings.record_table_name, pool=pool
+    )
+
+
+def get_async_user_service(
+    pool: stores.backend.AsyncStoragePool = fastapi.Depends(get_async_dynamo_pool),
+) -> service.async_user.AsyncUserService:
+    """get async user service backed by shared pool"""
+    return service.async_user.AsyncUserService(
+        config.settings.master_table_name, pool=pool
+    )
+
+
+def get_job_manager(request: fastapi.Request) -> service.jobs.JobManager:
+    """get process-wide transfer job manager created in lifespan"""
+    return request.app.state.job_manager
+
+
+def get_user_id(request: fastapi.Request) -> str | None:
+    """id of the requesting user, None for anonymous requests
+
+    With config.Settings.gateway_secret set, the user id header of requests
+    that do not come through the gateway is ignored.
+    """
+    secret = config.settings.gateway_secret
+    if secret is not None and not hmac.compare_digest(
+        request.headers.get(config.settings.gateway_secret_header, "").encode(),
+        secret.encode(),
+    ):
+        return None
+    return request.headers.get(config.settings.user_id_header) or None
+
+
+async def _resolve_level(
+    request: fastapi.Request, user_id: str | None, table_id: str
+) -> str:
+    if config.settings.io_mode == "async":
+        async_user_service = get_async_user_service(get_async_dynamo_pool(request))
+        return await service.access.AsyncAccessResolver(async_user_service).level(
+            user_id, table_id
+        )
+    user_service = get_user_service(get_dynamo_pool(request))
+    return await run_in_threadpool(
+        service.access.AccessResolver(user_service).level, user_id, table_id
+    )
+
+
+async def check_access(request: fastapi.Request, table_id: str, level: str):
+    """check the requesting user has level on table_id
+
+    The check is a coroutine, so a cached level costs a dictionary lookup on
+    the event loop instead of a hop to the threadpool, misses read the table
+    item. Nothing is checked unless config.Settings.access_control is set.
+
+    Raises:
+        fastapi.HTTPException: 404 when the table does not exist, 401 for
+            anonymous and 403 for other users without level
+    """
+    if not config.settings.access_control:
+        return
+    user_id = get_user_id(request)
+    found, granted = service.access.cached_level(user_id, table_id)
+    if not found or granted is None:
+        granted = await _resolve_level(request, user_id, table_id)
+    if service.access.allows(granted, level):
+        return
+    if granted == service.access.MISSING:
+        raise fastapi.HTTPException(status_code=404, detail="Table not found")
+    if user_id is None:
+        raise fastapi.HTTPException(status_code=401, detail="Authentication required")
+    raise fastapi.HTTPException(
+        status_code=403, detail=f"{level} access to table {table_id} required"
+    )
+
+
+def require_access(level: str) -> Callable[..., Awaitable[None]]:
+    """dependency checking the requesting user has level on path table_id,
+    see check_access
+
+    Args:
+        level (str): "owner", "edit" or "read"
+    """
+
+    async def check_path_access(table_id: str, request: fastapi.Request):
+        await check_access(request, table_id, level)
+
+    return check_path_access
+
+
+def require_job_access(
+    export_level: str, import_level: str
+) -> Callable[..., Awaitable[schema.response_model.TransferJob]]:
+    """dependency loading path job_id and checking the requesting user has
+    export_level or import_level, by kind of job, on the table of the job
+
+    Raises:
+        fastapi.HTTPException: 404 when the job does not exist, else see
+            check_access
+    """
+
+    async def load_job(
+        job_id: str,
+        request: fastapi.Request,
+        job_manager: service.jobs.JobManager = fastapi.Depends(get_job_manager),
+    ) -> schema.response_model.TransferJob:
+        job = await run_in_threadpool(job_manager.get, job_id)
+        if job is None:
+            raise fastapi.HTTPException(status_code=404, detail="Job not found")
+        level = export_level if job.kind == "export" else import_level
+        await check_access(request, job.table_id, level)
+        return job
+
+    return load_job
+
+
+def require_user(user_id: str, request: fastapi.Request):
+    """only let the user of path user_id through, when access control is on
+
+    Raises:
+        fastapi.HTTPException: 401 for anonymous and 403 for other users
+    """
+    if not config.settings.access_control:
+        return
+    requester = get_user_id(request)
+    if requester is None:
+        raise fastapi.HTTPException(status_code=401, detail="Authentication required")
+    if requester != user_id:
+        raise fastapi.HTTPException(status_code=403, detail="Access denied")
@@ -0,0 +1,65 @@
+"""Cursor pagination and NDJSON streaming helpers for routers"""
+
+from typing import AsyncIterator, Iterable, Iterator
+
+import fastapi
+import service
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def decode_start_key(cursor: str | None, scope: str) -> dict | None:
+    """decode cursor issued for scope, e.g. a table id, into key to resume from"""
+    try:
+        return service.cursor.decode_cursor(cursor, scope)
+    except service.cursor.InvalidCursorError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e)) from e
+
+
+def get_start_key(table_id: str, cursor: str | None = None) -> dict | None:
+    """decode cursor query parameter into key to resume from"""
+    return decode_start_key(cursor, table_id)
+
+
+def set_next_cursor(response: fastapi.Response, start_key: dict | None, table_id: str):
+    """expose cursor of next page in response header"""
+    next_cursor = service.cursor.encode_cursor(start_key, table_id)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+def search_scope(table_id: str) -> str:
+    """scope of search cursors, which hold an offset instead of a key"""
+    return f"search#{table_id}"
+
+
+def get_search_offset(table_id: str, cursor: str | None = None) -> int:
+    """decode cursor query parameter of a search into offset to resume from"""
+    start_key = decode_start_key(cursor, search_scope(table_id))
+    return int(start_key["offset"]) if start_key is not None else 0
+
+
+def set_next_search_cursor(
+    response: fastapi.Response, offset: int | None, table_id: str
+):
+    """expose cursor of next page of a search in response header"""
+    set_next_cursor(
+        response,
+        {"offset": offset} if offset is not None else None,
+        search_scope(table_id),
+    )
+
+
+def ndjson_lines(rows: Iterable[service.record_row.RecordRow]) -> Iterator[bytes]:
+    """serialise records one json object per line"""
+    for row in rows:
+        yield row.to_json() + b"\n"
+
+
+async def async_ndjson_lines(
+    rows: AsyncIterator[service.record_row.RecordRow],
+) -> AsyncIterator[bytes]:
+    """serialise records one json object per line"""
+    async for row in rows:
+        yield row.to_json() + b"\n"
@@ -1,10 +1,13 @@
 """Router for record related operations"""
 
+from typing import Literal
+
 import fastapi
 import pydantic
 import schema
 import service
 from loguru import logger
+from routers import dependencies, pagination, record_routes, responses
 
 router = fastapi.APIRouter()
 
@@ -19,39 +22,94 @@ router = fastapi.APIRouter()
 # delete record
 
 
-@router.post("/record/{table_id}", response_model=schema.table.Record)
-def create_record(record: schema.table.Record):
-    """Create a new record"""
-    logger.info(f"Create new record: {record}")
-    response = service.record.RecordService(
-        "record_project_record_table"
-    ).create_record(record)
+@record_routes.CREATE.of(router)
+def create_record(
+    table_id: str,
+    record: schema.table.Record,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Create a new record, 409 when a record with its id exists"""
+    record_routes.check_record(record, table_id)
+    logger.opt(lazy=True).debug("Create record {}", record.model_dump_json)
+    with record_routes.update_errors():
+        response = record_service.create_record(record)
     return response
 
 
-@router.get("/table/{table_id}/record", response_model=list[schema.table.Record])
-def get_table(table_id: str):
-    """Get a table of records"""
-    logger.info(f"Get table: {table_id}")
-    response = service.record.RecordService("record_project_record_table").query_record(
-        table_id
+@record_routes.BATCH_CREATE.of(router)
+def batch_create_record(
+    table_id: str,
+    request: schema.request.BatchCreateRecords,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Create records in batches, reporting success or failure per record"""
+    record_routes.check_records(request.records, table_id)
+    return record_service.batch_create_records(request.records)
+
+
+@record_routes.BATCH_GET.of(router)
+def batch_get_record(
+    table_id: str,
+    request: schema.request.BatchGetRecords,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Get records by id in batches, missing records are reported as failed"""
+    rows, results = record_service.batch_get_records(table_id, request.record_ids)
+    return responses.batch_get_response(rows, results)
+
+
+@record_routes.TABLE.of(router)
+def get_table(
+    table_id: str,
+    limit: int = fastapi.Query(100, ge=1),
+    response_format: Literal["json", "ndjson"] = fastapi.Query("json", alias="format"),
+    start_key: dict | None = fastapi.Depends(pagination.get_start_key),
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Get a table of records
+
+    Returns one page of records with the cursor of the next page in the
+    X-Next-Cursor header. With format=ndjson every record from the cursor on
+    is streamed, one json object per line, reading one page at a time.
+    """
+    if response_format == "ndjson":
+        return fastapi.responses.StreamingResponse(
+            pagination.ndjson_lines(
+                record_service.iter_records(table_id, start_key=start_key)
+            ),
+            media_type=pagination.NDJSON_MEDIA_TYPE,
+        )
+    records, next_key = record_service.query_record(
+        table_id, limit=limit, start_key=start_key
     )
+    response = responses.records_response(records)
+    pagination.set_next_cursor(response, next_key, table_id)
     return response
 
 
-@router.get("/table/{table_id}/record/query", response_model=list[schema.table.Record])
+@record_routes.QUERY.of(router)
 def query_record(
     table_id: str,
-    limit: int = 10,
+    limit: int = fastapi.Query(10, ge=1),
     category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
     created_after: pydantic.AwareDatetime | None = None,
     created_before: pydantic.AwareDatetime | None = None,
     record_condition: list[schema.request.FieldCondition] | None = None,
-    start_key: int | None = None,
+    start_key: dict | None = fastapi.Depends(pagination.get_start_key),
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
 ):
-    """Query records"""
-    logger.info(f"Query records")
-    response = service.record.RecordService("record_project_record_table").query_record(
+    """Query records, cursor of next page is in X-Next-Cursor header"""
+    records, next_key = record_service.query_record(
         table_id=table_id,
         limit=limit,
         category=category,
@@ -60,34 +118,163 @@ def query_record(
         record_condition=record_condition,
         start_key=start_key,
     )
+    response = responses.records_response(records)
+    pagination.set_next_cursor(response, next_key, table_id)
     return response
 
 
-@router.get("/table/{table_id}/record/{record_id}", response_model=schema.table.Record)
-def get_record(table_id: str, record_id: str):
-    """Get a record"""
-    logger.info(f"Get record: {record_id}")
-    response = service.record.RecordService(
-        "record_project_record_table"
-    ).get_record_by_id(table_id=table_id, record_id=record_id)
-    return response
+@record_routes.EXPLAIN.of(router)
+def explain_query_record(
+    table_id: str,
+    category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+    created_after: pydantic.AwareDatetime | None = None,
+    created_before: pydantic.AwareDatetime | None = None,
+    record_condition: list[schema.request.FieldCondition] | None = None,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Show the plan of a record query and the read units it consumes
+
+    The query runs once with Select=COUNT to measure what it reads.
+    """
+    return record_service.explain_query(
+        table_id=table_id,
+        category=category,
+        created_after=created_after,
+        created_before=created_before,
+        record_condition=record_condition,
+    )
 
 
-@router.put("/table/{table_id}/record/{record_id}", response_model=schema.table.Record)
-def update_record(table_id: str, record_id: str, record: schema.table.Record):
-    """Update a record"""
-    logger.info(f"Update record: {record_id}")
-    response = service.record.RecordService(
-        "record_project_record_table"
-    ).update_record(record)
+@record_routes.COUNT.of(router)
+def count_record(
+    table_id: str,
+    category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+    created_after: pydantic.AwareDatetime | None = None,
+    created_before: pydantic.AwareDatetime | None = None,
+    record_condition: list[schema.request.FieldCondition] | None = None,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Count records matching the query filters"""
+    record_count = record_service.get_query_result_count(
+        table_id=table_id,
+        category=category,
+        created_after=created_after,
+        created_before=created_before,
+        record_condition=record_condition,
+    )
+    return schema.response_model.RecordQuery(
+        category=category, record_count=record_count, records=[]
+    )
+
+
+@record_routes.AGGREGATE.of(router)
+def aggregate_record(
+    table_id: str,
+    query: schema.request.AggregateRecords,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Group records matching the query filters and aggregate their fields"""
+    with record_routes.aggregate_errors():
+        return record_service.aggregate_records(table_id, query)
+
+
+@record_routes.SEARCH.of(router)
+def search_record(
+    table_id: str,
+    q: str = fastapi.Query(..., min_length=1),
+    category: schema.common.RecordCategory | None = None,
+    limit: int = fastapi.Query(10, ge=1, le=100),
+    offset: int = fastapi.Depends(pagination.get_search_offset),
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Search the strings of records, best match first
+
+    Every word of q must match, "word*" matches words starting with word.
+    The cursor of the next page is in X-Next-Cursor header.
+    """
+    record_routes.check_search_enabled()
+    records, next_offset = record_service.search_records(
+        table_id, q, category=category, limit=limit, offset=offset
+    )
+    response = responses.records_response(records)
+    pagination.set_next_search_cursor(response, next_offset, table_id)
     return response
 
 
-@router.delete("/table/{table_id}/record/{record_id}")
-def delete_record(table_id: str, record_id: str):
+@record_routes.GET.of(router)
+def get_record(
+    table_id: str,
+    record_id: str,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Get a record"""
+    row = record_service.get_record_by_id(table_id=table_id, record_id=record_id)
+    return record_routes.found(row)
+
+
+@record_routes.UPDATE.of(router)
+def update_record(
+    table_id: str,
+    record_id: str,
+    record: schema.table.Record,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Replace a record
+
+    The body may leave out the id of the record, and its creation time to
+    keep the stored one. With a version in the body the update fails with 409
+    when the record has another version.
+    """
+    record_routes.check_record(record, table_id, record_id)
+    keep_created_at = "record_created_at" not in record.model_fields_set
+    record = record.model_copy(update={"id": record_id})
+    logger.opt(lazy=True).debug("Update record {}", record.model_dump_json)
+    with record_routes.update_errors():
+        row = record_service.update_record(record, keep_created_at=keep_created_at)
+    return record_routes.found(row)
+
+
+@record_routes.PATCH.of(router)
+def patch_record(
+    table_id: str,
+    record_id: str,
+    patch: schema.request.PatchRecord,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Update fields of a record
+
+    Only the changed fields are written, see schema.request.PatchRecord. With
+    a version in the body the update fails with 409 when the record has
+    another version.
+    """
+    logger.opt(lazy=True).debug("Patch record {}", patch.model_dump_json)
+    with record_routes.update_errors():
+        row = record_service.patch_record(table_id, record_id, patch)
+    return record_routes.found(row)
+
+
+@record_routes.DELETE.of(router)
+def delete_record(
+    table_id: str,
+    record_id: str,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
     """Delete a record"""
-    logger.info(f"Delete record: {record_id}")
-    response = service.record.RecordService(
-        "record_project_record_table"
-    ).delete_record(record_id)
+    response = record_service.delete_record(table_id=table_id, record_id=record_id)
     return response
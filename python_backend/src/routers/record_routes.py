@@ -0,0 +1,128 @@
+"""Routes and request checks shared by the record routers
+
+routers.record and routers.async_record serve the same API, one on the
+threadpool and one on the event loop. Paths, response models, access and the
+checks of requests are defined here once, so that the two only differ in
+awaiting the service.
+"""
+
+import contextlib
+import dataclasses
+from typing import Any
+
+import fastapi
+import schema
+import service
+from routers import dependencies, responses
+
+
+@dataclasses.dataclass(frozen=True)
+class Route:
+    """Path, method, response model and access of a record route"""
+
+    method: str
+    path: str
+    response_model: Any = None
+    access: str = service.access.READ
+
+    def of(self, router: fastapi.APIRouter):
+        """decorator adding the route to router"""
+        return router.api_route(
+            self.path,
+            methods=[self.method],
+            response_model=self.response_model,
+            dependencies=[fastapi.Depends(dependencies.require_access(self.access))],
+        )
+
+
+RECORD = "/table/{table_id}/record/{record_id}"
+
+CREATE = Route("POST", "/record/{table_id}", schema.table.Record, service.access.EDIT)
+BATCH_CREATE = Route(
+    "POST",
+    "/table/{table_id}/records:batchCreate",
+    schema.response_model.BatchCreateResult,
+    service.access.EDIT,
+)
+BATCH_GET = Route(
+    "POST",
+    "/table/{table_id}/records:batchGet",
+    schema.response_model.BatchGetResult,
+)
+TABLE = Route("GET", "/table/{table_id}/record", list[schema.table.Record])
+QUERY = Route("GET", "/table/{table_id}/record/query", list[schema.table.Record])
+EXPLAIN = Route(
+    "GET",
+    "/table/{table_id}/record/query/explain",
+    schema.response_model.QueryExplain,
+)
+COUNT = Route(
+    "GET", "/table/{table_id}/record/count", schema.response_model.RecordQuery
+)
+AGGREGATE = Route(
+    "POST",
+    "/table/{table_id}/records:aggregate",
+    schema.response_model.AggregateResult,
+)
+SEARCH = Route("GET", "/table/{table_id}/record/search", list[schema.table.Record])
+GET = Route("GET", RECORD, schema.table.Record)
+UPDATE = Route("PUT", RECORD, schema.table.Record, service.access.EDIT)
+PATCH = Route("PATCH", RECORD, schema.table.Record, service.access.EDIT)
+DELETE = Route("DELETE", RECORD, access=service.access.EDIT)
+
+
+def check_record(record: schema.table.Record, table_id: str, record_id: str = ""):
+    """raise 400 unless record belongs to table_id, and has record_id if set"""
+    if record.table_id != table_id:
+        raise fastapi.HTTPException(
+            status_code=400, detail="Record must belong to table " + table_id
+        )
+    if record_id and "id" in record.model_fields_set and record.id != record_id:
+        raise fastapi.HTTPException(
+            status_code=400, detail="Record id must be " + record_id
+        )
+
+
+def check_records(records: list[schema.table.Record], table_id: str):
+    """raise 400 unless every record belongs to table_id"""
+    if any(record.table_id != table_id for record in records):
+        raise fastapi.HTTPException(
+            status_code=400, detail="Records must belong to table " + table_id
+        )
+
+
+def check_search_enabled():
+    """raise 404 when record search is disabled"""
+    if not service.record.search_index.enabled:
+        raise fastapi.HTTPException(status_code=404, detail="Record search disabled")
+
+
+def found(row: service.record_row.RecordRow | None) -> fastapi.Response:
+    """response of row, raise 404 when no record was found"""
+    if row is None:
+        raise fastapi.HTTPException(status_code=404, detail="Record not found")
+    return responses.record_response(row)
+
+
+@contextlib.contextmanager
+def update_errors():
+    """raise 409 for a version conflict or an existing record and 400 for an
+    invalid update"""
+    try:
+        yield
+    except (
+        service.record_update.VersionConflictError,
+        service.record_update.RecordExistsError,
+    ) as e:
+        raise fastapi.HTTPException(status_code=409, detail=str(e)) from e
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e)) from e
+
+
+@contextlib.contextmanager
+def aggregate_errors():
+    """raise 400 when an aggregate has too many groups"""
+    try:
+        yield
+    except service.aggregation.TooManyGroupsError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e)) from e
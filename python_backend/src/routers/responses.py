@@ -0,0 +1,41 @@
+"""Fast JSON responses of records read from the store
+
+Routes keep their response_model for the API schema, but return these
+responses directly so that FastAPI does not validate and re-encode trusted
+store output.
+"""
+
+from typing import Iterable
+
+import fastapi
+import schema
+import service
+
+
+def record_response(row: service.record_row.RecordRow) -> fastapi.Response:
+    """single record"""
+    return fastapi.Response(content=row.to_json(), media_type="application/json")
+
+
+def records_response(
+    rows: Iterable[service.record_row.RecordRow],
+) -> fastapi.Response:
+    """JSON array of records"""
+    return fastapi.Response(
+        content=service.record_row.dumps_rows(rows), media_type="application/json"
+    )
+
+
+def batch_get_response(
+    rows: Iterable[service.record_row.RecordRow],
+    results: Iterable[schema.response_model.BatchItemResult],
+) -> fastapi.Response:
+    """records and outcome per record id of a batch read, see
+    schema.response_model.BatchGetResult"""
+    content = {
+        "records": [row.to_dict() for row in rows],
+        "results": [result.model_dump(by_alias=True) for result in results],
+    }
+    return fastapi.Response(
+        content=service.record_row.dumps(content), media_type="application/json"
+    )
@@ -0,0 +1,207 @@
+"""Router for table metadata and the tables of a user"""
+
+import config
+import fastapi
+import schema
+import service
+from loguru import logger
+from routers import dependencies, pagination
+
+router = fastapi.APIRouter()
+
+read_access = [fastapi.Depends(dependencies.require_access(service.access.READ))]
+owner_access = [fastapi.Depends(dependencies.require_access(service.access.OWNER))]
+user_access = [fastapi.Depends(dependencies.require_user)]
+
+
+@router.post("/table", response_model=schema.response_model.FullTableInfo)
+def create_table(
+    table: schema.table.TableInfo,
+    user_id: str | None = fastapi.Depends(dependencies.get_user_id),
+    user_service: service.user.UserService = fastapi.Depends(
+        dependencies.get_user_service
+    ),
+):
+    """Create a table and the memberships of its users, 409 when a table with
+    its id exists
+
+    With access control the requesting user must be the owner of the table.
+    """
+    if config.settings.access_control and user_id != table.table_owner:
+        raise fastapi.HTTPException(
+            status_code=403, detail="Tables are created by their owner"
+        )
+    logger.info("Create table", table_id=table.id)
+    try:
+        return user_service.create_table(table)
+    except service.table_index.TableExistsError as e:
+        raise fastapi.HTTPException(status_code=409, detail=str(e)) from e
+
+
+@router.get(
+    "/table/{table_id}",
+    response_model=schema.response_model.FullTableInfo,
+    dependencies=read_access,
+)
+def get_table(
+    table_id: str,
+    user_service: service.user.UserService = fastapi.Depends(
+        dependencies.get_user_service
+    ),
+    stats_service: service.table_stats.TableStatsService = fastapi.Depends(
+        dependencies.get_table_stats_service
+    ),
+):
+    """Get a table, table_last_edit includes the last record write"""
+    table = user_service.get_table(table_id)
+    if table is None:
+        raise fastapi.HTTPException(status_code=404, detail="Table not found")
+    return service.table_stats.with_last_write(table, stats_service.get_stats(table_id))
+
+
+@router.get(
+    "/table/{table_id}/stats",
+    response_model=schema.response_model.TableStats,
+    dependencies=read_access,
+)
+def get_table_stats(
+    table_id: str,
+    stats_service: service.table_stats.TableStatsService = fastapi.Depends(
+        dependencies.get_table_stats_service
+    ),
+):
+    """Record counts per category, approximate size and last write of a table
+
+    Maintained on every record write, so this is a single read whatever the
+    size of the table.
+    """
+    return stats_service.get_stats(table_id)
+
+
+@router.post(
+    "/table/{table_id}/stats:rebuild",
+    response_model=schema.response_model.TableStats,
+    dependencies=owner_access,
+)
+def rebuild_table_stats(
+    table_id: str,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Recount the statistics of a table from its records"""
+    logger.info("Rebuild table stats", table_id=table_id)
+    return record_service.rebuild_table_stats(table_id)
+
+
+@router.post(
+    "/table/{table_id}/search:rebuild",
+    response_model=schema.response_model.SearchIndexRebuild,
+    dependencies=owner_access,
+)
+def rebuild_search_index(
+    table_id: str,
+    record_service: service.record.RecordService = fastapi.Depends(
+        dependencies.get_record_service
+    ),
+):
+    """Index the records of a table for record search again"""
+    if not service.record.search_index.enabled:
+        raise fastapi.HTTPException(status_code=404, detail="Record search disabled")
+    logger.info("Rebuild search index", table_id=table_id)
+    return schema.response_model.SearchIndexRebuild(
+        table_id=table_id,
+        indexed_count=record_service.rebuild_search_index(table_id),
+    )
+
+
+@router.put(
+    "/table/{table_id}",
+    response_model=schema.response_model.FullTableInfo,
+    dependencies=owner_access,
+)
+def update_table(
+    table_id: str,
+    table: schema.table.TableInfo,
+    user_service: service.user.UserService = fastapi.Depends(
+        dependencies.get_user_service
+    ),
+):
+    """Replace a table, adding and removing memberships of its users"""
+    if table.id != table_id:
+        raise fastapi.HTTPException(status_code=400, detail="Table id mismatch")
+    updated = user_service.update_table(table)
+    if updated is None:
+        raise fastapi.HTTPException(status_code=404, detail="Table not found")
+    return updated
+
+
+@router.delete("/table/{table_id}", dependencies=owner_access)
+def delete_table(
+    table_id: str,
+    user_service: service.user.UserService = fastapi.Depends(
+        dependencies.get_user_service
+    ),
+):
+    """Delete a table and its memberships, records are kept"""
+    logger.info("Delete table", table_id=table_id)
+    if not user_service.delete_table(table_id):
+        raise fastapi.HTTPException(status_code=404, detail="Table not found")
+
+
+def _list_tables(
+    user_service: service.user.UserService,
+    user_id: str,
+    relation: str,
+    limit: int,
+    cursor: str | None,
+) -> fastapi.Response:
+    # cursors of a listing are only valid for the same user and relation
+    scope = f"user#{user_id}#{relation}"
+    tables, next_key = user_service.list_tables(
+        user_id,
+        relation,
+        limit=limit,
+        start_key=pagination.decode_start_key(cursor, scope),
+    )
+    response = fastapi.responses.JSONResponse(
+        [table.model_dump(mode="json", by_alias=True) for table in tables]
+    )
+    pagination.set_next_cursor(response, next_key, scope)
+    return response
+
+
+@router.get(
+    "/user/{user_id}/tables",
+    response_model=list[schema.response_model.TableSummary],
+    dependencies=user_access,
+)
+def list_owned_tables(
+    user_id: str,
+    limit: int = fastapi.Query(50, ge=1, le=1000),
+    cursor: str | None = None,
+    user_service: service.user.UserService = fastapi.Depends(
+        dependencies.get_user_service
+    ),
+):
+    """Tables owned by a user, cursor of next page is in X-Next-Cursor header"""
+    return _list_tables(user_service, user_id, service.table_index.OWNER, limit, cursor)
+
+
+@router.get(
+    "/user/{user_id}/tables/shared",
+    response_model=list[schema.response_model.TableSummary],
+    dependencies=user_access,
+)
+def list_shared_tables(
+    user_id: str,
+    limit: int = fastapi.Query(50, ge=1, le=1000),
+    cursor: str | None = None,
+    user_service: service.user.UserService = fastapi.Depends(
+        dependencies.get_user_service
+    ),
+):
+    """Tables shared with a user, cursor of next page is in X-Next-Cursor header"""
+    return _list_tables(
+        user_service, user_id, service.table_index.SHARED, limit, cursor
+    )
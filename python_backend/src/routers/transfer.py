@@ -0,0 +1,105 @@
+"""Router for exporting and importing virtual tables as background jobs"""
+
+import fastapi
+import schema
+import service
+from loguru import logger
+from routers import dependencies
+from starlette.concurrency import run_in_threadpool
+
+router = fastapi.APIRouter()
+
+read_access = [fastapi.Depends(dependencies.require_access(service.access.READ))]
+edit_access = [fastapi.Depends(dependencies.require_access(service.access.EDIT))]
+
+
+@router.post(
+    "/table/{table_id}/export",
+    response_model=schema.response_model.TransferJob,
+    status_code=202,
+    dependencies=read_access,
+)
+def export_table(
+    table_id: str,
+    request: schema.request.ExportTable = schema.request.ExportTable(),
+    job_manager: service.jobs.JobManager = fastapi.Depends(
+        dependencies.get_job_manager
+    ),
+):
+    """Start exporting every record of a table into part files"""
+    logger.info("Export table", table_id=table_id)
+    return job_manager.submit_export(table_id, request)
+
+
+@router.post(
+    "/table/{table_id}/import",
+    response_model=schema.response_model.TransferJob,
+    status_code=202,
+    dependencies=edit_access,
+)
+async def import_table(
+    table_id: str,
+    request: schema.request.ImportTable,
+    http_request: fastapi.Request,
+    job_manager: service.jobs.JobManager = fastapi.Depends(
+        dependencies.get_job_manager
+    ),
+):
+    """Start importing the files of a completed export job into a table, 409
+    while the export job has not completed
+
+    Needs read access to the table of the export job as well.
+    """
+    source = await run_in_threadpool(job_manager.get, request.source_job_id)
+    if source is None or source.kind != "export":
+        raise fastapi.HTTPException(status_code=404, detail="Export job not found")
+    await dependencies.check_access(http_request, source.table_id, service.access.READ)
+    logger.info("Import table", table_id=table_id, source_job_id=request.source_job_id)
+    try:
+        job = await run_in_threadpool(job_manager.submit_import, table_id, request)
+    except RuntimeError as e:
+        raise fastapi.HTTPException(status_code=409, detail=str(e)) from e
+    if job is None:
+        raise fastapi.HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=schema.response_model.TransferJob)
+def get_job(
+    job: schema.response_model.TransferJob = fastapi.Depends(
+        dependencies.require_job_access(service.access.READ, service.access.READ)
+    ),
+):
+    """Get status and progress of an export or import job
+
+    Needs read access to the table of the job.
+    """
+    return job
+
+
+@router.post(
+    "/jobs/{job_id}/resume",
+    response_model=schema.response_model.TransferJob,
+    status_code=202,
+)
+def resume_job(
+    job: schema.response_model.TransferJob = fastapi.Depends(
+        dependencies.require_job_access(service.access.READ, service.access.EDIT)
+    ),
+    job_manager: service.jobs.JobManager = fastapi.Depends(
+        dependencies.get_job_manager
+    ),
+):
+    """Resume a failed or interrupted job from its checkpoint
+
+    Needs read access to the table of an export, edit access to the table of
+    an import.
+    """
+    logger.info("Resume job", job_id=job.id)
+    try:
+        resumed = job_manager.resume(job.id)
+    except RuntimeError as e:
+        raise fastapi.HTTPException(status_code=409, detail=str(e)) from e
+    if resumed is None:
+        raise fastapi.HTTPException(status_code=404, detail="Job not found")
+    return resumed
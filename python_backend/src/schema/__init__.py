@@ -3,3 +3,4 @@
 from schema import common
 from schema import request
 from schema import table
+from schema import response_model
@@ -36,3 +36,14 @@ class RecordCategory(enum.StrEnum):
     TEMPLATE = "TEMPLATE"
     INFORMATION = "INFORMATION"
     REMARK = "REMARK"
+
+
+class AggregateFunction(enum.StrEnum):
+    """aggregate function of record fields"""
+
+    COUNT = "COUNT"
+    SUM = "SUM"
+    MIN = "MIN"
+    MAX = "MAX"
+    AVG = "AVG"
+    PERCENTILE = "PERCENTILE"
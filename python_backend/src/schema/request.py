@@ -1,9 +1,17 @@
 """Schema for request body"""
 
-from typing import Any
+import decimal
+from typing import Any, Literal
 
 import pydantic
-from schema import common
+from schema import common, table
+
+# dotted path of a record field, every part may end with list indexes,
+# e.g. "address.lines[0]"
+FIELD_PATH_PATTERN = r"^[^.\[\]]+(\[\d+\])*(\.[^.\[\]]+(\[\d+\])*)*$"
+
+# operands dynamo db accepts in one IN comparison
+MAX_IS_IN_VALUES = 100
 
 
 def to_camel(string: str) -> str:
@@ -13,6 +21,21 @@ def to_camel(string: str) -> str:
     )
 
 
+def to_number(value: Any) -> decimal.Decimal:
+    """finite decimal of a NUMBER condition value"""
+    if isinstance(value, bool) or not isinstance(
+        value, (int, float, str, decimal.Decimal)
+    ):
+        raise ValueError(f"NUMBER value must be a number: {value!r}")
+    try:
+        number = decimal.Decimal(str(value))
+    except decimal.InvalidOperation as error:
+        raise ValueError(f"NUMBER value must be a number: {value!r}") from error
+    if not number.is_finite():
+        raise ValueError(f"NUMBER value must be finite: {value!r}")
+    return number
+
+
 class BaseModel(pydantic.BaseModel):
     """base model for config"""
 
@@ -26,7 +49,132 @@ class BaseModel(pydantic.BaseModel):
 class FieldCondition(BaseModel):
     """Schema for field condition"""
 
-    field: str
+    field: str = pydantic.Field(min_length=1, pattern=FIELD_PATH_PATTERN)
     field_type: common.FieldType
     operation: common.Operator
     value: Any = None
+
+    @pydantic.model_validator(mode="after")
+    def check_value(self) -> "FieldCondition":
+        """IS_IN compares against a non-empty list of at most 100 values,
+        NUMBER values are converted to decimals"""
+        if self.operation in (common.Operator.EXISTS, common.Operator.NOT_EXISTS):
+            return self
+        if self.operation == common.Operator.IS_IN:
+            if not isinstance(self.value, list) or not self.value:
+                raise ValueError("IS_IN requires a non-empty list value")
+            if len(self.value) > MAX_IS_IN_VALUES:
+                raise ValueError(f"IS_IN takes at most {MAX_IS_IN_VALUES} values")
+            if self.field_type == common.FieldType.NUMBER:
+                self.value = [to_number(item) for item in self.value]
+        elif self.field_type == common.FieldType.NUMBER:
+            self.value = to_number(self.value)
+        return self
+
+
+class Aggregate(BaseModel):
+    """Schema for one aggregate of record fields
+
+    Attributes:
+        function (common.AggregateFunction): aggregate function, every function
+            but COUNT only takes numbers into account
+        field (str | None): dotted path of a record field, None with COUNT to
+            count records
+        percentile (float | None): percentile from 0 to 100 of PERCENTILE
+        name (str | None): key of the aggregate in the result, by default the
+            function and field, e.g. "sum_price" or "p95_latency"
+    """
+
+    function: common.AggregateFunction
+    field: str | None = None
+    percentile: float | None = pydantic.Field(None, ge=0, le=100)
+    name: str | None = None
+
+    @pydantic.model_validator(mode="after")
+    def check_arguments(self) -> "Aggregate":
+        """only COUNT goes without a field, only PERCENTILE takes a percentile"""
+        if self.field is None and self.function != common.AggregateFunction.COUNT:
+            raise ValueError(f"{self.function} requires a field")
+        if (self.percentile is None) == (
+            self.function == common.AggregateFunction.PERCENTILE
+        ):
+            raise ValueError("percentile is required by PERCENTILE only")
+        return self
+
+    def result_name(self) -> str:
+        """key of the aggregate in the result"""
+        if self.name is not None:
+            return self.name
+        if self.function == common.AggregateFunction.PERCENTILE:
+            prefix = f"p{self.percentile:g}"
+        else:
+            prefix = self.function.lower()
+        return prefix if self.field is None else f"{prefix}_{self.field}"
+
+
+class AggregateRecords(BaseModel):
+    """Schema for aggregating the records matching a query
+
+    Attributes:
+        group_by (list[str]): dotted paths of record fields, one group per
+            distinct combination of their values
+        aggregates (list[Aggregate]): aggregates computed per group
+    """
+
+    category: common.RecordCategory = common.RecordCategory.RECORD
+    created_after: pydantic.AwareDatetime | None = None
+    created_before: pydantic.AwareDatetime | None = None
+    record_condition: list[FieldCondition] | None = None
+    group_by: list[str] = pydantic.Field([], max_length=8)
+    aggregates: list[Aggregate] = pydantic.Field(min_length=1, max_length=32)
+
+    @pydantic.model_validator(mode="after")
+    def check_names(self) -> "AggregateRecords":
+        """aggregates need distinct result names"""
+        names = [aggregate.result_name() for aggregate in self.aggregates]
+        if len(set(names)) != len(names):
+            raise ValueError("aggregates must have distinct names")
+        return self
+
+
+class PatchRecord(BaseModel):
+    """Schema for a partial record update
+
+    Attributes:
+        record (dict): JSON merge patch (RFC 7396) of the record content,
+            nested maps are merged key by key and null removes a key
+        increment (dict[str, int | float]): numbers added to fields, by
+            dotted path, e.g. {"stats.views": 1}; missing fields start at 0
+        version (int | None): version the record must have, None for any
+    """
+
+    record: dict = {}
+    increment: dict[str, int | float] = {}
+    version: int | None = pydantic.Field(None, ge=0)
+
+
+class BatchCreateRecords(BaseModel):
+    """Schema for batch record creation, at most 50,000 records per request"""
+
+    records: list[table.Record] = pydantic.Field(max_length=50_000)
+
+
+class BatchGetRecords(BaseModel):
+    """Schema for batch record read by id, ids are de-duplicated"""
+
+    record_ids: list[str] = pydantic.Field(max_length=50_000)
+
+
+class ExportTable(BaseModel):
+    """Schema for exporting a virtual table, unset options use the settings"""
+
+    format: Literal["ndjson", "parquet"] = "ndjson"
+    segments: int | None = pydantic.Field(default=None, ge=1, le=1000)
+    chunk_rows: int | None = pydantic.Field(default=None, ge=1)
+
+
+class ImportTable(BaseModel):
+    """Schema for importing the files of an export job into a virtual table"""
+
+    source_job_id: str
+    write_units_per_second: float | None = pydantic.Field(default=None, ge=0)
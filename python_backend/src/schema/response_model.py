@@ -1,6 +1,8 @@
 """Response model for the API"""
 
 import datetime
+from typing import Any, Literal
+
 import pydantic
 
 
@@ -42,6 +44,14 @@ class UserInfo(BaseResponseModel):
     table: list[SimpleTableInfo]
 
 
+class TableSummary(SimpleTableInfo):
+    """Table in a listing of the tables of a user"""
+
+    table_owner: str
+    access: Literal["owner", "edit", "read"]
+    table_last_edit: datetime.datetime
+
+
 class FullTableInfo(SimpleTableInfo):
     """Full table information"""
 
@@ -53,9 +63,116 @@ class FullTableInfo(SimpleTableInfo):
     table_last_edit: datetime.datetime
 
 
+class TableStats(BaseResponseModel):
+    """Summary counters of the records of a table
+
+    Attributes:
+        table_id (str): table id
+        record_count (int): records of every category
+        category_count (dict[RecordCategory, int]): records per category
+        approximate_size (int): bytes of the stored records as JSON
+        last_write_at (datetime.datetime | None): time of the last record
+            write, None before the first one
+    """
+
+    table_id: str
+    record_count: int
+    category_count: dict[common.RecordCategory, int]
+    approximate_size: int
+    last_write_at: datetime.datetime | None
+
+
+class SearchIndexRebuild(BaseResponseModel):
+    """Outcome of indexing the records of a table for search again"""
+
+    table_id: str
+    indexed_count: int
+
+
 class RecordQuery(BaseResponseModel):
     """Schema for record query response"""
 
     category: common.RecordCategory
     record_count: int
     records: list[table.Record]
+
+
+class BatchItemResult(BaseResponseModel):
+    """Result of a single item of a batch operation"""
+
+    id: str
+    success: bool
+    error: str | None = None
+
+
+class BatchCreateResult(BaseResponseModel):
+    """Schema for batch record creation response"""
+
+    success_count: int
+    failure_count: int
+    results: list[BatchItemResult]
+
+
+class BatchGetResult(BaseResponseModel):
+    """Schema for batch record read response, missing ids are failed results"""
+
+    records: list[table.Record]
+    results: list[BatchItemResult]
+
+
+class QueryExplain(BaseResponseModel):
+    """chosen plan of a record query and what running it reads"""
+
+    operation: str
+    index_name: str | None
+    key_condition: str | None
+    filter_expression: str | None
+    key_predicates: list[str]
+    filter_predicates: list[str]
+    scanned_count: int
+    matched_count: int
+    estimated_read_units: float | None
+
+
+class AggregateGroup(BaseResponseModel):
+    """aggregates of the records of one group
+
+    Attributes:
+        key (dict[str, Any]): value of every group_by field, None when missing
+        count (int): records of the group
+        values (dict[str, float | int | None]): aggregate per result name, None
+            when the group has no number for it
+    """
+
+    key: dict[str, Any]
+    count: int
+    values: dict[str, float | int | None]
+
+
+class AggregateResult(BaseResponseModel):
+    """aggregates of the records matching a query
+
+    Attributes:
+        groups (list[AggregateGroup]): groups ordered by key
+        matched_count (int): records aggregated
+        approximate (bool): percentiles of some group were estimated from a
+            sample of its values
+    """
+
+    groups: list[AggregateGroup]
+    matched_count: int
+    approximate: bool
+
+
+class TransferJob(BaseResponseModel):
+    """Schema for export and import background jobs"""
+
+    id: str
+    kind: Literal["export", "import"]
+    table_id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    options: dict = {}
+    progress: dict = {}
+    error: str | None = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
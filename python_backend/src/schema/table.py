@@ -36,14 +36,18 @@ class BaseModel(pydantic.BaseModel):
 class TableInfo(BaseModel):
     """schema for table information"""
 
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     table_name: str
     table_owner: str
     user_edit: list[str] = []  # list of user_id
     user_read: list[str] = []  # list of user_id
     public: bool = False
-    table_created_at: datetime.datetime = datetime.datetime.now(datetime.UTC)
-    table_last_edit: datetime.datetime = datetime.datetime.now(datetime.UTC)
+    table_created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    table_last_edit: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
 
 
 class UserInfo(BaseModel):
@@ -57,10 +61,12 @@ class UserInfo(BaseModel):
         table (list[TableInfo]): list of table information
     """
 
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     username: str
     email: str = ""
-    created_at: datetime.datetime = datetime.datetime.now(datetime.UTC)
+    created_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
     independent_table: bool = False
     table: list[TableInfo] = []
 
@@ -76,13 +82,21 @@ class Record(BaseModel):
         record_created_at (datetime.datetime): record created time
         record_updated_at (datetime.datetime): record updated time
         record (dict): record content in json format
+        version (int | None): incremented by every update, starting at 1;
+            set it when updating to fail with a conflict if the record
+            changed since it was read
     """
 
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     table_id: str
     category: common.RecordCategory
-    record_created_at: pydantic.AwareDatetime = datetime.datetime.now(datetime.UTC)
+    record_created_at: pydantic.AwareDatetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
 
-    record_updated_at: pydantic.AwareDatetime = datetime.datetime.now(datetime.UTC)
+    record_updated_at: pydantic.AwareDatetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
 
     record: dict = {}
+    version: int | None = None
@@ -1,4 +1,25 @@
 """service module"""
 
+from service import cursor
+from service import query_compiler
+from service import query_planner
+from service import table_cache
+from service import record_cache
+from service import record_row
+from service import single_flight
+from service import record_update
+from service import table_index
+from service import access
+from service import storage
+from service import table_stats
+from service import async_table_stats
 from service import user
+from service import aggregation
+from service import change_feed
+from service import search
 from service import record
+from service import async_user
+from service import async_record
+from service import transfer
+from service import jobs
+from service import warmup
@@ -0,0 +1,149 @@
+"""Access levels of users on tables
+
+A user has the strongest of the levels a table grants: "owner" to its
+table_owner, "edit" to user_edit, "read" to user_read and to everyone when
+the table is public. Resolved levels are cached per (table_id, user_id) in a
+bounded TTL LRU, so checking a request is one dictionary lookup once the
+first request of a user on a table has read the table item. Every write of a
+table item invalidates its entries through the table generation, other
+processes see the change within config.Settings.access_cache_ttl.
+
+Misses of many tables, e.g. for a list endpoint, are resolved with one
+batched read of their table items.
+"""
+
+from typing import Iterable
+
+import config
+import schema
+from service import table_cache
+
+# levels a table grants, from the strongest
+OWNER = "owner"
+EDIT = "edit"
+READ = "read"
+LEVELS = (OWNER, EDIT, READ)
+# no access to an existing table, and a table without table item
+NONE = "none"
+MISSING = "missing"
+
+access_cache = table_cache.TableResultCache(
+    maxsize=config.settings.access_cache_size, ttl=config.settings.access_cache_ttl
+)
+
+
+def access_level(table: schema.table.TableInfo | None, user_id: str | None) -> str:
+    """level table grants user, user_id None for anonymous requests"""
+    if table is None:
+        return MISSING
+    if user_id is not None:
+        if user_id == table.table_owner:
+            return OWNER
+        if user_id in table.user_edit:
+            return EDIT
+        if user_id in table.user_read:
+            return READ
+    return READ if table.public else NONE
+
+
+def allows(granted: str, required: str) -> bool:
+    """whether level granted includes level required"""
+    if granted not in LEVELS:
+        return False
+    return LEVELS.index(granted) <= LEVELS.index(required)
+
+
+def cached_level(user_id: str | None, table_id: str) -> tuple[bool, str | None]:
+    """cached level of user on table
+
+    Returns:
+        tuple[bool, str | None]: whether the level was cached, and the level
+    """
+    return access_cache.get(table_id, user_id)
+
+
+def invalidate(table_id: str):
+    """drop cached levels of table, called on every write of its table item"""
+    access_cache.invalidate_table(table_id)
+
+
+class AccessResolver:
+    """Levels of a user on tables, through the access cache
+
+    Args:
+        user_service (service.user.UserService): reads table items
+    """
+
+    def __init__(self, user_service):
+        self.user_service = user_service
+
+    def level(self, user_id: str | None, table_id: str) -> str:
+        """level of user on table"""
+        return self.levels(user_id, [table_id])[table_id]
+
+    def levels(self, user_id: str | None, table_ids: Iterable[str]) -> dict[str, str]:
+        """level of user per table, misses read with one batched request"""
+        levels, missing = _cached_levels(user_id, table_ids)
+        if missing:
+            generations = {
+                table_id: access_cache.generation(table_id) for table_id in missing
+            }
+            tables = self.user_service.get_tables(missing)
+            levels.update(_fill(user_id, tables, generations))
+        return levels
+
+
+class AsyncAccessResolver:
+    """Async counterpart of AccessResolver
+
+    Args:
+        user_service (service.async_user.AsyncUserService): reads table items
+    """
+
+    def __init__(self, user_service):
+        self.user_service = user_service
+
+    async def level(self, user_id: str | None, table_id: str) -> str:
+        """level of user on table"""
+        return (await self.levels(user_id, [table_id]))[table_id]
+
+    async def levels(
+        self, user_id: str | None, table_ids: Iterable[str]
+    ) -> dict[str, str]:
+        """level of user per table, misses read with one batched request"""
+        levels, missing = _cached_levels(user_id, table_ids)
+        if missing:
+            generations = {
+                table_id: access_cache.generation(table_id) for table_id in missing
+            }
+            tables = await self.user_service.get_tables(missing)
+            levels.update(_fill(user_id, tables, generations))
+        return levels
+
+
+def _cached_levels(
+    user_id: str | None, table_ids: Iterable[str]
+) -> tuple[dict[str, str], list[str]]:
+    levels = {}
+    missing = []
+    for table_id in dict.fromkeys(table_ids):
+        found, level = access_cache.get(table_id, user_id)
+        if found:
+            levels[table_id] = level
+        else:
+            missing.append(table_id)
+    return levels, missing
+
+
+def _fill(
+    user_id: str | None,
+    tables: dict[str, schema.table.TableInfo | None],
+    generations: dict[str, int],
+) -> dict[str, str]:
+    levels = {}
+    for table_id, generation in generations.items():
+        level = access_level(tables.get(table_id), user_id)
+        # dropped when the table was written while it was read
+        access_cache.set(table_id, user_id, level, generation)
+        levels[table_id] = level
+    return levels
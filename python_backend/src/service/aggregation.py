@@ -0,0 +1,293 @@
+"""Aggregates of record fields, computed page by page
+
+RecordService.aggregate_records reads the records matching a query one page
+at a time, projected to their record content, and folds every page into an
+Aggregation:
+
+- the page is turned into columns, the group key of every record and the
+  value of every aggregated field
+- records are split by group key, and the column of every field of a group
+  is folded into its accumulator with builtins over whole lists (math.fsum,
+  min, max) instead of record by record
+
+Memory is bounded by config.Settings.aggregate_max_groups groups and, for
+fields with a percentile, aggregate_sample_size values per group:
+percentiles are exact up to that many values and estimated from a uniform
+reservoir sample beyond.
+"""
+
+import decimal
+import json
+import math
+import random
+from array import array
+from typing import Any
+
+import schema
+
+
+class TooManyGroupsError(ValueError):
+    """the records of an aggregation fall into more groups than allowed"""
+
+
+def field_value(record: dict, path: tuple[str, ...]) -> Any:
+    """value at a dotted path of record content, None when missing"""
+    value: Any = record
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def number(value: Any) -> float | None:
+    """float of a numeric value, None for anything else"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return float(value)
+    return None
+
+
+def group_value(value: Any) -> Any:
+    """hashable, json friendly value of a group key"""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (dict, list, set)):
+        return json.dumps(value, sort_keys=True, default=str)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _sort_key(key: tuple) -> tuple:
+    # None first, then booleans, numbers and strings
+    order: list[tuple[int, Any]] = []
+    for value in key:
+        if value is None:
+            order.append((0, 0))
+        elif isinstance(value, bool):
+            order.append((1, value))
+        elif isinstance(value, (int, float)):
+            order.append((2, value))
+        else:
+            order.append((3, value))
+    return tuple(order)
+
+
+class FieldAccumulator:
+    """running aggregates of one field of one group
+
+    Args:
+        sampled (bool): keep a sample of the values for percentiles
+    """
+
+    __slots__ = ("present", "count", "total", "minimum", "maximum", "sample")
+
+    def __init__(self, sampled: bool = False):
+        self.present = 0
+        self.count = 0
+        self.total = 0.0
+        self.minimum: float | None = None
+        self.maximum: float | None = None
+        self.sample: array[float] | None = array("d") if sampled else None
+
+    def add(self, values: list[Any], sample_size: int, rng: random.Random):
+        """fold the values of the field in one page"""
+        present = [value for value in values if value is not None]
+        self.present += len(present)
+        numbers = [value for value in map(number, present) if value is not None]
+        if not numbers:
+            return
+        if self.sample is not None:
+            self._add_sample(numbers, sample_size, rng)
+        self.count += len(numbers)
+        self.total += math.fsum(numbers)
+        low, high = min(numbers), max(numbers)
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+    def _add_sample(self, numbers: list[float], size: int, rng: random.Random):
+        # reservoir sampling (algorithm R) over every number seen so far
+        sample = self.sample
+        if sample is None:
+            return
+        seen = self.count
+        room = size - len(sample)
+        if room > 0:
+            sample.extend(numbers[:room])
+            seen += min(room, len(numbers))
+            numbers = numbers[room:]
+        for value in numbers:
+            seen += 1
+            index = rng.randrange(seen)
+            if index < size:
+                sample[index] = value
+
+    @property
+    def approximate(self) -> bool:
+        """whether percentiles are estimated from a sample"""
+        return self.sample is not None and self.count > len(self.sample)
+
+    def percentiles(self, percentiles: list[float]) -> list[float | None]:
+        """percentiles of the values, interpolated between closest ranks"""
+        if not self.sample:
+            return [None for _ in percentiles]
+        ordered = sorted(self.sample)
+        results: list[float | None] = []
+        for percentile in percentiles:
+            rank = percentile / 100 * (len(ordered) - 1)
+            low = math.floor(rank)
+            high = min(low + 1, len(ordered) - 1)
+            results.append(ordered[low] + (ordered[high] - ordered[low]) * (rank - low))
+        return results
+
+
+class _Group:
+    __slots__ = ("count", "fields")
+
+    def __init__(self, fields: dict[str, FieldAccumulator]):
+        self.count = 0
+        self.fields = fields
+
+
+class Aggregation:
+    """Aggregates of records per group, fed one page at a time
+
+    Args:
+        group_by (list[str]): dotted paths of the record fields grouping records
+        aggregates (list[schema.request.Aggregate]): aggregates of every group
+        max_groups (int): groups allowed before TooManyGroupsError
+        sample_size (int): values kept per group for percentiles
+        seed (int): seed of the reservoir samples
+    """
+
+    def __init__(
+        self,
+        group_by: list[str],
+        aggregates: list[schema.request.Aggregate],
+        max_groups: int = 10_000,
+        sample_size: int = 10_000,
+        seed: int = 0,
+    ):
+        self.group_by = list(group_by)
+        self.aggregates = aggregates
+        self.max_groups = max_groups
+        self.sample_size = sample_size
+        self._group_paths = [tuple(field.split(".")) for field in group_by]
+        sampled = {
+            aggregate.field
+            for aggregate in aggregates
+            if aggregate.function == schema.common.AggregateFunction.PERCENTILE
+        }
+        self._fields = {
+            aggregate.field: (
+                tuple(aggregate.field.split(".")),
+                aggregate.field in sampled,
+            )
+            for aggregate in aggregates
+            if aggregate.field is not None
+        }
+        self._groups: dict[tuple, _Group] = {}
+        self._rng = random.Random(seed)
+        self.matched_count = 0
+
+    def add_page(self, records: list[dict]):
+        """fold the record contents of one page
+
+        Raises:
+            TooManyGroupsError: records fall into more than max_groups groups
+        """
+        if not records:
+            return
+        self.matched_count += len(records)
+        columns = {
+            field: [field_value(record, path) for record in records]
+            for field, (path, _) in self._fields.items()
+        }
+        if not self._group_paths:
+            self._fold((), len(records), columns)
+            return
+        rows: dict[tuple, list[int]] = {}
+        for index, record in enumerate(records):
+            key = tuple(
+                group_value(field_value(record, path)) for path in self._group_paths
+            )
+            rows.setdefault(key, []).append(index)
+        for key, indexes in rows.items():
+            self._fold(
+                key,
+                len(indexes),
+                {
+                    field: [column[index] for index in indexes]
+                    for field, column in columns.items()
+                },
+            )
+
+    def _fold(self, key: tuple, count: int, columns: dict[str, list]):
+        group = self._groups.get(key)
+        if group is None:
+            if len(self._groups) >= self.max_groups:
+                raise TooManyGroupsError(
+                    f"Records fall into more than {self.max_groups} groups"
+                )
+            group = _Group(
+                {
+                    field: FieldAccumulator(sampled)
+                    for field, (_, sampled) in self._fields.items()
+                }
+            )
+            self._groups[key] = group
+        group.count += count
+        for field, values in columns.items():
+            group.fields[field].add(values, self.sample_size, self._rng)
+
+    def _values(self, group: _Group) -> dict[str, float | int | None]:
+        functions = schema.common.AggregateFunction
+        values: dict[str, float | int | None] = {}
+        for aggregate in self.aggregates:
+            name = aggregate.result_name()
+            if aggregate.field is None:
+                values[name] = group.count
+                continue
+            accumulator = group.fields[aggregate.field]
+            if aggregate.function == functions.COUNT:
+                values[name] = accumulator.present
+            elif accumulator.count == 0:
+                values[name] = None
+            elif aggregate.function == functions.SUM:
+                values[name] = accumulator.total
+            elif aggregate.function == functions.AVG:
+                values[name] = accumulator.total / accumulator.count
+            elif aggregate.function == functions.MIN:
+                values[name] = accumulator.minimum
+            elif aggregate.function == functions.MAX:
+                values[name] = accumulator.maximum
+            elif aggregate.percentile is not None:
+                values[name] = accumulator.percentiles([aggregate.percentile])[0]
+        return values
+
+    def result(self) -> schema.response_model.AggregateResult:
+        """aggregates of the groups folded so far, ordered by group key"""
+        groups = self._groups
+        if not groups and not self._group_paths:
+            # a whole-table aggregate of no records is still one group
+            groups = {(): _Group({field: FieldAccumulator() for field in self._fields})}
+        return schema.response_model.AggregateResult(
+            groups=[
+                schema.response_model.AggregateGroup(
+                    key=dict(zip(self.group_by, key)),
+                    count=group.count,
+                    values=self._values(group),
+                )
+                for key, group in sorted(
+                    groups.items(), key=lambda entry: _sort_key(entry[0])
+                )
+            ],
+            matched_count=self.matched_count,
+            approximate=any(
+                accumulator.approximate
+                for group in groups.values()
+                for accumulator in group.fields.values()
+            ),
+        )
@@ -0,0 +1,657 @@
+"""Async record related services"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+import config
+import pydantic
+import schema
+import stores
+from loguru import logger
+from service import (
+    async_table_stats,
+    change_feed,
+    query_planner,
+    record,
+    record_row,
+    record_update,
+    single_flight,
+    table_stats,
+)
+
+T = TypeVar("T")
+
+# shares its counters with record.read_flight
+read_flight = single_flight.AsyncSingleFlight(record.flight_stats)
+
+
+async def coalesce(
+    operation: str, table_id: str, params: tuple, func: Callable[[], Awaitable[T]]
+) -> T:
+    """run a read of table, shared with identical reads in flight"""
+    if not config.settings.read_coalescing:
+        return await func()
+    return await read_flight.do(operation, record.flight_key(table_id, *params), func)
+
+
+async def index_records(items: list[dict]):
+    """index items in record.search_index, off the event loop"""
+    if record.search_index.enabled and items:
+        await asyncio.to_thread(record.search_index.index, items)
+
+
+async def unindex_records(table_id: str, record_ids: list[str]):
+    """remove records from record.search_index, off the event loop"""
+    if record.search_index.enabled and record_ids:
+        await asyncio.to_thread(record.search_index.remove, table_id, record_ids)
+
+
+async def cached_record(table_id: str, record_id: str) -> tuple[bool, dict | None]:
+    """look a record up in record.item_cache, off the event loop if blocking"""
+    if record.item_cache.blocking:
+        return await asyncio.to_thread(record.item_cache.get, table_id, record_id)
+    return record.item_cache.get(table_id, record_id)
+
+
+async def fill_token(table_id: str, record_id: str):
+    """fill token of record.item_cache, off the event loop if blocking"""
+    if record.item_cache.blocking:
+        return await asyncio.to_thread(
+            record.item_cache.fill_token, table_id, record_id
+        )
+    return record.item_cache.fill_token(table_id, record_id)
+
+
+async def cache_record(table_id: str, record_id: str, item: dict | None, token):
+    """fill record.item_cache, off the event loop if blocking"""
+    if record.item_cache.blocking:
+        await asyncio.to_thread(record.item_cache.set, table_id, record_id, item, token)
+    else:
+        record.item_cache.set(table_id, record_id, item, token)
+
+
+def _invalidate(keys: list[tuple[str, str]]):
+    for table_id, record_id in keys:
+        record.item_cache.invalidate(table_id, record_id)
+
+
+async def invalidate_records(keys: list[tuple[str, str]]):
+    """drop records from record.item_cache, off the event loop if blocking"""
+    if record.item_cache.blocking:
+        await asyncio.to_thread(_invalidate, keys)
+    else:
+        _invalidate(keys)
+
+
+async def publish_change(
+    table_id: str,
+    operation: str,
+    record_id: str | None = None,
+    version: int | None = None,
+):
+    """publish a change to record.change_broker, off the event loop if blocking"""
+    if record.change_broker.blocking:
+        await asyncio.to_thread(
+            record.change_broker.publish, table_id, operation, record_id, version
+        )
+    else:
+        record.change_broker.publish(table_id, operation, record_id, version)
+
+
+async def read_previous(
+    db_client: stores.backend.AsyncStorageClient, items: list[dict]
+) -> list[dict | None]:
+    """records a batch write of items replaces, see record.read_previous"""
+    if not config.settings.table_stats:
+        return [None] * len(items)
+    metadata = await db_client.metadata()
+    results = await db_client.batch_get(
+        [metadata.build_key(item["id"], item["table_id"]) for item in items]
+    )
+    return [result["item"] for result in results]
+
+
+class AsyncRecordService:
+    """Async counterpart of record.RecordService"""
+
+    def __init__(self, table_name: str, pool: stores.backend.AsyncStoragePool):
+        self.db_client = pool.get_client(table_name)
+        self.stats = async_table_stats.AsyncTableStatsService(
+            config.settings.master_table_name, pool
+        )
+
+    async def _update_stats(self, table_id: str, delta: table_stats.StatsDelta):
+        """apply delta after a record write, best effort, see
+        record.RecordService._update_stats"""
+        if not config.settings.table_stats:
+            return
+        try:
+            await self.stats.apply(table_id, delta)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Table stats update failed", table_id=table_id)
+
+    async def create_record(self, record_item: schema.table.Record):
+        """create record at version 1, see record.RecordService.create_record"""
+        item = record.record_item(record_item)
+        metadata = await self.db_client.metadata()
+        try:
+            await self.db_client.create_item(
+                item=item,
+                condition=record_update.new_item_condition(metadata.partition_key),
+            )
+        except stores.dynamo_db.ConditionFailedError as e:
+            raise record_update.RecordExistsError(
+                f"Record {record_item.id} exists"
+            ) from e
+        record.invalidate_table_results(record_item.table_id)
+        await invalidate_records([(record_item.table_id, record_item.id)])
+        await publish_change(
+            record_item.table_id, change_feed.CREATE, record_item.id, 1
+        )
+        await index_records([item])
+        await self._update_stats(
+            record_item.table_id, table_stats.StatsDelta().add(None, item)
+        )
+        return record_item.model_copy(update={record_update.VERSION: 1})
+
+    async def batch_create_records(
+        self, records: list[schema.table.Record]
+    ) -> schema.response_model.BatchCreateResult:
+        """create records with batched, concurrent writes"""
+        items = [record.record_item(record_item) for record_item in records]
+        previous = await read_previous(self.db_client, items)
+        results = await self.db_client.batch_write(items)
+        for table_id in {record_item.table_id for record_item in records}:
+            record.invalidate_table_results(table_id)
+        await invalidate_records(
+            [(record_item.table_id, record_item.id) for record_item in records]
+        )
+        for table_id in {record_item.table_id for record_item in records}:
+            await publish_change(table_id, change_feed.RELOAD)
+        await index_records(record.written_items(items, results))
+        deltas = table_stats.batch_deltas(items, results, previous)
+        for table_id, delta in deltas.items():
+            await self._update_stats(table_id, delta)
+        return record.batch_create_result(records, results)
+
+    async def batch_get_records(
+        self, table_id: str, record_ids: list[str]
+    ) -> tuple[list[record_row.RecordRow], list[schema.response_model.BatchItemResult]]:
+        """records of a table read by id with batched, concurrent reads, and
+        the outcome per record id"""
+        record_ids = list(dict.fromkeys(record_ids))
+        metadata = await self.db_client.metadata()
+        results = await self.db_client.batch_get(
+            [metadata.build_key(record_id, table_id) for record_id in record_ids]
+        )
+        return record.batch_get_result(record_ids, results)
+
+    async def get_record_by_id(
+        self, table_id: str, record_id: str
+    ) -> record_row.RecordRow | None:
+        """read record through the record cache, None when not found"""
+        found, item = await cached_record(table_id, record_id)
+        if not found:
+            item = await coalesce(
+                "get_record",
+                table_id,
+                (record_id,),
+                lambda: self._fill_record(table_id, record_id),
+            )
+        return record_row.RecordRow.from_item(item) if item is not None else None
+
+    async def _fill_record(self, table_id: str, record_id: str) -> dict | None:
+        token = await fill_token(table_id, record_id)
+        item = await self.db_client.get_by_id(
+            partition_key_value=record_id,
+            sort_key_value=table_id,
+        )
+        await cache_record(table_id, record_id, item, token)
+        return item
+
+    async def update_record(
+        self, record_item: schema.table.Record, keep_created_at: bool = False
+    ) -> record_row.RecordRow | None:
+        """replace a record, see record.RecordService.update_record
+
+        Raises:
+            record_update.VersionConflictError: record has another version
+        """
+        if keep_created_at:
+            stored = await self.db_client.get_by_id(
+                partition_key_value=record_item.id, sort_key_value=record_item.table_id
+            )
+            record_item = record.with_created_at(record_item, stored)
+        update, condition = record_update.render(
+            record.replace_delta(record_item), expected_version=record_item.version
+        )
+        try:
+            updated_old = await self.db_client.patch_item(
+                partition_key_value=record_item.id,
+                sort_key_value=record_item.table_id,
+                update=update,
+                condition=condition,
+                return_values="UPDATED_OLD",
+            )
+        except stores.dynamo_db.ConditionFailedError:
+            await self._conflict(record_item.table_id, record_item.id)
+            return None
+        previous, item = record.replaced_items(record_item, updated_old)
+        record.invalidate_table_results(record_item.table_id)
+        await invalidate_records([(record_item.table_id, record_item.id)])
+        await publish_change(
+            record_item.table_id,
+            change_feed.UPDATE,
+            record_item.id,
+            item[record_update.VERSION],
+        )
+        await index_records([item])
+        await self._update_stats(
+            record_item.table_id, table_stats.StatsDelta().add(previous, item)
+        )
+        return record_row.RecordRow.from_item(item)
+
+    async def patch_record(
+        self, table_id: str, record_id: str, patch: schema.request.PatchRecord
+    ) -> record_row.RecordRow | None:
+        """apply a partial update, see record.RecordService.patch_record
+
+        Raises:
+            record_update.VersionConflictError: patch.version is set and the
+                record has another version
+            ValueError: paths of the patch overlap or are invalid
+        """
+        delta = record.patch_delta(patch)
+        written: tuple[dict, dict] | None
+        try:
+            written = await self._write_delta(table_id, record_id, delta, patch.version)
+        except stores.dynamo_db.InvalidPathError:
+            written = await self._rebase_delta(
+                table_id, record_id, delta, patch.version
+            )
+        except stores.dynamo_db.ConditionFailedError:
+            await self._conflict(table_id, record_id)
+            return None
+        if written is None:
+            return None
+        previous, item = written
+        record.invalidate_table_results(table_id)
+        await invalidate_records([(table_id, record_id)])
+        await publish_change(
+            table_id,
+            change_feed.PATCH,
+            record_id,
+            record_update.item_version(item),
+        )
+        await index_records([item])
+        await self._update_stats(table_id, table_stats.StatsDelta().add(previous, item))
+        return record_row.RecordRow.from_item(item)
+
+    async def _write_delta(
+        self,
+        table_id: str,
+        record_id: str,
+        delta: record_update.RecordDelta,
+        version: int | None,
+    ) -> tuple[dict, dict]:
+        """write delta to a stored record, returns the items before and after"""
+        metadata = await self.db_client.metadata()
+        update, condition = record_update.render(
+            delta, expected_version=version, must_exist=metadata.partition_key
+        )
+        previous = await self.db_client.patch_item(
+            partition_key_value=record_id,
+            sort_key_value=table_id,
+            update=update,
+            condition=condition,
+            return_values="ALL_OLD",
+        )
+        return previous, record.patched_item(previous, delta)
+
+    async def _rebase_delta(
+        self,
+        table_id: str,
+        record_id: str,
+        delta: record_update.RecordDelta,
+        version: int | None,
+    ) -> tuple[dict, dict] | None:
+        for _ in range(record_update.MAX_REBASE_ATTEMPTS):
+            stored = await self.db_client.get_by_id(
+                partition_key_value=record_id, sort_key_value=table_id
+            )
+            if stored is None:
+                return None
+            current = record_update.item_version(stored)
+            if version is not None and current != version:
+                raise record_update.VersionConflictError(current)
+            try:
+                return await self._write_delta(
+                    table_id, record_id, record_update.rebase(stored, delta), current
+                )
+            except stores.dynamo_db.ConditionFailedError:
+                continue
+        await self._conflict(table_id, record_id)
+        return None
+
+    async def _conflict(self, table_id: str, record_id: str) -> None:
+        """None when a failed conditional update found no record, else raise"""
+        stored = await self.db_client.get_by_id(
+            partition_key_value=record_id, sort_key_value=table_id
+        )
+        if stored is None:
+            return None
+        raise record_update.VersionConflictError(record_update.item_version(stored))
+
+    async def delete_record(self, table_id: str, record_id: str):
+        """delete record"""
+        response = await self.db_client.delete_item(
+            partition_key_value=record_id,
+            sort_key_value=table_id,
+            return_values="ALL_OLD",
+        )
+        previous = response.pop("Attributes", None)
+        record.invalidate_table_results(table_id)
+        await invalidate_records([(table_id, record_id)])
+        if previous:
+            await publish_change(table_id, change_feed.DELETE, record_id)
+            await unindex_records(table_id, [record_id])
+            await self._update_stats(
+                table_id, table_stats.StatsDelta().add(previous, None)
+            )
+        return response
+
+    async def plan_query(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+    ) -> query_planner.QueryPlan:
+        """access path of a record query on the record table indexes"""
+        return query_planner.plan_query(
+            await self.db_client.metadata(),
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+
+    async def get_query_result_count(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+    ) -> int:
+        """get query result count across all pages, cached until the next write"""
+        cache_key = record.query_cache_key(
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        found, count = record.count_cache.get(table_id, cache_key)
+        if found:
+            return count
+        return await coalesce(
+            "count_records",
+            table_id,
+            (cache_key,),
+            lambda: self._count_records(
+                table_id,
+                cache_key,
+                category=category,
+                created_after=created_after,
+                created_before=created_before,
+                record_condition=record_condition,
+            ),
+        )
+
+    async def _count_records(
+        self,
+        table_id: str,
+        cache_key: str,
+        category: schema.common.RecordCategory,
+        created_after: pydantic.AwareDatetime | None,
+        created_before: pydantic.AwareDatetime | None,
+        record_condition: list[schema.request.FieldCondition] | None,
+    ) -> int:
+        generation = record.count_cache.generation(table_id)
+
+        total_segments = config.settings.record_count_segments
+        plan = await self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        if total_segments > 1 or plan.operation == "scan":
+            count = await self.db_client.scan_count(
+                filter_expression=record.generate_filter_expression(
+                    category=category,
+                    created_after=created_after,
+                    created_before=created_before,
+                    record_condition=record_condition,
+                    table_id=table_id,
+                ),
+                total_segments=total_segments,
+            )
+        else:
+            count = await self.db_client.query_count(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                index_name=plan.index_name,
+            )
+        record.count_cache.set(table_id, cache_key, count, generation)
+        return count
+
+    async def aggregate_records(
+        self, table_id: str, query: schema.request.AggregateRecords
+    ) -> schema.response_model.AggregateResult:
+        """group and aggregate the matching records, cached until the next write
+
+        Raises:
+            service.aggregation.TooManyGroupsError: more groups than
+                config.Settings.aggregate_max_groups
+        """
+        cache_key = record.aggregate_cache_key(query)
+        found, result = record.aggregate_cache.get(table_id, cache_key)
+        if found:
+            return result
+        return await coalesce(
+            "aggregate_records",
+            table_id,
+            (cache_key,),
+            lambda: self._aggregate_records(table_id, cache_key, query),
+        )
+
+    async def _aggregate_records(
+        self, table_id: str, cache_key: str, query: schema.request.AggregateRecords
+    ) -> schema.response_model.AggregateResult:
+        generation = record.aggregate_cache.generation(table_id)
+
+        plan = await self.plan_query(
+            table_id=table_id,
+            category=query.category,
+            created_after=query.created_after,
+            created_before=query.created_before,
+            record_condition=query.record_condition,
+        )
+        if plan.operation == "scan":
+            pages = self.db_client.iter_scan_pages(
+                filter_expression=plan.filter_expression,
+                page_size=config.settings.aggregate_page_size,
+                projection=("record",),
+            )
+        else:
+            pages = self.db_client.iter_query_pages(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                page_size=config.settings.aggregate_page_size,
+                index_name=plan.index_name,
+                projection=("record",),
+            )
+        folded = record.new_aggregation(query)
+        async for page in pages:
+            folded.add_page(
+                [item.get("record") or {} for item in page.get("Items", [])]
+            )
+        result = folded.result()
+        record.aggregate_cache.set(table_id, cache_key, result, generation)
+        return result
+
+    async def query_record(
+        self,
+        table_id: str,
+        limit: int = 10,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+        start_key: dict | None = None,
+    ) -> tuple[list[record_row.RecordRow], dict | None]:
+        """query one page of records"""
+        return await coalesce(
+            "query_record",
+            table_id,
+            (
+                limit,
+                record.query_cache_key(
+                    category=category,
+                    created_after=created_after,
+                    created_before=created_before,
+                    record_condition=record_condition,
+                ),
+                record.start_key_param(start_key),
+            ),
+            lambda: self._query_page(
+                table_id,
+                limit=limit,
+                category=category,
+                created_after=created_after,
+                created_before=created_before,
+                record_condition=record_condition,
+                start_key=start_key,
+            ),
+        )
+
+    async def _query_page(
+        self,
+        table_id: str,
+        limit: int,
+        category: schema.common.RecordCategory,
+        created_after: pydantic.AwareDatetime | None,
+        created_before: pydantic.AwareDatetime | None,
+        record_condition: list[schema.request.FieldCondition] | None,
+        start_key: dict | None,
+    ) -> tuple[list[record_row.RecordRow], dict | None]:
+        plan = await self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        if plan.operation == "scan":
+            items, next_key = await self.db_client.scan(
+                filter_expression=plan.filter_expression,
+                limit=limit,
+                start_key=start_key,
+            )
+        else:
+            items, next_key = await self.db_client.query(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                limit=limit,
+                start_key=start_key,
+                index_name=plan.index_name,
+            )
+        return record_row.from_items(items), next_key
+
+    async def iter_records(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+        start_key: dict | None = None,
+    ) -> AsyncIterator[record_row.RecordRow]:
+        """iterate all matching records, reading one page at a time"""
+        plan = await self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        if plan.operation == "scan":
+            items = self.db_client.iter_scan(
+                filter_expression=plan.filter_expression, start_key=start_key
+            )
+        else:
+            items = self.db_client.iter_query(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                start_key=start_key,
+                index_name=plan.index_name,
+            )
+        async for item in items:
+            yield record_row.RecordRow.from_item(item)
+
+    async def search_records(
+        self,
+        table_id: str,
+        query: str,
+        category: schema.common.RecordCategory | None = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> tuple[list[record_row.RecordRow], int | None]:
+        """records matching the words of query, best match first, see
+        record.RecordService.search_records"""
+        hits = await asyncio.to_thread(
+            record.search_index.search,
+            table_id,
+            query,
+            category=category,
+            limit=limit + 1,
+            offset=offset,
+        )
+        next_offset = offset + limit if len(hits) > limit else None
+        record_ids = [record_id for record_id, _ in hits[:limit]]
+        if not record_ids:
+            return [], next_offset
+        metadata = await self.db_client.metadata()
+        results = await self.db_client.batch_get(
+            [metadata.build_key(record_id, table_id) for record_id in record_ids]
+        )
+        rows, missing = record.search_results(record_ids, results)
+        await unindex_records(table_id, missing)
+        return rows, next_offset
+
+    async def explain_query(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+    ) -> schema.response_model.QueryExplain:
+        """chosen plan of a query and the read units running it consumes"""
+        plan = await self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        stats = await self.db_client.read_stats(
+            key_condition_expression=plan.key_condition,
+            filter_expression=plan.filter_expression,
+            index_name=plan.index_name,
+        )
+        return query_planner.explain(plan, stats)
@@ -0,0 +1,30 @@
+"""Async table statistics services"""
+
+import datetime
+
+import schema
+import stores
+from service import table_stats
+
+
+class AsyncTableStatsService:
+    """Async counterpart of table_stats.TableStatsService"""
+
+    def __init__(self, table_name: str, pool: stores.backend.AsyncStoragePool):
+        self.db_client = pool.get_client(table_name)
+
+    async def get_stats(self, table_id: str) -> schema.response_model.TableStats:
+        """statistics of table_id"""
+        return table_stats.stats_from_item(
+            table_id, await self.db_client.get_by_id(table_stats.stats_key(table_id))
+        )
+
+    async def apply(self, table_id: str, delta: table_stats.StatsDelta):
+        """add delta to the statistics of table_id, setting its write time now"""
+        await self.db_client.patch_item(
+            table_stats.stats_key(table_id),
+            update=table_stats.update_expression(
+                table_id, delta, datetime.datetime.now(datetime.UTC)
+            ),
+            return_values="NONE",
+        )
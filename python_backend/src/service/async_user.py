@@ -0,0 +1,176 @@
+"""Async user related services"""
+
+import asyncio
+
+import schema
+import stores
+from service import access
+from service import table_index
+
+
+class AsyncUserService:
+    """Async counterpart of user.UserService"""
+
+    def __init__(self, table_name: str, pool: stores.backend.AsyncStoragePool):
+        self.db_client = pool.get_client(table_name)
+
+    async def create_user(self, user_info: schema.table.UserInfo):
+        """create user, and a table item for every table of user_info"""
+        response = await self.db_client.create_item(
+            item=user_info.model_dump(exclude={"table"})
+        )
+        for table in user_info.table:
+            await self.create_table(table)
+        return response
+
+    async def get_user_by_id(self, user_id: str):
+        """read user"""
+        return await self.db_client.get_by_id(user_id)
+
+    async def update_user(self, user_info: schema.table.UserInfo):
+        """update user, and update or create every table of user_info"""
+        updates = user_info.model_dump(exclude={"table"})
+        user_id = updates.pop("id")
+        username = updates.pop("username")
+        response = await self.db_client.update_item(
+            partition_key_value=user_id,
+            sort_key_value=username,
+            updates=updates,
+        )
+        for table in user_info.table:
+            if await self.update_table(table) is None:
+                await self.create_table(table)
+        return response
+
+    async def delete_user_by_id(self, user_id: str):
+        """delete user"""
+        return await self.db_client.delete_item(partition_key_value=user_id)
+
+    async def get_user_tables(
+        self, user_id: str
+    ) -> list[schema.response_model.TableSummary]:
+        """tables owned by or shared with user, every page"""
+        tables = []
+        for relation in (table_index.OWNER, table_index.SHARED):
+            tables.extend((await self.list_tables(user_id, relation))[0])
+        return tables
+
+    async def list_tables(
+        self,
+        user_id: str,
+        relation: str,
+        limit: int | None = None,
+        start_key: dict | None = None,
+    ) -> tuple[list[schema.response_model.TableSummary], dict | None]:
+        """one page of the tables user owns or that are shared with user"""
+        items, next_key = await self.db_client.query(
+            filter_expression=None,
+            key_condition_expression=table_index.listing_condition(user_id, relation),
+            limit=limit,
+            start_key=start_key,
+            index_name=table_index.MEMBER_INDEX,
+            projection=table_index.LISTING_ATTRIBUTES,
+        )
+        return [table_index.summary(item) for item in items], next_key
+
+    async def get_table(self, table_id: str) -> schema.table.TableInfo | None:
+        """read table, None when not found"""
+        item = await self.db_client.get_by_id(table_index.table_key(table_id))
+        return table_index.table_from_item(item) if item is not None else None
+
+    async def get_tables(
+        self, table_ids: list[str]
+    ) -> dict[str, schema.table.TableInfo | None]:
+        """read tables with batched reads, None per table not found
+
+        Raises:
+            RuntimeError: a table could not be read
+        """
+        metadata = await self.db_client.metadata()
+        results = await self.db_client.batch_get(
+            [
+                metadata.build_key(table_index.table_key(table_id))
+                for table_id in table_ids
+            ]
+        )
+        tables = {}
+        for table_id, result in zip(table_ids, results):
+            if result["error"] is not None:
+                raise RuntimeError(f"Table {table_id} not read: {result['error']}")
+            item = result["item"]
+            tables[table_id] = (
+                table_index.table_from_item(item) if item is not None else None
+            )
+        return tables
+
+    async def create_table(
+        self, table: schema.table.TableInfo
+    ) -> schema.table.TableInfo:
+        """write a new table and the memberships of its users
+
+        Raises:
+            table_index.TableExistsError: a table with the id of table exists,
+                it is left unchanged
+            RuntimeError: memberships could not be written
+        """
+        try:
+            await self.db_client.create_item(
+                item=table_index.table_item(table),
+                condition=table_index.new_table_condition(),
+            )
+        except stores.dynamo_db.ConditionFailedError as e:
+            raise table_index.TableExistsError(f"Table {table.id} exists") from e
+        access.invalidate(table.id)
+        await self._write_members(None, table)
+        return table
+
+    async def update_table(
+        self, table: schema.table.TableInfo
+    ) -> schema.table.TableInfo | None:
+        """replace a table, None when not found, see user.UserService.update_table"""
+        previous = await self.get_table(table.id)
+        if previous is None:
+            return None
+        try:
+            await self.db_client.create_item(
+                item=table_index.table_item(table),
+                condition=table_index.existing_table_condition(),
+            )
+        except stores.dynamo_db.ConditionFailedError:
+            return None
+        access.invalidate(table.id)
+        await self._write_members(previous, table)
+        return table
+
+    async def _write_members(
+        self, previous: schema.table.TableInfo | None, table: schema.table.TableInfo
+    ):
+        """write the memberships of table, deleting those only previous has"""
+        results = await self.db_client.batch_write(table_index.member_items(table))
+        failed = [result["error"] for result in results if not result["success"]]
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} memberships of table {table.id} not written: "
+                f"{failed[0]}"
+            )
+        await asyncio.gather(
+            *(
+                self.db_client.delete_item(table_index.member_key(table.id, user_id))
+                for user_id in table_index.removed_members(previous, table)
+            )
+        )
+
+    async def delete_table(self, table_id: str) -> bool:
+        """delete table and its memberships, False when not found"""
+        table = await self.get_table(table_id)
+        if table is None:
+            return False
+        await asyncio.gather(
+            *(
+                self.db_client.delete_item(table_index.member_key(table_id, user_id))
+                for user_id in table_index.members(table)
+            )
+        )
+        await self.db_client.delete_item(table_index.table_key(table_id))
+        access.invalidate(table_id)
+        return True
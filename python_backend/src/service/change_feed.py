@@ -0,0 +1,428 @@
+"""Change feed of record writes, for live table views
+
+Instead of polling the record listing, clients subscribe to the changes of a
+table (GET /table/{table_id}/changes, server-sent events) and refetch only
+what changed, so reads grow with writes instead of with open views.
+
+Every record write publishes a compact ChangeEvent to the broker of the
+process:
+
+- events of a table get increasing sequence numbers and the last
+  config.Settings.change_feed_history of them are kept for resuming
+- every subscription buffers at most change_feed_buffer events; a subscriber
+  falling further behind is closed instead of slowing down writers, and
+  resumes after its last sequence when it reconnects
+- resuming after a sequence that is no longer kept, or that another broker
+  issued, starts with a "reset" event: the client reloads the table
+
+The "redis" backend publishes events through redis pub/sub, with sequences
+from a redis counter per table taken in the same script as the publish, so
+events are published in sequence order, and every worker delivers every
+event to its own subscribers, so a client may reconnect to any worker. Its publish waits
+on redis, so service.async_record publishes from a worker thread.
+"""
+
+import asyncio
+import collections
+import dataclasses
+import threading
+import time
+import uuid
+from typing import Any
+
+import orjson
+
+# operations of events, "reload" stands for many records changed at once
+CREATE = "create"
+UPDATE = "update"
+PATCH = "patch"
+DELETE = "delete"
+RELOAD = "reload"
+RESET = "reset"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ChangeEvent:
+    """change of a table
+
+    Attributes:
+        sequence (int): position of the change in the feed of the table
+        table_id (str): changed table
+        operation (str): create, update, patch, delete, reload or reset
+        record_id (str | None): changed record, None for reload and reset
+        version (int | None): version of the record after the change
+        at (float): epoch seconds of the change
+    """
+
+    sequence: int
+    table_id: str
+    operation: str
+    record_id: str | None = None
+    version: int | None = None
+    at: float = dataclasses.field(default_factory=time.time)
+
+    def to_dict(self) -> dict[str, Any]:
+        """event document, camelCase like the responses"""
+        return {
+            "sequence": self.sequence,
+            "tableId": self.table_id,
+            "operation": self.operation,
+            "recordId": self.record_id,
+            "version": self.version,
+            "at": self.at,
+        }
+
+    @classmethod
+    def from_dict(cls, content: dict[str, Any]) -> "ChangeEvent":
+        """event of an event document"""
+        return cls(
+            sequence=content["sequence"],
+            table_id=content["tableId"],
+            operation=content["operation"],
+            record_id=content.get("recordId"),
+            version=content.get("version"),
+            at=content["at"],
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class EventId:
+    """id of an event, "<epoch>.<sequence>" in the feed
+
+    Attributes:
+        epoch (str): broker that numbered the event
+        sequence (int): sequence of the event, -1 when the id is malformed
+    """
+
+    epoch: str
+    sequence: int
+
+    def __str__(self) -> str:
+        return f"{self.epoch}.{self.sequence}"
+
+    @classmethod
+    def parse(cls, text: str) -> "EventId":
+        """event id of its text, a malformed one resumes nothing"""
+        epoch, _, sequence = text.rpartition(".")
+        try:
+            return cls(epoch, int(sequence))
+        except ValueError:
+            return cls(epoch, -1)
+
+
+class Subscription:
+    """events of one table for one client, buffered until the client reads them
+
+    Brokers push from any thread, the client reads on its event loop.
+
+    Args:
+        table_id (str): subscribed table
+        loop (asyncio.AbstractEventLoop): event loop of the client
+        buffer_size (int): events buffered before the subscription is closed
+    """
+
+    def __init__(
+        self, table_id: str, loop: asyncio.AbstractEventLoop, buffer_size: int
+    ):
+        self.table_id = table_id
+        self.buffer_size = buffer_size
+        self.overflowed = False
+        self._loop = loop
+        self._events: collections.deque[ChangeEvent] = collections.deque()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def push(self, events: list[ChangeEvent], force: bool = False):
+        """buffer events, closing the subscription when the buffer is full
+
+        Args:
+            events (list[ChangeEvent]): events to deliver
+            force (bool): buffer events beyond buffer_size, for replays
+        """
+        with self._lock:
+            if self.overflowed:
+                return
+            if not force and len(self._events) + len(events) > self.buffer_size:
+                self.overflowed = True
+            else:
+                self._events.extend(events)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # event loop of a client that is gone
+            pass
+
+    async def next_events(self, timeout: float) -> list[ChangeEvent] | None:
+        """buffered events, waiting up to timeout for some
+
+        Returns:
+            list[ChangeEvent] | None: events, empty after timeout, None once
+                the subscription is closed and drained
+        """
+        with self._lock:
+            if self.overflowed and not self._events:
+                return None
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except TimeoutError:
+            return []
+        self._ready.clear()
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            if not events and self.overflowed:
+                return None
+        return events
+
+
+class _TableFeed:
+    __slots__ = ("sequence", "history", "subscriptions")
+
+    def __init__(self, history: int):
+        self.sequence = 0
+        self.history: collections.deque[ChangeEvent] = collections.deque(maxlen=history)
+        self.subscriptions: set[Subscription] = set()
+
+
+class ChangeBroker:
+    """Interface of change brokers, also the disabled one"""
+
+    enabled = False
+    # prefix of event ids, events of other brokers cannot be resumed from
+    epoch = "none"
+    # publish waits on the network, async services call it off the event loop
+    blocking = False
+
+    def publish(
+        self,
+        table_id: str,
+        operation: str,
+        record_id: str | None = None,
+        version: int | None = None,
+    ):
+        """publish a change of table_id to its subscribers"""
+
+    def subscribe(
+        self,
+        table_id: str,
+        after: EventId | None,
+        loop: asyncio.AbstractEventLoop,
+    ) -> Subscription:
+        """subscription to the changes of table_id
+
+        Args:
+            table_id (str): table to follow
+            after (EventId | None): id of the last event the client received,
+                the kept events after it are replayed first
+            loop (asyncio.AbstractEventLoop): event loop reading the events
+        """
+        subscription = Subscription(table_id, loop, 0)
+        if after is not None:
+            # nothing is kept to resume from
+            subscription.push([ChangeEvent(0, table_id, RESET)], force=True)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """stop delivering to subscription"""
+
+    def event_id(self, event: ChangeEvent) -> EventId:
+        """id of event, to resume after it"""
+        return EventId(self.epoch, event.sequence)
+
+    def start(self):
+        """start receiving events of other workers"""
+
+    def close(self):
+        """stop receiving events of other workers"""
+
+
+class MemoryChangeBroker(ChangeBroker):
+    """Change broker of one process
+
+    Args:
+        history (int): events kept per table for resuming
+        buffer_size (int): events buffered per subscription
+        max_tables (int): tables whose sequence and history are kept, the
+            least recently changed one without subscribers is dropped first
+    """
+
+    enabled = True
+
+    def __init__(
+        self, history: int = 1000, buffer_size: int = 256, max_tables: int = 10_000
+    ):
+        self.history = history
+        self.buffer_size = buffer_size
+        self.max_tables = max_tables
+        self.epoch = uuid.uuid4().hex[:8]
+        self._tables: collections.OrderedDict[str, _TableFeed] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def _feed(self, table_id: str) -> _TableFeed:
+        feed = self._tables.get(table_id)
+        if feed is not None:
+            self._tables.move_to_end(table_id)
+            return feed
+        if len(self._tables) >= self.max_tables:
+            for idle_id, idle in self._tables.items():
+                if not idle.subscriptions:
+                    del self._tables[idle_id]
+                    break
+        feed = self._tables[table_id] = _TableFeed(self.history)
+        return feed
+
+    def publish(
+        self,
+        table_id: str,
+        operation: str,
+        record_id: str | None = None,
+        version: int | None = None,
+    ):
+        with self._lock:
+            feed = self._feed(table_id)
+            self._deliver(
+                feed,
+                ChangeEvent(feed.sequence + 1, table_id, operation, record_id, version),
+            )
+
+    def deliver(self, event: ChangeEvent):
+        """deliver an event numbered elsewhere, e.g. by another worker"""
+        with self._lock:
+            self._deliver(self._feed(event.table_id), event)
+
+    def _deliver(self, feed: _TableFeed, event: ChangeEvent):
+        # events of other workers arrive in sequence order, see RedisChangeBroker
+        feed.sequence = max(feed.sequence, event.sequence)
+        feed.history.append(event)
+        for subscription in feed.subscriptions:
+            subscription.push([event])
+
+    def subscribe(
+        self,
+        table_id: str,
+        after: EventId | None,
+        loop: asyncio.AbstractEventLoop,
+    ) -> Subscription:
+        subscription = Subscription(table_id, loop, self.buffer_size)
+        with self._lock:
+            feed = self._feed(table_id)
+            replay = self._replay(table_id, feed, after)
+            feed.subscriptions.add(subscription)
+        if replay:
+            subscription.push(replay, force=True)
+        return subscription
+
+    def _replay(
+        self, table_id: str, feed: _TableFeed, after: EventId | None
+    ) -> list[ChangeEvent]:
+        if after is None:
+            return []
+        kept_from = feed.history[0].sequence if feed.history else feed.sequence + 1
+        if after.epoch != self.epoch or not (
+            kept_from - 1 <= after.sequence <= feed.sequence
+        ):
+            return [ChangeEvent(feed.sequence, table_id, RESET)]
+        return [event for event in feed.history if event.sequence > after.sequence]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            feed = self._tables.get(subscription.table_id)
+            if feed is not None:
+                feed.subscriptions.discard(subscription)
+
+
+# number the event ARGV[2], a JSON object without its sequence, with the
+# counter KEYS[1] and publish it to channel ARGV[1]; scripts run one at a
+# time, so events of a table are published in sequence order
+_PUBLISH_SCRIPT = """
+local sequence = redis.call('INCR', KEYS[1])
+redis.call(
+    'PUBLISH', ARGV[1], '{"sequence":' .. sequence .. ',' .. string.sub(ARGV[2], 2)
+)
+return sequence
+"""
+
+
+class RedisChangeBroker(MemoryChangeBroker):
+    """Change broker of all workers, through a redis compatible client
+
+    Args:
+        client: redis-py compatible client with register_script and pubsub
+        channel (str): pub/sub channel of the events, also the prefix of the
+            sequence counters
+    """
+
+    blocking = True
+
+    def __init__(self, client, channel: str = "record_project:changes", **kwargs):
+        super().__init__(**kwargs)
+        # sequences are shared through redis, so every worker can resume them
+        self.epoch = "redis"
+        self.client = client
+        self.channel = channel
+        self._publish = client.register_script(_PUBLISH_SCRIPT)
+        self._pubsub = None
+        self._thread = None
+
+    def publish(
+        self,
+        table_id: str,
+        operation: str,
+        record_id: str | None = None,
+        version: int | None = None,
+    ):
+        content = ChangeEvent(0, table_id, operation, record_id, version).to_dict()
+        del content["sequence"]
+        self._publish(
+            keys=[f"{self.channel}:{table_id}"],
+            args=[self.channel, orjson.dumps(content)],
+        )
+
+    def _on_message(self, message: dict):
+        self.deliver(ChangeEvent.from_dict(orjson.loads(message["data"])))
+
+    def start(self):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+def sse_message(broker: ChangeBroker, event: ChangeEvent) -> bytes:
+    """server-sent event of event, named after its operation"""
+    return (
+        f"id: {broker.event_id(event)}\nevent: {event.operation}\ndata: ".encode()
+        + orjson.dumps(event.to_dict())
+        + b"\n\n"
+    )
+
+
+def create_change_broker(
+    backend: str,
+    history: int = 1000,
+    buffer_size: int = 256,
+    max_tables: int = 10_000,
+    redis_url: str = "redis://localhost:6379/0",
+) -> ChangeBroker:
+    """create change broker of backend "memory", "redis" or "none" """
+    options: dict[str, Any] = {
+        "history": history,
+        "buffer_size": buffer_size,
+        "max_tables": max_tables,
+    }
+    if backend == "memory":
+        return MemoryChangeBroker(**options)
+    if backend == "redis":
+        import redis  # pylint: disable=import-outside-toplevel
+
+        return RedisChangeBroker(redis.Redis.from_url(redis_url), **options)
+    return ChangeBroker()
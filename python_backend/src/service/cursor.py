@@ -0,0 +1,72 @@
+"""Opaque, signed pagination cursors
+
+A cursor wraps the dynamo db key to resume a query from. It is bound to the
+virtual table it was issued for and signed with config.Settings.cursor_secret,
+so clients can neither read nor forge keys of other tables.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+
+import config
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class InvalidCursorError(ValueError):
+    """cursor is malformed, tampered or issued for another table"""
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(
+        config.settings.cursor_secret.encode(), payload, hashlib.sha256
+    ).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def encode_cursor(start_key: dict | None, table_id: str) -> str | None:
+    """encode key to resume from into cursor token, None when no more items"""
+    if start_key is None:
+        return None
+    payload = json.dumps(
+        {
+            "t": table_id,
+            "k": {
+                key: _serializer.serialize(value) for key, value in start_key.items()
+            },
+        },
+        separators=(",", ":"),
+        sort_keys=True,
+    ).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(cursor: str | None, table_id: str) -> dict | None:
+    """decode cursor token into key to resume from"""
+    if cursor is None:
+        return None
+    try:
+        encoded_payload, encoded_signature = cursor.split(".")
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except ValueError as e:
+        raise InvalidCursorError("Malformed cursor") from e
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidCursorError("Cursor signature mismatch")
+    content = json.loads(payload)
+    if content["t"] != table_id:
+        raise InvalidCursorError("Cursor was issued for another table")
+    return {
+        key: _deserializer.deserialize(value) for key, value in content["k"].items()
+    }
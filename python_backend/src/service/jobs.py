@@ -0,0 +1,226 @@
+"""Background export and import jobs
+
+Jobs run on a small thread pool of their own, so that long transfers do not
+hold request threads or the dynamo db fan-out executor. Every job keeps its
+state in <transfer_dir>/<job_id>/job.json next to its files and checkpoint;
+a job interrupted by a failure or a restart can be resumed from there.
+"""
+
+import concurrent.futures
+import datetime
+import pathlib
+import threading
+import uuid
+from typing import Callable, Literal
+
+import config
+import schema
+import stores
+from loguru import logger
+from service import table_stats, transfer
+
+JOB_FILE = "job.json"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC)
+
+
+class JobManager:
+    """Run and track export and import jobs
+
+    Args:
+        pool (stores.backend.StoragePool): pool of the record table client
+        directory (str): directory holding one sub directory per job
+        max_workers (int): jobs running at once
+    """
+
+    def __init__(
+        self,
+        pool: stores.backend.StoragePool,
+        directory: str = "transfers",
+        max_workers: int = 2,
+    ):
+        self.pool = pool
+        self.directory = pathlib.Path(directory)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="transfer-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: dict[str, schema.response_model.TransferJob] = {}
+        self._running: set[str] = set()
+
+    def job_directory(self, job_id: str) -> pathlib.Path | None:
+        """directory of job, None when job_id is not a job id"""
+        try:
+            return self._directory(job_id)
+        except ValueError:
+            return None
+
+    def _directory(self, job_id: str) -> pathlib.Path:
+        """directory of a known job
+
+        Raises:
+            ValueError: job_id is not a job id
+        """
+        return self.directory / uuid.UUID(job_id).hex
+
+    def _save(self, job: schema.response_model.TransferJob):
+        job.updated_at = _now()
+        directory = self._directory(job.id)
+        directory.mkdir(parents=True, exist_ok=True)
+        transfer.save_checkpoint(directory / JOB_FILE, job.model_dump(mode="json"))
+
+    def get(self, job_id: str) -> schema.response_model.TransferJob | None:
+        """get job, also one started before a restart, None when not found"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        directory = self.job_directory(job_id)
+        if directory is None:
+            return None
+        content = transfer.load_checkpoint(directory / JOB_FILE)
+        if content is None:
+            return None
+        job = schema.response_model.TransferJob.model_validate(content)
+        with self._lock:
+            return self._jobs.setdefault(job.id, job)
+
+    def _run(self, job: schema.response_model.TransferJob):
+        def progress(checkpoint: dict):
+            job.progress = checkpoint
+            self._save(job)
+
+        try:
+            job.status = "running"
+            self._save(job)
+            self._target(job)(progress)
+            job.status = "completed"
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception("Transfer job failed", job_id=job.id)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            self._save(job)
+            with self._lock:
+                self._running.discard(job.id)
+
+    def _target(
+        self, job: schema.response_model.TransferJob
+    ) -> Callable[[transfer.Progress], dict]:
+        db_client = self.pool.get_client(config.settings.record_table_name)
+        directory = self._directory(job.id)
+        options = job.options
+        if job.kind == "export":
+            return lambda progress: transfer.export_table(
+                db_client,
+                job.table_id,
+                directory,
+                file_format=options["format"],
+                segments=options["segments"],
+                chunk_rows=options["chunk_rows"],
+                page_size=config.settings.transfer_page_size,
+                progress=progress,
+            )
+        return lambda progress: transfer.import_table(
+            db_client,
+            job.table_id,
+            self._directory(options["source_job_id"]),
+            checkpoint_path=directory / "import-checkpoint.json",
+            batch_size=config.settings.transfer_batch_size,
+            write_units_per_second=options["write_units_per_second"],
+            progress=progress,
+            stats=(
+                table_stats.TableStatsService(
+                    config.settings.master_table_name, self.pool
+                )
+                if config.settings.table_stats
+                else None
+            ),
+        )
+
+    def _start(self, job: schema.response_model.TransferJob):
+        """run job, checking and marking it running under one lock
+
+        Raises:
+            RuntimeError: job is still running
+        """
+        with self._lock:
+            if job.id in self._running:
+                raise RuntimeError(f"Job {job.id} is still running")
+            self._jobs[job.id] = job
+            self._running.add(job.id)
+        job.status = "pending"
+        job.error = None
+        self._save(job)
+        self._executor.submit(self._run, job)
+
+    def _create(
+        self, kind: Literal["export", "import"], table_id: str, options: dict
+    ) -> schema.response_model.TransferJob:
+        now = _now()
+        job = schema.response_model.TransferJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            table_id=table_id,
+            status="pending",
+            options=options,
+            created_at=now,
+            updated_at=now,
+        )
+        self._start(job)
+        return job
+
+    def submit_export(
+        self, table_id: str, request: schema.request.ExportTable
+    ) -> schema.response_model.TransferJob:
+        """start exporting a virtual table"""
+        return self._create(
+            "export",
+            table_id,
+            {
+                "format": request.format,
+                "segments": request.segments or config.settings.transfer_segments,
+                "chunk_rows": request.chunk_rows or config.settings.transfer_chunk_rows,
+            },
+        )
+
+    def submit_import(
+        self, table_id: str, request: schema.request.ImportTable
+    ) -> schema.response_model.TransferJob | None:
+        """start importing the files of an export job, None when it is unknown
+
+        Raises:
+            RuntimeError: the export job has not completed, its files are
+                missing or partly written
+        """
+        source = self.get(request.source_job_id)
+        if source is None or source.kind != "export":
+            return None
+        if source.status != "completed":
+            raise RuntimeError(f"Export job {source.id} is {source.status}")
+        return self._create(
+            "import",
+            table_id,
+            {
+                "source_job_id": source.id,
+                "write_units_per_second": request.write_units_per_second,
+            },
+        )
+
+    def resume(self, job_id: str) -> schema.response_model.TransferJob | None:
+        """continue a failed or interrupted job from its checkpoint
+
+        Raises:
+            RuntimeError: job is still running
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        self._start(job)
+        return job
+
+    def shutdown(self):
+        """stop taking jobs, running jobs finish in the background"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
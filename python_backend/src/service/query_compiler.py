@@ -0,0 +1,216 @@
+"""Compile record filters into reusable filter expressions
+
+A filter is split into its shape (which fields are compared with which
+operators) and its values. The shape is compiled once into an expression
+string with attribute name placeholders and value slots, kept in a bounded
+LRU, and every query only binds its values to the compiled template.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import functools
+import re
+from typing import Any, Callable
+
+import config
+import schema
+import stores
+
+Operator = schema.common.Operator
+FieldType = schema.common.FieldType
+
+_PATH_PART = re.compile(r"^([^\[\]]+)((?:\[\d+\])*)$")
+
+
+@dataclasses.dataclass(frozen=True)
+class CompiledFilter:
+    """filter expression template of a condition shape
+
+    Attributes:
+        expression (str): filter expression with #f* names and :f* value slots
+        names (dict[str, str]): attribute name placeholders
+        value_slots (tuple[str, ...]): value placeholders in binding order
+    """
+
+    expression: str
+    names: dict[str, str]
+    value_slots: tuple[str, ...]
+
+    def bind(self, values: list[Any]) -> stores.expression.Expression:
+        """fill value slots in order"""
+        return stores.expression.Expression(
+            expression=self.expression,
+            names=self.names,
+            values=dict(zip(self.value_slots, values)),
+        )
+
+
+def _comparison(operator: str) -> Callable[[str, list[str]], str]:
+    return lambda path, slots: f"{path} {operator} {slots[0]}"
+
+
+# operator -> renders condition from attribute path and value slots
+OPERATORS: dict[str, Callable[[str, list[str]], str]] = {
+    Operator.EQ: _comparison("="),
+    Operator.NE: _comparison("<>"),
+    Operator.GT: _comparison(">"),
+    Operator.GTE: _comparison(">="),
+    Operator.LT: _comparison("<"),
+    Operator.LTE: _comparison("<="),
+    Operator.EXISTS: lambda path, slots: f"attribute_exists({path})",
+    Operator.NOT_EXISTS: lambda path, slots: f"attribute_not_exists({path})",
+    Operator.CONTAINS: lambda path, slots: f"contains({path}, {slots[0]})",
+    Operator.IS_IN: lambda path, slots: f"{path} IN ({', '.join(slots)})",
+    Operator.BEGINS_WITH: lambda path, slots: f"begins_with({path}, {slots[0]})",
+}
+
+
+def _arity(condition: schema.request.FieldCondition) -> int:
+    """number of values bound by condition"""
+    if condition.operation in (Operator.EXISTS, Operator.NOT_EXISTS):
+        return 0
+    if condition.operation == Operator.IS_IN:
+        return len(condition.value)
+    return 1
+
+
+def _coerce(field_type: str, value: Any) -> Any:
+    """convert value to the dynamo db type of field_type"""
+    if field_type == FieldType.NUMBER:
+        return schema.request.to_number(value)
+    if field_type == FieldType.STRING:
+        return str(value)
+    if field_type == FieldType.BOOLEAN and not isinstance(value, bool):
+        return str(value).lower() == "true"
+    return stores.dynamo_db.to_dynamo_value(value)
+
+
+def _timestamp(value: datetime.datetime) -> decimal.Decimal:
+    return decimal.Decimal(str(value.timestamp()))
+
+
+class _Compiler:
+    """renders attribute paths and value slots of one compiled filter"""
+
+    def __init__(self):
+        self.names: dict[str, str] = {}
+        self.value_count = 0
+
+    def path(self, attribute_path: str) -> str:
+        parts = []
+        for part in attribute_path.split("."):
+            match = _PATH_PART.match(part)
+            if match is None:
+                raise ValueError(f"Invalid attribute path: {attribute_path}")
+            name, index = match.groups()
+            placeholder = self.names.get(name)
+            if placeholder is None:
+                placeholder = f"#f{len(self.names)}"
+                self.names[name] = placeholder
+            parts.append(placeholder + index)
+        return ".".join(parts)
+
+    def slots(self, count: int) -> list[str]:
+        slots = [f":f{self.value_count + index}" for index in range(count)]
+        self.value_count += count
+        return slots
+
+
+# condition shape: (has table_id, has category, has created_after,
+# has created_before, ((field, operation, arity), ...))
+FilterShape = tuple[bool, bool, bool, bool, tuple[tuple[str, str, int], ...]]
+
+
+def _compile_shape(shape: FilterShape) -> CompiledFilter | None:
+    has_table_id, has_category, has_created_after, has_created_before, conditions = (
+        shape
+    )
+    compiler = _Compiler()
+    clauses = []
+    if has_table_id:
+        clauses.append(f"{compiler.path('table_id')} = {compiler.slots(1)[0]}")
+    if has_category:
+        clauses.append(f"{compiler.path('category')} = {compiler.slots(1)[0]}")
+    if has_created_after and has_created_before:
+        after, before = compiler.slots(2)
+        clauses.append(
+            f"{compiler.path('record_created_at')} BETWEEN {after} AND {before}"
+        )
+    elif has_created_after:
+        clauses.append(f"{compiler.path('record_created_at')} > {compiler.slots(1)[0]}")
+    elif has_created_before:
+        clauses.append(f"{compiler.path('record_created_at')} < {compiler.slots(1)[0]}")
+    for field, operation, arity in conditions:
+        path = compiler.path("record." + field)
+        clauses.append(OPERATORS[operation](path, compiler.slots(arity)))
+    if not clauses:
+        return None
+    return CompiledFilter(
+        expression=" AND ".join(
+            clause if len(clauses) == 1 else f"({clause})" for clause in clauses
+        ),
+        names={placeholder: name for name, placeholder in compiler.names.items()},
+        value_slots=tuple(f":f{index}" for index in range(compiler.value_count)),
+    )
+
+
+compile_shape = functools.lru_cache(maxsize=config.settings.filter_cache_size)(
+    _compile_shape
+)
+
+
+def normalise_conditions(
+    record_condition: list[schema.request.FieldCondition] | None,
+) -> list[schema.request.FieldCondition]:
+    """conditions in a canonical order, so that equal filters share a shape"""
+    return sorted(
+        record_condition or [],
+        key=lambda condition: (
+            condition.field,
+            condition.operation,
+            condition.field_type,
+        ),
+    )
+
+
+def compile_filter(
+    category: schema.common.RecordCategory | None = schema.common.RecordCategory.RECORD,
+    created_after: datetime.datetime | None = None,
+    created_before: datetime.datetime | None = None,
+    record_condition: list[schema.request.FieldCondition] | None = None,
+    table_id: str | None = None,
+) -> stores.expression.Expression | None:
+    """compile record filter into a filter expression bound to its values
+
+    Conditions left as None are not filtered on, None when nothing is.
+    """
+    conditions = normalise_conditions(record_condition)
+    shape: FilterShape = (
+        table_id is not None,
+        category is not None,
+        created_after is not None,
+        created_before is not None,
+        tuple(
+            (condition.field, condition.operation, _arity(condition))
+            for condition in conditions
+        ),
+    )
+    values: list[Any] = []
+    if table_id is not None:
+        values.append(table_id)
+    if category is not None:
+        values.append(category)
+    if created_after is not None:
+        values.append(_timestamp(created_after))
+    if created_before is not None:
+        values.append(_timestamp(created_before))
+    for condition in conditions:
+        if condition.operation == Operator.IS_IN:
+            values.extend(
+                _coerce(condition.field_type, item) for item in condition.value
+            )
+        elif _arity(condition):
+            values.append(_coerce(condition.field_type, condition.value))
+    compiled = compile_shape(shape)
+    return compiled.bind(values) if compiled is not None else None
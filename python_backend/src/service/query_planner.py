@@ -0,0 +1,251 @@
+"""Choose the access path of record queries
+
+Records of a virtual table are found through an index partitioned by
+table_id. The planner looks at the cached key schema of the record table and
+pushes category and created time conditions into the KeyConditionExpression
+when the sort key of an index covers them:
+
+- category_created_at ("<category>#<created epoch>"): category and created range
+- category: category
+- record_created_at: created range
+
+Whatever the chosen key does not cover stays in the FilterExpression. Without
+any index partitioned by table_id the query falls back to a filtered scan.
+Only the base table and indexes projecting ALL attributes are considered, as
+records are returned whole.
+"""
+
+import dataclasses
+import datetime
+import decimal
+from typing import Any
+
+import schema
+import stores
+from service import query_compiler
+
+TABLE_ID = "table_id"
+CATEGORY = "category"
+RECORD_CREATED_AT = "record_created_at"
+CATEGORY_CREATED_AT = "category_created_at"
+
+
+def category_created_at(
+    category: str, created_at: datetime.datetime | decimal.Decimal
+) -> str:
+    """sort key of the category_created_at index, ordered by created time"""
+    epoch: float | decimal.Decimal = (
+        created_at.timestamp()
+        if isinstance(created_at, datetime.datetime)
+        else created_at
+    )
+    return f"{category}#{epoch:017.6f}"
+
+
+def index_attributes(record: schema.table.Record) -> dict[str, Any]:
+    """derived attributes maintained on every record write for the indexes"""
+    return {
+        CATEGORY_CREATED_AT: category_created_at(
+            record.category, record.record_created_at
+        )
+    }
+
+
+@dataclasses.dataclass(frozen=True)
+class QueryPlan:
+    """access path of a record query
+
+    Attributes:
+        operation (str): "query" or "scan"
+        index_name (str | None): queried index, None for the base table
+        key_condition (stores.expression.Expression | None): key condition of query
+        filter_expression (stores.expression.Expression | None): residual filter
+        key_predicates (tuple[str, ...]): conditions answered by the key
+        filter_predicates (tuple[str, ...]): conditions evaluated by the filter
+    """
+
+    operation: str
+    index_name: str | None
+    key_condition: stores.expression.Expression | None
+    filter_expression: stores.expression.Expression | None
+    key_predicates: tuple[str, ...]
+    filter_predicates: tuple[str, ...]
+
+    def describe(self) -> dict:
+        """plan in a json friendly form"""
+        return {
+            "operation": self.operation,
+            "index_name": self.index_name,
+            "key_condition": _render(self.key_condition),
+            "filter_expression": _render(self.filter_expression),
+            "key_predicates": list(self.key_predicates),
+            "filter_predicates": list(self.filter_predicates),
+        }
+
+
+def _render(condition: stores.expression.Expression | None) -> str | None:
+    """condition with name placeholders substituted, values left as slots"""
+    if condition is None:
+        return None
+    rendered = condition.expression
+    for placeholder in sorted(condition.names, key=len, reverse=True):
+        rendered = rendered.replace(placeholder, condition.names[placeholder])
+    return rendered
+
+
+def _access_paths(
+    metadata: stores.table_metadata.TableMetadata,
+) -> list[tuple[str | None, str | None]]:
+    """(index name, sort key) of base table and indexes partitioned by table_id"""
+    paths: list[tuple[str | None, str | None]] = []
+    if metadata.partition_key == TABLE_ID:
+        paths.append((None, metadata.sort_key))
+    for index in metadata.indexes:
+        if index.partition_key == TABLE_ID and index.projection_type == "ALL":
+            paths.append((index.name, index.sort_key))
+    return paths
+
+
+def _covered(sort_key: str | None, has_created_range: bool) -> tuple[bool, bool]:
+    """whether sort_key answers the category and the created range conditions"""
+    if sort_key == CATEGORY_CREATED_AT:
+        return True, has_created_range
+    if sort_key == CATEGORY:
+        return True, False
+    if sort_key == RECORD_CREATED_AT:
+        return False, has_created_range
+    return False, False
+
+
+def _key_condition(
+    table_id: str,
+    sort_key: str | None,
+    category: str,
+    created_after: datetime.datetime | None,
+    created_before: datetime.datetime | None,
+    covers_category: bool,
+    covers_created: bool,
+) -> stores.expression.Expression:
+    names = {"#k0": TABLE_ID}
+    values: dict[str, Any] = {":k0": table_id}
+    clauses = ["#k0 = :k0"]
+    if sort_key is not None and (covers_category or covers_created):
+        names["#k1"] = sort_key
+    if sort_key == CATEGORY_CREATED_AT:
+        # "#" < digits < "$", so the range covers every record of category
+        values[":k1"] = (
+            category_created_at(category, created_after)
+            if created_after is not None
+            else f"{category}#"
+        )
+        values[":k2"] = (
+            category_created_at(category, created_before)
+            if created_before is not None
+            else f"{category}$"
+        )
+        clauses.append("#k1 BETWEEN :k1 AND :k2")
+    elif covers_category:
+        values[":k1"] = category
+        clauses.append("#k1 = :k1")
+    elif covers_created and created_after is not None and created_before is not None:
+        values[":k1"] = decimal.Decimal(str(created_after.timestamp()))
+        values[":k2"] = decimal.Decimal(str(created_before.timestamp()))
+        clauses.append("#k1 BETWEEN :k1 AND :k2")
+    elif covers_created and created_after is not None:
+        values[":k1"] = decimal.Decimal(str(created_after.timestamp()))
+        clauses.append("#k1 > :k1")
+    elif covers_created and created_before is not None:
+        values[":k1"] = decimal.Decimal(str(created_before.timestamp()))
+        clauses.append("#k1 < :k1")
+    return stores.expression.Expression(
+        expression=" AND ".join(clauses), names=names, values=values
+    )
+
+
+def plan_query(
+    metadata: stores.table_metadata.TableMetadata,
+    table_id: str,
+    category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+    created_after: datetime.datetime | None = None,
+    created_before: datetime.datetime | None = None,
+    record_condition: list[schema.request.FieldCondition] | None = None,
+) -> QueryPlan:
+    """choose the access path answering most conditions by key"""
+    has_created_range = created_after is not None or created_before is not None
+    best = None
+    for index_name, sort_key in _access_paths(metadata):
+        covers_category, covers_created = _covered(sort_key, has_created_range)
+        score = covers_category + covers_created
+        if best is None or score > best[0]:
+            best = (score, index_name, sort_key, covers_category, covers_created)
+    record_predicates = tuple(
+        f"record.{condition.field} {condition.operation}"
+        for condition in record_condition or []
+    )
+    created_predicates = (RECORD_CREATED_AT,) if has_created_range else ()
+
+    if best is None:
+        return QueryPlan(
+            operation="scan",
+            index_name=None,
+            key_condition=None,
+            filter_expression=query_compiler.compile_filter(
+                category=category,
+                created_after=created_after,
+                created_before=created_before,
+                record_condition=record_condition,
+                table_id=table_id,
+            ),
+            key_predicates=(),
+            filter_predicates=(TABLE_ID, CATEGORY)
+            + created_predicates
+            + record_predicates,
+        )
+
+    _, index_name, sort_key, covers_category, covers_created = best
+    # the composite key range is inclusive, a single (exclusive) created bound
+    # is rechecked by the filter
+    exact_created = sort_key == CATEGORY_CREATED_AT and (
+        (created_after is None) != (created_before is None)
+    )
+    filter_created = not covers_created or exact_created
+    return QueryPlan(
+        operation="query",
+        index_name=index_name,
+        key_condition=_key_condition(
+            table_id,
+            sort_key,
+            category,
+            created_after,
+            created_before,
+            covers_category,
+            covers_created,
+        ),
+        filter_expression=query_compiler.compile_filter(
+            category=None if covers_category else category,
+            created_after=created_after if filter_created else None,
+            created_before=created_before if filter_created else None,
+            record_condition=record_condition,
+        ),
+        key_predicates=(TABLE_ID,)
+        + ((CATEGORY,) if covers_category else ())
+        + (created_predicates if covers_created else ()),
+        filter_predicates=(() if covers_category else (CATEGORY,))
+        + (created_predicates if filter_created else ())
+        + record_predicates,
+    )
+
+
+def explain(plan: QueryPlan, stats: dict) -> schema.response_model.QueryExplain:
+    """plan with the items and read units of running it
+
+    Args:
+        plan (QueryPlan): chosen plan
+        stats (dict): DynamoClient.read_stats of the plan
+    """
+    return schema.response_model.QueryExplain(
+        **plan.describe(),
+        scanned_count=stats["scanned_count"],
+        matched_count=stats["count"],
+        estimated_read_units=stats["read_units"],
+    )
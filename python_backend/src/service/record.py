@@ -1,96 +1,599 @@
 """Record related services"""
 
 import datetime
+import json
+from typing import Callable, Iterator, TypeVar
 
+import config
 import pydantic
 import schema
 import stores
-from boto3.dynamodb.conditions import Attr, Key
+from loguru import logger
+from service import (
+    aggregation,
+    change_feed,
+    query_compiler,
+    query_planner,
+    record_cache,
+    record_row,
+    record_update,
+    search,
+    single_flight,
+    table_cache,
+    table_stats,
+)
+
+T = TypeVar("T")
+
+# records indexed per transaction of RecordService.rebuild_search_index
+REINDEX_BATCH_SIZE = 500
+
+# record counts per (table_id, filter), dropped on every write to the table
+count_cache = table_cache.TableResultCache(
+    maxsize=config.settings.count_cache_size, ttl=config.settings.count_cache_ttl
+)
+# aggregate results per (table_id, query), dropped on every write to the table
+aggregate_cache = table_cache.TableResultCache(
+    maxsize=config.settings.aggregate_cache_size,
+    ttl=config.settings.aggregate_cache_ttl,
+)
+# records per (table_id, record_id), dropped on every write to the record
+item_cache = record_cache.create_record_cache(
+    config.settings.record_cache_backend,
+    maxsize=config.settings.record_cache_size,
+    ttl=config.settings.record_cache_ttl,
+    negative_ttl=config.settings.record_cache_negative_ttl,
+    redis_url=config.settings.record_cache_redis_url,
+)
+# record writes published to live table views, see service.change_feed
+change_broker = change_feed.create_change_broker(
+    config.settings.change_feed_backend,
+    history=config.settings.change_feed_history,
+    buffer_size=config.settings.change_feed_buffer,
+    max_tables=config.settings.change_feed_max_tables,
+    redis_url=config.settings.change_feed_redis_url,
+)
+# full-text index of the record strings, see service.search
+search_index = search.create_search_index(
+    config.settings.search_backend,
+    path=config.settings.search_index_path,
+    busy_timeout=config.settings.sqlite_busy_timeout,
+)
+# identical reads in flight share one dynamo db call, see service.single_flight
+flight_stats = single_flight.CoalescingStats()
+read_flight = single_flight.SingleFlight(flight_stats)
+
+
+def generate_filter_expression(
+    category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+    created_after: pydantic.AwareDatetime | None = None,
+    created_before: pydantic.AwareDatetime | None = None,
+    record_condition: list[schema.request.FieldCondition] | None = None,
+    table_id: str | None = None,
+) -> stores.expression.Expression | None:
+    """combine category, created time and record conditions into one filter,
+    None when nothing is filtered on"""
+    return query_compiler.compile_filter(
+        category=category,
+        created_after=created_after,
+        created_before=created_before,
+        record_condition=record_condition,
+        table_id=table_id,
+    )
+
+
+def record_item(record: schema.table.Record) -> dict:
+    """stored item of a new record, with the attributes the record indexes need"""
+    return {
+        **record.model_dump(exclude={record_update.VERSION}),
+        **query_planner.index_attributes(record),
+        record_update.VERSION: 1,
+    }
+
+
+def replaced_items(
+    record: schema.table.Record, updated_old: dict
+) -> tuple[dict | None, dict]:
+    """items before and after an update of replace_delta(record)
+
+    Args:
+        record (schema.table.Record): replacing record
+        updated_old (dict): UPDATED_OLD attributes of the update, empty when
+            it created the record
+
+    Returns:
+        tuple[dict | None, dict]: previous item, None when created, and item
+    """
+    item = record_item(record)
+    if not updated_old:
+        return None, item
+    item[record_update.VERSION] = int(updated_old.get(record_update.VERSION, 0)) + 1
+    return {**item, **updated_old}, item
+
+
+def patched_item(previous: dict, delta: record_update.RecordDelta) -> dict:
+    """item after an update of delta, from the item before it (ALL_OLD)"""
+    item = stores.dynamo_db.to_dynamo_value(record_update.apply(previous, delta))
+    item[record_update.VERSION] = record_update.item_version(previous) + 1
+    return item
+
+
+def with_created_at(
+    record: schema.table.Record, stored: dict | None
+) -> schema.table.Record:
+    """record with the creation time of the stored item, if there is one"""
+    if stored is None:
+        return record
+    return record.model_copy(
+        update={
+            "record_created_at": record_row.to_datetime(stored["record_created_at"])
+        }
+    )
+
+
+def replace_delta(record: schema.table.Record) -> record_update.RecordDelta:
+    """delta replacing every attribute of a stored record but its key"""
+    item = record_item(record)
+    for name in ("id", "table_id", record_update.VERSION):
+        item.pop(name)
+    return record_update.RecordDelta(
+        set={(name,): value for name, value in item.items()}
+    )
+
+
+def patch_delta(patch: schema.request.PatchRecord) -> record_update.RecordDelta:
+    """delta of a record patch, touching record_updated_at
+
+    Raises:
+        ValueError: an increment path is invalid
+    """
+    delta = record_update.merge_patch(patch.record)
+    delta.increment = {
+        record_update.split_path(path): amount
+        for path, amount in patch.increment.items()
+    }
+    delta.set[("record_updated_at",)] = datetime.datetime.now(datetime.UTC)
+    return delta
+
+
+def query_cache_key(
+    category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+    created_after: pydantic.AwareDatetime | None = None,
+    created_before: pydantic.AwareDatetime | None = None,
+    record_condition: list[schema.request.FieldCondition] | None = None,
+) -> str:
+    """normalised key of a record filter, independent of condition order"""
+    return json.dumps(
+        [
+            category,
+            created_after.timestamp() if created_after is not None else None,
+            created_before.timestamp() if created_before is not None else None,
+            sorted(condition.model_dump_json() for condition in record_condition or []),
+        ]
+    )
+
+
+def aggregate_cache_key(query: schema.request.AggregateRecords) -> str:
+    """normalised key of an aggregate query"""
+    return json.dumps(
+        [
+            query_cache_key(
+                category=query.category,
+                created_after=query.created_after,
+                created_before=query.created_before,
+                record_condition=query.record_condition,
+            ),
+            query.group_by,
+            [aggregate.model_dump(mode="json") for aggregate in query.aggregates],
+        ]
+    )
+
+
+def new_aggregation(query: schema.request.AggregateRecords) -> aggregation.Aggregation:
+    """empty aggregation of query, bounded by the aggregate settings"""
+    return aggregation.Aggregation(
+        query.group_by,
+        query.aggregates,
+        max_groups=config.settings.aggregate_max_groups,
+        sample_size=config.settings.aggregate_sample_size,
+    )
+
+
+def invalidate_table_results(table_id: str):
+    """drop the cached counts and aggregates of table, on every write to it"""
+    count_cache.invalidate_table(table_id)
+    aggregate_cache.invalidate_table(table_id)
+
+
+def flight_key(table_id: str, *params) -> tuple:
+    """key of a coalesced read of table
+
+    Writes bump the table generation, so that a read started after a write
+    never shares the result of a read started before it.
+    """
+    return (table_id, count_cache.generation(table_id), *params)
+
+
+def start_key_param(start_key: dict | None) -> str | None:
+    """normalised start key of a page read"""
+    if start_key is None:
+        return None
+    return json.dumps(start_key, sort_keys=True, default=str)
+
+
+def coalesce(operation: str, table_id: str, params: tuple, func: Callable[[], T]) -> T:
+    """run a read of table, shared with identical reads in flight"""
+    if not config.settings.read_coalescing:
+        return func()
+    return read_flight.do(operation, flight_key(table_id, *params), func)
+
+
+def batch_create_result(
+    records: list[schema.table.Record], results: list[dict]
+) -> schema.response_model.BatchCreateResult:
+    """per record outcome of DynamoClient.batch_write"""
+    item_results = [
+        schema.response_model.BatchItemResult(
+            id=record.id, success=result["success"], error=result["error"]
+        )
+        for record, result in zip(records, results)
+    ]
+    success_count = sum(result.success for result in item_results)
+    return schema.response_model.BatchCreateResult(
+        success_count=success_count,
+        failure_count=len(item_results) - success_count,
+        results=item_results,
+    )
+
+
+def written_items(items: list[dict], results: list[dict]) -> list[dict]:
+    """items of a batch write that were written"""
+    return [item for item, result in zip(items, results) if result["success"]]
+
+
+def read_previous(
+    db_client: stores.backend.StorageClient, items: list[dict]
+) -> list[dict | None]:
+    """records a batch write of items replaces, read before it for the table
+    statistics, None for new records and when statistics are off"""
+    if not config.settings.table_stats:
+        return [None] * len(items)
+    metadata = db_client.metadata
+    results = db_client.batch_get(
+        [metadata.build_key(item["id"], item["table_id"]) for item in items]
+    )
+    return [result["item"] for result in results]
+
+
+def update_stats(
+    stats: table_stats.TableStatsService, table_id: str, delta: table_stats.StatsDelta
+):
+    """apply delta after a record write, best effort: a failure is logged and
+    the write still succeeds, RecordService.rebuild_table_stats recounts the
+    table"""
+    if not config.settings.table_stats:
+        return
+    try:
+        stats.apply(table_id, delta)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("Table stats update failed", table_id=table_id)
+
+
+def search_results(
+    record_ids: list[str], results: list[dict]
+) -> tuple[list[record_row.RecordRow], list[str]]:
+    """records of a search found by DynamoClient.batch_get, in the order of
+    record_ids, and the ids of the records not found"""
+    missing = [
+        record_id
+        for record_id, result in zip(record_ids, results)
+        if result["item"] is None and result["error"] is None
+    ]
+    rows = [
+        record_row.RecordRow.from_item(result["item"])
+        for result in results
+        if result["item"] is not None
+    ]
+    return rows, missing
+
+
+def batch_get_result(
+    record_ids: list[str], results: list[dict]
+) -> tuple[list[record_row.RecordRow], list[schema.response_model.BatchItemResult]]:
+    """records found by DynamoClient.batch_get and outcome per record id"""
+    rows = []
+    item_results = []
+    for record_id, result in zip(record_ids, results):
+        if result["item"] is not None:
+            rows.append(record_row.RecordRow.from_item(result["item"]))
+            item_results.append(
+                schema.response_model.BatchItemResult(id=record_id, success=True)
+            )
+        else:
+            item_results.append(
+                schema.response_model.BatchItemResult(
+                    id=record_id, success=False, error=result["error"] or "Not found"
+                )
+            )
+    return rows, item_results
 
 
 class RecordService:
     """Record related services"""
 
-    def __init__(self, table_name: str):
-        self.db_client = stores.dynamo_db.DynamoClient(table_name)
+    def __init__(self, table_name: str, pool: stores.backend.StoragePool | None = None):
+        self.db_client: stores.backend.StorageClient
+        if pool is None:
+            self.db_client = stores.dynamo_db.DynamoClient(table_name)
+        else:
+            self.db_client = pool.get_client(table_name)
+        self.stats = table_stats.TableStatsService(
+            config.settings.master_table_name, pool
+        )
+
+    def _update_stats(self, table_id: str, delta: table_stats.StatsDelta):
+        """apply delta after a record write, see update_stats"""
+        update_stats(self.stats, table_id, delta)
 
     def create_record(self, record: schema.table.Record):
-        """create record"""
-        response = self.db_client.create_item(item=record.model_dump())
-        return response
+        """create record at version 1
+
+        Raises:
+            record_update.RecordExistsError: a record with the id exists in
+                the table, it is left unchanged
+        """
+        item = record_item(record)
+        try:
+            self.db_client.create_item(
+                item=item,
+                condition=record_update.new_item_condition(
+                    self.db_client.metadata.partition_key
+                ),
+            )
+        except stores.dynamo_db.ConditionFailedError as e:
+            raise record_update.RecordExistsError(f"Record {record.id} exists") from e
+        invalidate_table_results(record.table_id)
+        item_cache.invalidate(record.table_id, record.id)
+        change_broker.publish(record.table_id, change_feed.CREATE, record.id, 1)
+        search_index.index([item])
+        self._update_stats(record.table_id, table_stats.StatsDelta().add(None, item))
+        return record.model_copy(update={record_update.VERSION: 1})
 
-    def get_record_by_id(self, table_id: str, record_id: str):
-        """read record"""
-        return self.db_client.get_by_id(
+    def batch_create_records(
+        self, records: list[schema.table.Record]
+    ) -> schema.response_model.BatchCreateResult:
+        """create records with batched, concurrent writes"""
+        items = [record_item(record) for record in records]
+        previous = read_previous(self.db_client, items)
+        results = self.db_client.batch_write(items)
+        for table_id in {record.table_id for record in records}:
+            invalidate_table_results(table_id)
+        for record in records:
+            item_cache.invalidate(record.table_id, record.id)
+        for table_id in {record.table_id for record in records}:
+            change_broker.publish(table_id, change_feed.RELOAD)
+        search_index.index(written_items(items, results))
+        deltas = table_stats.batch_deltas(items, results, previous)
+        for table_id, delta in deltas.items():
+            self._update_stats(table_id, delta)
+        return batch_create_result(records, results)
+
+    def batch_get_records(
+        self, table_id: str, record_ids: list[str]
+    ) -> tuple[list[record_row.RecordRow], list[schema.response_model.BatchItemResult]]:
+        """records of a table read by id with batched, concurrent reads, and
+        the outcome per record id"""
+        record_ids = list(dict.fromkeys(record_ids))
+        metadata = self.db_client.metadata
+        results = self.db_client.batch_get(
+            [metadata.build_key(record_id, table_id) for record_id in record_ids]
+        )
+        return batch_get_result(record_ids, results)
+
+    def get_record_by_id(
+        self, table_id: str, record_id: str
+    ) -> record_row.RecordRow | None:
+        """read record through the record cache, None when not found"""
+        found, item = item_cache.get(table_id, record_id)
+        if not found:
+            item = coalesce(
+                "get_record",
+                table_id,
+                (record_id,),
+                lambda: self._fill_record(table_id, record_id),
+            )
+        return record_row.RecordRow.from_item(item) if item is not None else None
+
+    def _fill_record(self, table_id: str, record_id: str) -> dict | None:
+        token = item_cache.fill_token(table_id, record_id)
+        item = self.db_client.get_by_id(
             partition_key_value=record_id,
             sort_key_value=table_id,
         )
+        item_cache.set(table_id, record_id, item, token)
+        return item
+
+    def update_record(
+        self, record: schema.table.Record, keep_created_at: bool = False
+    ) -> record_row.RecordRow | None:
+        """replace a record, conditional on record.version when set
 
-    def update_record(self, record: schema.table.Record) -> schema.table.Record:
-        """update record"""
-        record_id = record.pop("id")
-        response = self.db_client.update_item(
-            partition_key_value=record_id, updates=record
+        Args:
+            record (schema.table.Record): replacing record
+            keep_created_at (bool): keep the record_created_at of the stored
+                record instead of the one of record, reading it first
+
+        Returns:
+            record_row.RecordRow | None: updated record, None when record.version
+                is set and the record does not exist
+
+        Raises:
+            record_update.VersionConflictError: record has another version
+        """
+        if keep_created_at:
+            stored = self.db_client.get_by_id(
+                partition_key_value=record.id, sort_key_value=record.table_id
+            )
+            record = with_created_at(record, stored)
+        update, condition = record_update.render(
+            replace_delta(record), expected_version=record.version
         )
-        # TODO: convert response to schema
-        return response
+        try:
+            updated_old = self.db_client.patch_item(
+                partition_key_value=record.id,
+                sort_key_value=record.table_id,
+                update=update,
+                condition=condition,
+                return_values="UPDATED_OLD",
+            )
+        except stores.dynamo_db.ConditionFailedError:
+            self._conflict(record.table_id, record.id)
+            return None
+        previous, item = replaced_items(record, updated_old)
+        invalidate_table_results(record.table_id)
+        item_cache.invalidate(record.table_id, record.id)
+        change_broker.publish(
+            record.table_id,
+            change_feed.UPDATE,
+            record.id,
+            item[record_update.VERSION],
+        )
+        search_index.index([item])
+        self._update_stats(
+            record.table_id, table_stats.StatsDelta().add(previous, item)
+        )
+        return record_row.RecordRow.from_item(item)
+
+    def patch_record(
+        self, table_id: str, record_id: str, patch: schema.request.PatchRecord
+    ) -> record_row.RecordRow | None:
+        """apply a partial update, see service.record_update
+
+        Without a read in the common case. When a nested path of the patch
+        has no parent map, the patch is rebased on the stored record and
+        written conditional on the version read.
+
+        Returns:
+            record_row.RecordRow | None: updated record, None when not found
+
+        Raises:
+            record_update.VersionConflictError: patch.version is set and the
+                record has another version
+            ValueError: paths of the patch overlap or are invalid
+        """
+        delta = patch_delta(patch)
+        written: tuple[dict, dict] | None
+        try:
+            written = self._write_delta(table_id, record_id, delta, patch.version)
+        except stores.dynamo_db.InvalidPathError:
+            written = self._rebase_delta(table_id, record_id, delta, patch.version)
+        except stores.dynamo_db.ConditionFailedError:
+            self._conflict(table_id, record_id)
+            return None
+        if written is None:
+            return None
+        previous, item = written
+        invalidate_table_results(table_id)
+        item_cache.invalidate(table_id, record_id)
+        change_broker.publish(
+            table_id,
+            change_feed.PATCH,
+            record_id,
+            record_update.item_version(item),
+        )
+        search_index.index([item])
+        self._update_stats(table_id, table_stats.StatsDelta().add(previous, item))
+        return record_row.RecordRow.from_item(item)
+
+    def _write_delta(
+        self,
+        table_id: str,
+        record_id: str,
+        delta: record_update.RecordDelta,
+        version: int | None,
+    ) -> tuple[dict, dict]:
+        """write delta to a stored record, returns the items before and after"""
+        update, condition = record_update.render(
+            delta,
+            expected_version=version,
+            must_exist=self.db_client.metadata.partition_key,
+        )
+        previous = self.db_client.patch_item(
+            partition_key_value=record_id,
+            sort_key_value=table_id,
+            update=update,
+            condition=condition,
+            return_values="ALL_OLD",
+        )
+        return previous, patched_item(previous, delta)
 
-    def delete_record(self, record_id):
+    def _rebase_delta(
+        self,
+        table_id: str,
+        record_id: str,
+        delta: record_update.RecordDelta,
+        version: int | None,
+    ) -> tuple[dict, dict] | None:
+        for _ in range(record_update.MAX_REBASE_ATTEMPTS):
+            stored = self.db_client.get_by_id(
+                partition_key_value=record_id, sort_key_value=table_id
+            )
+            if stored is None:
+                return None
+            current = record_update.item_version(stored)
+            if version is not None and current != version:
+                raise record_update.VersionConflictError(current)
+            try:
+                return self._write_delta(
+                    table_id, record_id, record_update.rebase(stored, delta), current
+                )
+            except stores.dynamo_db.ConditionFailedError:
+                continue
+        self._conflict(table_id, record_id)
+        return None
+
+    def _conflict(self, table_id: str, record_id: str) -> None:
+        """None when a failed conditional update found no record, else raise"""
+        stored = self.db_client.get_by_id(
+            partition_key_value=record_id, sort_key_value=table_id
+        )
+        if stored is None:
+            return None
+        raise record_update.VersionConflictError(record_update.item_version(stored))
+
+    def delete_record(self, table_id: str, record_id: str):
         """delete record"""
-        return self.db_client.delete_item(partition_key_value=record_id)
+        response = self.db_client.delete_item(
+            partition_key_value=record_id,
+            sort_key_value=table_id,
+            return_values="ALL_OLD",
+        )
+        previous = response.pop("Attributes", None)
+        invalidate_table_results(table_id)
+        item_cache.invalidate(table_id, record_id)
+        if previous:
+            change_broker.publish(table_id, change_feed.DELETE, record_id)
+            search_index.remove(table_id, [record_id])
+            self._update_stats(table_id, table_stats.StatsDelta().add(previous, None))
+        return response
 
-    def _generate_filter_expression(
+    def plan_query(
         self,
+        table_id: str,
         category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
         created_after: pydantic.AwareDatetime | None = None,
         created_before: pydantic.AwareDatetime | None = None,
         record_condition: list[schema.request.FieldCondition] | None = None,
-    ) -> str:
-        filter_expressions = []
-        filter_expressions.append(Attr("category").eq(category))
-        if created_after is not None and created_before is not None:
-            filter_expressions.append(
-                Attr("record_created_at").between(
-                    created_after.timestamp, created_before.timestamp
-                )
-            )
-        elif created_after:
-            filter_expressions.append(
-                Attr("record_created_at").gt(created_after.timestamp)
-            )
-        elif created_before:
-            filter_expressions.append(
-                Attr("record_created_at").lt(created_before.timestamp)
-            )
-        if record_condition:
-            for field in record_condition:
-                field_name = "record." + field.field
-                if field.operation == schema.common.Operator.EQ:
-                    filter_expressions.append(Attr(field_name).eq(field.value))
-                elif field.operation == schema.common.Operator.NE:
-                    filter_expressions.append(Attr(field_name).ne(field.value))
-                elif field.operation == schema.common.Operator.GT:
-                    filter_expressions.append(Attr(field_name).gt(field.value))
-                elif field.operation == schema.common.Operator.GTE:
-                    filter_expressions.append(Attr(field_name).gte(field.value))
-                elif field.operation == schema.common.Operator.LT:
-                    filter_expressions.append(Attr(field_name).lt(field.value))
-                elif field.operation == schema.common.Operator.LTE:
-                    filter_expressions.append(Attr(field_name).lte(field.value))
-                elif field.operation == schema.common.Operator.EXISTS:
-                    filter_expressions.append(Attr(field_name).exists())
-                elif field.operation == schema.common.Operator.NOT_EXISTS:
-                    filter_expressions.append(Attr(field_name).not_exists())
-                elif field.operation == schema.common.Operator.CONTAINS:
-                    filter_expressions.append(Attr(field_name).contains(field.value))
-                elif field.operation == schema.common.Operator.IS_IN:
-                    filter_expressions.append(Attr(field_name).is_in(field.value))
-                elif field.operation == schema.common.Operator.BEGINS_WITH:
-                    filter_expressions.append(Attr(field_name).begins_with(field.value))
-            filter_expression = filter_expressions[0]
-            for expr in filter_expressions[1:]:
-                filter_expression = filter_expression & expr
-        return filter_expression
+    ) -> query_planner.QueryPlan:
+        """access path of a record query on the record table indexes"""
+        return query_planner.plan_query(
+            self.db_client.metadata,
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
 
     def get_query_result_count(
         self,
@@ -99,19 +602,132 @@ class RecordService:
         created_after: pydantic.AwareDatetime | None = None,
         created_before: pydantic.AwareDatetime | None = None,
         record_condition: list[schema.request.FieldCondition] | None = None,
-    ):
-        """get query result count"""
-        filter_expression = self._generate_filter_expression(
+    ) -> int:
+        """get query result count across all pages, cached until the next write
+
+        With config.Settings.record_count_segments above 1 the count runs as a
+        parallel segmented scan instead of a sequential query.
+        """
+        cache_key = query_cache_key(
             category=category,
             created_after=created_after,
             created_before=created_before,
             record_condition=record_condition,
         )
-        key_condition = Key("sort_key").eq(table_id)
-        response = self.db_client.query_count(
-            key_condition_expression=key_condition, filter_expression=filter_expression
+        found, count = count_cache.get(table_id, cache_key)
+        if found:
+            return count
+        return coalesce(
+            "count_records",
+            table_id,
+            (cache_key,),
+            lambda: self._count_records(
+                table_id,
+                cache_key,
+                category=category,
+                created_after=created_after,
+                created_before=created_before,
+                record_condition=record_condition,
+            ),
         )
-        return response
+
+    def _count_records(
+        self,
+        table_id: str,
+        cache_key: str,
+        category: schema.common.RecordCategory,
+        created_after: pydantic.AwareDatetime | None,
+        created_before: pydantic.AwareDatetime | None,
+        record_condition: list[schema.request.FieldCondition] | None,
+    ) -> int:
+        generation = count_cache.generation(table_id)
+
+        total_segments = config.settings.record_count_segments
+        plan = self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        if total_segments > 1 or plan.operation == "scan":
+            count = self.db_client.scan_count(
+                filter_expression=generate_filter_expression(
+                    category=category,
+                    created_after=created_after,
+                    created_before=created_before,
+                    record_condition=record_condition,
+                    table_id=table_id,
+                ),
+                total_segments=total_segments,
+            )
+        else:
+            count = self.db_client.query_count(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                index_name=plan.index_name,
+            )
+        count_cache.set(table_id, cache_key, count, generation)
+        return count
+
+    def aggregate_records(
+        self, table_id: str, query: schema.request.AggregateRecords
+    ) -> schema.response_model.AggregateResult:
+        """group and aggregate the matching records, cached until the next write
+
+        Matching records are read page by page, projected to their record
+        content, and folded into a service.aggregation.Aggregation, so memory
+        is bounded by the groups and not by the records.
+
+        Raises:
+            aggregation.TooManyGroupsError: more groups than
+                config.Settings.aggregate_max_groups
+        """
+        cache_key = aggregate_cache_key(query)
+        found, result = aggregate_cache.get(table_id, cache_key)
+        if found:
+            return result
+        return coalesce(
+            "aggregate_records",
+            table_id,
+            (cache_key,),
+            lambda: self._aggregate_records(table_id, cache_key, query),
+        )
+
+    def _aggregate_records(
+        self, table_id: str, cache_key: str, query: schema.request.AggregateRecords
+    ) -> schema.response_model.AggregateResult:
+        generation = aggregate_cache.generation(table_id)
+
+        plan = self.plan_query(
+            table_id=table_id,
+            category=query.category,
+            created_after=query.created_after,
+            created_before=query.created_before,
+            record_condition=query.record_condition,
+        )
+        if plan.operation == "scan":
+            pages = self.db_client.iter_scan_pages(
+                filter_expression=plan.filter_expression,
+                page_size=config.settings.aggregate_page_size,
+                projection=("record",),
+            )
+        else:
+            pages = self.db_client.iter_query_pages(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                page_size=config.settings.aggregate_page_size,
+                index_name=plan.index_name,
+                projection=("record",),
+            )
+        folded = new_aggregation(query)
+        for page in pages:
+            folded.add_page(
+                [item.get("record") or {} for item in page.get("Items", [])]
+            )
+        result = folded.result()
+        aggregate_cache.set(table_id, cache_key, result, generation)
+        return result
 
     def query_record(
         self,
@@ -121,22 +737,221 @@ class RecordService:
         created_after: pydantic.AwareDatetime | None = None,
         created_before: pydantic.AwareDatetime | None = None,
         record_condition: list[schema.request.FieldCondition] | None = None,
-        start_key: int | None = None,
-    ):
-        """query record"""
-        key_condition = Key("sort_key").eq(table_id)
-        filter_expression = self._generate_filter_expression(
+        start_key: dict | None = None,
+    ) -> tuple[list[record_row.RecordRow], dict | None]:
+        """query one page of records
+
+        Returns:
+            tuple[list[record_row.RecordRow], dict | None]: records and the key
+                to resume from
+        """
+        return coalesce(
+            "query_record",
+            table_id,
+            (
+                limit,
+                query_cache_key(
+                    category=category,
+                    created_after=created_after,
+                    created_before=created_before,
+                    record_condition=record_condition,
+                ),
+                start_key_param(start_key),
+            ),
+            lambda: self._query_page(
+                table_id,
+                limit=limit,
+                category=category,
+                created_after=created_after,
+                created_before=created_before,
+                record_condition=record_condition,
+                start_key=start_key,
+            ),
+        )
+
+    def _query_page(
+        self,
+        table_id: str,
+        limit: int,
+        category: schema.common.RecordCategory,
+        created_after: pydantic.AwareDatetime | None,
+        created_before: pydantic.AwareDatetime | None,
+        record_condition: list[schema.request.FieldCondition] | None,
+        start_key: dict | None,
+    ) -> tuple[list[record_row.RecordRow], dict | None]:
+        plan = self.plan_query(
+            table_id=table_id,
             category=category,
             created_after=created_after,
             created_before=created_before,
             record_condition=record_condition,
         )
+        if plan.operation == "scan":
+            items, next_key = self.db_client.scan(
+                filter_expression=plan.filter_expression,
+                limit=limit,
+                start_key=start_key,
+            )
+        else:
+            items, next_key = self.db_client.query(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                limit=limit,
+                start_key=start_key,
+                index_name=plan.index_name,
+            )
+        return record_row.from_items(items), next_key
 
-        response = self.db_client.query(
-            key_condition_expression=key_condition,
-            filter_expression=filter_expression,
-            limit=limit,
-            start_key=start_key,
+    def iter_records(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+        start_key: dict | None = None,
+    ) -> Iterator[record_row.RecordRow]:
+        """iterate all matching records, reading one page at a time"""
+        return map(
+            record_row.RecordRow.from_item,
+            self.iter_items(
+                table_id,
+                category=category,
+                created_after=created_after,
+                created_before=created_before,
+                record_condition=record_condition,
+                start_key=start_key,
+            ),
         )
-        # TODO: convert response to schema
-        return response
+
+    def iter_items(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+        start_key: dict | None = None,
+    ) -> Iterator[dict]:
+        """iterate the stored items of all matching records"""
+        plan = self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        if plan.operation == "scan":
+            items = self.db_client.iter_scan(
+                filter_expression=plan.filter_expression, start_key=start_key
+            )
+        else:
+            items = self.db_client.iter_query(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                start_key=start_key,
+                index_name=plan.index_name,
+            )
+        return items
+
+    def rebuild_table_stats(self, table_id: str) -> schema.response_model.TableStats:
+        """recount the statistics of table_id from its records, see
+        service.table_stats
+
+        Writes during the recount may be missed or counted twice.
+        """
+        delta = table_stats.StatsDelta()
+        for category in schema.common.RecordCategory:
+            for item in self.iter_items(table_id, category=category):
+                delta.add(None, item)
+        stats = schema.response_model.TableStats(
+            table_id=table_id,
+            record_count=delta.counts.total(),
+            category_count={
+                category: delta.counts[category]
+                for category in schema.common.RecordCategory
+            },
+            approximate_size=delta.size,
+            last_write_at=self.stats.get_stats(table_id).last_write_at,
+        )
+        self.stats.save(stats)
+        return stats
+
+    def search_records(
+        self,
+        table_id: str,
+        query: str,
+        category: schema.common.RecordCategory | None = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> tuple[list[record_row.RecordRow], int | None]:
+        """records matching the words of query, best match first, see
+        service.search
+
+        Records the index found but the table no longer has are skipped and
+        removed from the index.
+
+        Returns:
+            tuple[list[record_row.RecordRow], int | None]: records and the
+                offset of the next page, None on the last page
+        """
+        hits = search_index.search(
+            table_id, query, category=category, limit=limit + 1, offset=offset
+        )
+        next_offset = offset + limit if len(hits) > limit else None
+        record_ids = [record_id for record_id, _ in hits[:limit]]
+        if not record_ids:
+            return [], next_offset
+        metadata = self.db_client.metadata
+        results = self.db_client.batch_get(
+            [metadata.build_key(record_id, table_id) for record_id in record_ids]
+        )
+        rows, missing = search_results(record_ids, results)
+        if missing:
+            search_index.remove(table_id, missing)
+        return rows, next_offset
+
+    def rebuild_search_index(self, table_id: str) -> int:
+        """index the records of table_id again, see service.search
+
+        Searches during the rebuild miss the records not indexed yet.
+
+        Returns:
+            int: records indexed
+        """
+        search_index.clear_table(table_id)
+        indexed = 0
+        for category in schema.common.RecordCategory:
+            batch = []
+            for item in self.iter_items(table_id, category=category):
+                batch.append(item)
+                if len(batch) >= REINDEX_BATCH_SIZE:
+                    search_index.index(batch)
+                    indexed += len(batch)
+                    batch = []
+            search_index.index(batch)
+            indexed += len(batch)
+        return indexed
+
+    def explain_query(
+        self,
+        table_id: str,
+        category: schema.common.RecordCategory = schema.common.RecordCategory.RECORD,
+        created_after: pydantic.AwareDatetime | None = None,
+        created_before: pydantic.AwareDatetime | None = None,
+        record_condition: list[schema.request.FieldCondition] | None = None,
+    ) -> schema.response_model.QueryExplain:
+        """chosen plan of a query and the read units running it consumes"""
+        plan = self.plan_query(
+            table_id=table_id,
+            category=category,
+            created_after=created_after,
+            created_before=created_before,
+            record_condition=record_condition,
+        )
+        stats = self.db_client.read_stats(
+            key_condition_expression=plan.key_condition,
+            filter_expression=plan.filter_expression,
+            index_name=plan.index_name,
+        )
+        return query_planner.explain(plan, stats)
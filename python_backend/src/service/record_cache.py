@@ -0,0 +1,254 @@
+"""Read-through cache for single records
+
+RecordService.get_record_by_id looks records up here before reading dynamo db
+and every record write invalidates the (table_id, record_id) entry. Records
+that do not exist are cached too, for a shorter negative_ttl. Caches doing
+network io, like the redis one, are blocking: service.async_record calls
+them from a worker thread so that they never stall the event loop.
+"""
+
+import collections
+import json
+import threading
+import time
+from typing import Any
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class RecordCache:
+    """Interface of record caches, also the no-op cache"""
+
+    # calls wait on the network, async services make them off the event loop
+    blocking = False
+
+    def __init__(self):
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def fill_token(self, table_id: str, record_id: str) -> Any:
+        """token to take before reading the store, pass it to set()"""
+        return None
+
+    def get(self, table_id: str, record_id: str) -> tuple[bool, dict | None]:
+        """get cached record
+
+        Returns:
+            tuple[bool, dict | None]: whether the entry was found, and the
+                record, None when the record is cached as not existing
+        """
+        self.misses += 1
+        return False, None
+
+    def set(self, table_id: str, record_id: str, item: dict | None, token: Any = None):
+        """cache record, or its absence when item is None"""
+
+    def invalidate(self, table_id: str, record_id: str):
+        """drop cached record"""
+
+    def clear(self):
+        """drop every cached record"""
+
+    def stats(self) -> dict[str, int]:
+        """hit, miss and eviction counters"""
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class LRURecordCache(RecordCache):
+    """In-process LRU record cache bounded by size and TTL
+
+    Args:
+        maxsize (int): maximum number of cached records
+        ttl (float): seconds a record stays cached
+        negative_ttl (float): seconds the absence of a record stays cached
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 30, negative_ttl: float = 5):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[
+            tuple[str, str], tuple[float, dict | None]
+        ] = collections.OrderedDict()
+        self._invalidations = 0
+
+    def fill_token(self, table_id: str, record_id: str) -> int:
+        # a read racing with any invalidation must not refill the cache with
+        # the value it read before the write
+        return self._invalidations
+
+    def get(self, table_id: str, record_id: str) -> tuple[bool, dict | None]:
+        with self._lock:
+            entry = self._entries.get((table_id, record_id))
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[(table_id, record_id)]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end((table_id, record_id))
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, entry[1]
+
+    def set(self, table_id: str, record_id: str, item: dict | None, token: Any = None):
+        ttl = self.ttl if item is not None else self.negative_ttl
+        with self._lock:
+            if token is not None and token != self._invalidations:
+                return
+            self._entries[(table_id, record_id)] = (time.monotonic() + ttl, item)
+            self._entries.move_to_end((table_id, record_id))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, table_id: str, record_id: str):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.pop((table_id, record_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+
+
+# set the record of KEYS[2] unless KEYS[1], its invalidation counter, moved
+# on from ARGV[1] since the fill token was taken
+_FILL_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+# count an invalidation in KEYS[1] and drop the record of KEYS[2]
+_INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+
+class RedisRecordCache(RecordCache):
+    """Record cache shared by workers through a redis compatible client
+
+    Every record has an invalidation counter next to its entry. A fill is
+    written by a script only while the counter still has the value taken
+    before the read, so that a read racing with a write of another worker
+    does not cache the record it read before the write.
+
+    Args:
+        client: redis-py compatible client with get, set(ex=), delete and
+            register_script
+        ttl (float): seconds a record stays cached
+        negative_ttl (float): seconds the absence of a record stays cached
+        prefix (str): key prefix of cached records
+        generation_prefix (str): key prefix of the invalidation counters
+        generation_ttl (float): seconds an invalidation counter is kept, far
+            longer than a read of the store takes
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        client,
+        ttl: float = 30,
+        negative_ttl: float = 5,
+        prefix: str = "record:",
+        generation_prefix: str = "record-generation:",
+        generation_ttl: float = 3600,
+    ):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = prefix
+        self.generation_prefix = generation_prefix
+        self.generation_ttl = generation_ttl
+        self._fill = client.register_script(_FILL_SCRIPT)
+        self._invalidate = client.register_script(_INVALIDATE_SCRIPT)
+
+    def _key(self, table_id: str, record_id: str) -> str:
+        return f"{self.prefix}{table_id}:{record_id}"
+
+    def _generation_key(self, table_id: str, record_id: str) -> str:
+        return f"{self.generation_prefix}{table_id}:{record_id}"
+
+    def fill_token(self, table_id: str, record_id: str) -> int:
+        value = self.client.get(self._generation_key(table_id, record_id))
+        return int(value or 0)
+
+    def get(self, table_id: str, record_id: str) -> tuple[bool, dict | None]:
+        value = self.client.get(self._key(table_id, record_id))
+        if value is None:
+            self.misses += 1
+            return False, None
+        content = json.loads(value)
+        if content is None:
+            self.negative_hits += 1
+            return True, None
+        self.hits += 1
+        return True, {
+            key: _deserializer.deserialize(item) for key, item in content.items()
+        }
+
+    def set(self, table_id: str, record_id: str, item: dict | None, token: Any = None):
+        content = None
+        if item is not None:
+            content = {key: _serializer.serialize(value) for key, value in item.items()}
+        value = json.dumps(content)
+        expires = max(1, round(self.ttl if item is not None else self.negative_ttl))
+        if token is None:
+            self.client.set(self._key(table_id, record_id), value, ex=expires)
+            return
+        self._fill(
+            keys=[
+                self._generation_key(table_id, record_id),
+                self._key(table_id, record_id),
+            ],
+            args=[str(token), value, expires],
+        )
+
+    def invalidate(self, table_id: str, record_id: str):
+        self._invalidate(
+            keys=[
+                self._generation_key(table_id, record_id),
+                self._key(table_id, record_id),
+            ],
+            args=[max(1, round(self.generation_ttl))],
+        )
+
+
+def create_record_cache(
+    backend: str,
+    maxsize: int = 10_000,
+    ttl: float = 30,
+    negative_ttl: float = 5,
+    redis_url: str = "redis://localhost:6379/0",
+) -> RecordCache:
+    """create record cache of backend "memory", "redis" or "none" """
+    if backend == "memory":
+        return LRURecordCache(maxsize=maxsize, ttl=ttl, negative_ttl=negative_ttl)
+    if backend == "redis":
+        import redis  # pylint: disable=import-outside-toplevel
+
+        return RedisRecordCache(
+            redis.Redis.from_url(redis_url), ttl=ttl, negative_ttl=negative_ttl
+        )
+    return RecordCache()
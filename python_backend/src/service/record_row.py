@@ -0,0 +1,102 @@
+"""Compact record representation for the list response fast path
+
+Items read from dynamo db are trusted: they were validated as
+schema.table.Record when written. RecordRow keeps an item in a slots
+dataclass, with epoch timestamps turned into datetimes, and serialises it
+straight to JSON bytes with orjson, producing the document of
+schema.table.Record with by_alias=True without validating it again. Decimal
+values are converted to int or float once, by orjson's default hook while
+encoding, instead of walking the record in python.
+"""
+
+import base64
+import dataclasses
+import datetime
+import decimal
+from typing import Any, Iterable
+
+import orjson
+from boto3.dynamodb.types import Binary
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+_JSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def json_default(value: Any) -> Any:
+    """orjson fallback for dynamo db types: Decimal, set and Binary"""
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return list(value)
+    if isinstance(value, Binary):
+        return base64.b64encode(value.value).decode()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes of content read from dynamo db"""
+    return orjson.dumps(content, default=json_default, option=_JSON_OPTIONS)
+
+
+def to_datetime(value: Any) -> datetime.datetime:
+    """stored record timestamp, epoch seconds or ISO string, as UTC datetime"""
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    # exact microseconds from the stored Decimal
+    return _EPOCH + datetime.timedelta(
+        microseconds=int(decimal.Decimal(value) * 1_000_000)
+    )
+
+
+@dataclasses.dataclass(slots=True)
+class RecordRow:
+    """record as read from the store, see schema.table.Record"""
+
+    id: str
+    table_id: str
+    category: str
+    record_created_at: datetime.datetime
+    record_updated_at: datetime.datetime
+    record: dict
+    version: int
+
+    @classmethod
+    def from_item(cls, item: dict) -> "RecordRow":
+        """convert store item"""
+        return cls(
+            id=item["id"],
+            table_id=item["table_id"],
+            category=item["category"],
+            record_created_at=to_datetime(item["record_created_at"]),
+            record_updated_at=to_datetime(item["record_updated_at"]),
+            record=item.get("record", {}),
+            version=int(item.get("version", 0)),
+        )
+
+    def to_dict(self) -> dict:
+        """response document, camelCase like schema.table.Record"""
+        return {
+            "id": self.id,
+            "tableId": self.table_id,
+            "category": self.category,
+            "recordCreatedAt": self.record_created_at,
+            "recordUpdatedAt": self.record_updated_at,
+            "record": self.record,
+            "version": self.version,
+        }
+
+    def to_json(self) -> bytes:
+        """response document as JSON bytes"""
+        return dumps(self.to_dict())
+
+
+def from_items(items: Iterable[dict]) -> list[RecordRow]:
+    """convert store items"""
+    return [RecordRow.from_item(item) for item in items]
+
+
+def dumps_rows(rows: Iterable[RecordRow]) -> bytes:
+    """JSON array of rows"""
+    return dumps([row.to_dict() for row in rows])
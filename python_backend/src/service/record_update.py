@@ -0,0 +1,254 @@
+"""Delta updates of records
+
+An update is a RecordDelta: values SET at attribute paths, paths REMOVEd and
+numbers added, rendered into one UpdateExpression with #u*/:u* placeholders.
+Paths are tuples of attribute names, ("record", "address", "city") being
+record.address.city, so a change to one field of a wide record sends that
+field instead of the whole record map.
+
+Every update ADDs 1 to the version attribute, which counts from 0 for items
+written before it existed. Rendering the update with the version read
+earlier makes it conditional on that version: a concurrent edit fails the
+condition instead of being overwritten, without reading the item first.
+Creating a record is conditional on it not existing, so that versions only
+ever grow and a version read earlier never matches other content.
+"""
+
+import copy
+import dataclasses
+from typing import Any
+
+import stores
+
+VERSION = "version"
+RECORD = "record"
+# rebases of a patch on a record changing under it before giving up
+MAX_REBASE_ATTEMPTS = 3
+
+Path = tuple[str, ...]
+
+
+class VersionConflictError(Exception):
+    """the record does not have the version an update expects
+
+    Args:
+        version (int): current version of the record
+    """
+
+    def __init__(self, version: int):
+        super().__init__(f"Record is at version {version}")
+        self.version = version
+
+
+class RecordExistsError(Exception):
+    """a created record already exists"""
+
+
+@dataclasses.dataclass
+class RecordDelta:
+    """changes of one update
+
+    Attributes:
+        set (dict[Path, Any]): values written at paths
+        remove (list[Path]): paths removed
+        increment (dict[Path, int | float]): numbers added at paths, to 0 when
+            the path is missing
+    """
+
+    set: dict[Path, Any] = dataclasses.field(default_factory=dict)
+    remove: list[Path] = dataclasses.field(default_factory=list)
+    increment: dict[Path, int | float] = dataclasses.field(default_factory=dict)
+
+
+def new_item_condition(partition_key: str) -> stores.expression.Expression:
+    """condition of a put creating an item, on the partition key of the table"""
+    return stores.expression.Expression(
+        expression="attribute_not_exists(#c0)", names={"#c0": partition_key}, values={}
+    )
+
+
+def item_version(item: dict) -> int:
+    """version of a stored item, 0 when written before versioning"""
+    return int(item.get(VERSION, 0))
+
+
+def split_path(path: str, prefix: Path = (RECORD,)) -> Path:
+    """dotted path of the record content, e.g. "address.city", as Path"""
+    parts = tuple(path.split("."))
+    if not all(parts):
+        raise ValueError(f"Invalid attribute path: {path}")
+    return (*prefix, *parts)
+
+
+def merge_patch(patch: dict, prefix: Path = (RECORD,)) -> RecordDelta:
+    """delta of a JSON merge patch (RFC 7396) of the map at prefix
+
+    Maps are merged key by key, so an empty map changes nothing, and null
+    removes a key. Nested paths only apply when their parent map exists, see
+    rebase.
+    """
+    delta = RecordDelta()
+    for key, value in patch.items():
+        path = (*prefix, key)
+        if value is None:
+            delta.remove.append(path)
+        elif isinstance(value, dict):
+            nested = merge_patch(value, path)
+            delta.set.update(nested.set)
+            delta.remove.extend(nested.remove)
+        else:
+            delta.set[path] = value
+    return delta
+
+
+def diff(old: dict, new: dict, prefix: Path = (RECORD,)) -> RecordDelta:
+    """minimal delta turning map old into new
+
+    Recurses into maps present on both sides, so every path of the delta has
+    its parent in old.
+    """
+    delta = RecordDelta()
+    for key, value in new.items():
+        path = (*prefix, key)
+        if key not in old:
+            delta.set[path] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested = diff(old[key], value, path)
+            delta.set.update(nested.set)
+            delta.remove.extend(nested.remove)
+        elif old[key] != value:
+            delta.set[path] = value
+    delta.remove.extend((*prefix, key) for key in old if key not in new)
+    return delta
+
+
+def apply(item: dict, delta: RecordDelta) -> dict:
+    """copy of item with delta applied, creating missing maps on the way"""
+    item = copy.deepcopy(item)
+
+    def parent(path: Path) -> dict:
+        document = item
+        for name in path[:-1]:
+            if not isinstance(document.get(name), dict):
+                document[name] = {}
+            document = document[name]
+        return document
+
+    for path, value in delta.set.items():
+        parent(path)[path[-1]] = copy.deepcopy(value)
+    for path in delta.remove:
+        parent(path).pop(path[-1], None)
+    for path, amount in delta.increment.items():
+        document = parent(path)
+        amount = stores.dynamo_db.to_dynamo_value(amount)
+        document[path[-1]] = document.get(path[-1], 0) + amount
+    return item
+
+
+def rebase(item: dict, delta: RecordDelta) -> RecordDelta:
+    """delta writing the record content item has after delta
+
+    Used when delta has a nested path whose parent map is missing: the
+    result only has paths valid for item, and sets counters to their sums.
+    Changes outside the record content are kept as they are.
+    """
+    updated = apply(item, delta)
+    rebased = diff(item.get(RECORD, {}), updated.get(RECORD, {}))
+    for path, value in delta.set.items():
+        if path[0] != RECORD:
+            rebased.set[path] = value
+    return rebased
+
+
+def _check_overlap(paths: list[Path]):
+    ordered = sorted(paths)
+    for before, after in zip(ordered, ordered[1:]):
+        if after[: len(before)] == before:
+            raise ValueError(
+                f"Overlapping update paths: {'.'.join(before)} and {'.'.join(after)}"
+            )
+
+
+class _Renderer:
+    """placeholders of the paths and values of one expression"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.names: dict[str, str] = {}
+        self.values: dict[str, Any] = {}
+
+    def path(self, path: Path) -> str:
+        parts = []
+        for name in path:
+            placeholder = self.names.get(name)
+            if placeholder is None:
+                placeholder = f"#{self.prefix}{len(self.names)}"
+                self.names[name] = placeholder
+            parts.append(placeholder)
+        return ".".join(parts)
+
+    def value(self, value: Any) -> str:
+        placeholder = f":{self.prefix}{len(self.values)}"
+        self.values[placeholder] = stores.dynamo_db.to_dynamo_value(value)
+        return placeholder
+
+    def expression(self, text: str) -> stores.expression.Expression:
+        return stores.expression.Expression(
+            expression=text,
+            names={placeholder: name for name, placeholder in self.names.items()},
+            values=self.values,
+        )
+
+
+def render(
+    delta: RecordDelta,
+    expected_version: int | None = None,
+    must_exist: str | None = None,
+) -> tuple[stores.expression.Expression, stores.expression.Expression | None]:
+    """UpdateExpression of delta, adding 1 to the version, and its condition
+
+    Counters are SET to if_not_exists(path, 0) + amount, which also works on
+    nested paths of the record content.
+
+    Args:
+        delta (RecordDelta): changes
+        expected_version (int | None): version the item must have, None for any
+        must_exist (str | None): attribute the item must have, e.g. its
+            partition key, so that the update never creates a partial item
+
+    Returns:
+        tuple[Expression, Expression | None]: update and condition, with
+            #u*/:u* and #c*/:c* placeholders
+
+    Raises:
+        ValueError: two paths of delta overlap
+    """
+    _check_overlap([*delta.set, *delta.remove, *delta.increment, (VERSION,)])
+    update = _Renderer("u")
+    sets = [f"{update.path(path)} = {update.value(v)}" for path, v in delta.set.items()]
+    for path, amount in delta.increment.items():
+        rendered = update.path(path)
+        sets.append(
+            f"{rendered} = if_not_exists({rendered}, {update.value(0)}) "
+            f"+ {update.value(amount)}"
+        )
+    clauses = []
+    if sets:
+        clauses.append("SET " + ", ".join(sets))
+    if delta.remove:
+        clauses.append("REMOVE " + ", ".join(map(update.path, delta.remove)))
+    clauses.append(f"ADD {update.path((VERSION,))} {update.value(1)}")
+
+    condition = _Renderer("c")
+    conditions = []
+    if must_exist is not None:
+        conditions.append(f"attribute_exists({condition.path((must_exist,))})")
+    if expected_version is not None:
+        version = condition.path((VERSION,))
+        matches = f"{version} = {condition.value(expected_version)}"
+        if expected_version == 0:
+            matches = f"(attribute_not_exists({version}) OR {matches})"
+        conditions.append(matches)
+    return update.expression(" ".join(clauses)), (
+        condition.expression(" AND ".join(conditions)) if conditions else None
+    )
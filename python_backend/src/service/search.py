@@ -0,0 +1,271 @@
+"""Full-text and prefix search over the string fields of records
+
+The CONTAINS and BEGINS_WITH conditions of record queries are dynamo db
+filter expressions: every search reads, and is billed for, the whole table.
+Searches instead run on an inverted index kept next to the store, updated on
+every record write from the item the write stored or returned, so the cost
+of a search grows with the records matching it and not with the table:
+
+- one document per record, holding the strings of its record content
+- documents are scoped by a token of their table, and one of their table
+  and category, matched together with the words of the search, so a search
+  only walks the postings of its own table
+- results are ranked by bm25, "word*" matches words starting with word
+
+The "sqlite" backend keeps the index in an sqlite FTS5 table of its own
+database file, opened through stores.sqlite_db.SqliteEngine, so the workers
+of a host share it. RecordService.rebuild_search_index reindexes a table
+from its records, for tables written before the index existed or by another
+host.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+from typing import Any, Iterable
+
+import stores
+
+# words of a search, "*" right after a word makes it a prefix
+_SEARCH_WORD = re.compile(r"([^\W_]+)(\*?)")
+
+
+def record_text(content: Any) -> str:
+    """strings of a record content, nested ones included, one per line"""
+    strings = []
+    stack = [content]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, (list, tuple, set)):
+            stack.extend(reversed(list(value)))
+    return "\n".join(strings)
+
+
+def scope_tokens(table_id: str, category: str) -> str:
+    """scope of a document: the token of its table and of its table and category"""
+    return f"{table_token(table_id)} {table_token(table_id, category)}"
+
+
+def table_token(table_id: str, category: str | None = None) -> str:
+    """single word standing for table_id, or for table_id and category"""
+    token = "t" + hashlib.blake2b(table_id.encode(), digest_size=10).hexdigest()
+    if category is not None:
+        token += "c" + str(category).lower()
+    return token
+
+
+def match_expression(
+    table_id: str, query: str, category: str | None = None, max_words: int = 16
+) -> str | None:
+    """FTS5 query of the documents of table matching every word of query
+
+    Args:
+        table_id (str): searched table
+        query (str): words to find, "word*" for words starting with word
+        category (str | None): category of the records, None for all
+        max_words (int): words of query searched, the following are ignored
+
+    Returns:
+        str | None: MATCH expression, None when query has no word
+    """
+    words = [
+        f'"{word.lower()}"{star}'
+        for word, star in _SEARCH_WORD.findall(query)[:max_words]
+    ]
+    if not words:
+        return None
+    scope = table_token(table_id, category)
+    return f'scope : "{scope}" AND content : ({" ".join(words)})'
+
+
+class SearchIndex:
+    """Interface of search indexes, also the disabled one"""
+
+    enabled = False
+
+    def index(self, items: Iterable[dict]):
+        """index stored record items, replacing their previous documents"""
+
+    def remove(self, table_id: str, record_ids: Iterable[str]):
+        """remove the documents of records of table_id"""
+
+    def search(
+        self,
+        table_id: str,
+        query: str,
+        category: str | None = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[tuple[str, float]]:
+        """ids and scores of the records of table_id matching query, best first
+
+        Args:
+            table_id (str): searched table
+            query (str): words to find, "word*" for words starting with word
+            category (str | None): category of the records, None for all
+            limit (int): results returned
+            offset (int): results skipped
+        """
+        return []
+
+    def clear_table(self, table_id: str):
+        """remove every document of table_id"""
+
+    def open(self):
+        """open the index ahead of its first use"""
+
+    def close(self):
+        """release the index"""
+
+
+class SqliteSearchIndex(SearchIndex):
+    """Search index in an sqlite FTS5 table
+
+    Args:
+        path (str): database file of the index, created on first use,
+            ":memory:" for an index living as long as the process
+        max_connections (int): connections to the database
+        busy_timeout (float): seconds a write waits for another
+    """
+
+    enabled = True
+
+    def __init__(self, path: str, max_connections: int = 4, busy_timeout: float = 5):
+        self.path = path
+        self.max_connections = max_connections
+        self.busy_timeout = busy_timeout
+        self._engine: stores.sqlite_db.SqliteEngine | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self) -> stores.sqlite_db.SqliteEngine:
+        """database of the index, opened and created on first use"""
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._open()
+        return self._engine
+
+    def _open(self) -> stores.sqlite_db.SqliteEngine:
+        engine = stores.sqlite_db.SqliteEngine(
+            self.path,
+            max_connections=self.max_connections,
+            busy_timeout=self.busy_timeout,
+        )
+        with engine.transaction() as connection:
+            # rowid of the document of every record, documents are replaced by
+            # rowid as FTS5 cannot look up unindexed columns
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS search_documents "
+                "(rowid INTEGER PRIMARY KEY, table_id TEXT NOT NULL, "
+                "record_id TEXT NOT NULL, UNIQUE (table_id, record_id))"
+            )
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'search'"
+            ).fetchone()
+            if exists is None:
+                connection.execute(
+                    "CREATE VIRTUAL TABLE search USING fts5(scope, content, "
+                    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                )
+                # rank by the content only, the scope matches every document
+                connection.execute(
+                    "INSERT INTO search (search, rank) VALUES ('rank', 'bm25(0, 1)')"
+                )
+        return engine
+
+    def index(self, items: Iterable[dict]):
+        with self.engine.transaction() as connection:
+            for item in items:
+                rowid = self._rowid(connection, item["table_id"], item["id"])
+                connection.execute("DELETE FROM search WHERE rowid = ?", (rowid,))
+                connection.execute(
+                    "INSERT INTO search (rowid, scope, content) VALUES (?, ?, ?)",
+                    (
+                        rowid,
+                        scope_tokens(item["table_id"], item["category"]),
+                        record_text(item.get("record")),
+                    ),
+                )
+
+    @staticmethod
+    def _rowid(connection: sqlite3.Connection, table_id: str, record_id: str) -> int:
+        row = connection.execute(
+            "SELECT rowid FROM search_documents WHERE table_id = ? AND record_id = ?",
+            (table_id, record_id),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        cursor = connection.execute(
+            "INSERT INTO search_documents (table_id, record_id) VALUES (?, ?)",
+            (table_id, record_id),
+        )
+        if cursor.lastrowid is None:
+            raise sqlite3.DatabaseError("Search document was not inserted")
+        return cursor.lastrowid
+
+    def remove(self, table_id: str, record_ids: Iterable[str]):
+        with self.engine.transaction() as connection:
+            for record_id in record_ids:
+                row = connection.execute(
+                    "DELETE FROM search_documents "
+                    "WHERE table_id = ? AND record_id = ? RETURNING rowid",
+                    (table_id, record_id),
+                ).fetchone()
+                if row is not None:
+                    connection.execute("DELETE FROM search WHERE rowid = ?", row)
+
+    def search(
+        self,
+        table_id: str,
+        query: str,
+        category: str | None = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> list[tuple[str, float]]:
+        expression = match_expression(table_id, query, category)
+        if expression is None:
+            return []
+        with self.engine.connection() as connection:
+            rows = connection.execute(
+                "SELECT search_documents.record_id, search.rank FROM search "
+                "JOIN search_documents ON search_documents.rowid = search.rowid "
+                "WHERE search MATCH ? ORDER BY search.rank LIMIT ? OFFSET ?",
+                (expression, limit, offset),
+            ).fetchall()
+        # bm25 is lower for better matches
+        return [(record_id, -rank) for record_id, rank in rows]
+
+    def clear_table(self, table_id: str):
+        with self.engine.transaction() as connection:
+            connection.execute(
+                "DELETE FROM search WHERE rowid IN "
+                "(SELECT rowid FROM search_documents WHERE table_id = ?)",
+                (table_id,),
+            )
+            connection.execute(
+                "DELETE FROM search_documents WHERE table_id = ?", (table_id,)
+            )
+
+    def open(self):
+        _ = self.engine
+
+    def close(self):
+        with self._lock:
+            if self._engine is not None:
+                self._engine.close()
+                self._engine = None
+
+
+def create_search_index(
+    backend: str, path: str = "record_project_search.db", busy_timeout: float = 5
+) -> SearchIndex:
+    """create search index of backend "sqlite" or "none" """
+    if backend == "sqlite":
+        return SqliteSearchIndex(path, busy_timeout=busy_timeout)
+    return SearchIndex()
@@ -0,0 +1,132 @@
+"""Single-flight coalescing of identical concurrent reads
+
+When many clients open the same table at once, they all ask for the same
+records. The first caller of a key runs the backend call, and callers arriving
+while it is in flight wait for it and share its result or exception instead of
+calling dynamo db again. Nothing is kept once the call finishes, caching is
+left to service.table_cache and service.record_cache.
+"""
+
+import asyncio
+import functools
+import threading
+from collections.abc import Hashable
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class CoalescingStats:
+    """Requests and backend calls per operation, shared by sync and async flights"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[str, list[int]] = {}
+
+    def record(self, operation: str, leader: bool):
+        """count a request, and a backend call when it leads its flight"""
+        with self._lock:
+            counts = self._counts.setdefault(operation, [0, 0])
+            counts[0] += 1
+            counts[1] += leader
+
+    def snapshot(self) -> dict:
+        """requests, backend calls and share of requests coalesced per operation"""
+        with self._lock:
+            counts = {
+                operation: list(value) for operation, value in self._counts.items()
+            }
+        return {
+            operation: {
+                "requests": requests,
+                "backend_calls": backend_calls,
+                "coalesced": requests - backend_calls,
+                "coalescing_ratio": (
+                    (requests - backend_calls) / requests if requests else 0.0
+                ),
+            }
+            for operation, (requests, backend_calls) in counts.items()
+        }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Share one call among threads asking for the same key at the same time
+
+    Args:
+        stats (CoalescingStats): counters to record requests in
+    """
+
+    def __init__(self, stats: CoalescingStats):
+        self.stats = stats
+        self._lock = threading.Lock()
+        self._calls: dict[tuple[str, Hashable], _Call] = {}
+
+    def do(self, operation: str, key: Hashable, func: Callable[[], T]) -> T:
+        """run func, or wait for the call of the same operation and key in flight"""
+        flight_key = (operation, key)
+        with self._lock:
+            call = self._calls.get(flight_key)
+            leader = call is None
+            if call is None:
+                call = self._calls[flight_key] = _Call()
+        self.stats.record(operation, leader)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[flight_key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """Async counterpart of SingleFlight
+
+    The shared call runs as a task of its own, so that a leader cancelled by
+    a disconnecting client does not cancel it for the others.
+
+    Args:
+        stats (CoalescingStats): counters to record requests in
+    """
+
+    def __init__(self, stats: CoalescingStats):
+        self.stats = stats
+        self._tasks: dict[tuple[str, Hashable], asyncio.Future] = {}
+
+    async def do(
+        self, operation: str, key: Hashable, func: Callable[[], Awaitable[T]]
+    ) -> T:
+        """await func, or the call of the same operation and key in flight"""
+        flight_key = (operation, key)
+        task = self._tasks.get(flight_key)
+        leader = task is None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[flight_key] = task
+            task.add_done_callback(functools.partial(self._done, flight_key))
+        self.stats.record(operation, leader)
+        return await asyncio.shield(task)
+
+    def _done(self, flight_key: tuple[str, Hashable], task: asyncio.Future):
+        if self._tasks.get(flight_key) is task:
+            del self._tasks[flight_key]
+        if not task.cancelled():
+            # retrieved even when every waiter is gone
+            task.exception()
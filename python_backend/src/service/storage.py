@@ -0,0 +1,104 @@
+"""Storage backend of the server
+
+config.Settings.storage_backend selects where the record and master tables
+live: "dynamodb" for dynamo db (or a compatible endpoint), "sqlite" for an
+embedded database, see stores.sqlite_db. Both give pools implementing
+stores.backend.StoragePool, so services and routers do not depend on the
+backend. Tables of dynamo db are provisioned outside of the server, those of
+sqlite are created with their indexes on startup when missing.
+"""
+
+import config
+import stores
+from service import table_index
+
+
+def master_table_definition(table_name: str) -> dict:
+    """CreateTable parameters of the master table"""
+    return {
+        "TableName": table_name,
+        "KeySchema": [{"AttributeName": "id", "KeyType": "HASH"}],
+        "AttributeDefinitions": [
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": table_index.MEMBER_USER_ID, "AttributeType": "S"},
+            {"AttributeName": table_index.MEMBER_KEY, "AttributeType": "S"},
+        ],
+        "GlobalSecondaryIndexes": [table_index.MEMBER_INDEX_DEFINITION],
+    }
+
+
+def create_tables(engine: stores.sqlite_db.SqliteEngine, settings: config.Settings):
+    """create the record and master tables of settings missing in engine"""
+    existing = set(engine.list_tables()["TableNames"])
+    for definition in (
+        stores.dynamo_db.record_table_definition(settings.record_table_name),
+        master_table_definition(settings.master_table_name),
+    ):
+        if definition["TableName"] not in existing:
+            engine.create_table(**definition)
+
+
+def _dynamo_options(
+    settings: config.Settings, throughput: stores.rate_limit.ThroughputRegistry
+) -> dict:
+    return {
+        "region_name": settings.aws_region,
+        "endpoint_url": settings.dynamo_endpoint_url,
+        "max_pool_connections": settings.dynamo_max_pool_connections,
+        "tcp_keepalive": settings.dynamo_tcp_keepalive,
+        "connect_timeout": settings.dynamo_connect_timeout,
+        "read_timeout": settings.dynamo_read_timeout,
+        "metadata_ttl": settings.dynamo_metadata_ttl,
+        "throughput": throughput,
+        "coalesce_reads": settings.dynamo_coalesce_reads,
+        "coalesce_window": settings.dynamo_coalesce_window,
+    }
+
+
+def create_pool(
+    settings: config.Settings, throughput: stores.rate_limit.ThroughputRegistry
+) -> stores.backend.StoragePool:
+    """pool of the storage backend of settings"""
+    if settings.storage_backend == "sqlite":
+        engine = stores.sqlite_db.SqliteEngine(
+            settings.sqlite_path,
+            max_connections=settings.sqlite_max_connections,
+            busy_timeout=settings.sqlite_busy_timeout,
+        )
+        create_tables(engine, settings)
+        return stores.sqlite_db.SqliteClientPool(
+            engine,
+            metadata_ttl=settings.dynamo_metadata_ttl,
+            max_workers=settings.dynamo_max_workers,
+            throughput=throughput,
+        )
+    return stores.dynamo_db.DynamoClientPool(
+        **_dynamo_options(settings, throughput),
+        max_workers=settings.dynamo_max_workers,
+    )
+
+
+async def open_async_pool(
+    settings: config.Settings,
+    throughput: stores.rate_limit.ThroughputRegistry,
+    pool: stores.backend.StoragePool,
+) -> stores.backend.AsyncStoragePool:
+    """opened async pool of the storage backend of settings
+
+    Args:
+        pool (stores.backend.StoragePool): pool of create_pool, whose database
+            the sqlite backend shares
+    """
+    async_pool: stores.async_dynamo_db.AsyncDynamoClientPool
+    if isinstance(pool, stores.sqlite_db.SqliteClientPool):
+        async_pool = stores.sqlite_db.AsyncSqliteClientPool(
+            pool.engine,
+            metadata_ttl=settings.dynamo_metadata_ttl,
+            throughput=throughput,
+        )
+    else:
+        async_pool = stores.async_dynamo_db.AsyncDynamoClientPool(
+            **_dynamo_options(settings, throughput)
+        )
+    await async_pool.open()
+    return async_pool
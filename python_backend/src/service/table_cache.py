@@ -0,0 +1,82 @@
+"""Per virtual table cache of query results
+
+Results are kept in a bounded LRU with a TTL. Every write to a virtual table
+bumps that table's generation, which turns all of its cached results into
+misses without walking the cache. The cache is per process, so the TTL bounds
+staleness caused by writes handled by other workers.
+"""
+
+import collections
+import threading
+import time
+from collections.abc import Hashable
+from typing import Any
+
+
+class TableResultCache:
+    """Bounded LRU of query results, invalidated per virtual table
+
+    Args:
+        maxsize (int): maximum number of cached results
+        ttl (float): seconds a result stays valid
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[
+            tuple[str, Hashable], tuple[float, int, Any]
+        ] = collections.OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    def generation(self, table_id: str) -> int:
+        """current generation of table, pass it to set() to drop racing results"""
+        return self._generations.get(table_id, 0)
+
+    def get(self, table_id: str, key: Hashable) -> tuple[bool, Any]:
+        """get cached result
+
+        Returns:
+            tuple[bool, Any]: whether the result was found, and the result
+        """
+        with self._lock:
+            entry = self._entries.get((table_id, key))
+            if entry is None:
+                return False, None
+            expires_at, generation, value = entry
+            if expires_at <= time.monotonic() or generation != self.generation(
+                table_id
+            ):
+                del self._entries[(table_id, key)]
+                return False, None
+            self._entries.move_to_end((table_id, key))
+            return True, value
+
+    def set(
+        self, table_id: str, key: Hashable, value: Any, generation: int | None = None
+    ):
+        """cache result, ignored when table was written since generation"""
+        with self._lock:
+            current_generation = self.generation(table_id)
+            if generation is not None and generation != current_generation:
+                return
+            self._entries[(table_id, key)] = (
+                time.monotonic() + self.ttl,
+                current_generation,
+                value,
+            )
+            self._entries.move_to_end((table_id, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_table(self, table_id: str):
+        """drop every cached result of table"""
+        with self._lock:
+            self._generations[table_id] = self.generation(table_id) + 1
+
+    def clear(self):
+        """drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
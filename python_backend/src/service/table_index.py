@@ -0,0 +1,163 @@
+"""Table and membership items of the master table
+
+Tables used to be a list embedded in the user item: listing table ids read
+and deserialised the whole user document, and every shared table made the
+item grow towards the 400 KB limit. Tables are now items of their own:
+
+- table item, id "table#<table_id>": the TableInfo with its access lists
+- membership item, id "member#<table_id>#<user_id>": one per owner, editor
+  and reader of a table, copying the few attributes a listing shows
+
+Membership items carry member_user_id and member_key ("owner#<table_id>" or
+"shared#<table_id>"), the keys of the member_user_id-member_key-index GSI
+(see MEMBER_INDEX_DEFINITION), so that "my tables" and "tables shared with
+me" are paginated queries of one user's memberships instead of reads of
+whole documents.
+"""
+
+import schema
+import stores
+from service import record_row
+
+TABLE_PREFIX = "table#"
+MEMBER_PREFIX = "member#"
+MEMBER_USER_ID = "member_user_id"
+MEMBER_KEY = "member_key"
+MEMBER_INDEX = "member_user_id-member_key-index"
+
+OWNER = "owner"
+SHARED = "shared"
+# access levels, from the strongest
+ACCESS_LEVELS = ("owner", "edit", "read")
+
+# attributes of membership items returned by listings
+LISTING_ATTRIBUTES = (
+    "table_id",
+    "table_name",
+    "table_owner",
+    "access",
+    "table_last_edit",
+)
+
+MEMBER_INDEX_DEFINITION = {
+    "IndexName": MEMBER_INDEX,
+    "KeySchema": [
+        {"AttributeName": MEMBER_USER_ID, "KeyType": "HASH"},
+        {"AttributeName": MEMBER_KEY, "KeyType": "RANGE"},
+    ],
+    "Projection": {
+        "ProjectionType": "INCLUDE",
+        "NonKeyAttributes": list(LISTING_ATTRIBUTES),
+    },
+}
+
+
+class TableExistsError(Exception):
+    """a table with the id of a created table already exists"""
+
+
+def table_key(table_id: str) -> str:
+    """id of the table item of table_id"""
+    return TABLE_PREFIX + table_id
+
+
+def member_key(table_id: str, user_id: str) -> str:
+    """id of the membership item of user_id in table_id"""
+    return f"{MEMBER_PREFIX}{table_id}#{user_id}"
+
+
+def table_item(table: schema.table.TableInfo) -> dict:
+    """table item of table"""
+    return {
+        **table.model_dump(exclude={"id"}),
+        "id": table_key(table.id),
+        "table_id": table.id,
+    }
+
+
+def new_table_condition() -> stores.expression.Expression:
+    """condition of putting a table item that creates the table"""
+    return stores.expression.Expression(
+        expression="attribute_not_exists(#t0)", names={"#t0": "id"}, values={}
+    )
+
+
+def existing_table_condition() -> stores.expression.Expression:
+    """condition of putting a table item that replaces the table"""
+    return stores.expression.Expression(
+        expression="attribute_exists(#t0)", names={"#t0": "id"}, values={}
+    )
+
+
+def table_from_item(item: dict) -> schema.table.TableInfo:
+    """TableInfo of a table item, or of a table embedded in a user item"""
+    return schema.table.TableInfo(
+        id=item["table_id"] if "table_id" in item else item["id"],
+        table_name=item["table_name"],
+        table_owner=item["table_owner"],
+        user_edit=item.get("user_edit", []),
+        user_read=item.get("user_read", []),
+        public=item.get("public", False),
+        table_created_at=record_row.to_datetime(item["table_created_at"]),
+        table_last_edit=record_row.to_datetime(item["table_last_edit"]),
+    )
+
+
+def members(table: schema.table.TableInfo) -> dict[str, str]:
+    """access level per user of table, the strongest when listed twice"""
+    access = {user_id: "read" for user_id in table.user_read}
+    access.update({user_id: "edit" for user_id in table.user_edit})
+    access[table.table_owner] = "owner"
+    return access
+
+
+def member_item(table: schema.table.TableInfo, user_id: str, access: str) -> dict:
+    """membership item of user_id in table"""
+    relation = OWNER if access == "owner" else SHARED
+    return {
+        "id": member_key(table.id, user_id),
+        MEMBER_USER_ID: user_id,
+        MEMBER_KEY: f"{relation}#{table.id}",
+        "table_id": table.id,
+        "table_name": table.table_name,
+        "table_owner": table.table_owner,
+        "access": access,
+        "table_last_edit": table.table_last_edit,
+    }
+
+
+def member_items(table: schema.table.TableInfo) -> list[dict]:
+    """membership items of every user of table"""
+    return [
+        member_item(table, user_id, access)
+        for user_id, access in members(table).items()
+    ]
+
+
+def removed_members(
+    previous: schema.table.TableInfo | None, table: schema.table.TableInfo
+) -> list[str]:
+    """users of previous that are no longer users of table"""
+    if previous is None:
+        return []
+    return sorted(members(previous).keys() - members(table).keys())
+
+
+def listing_condition(user_id: str, relation: str) -> stores.expression.Expression:
+    """key condition of the memberships of user_id with relation"""
+    return stores.expression.Expression(
+        expression="#k0 = :k0 AND begins_with(#k1, :k1)",
+        names={"#k0": MEMBER_USER_ID, "#k1": MEMBER_KEY},
+        values={":k0": user_id, ":k1": f"{relation}#"},
+    )
+
+
+def summary(item: dict) -> schema.response_model.TableSummary:
+    """listing entry of a membership item"""
+    return schema.response_model.TableSummary(
+        id=item["table_id"],
+        table_name=item["table_name"],
+        table_owner=item["table_owner"],
+        access=item["access"],
+        table_last_edit=record_row.to_datetime(item["table_last_edit"]),
+    )
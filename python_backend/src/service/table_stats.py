@@ -0,0 +1,190 @@
+"""Summary statistics of virtual tables, maintained on every record write
+
+Every virtual table has a stats item in the master table, id
+"stats#<table_id>", holding its record count per category, the approximate
+size of its records and the time of its last record write. Writes apply a
+StatsDelta to it with one UpdateItem of ADD clauses, which dynamo db applies
+atomically, so concurrent writers never lose a change, and reading the
+statistics is a single GetItem whatever the size of the table.
+
+Deltas are derived from the responses of the writes, without extra reads:
+
+- create: the item replaced by the put (ReturnValues ALL_OLD)
+- replace: the changed attributes before the update (UPDATED_OLD)
+- delete: the deleted item (ALL_OLD)
+- patch: the item before the update (ALL_OLD), and after it as the delta
+  applied to that item
+- batch writes and imports: the items read with BatchGetItem before the
+  write, batched puts do not return the items they replace
+
+Statistics are applied last and best effort: the caches, change feed and
+search index are updated first, and a failed statistics update is logged
+without failing the record write. RecordService.rebuild_table_stats recounts
+a table from its records, for tables written before the statistics existed
+or counters that drifted.
+"""
+
+import collections
+import dataclasses
+import datetime
+
+import schema
+import stores
+from service import record_row
+
+STATS_PREFIX = "stats#"
+COUNT_PREFIX = "count_"
+APPROXIMATE_SIZE = "approximate_size"
+LAST_WRITE_AT = "last_write_at"
+
+
+def stats_key(table_id: str) -> str:
+    """id of the stats item of table_id"""
+    return STATS_PREFIX + table_id
+
+
+def item_size(item: dict) -> int:
+    """approximate stored size of an item, as JSON bytes of its stored values"""
+    return len(record_row.dumps(stores.dynamo_db.to_dynamo_value(item)))
+
+
+@dataclasses.dataclass
+class StatsDelta:
+    """change of the statistics of a table
+
+    Attributes:
+        counts (collections.Counter): records added per category, negative
+            when removed
+        size (int): bytes added, negative when removed
+    """
+
+    counts: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    size: int = 0
+
+    def add(self, previous: dict | None, item: dict | None) -> "StatsDelta":
+        """account for a write replacing item previous with item, None for none"""
+        if previous is not None:
+            self.counts[str(previous["category"])] -= 1
+            self.size -= item_size(previous)
+        if item is not None:
+            self.counts[str(item["category"])] += 1
+            self.size += item_size(item)
+        return self
+
+
+def batch_deltas(
+    items: list[dict], results: list[dict], previous: list[dict | None]
+) -> dict[str, StatsDelta]:
+    """deltas per table of a batch write
+
+    Args:
+        items (list[dict]): written items
+        results (list[dict]): outcome per item of the batch write
+        previous (list[dict | None]): item replaced per item, read before the
+            write, None for new items
+    """
+    deltas: dict[str, StatsDelta] = {}
+    for item, result, replaced in zip(items, results, previous):
+        if result["success"]:
+            deltas.setdefault(item["table_id"], StatsDelta()).add(replaced, item)
+    return deltas
+
+
+def update_expression(
+    table_id: str, delta: StatsDelta, written_at: datetime.datetime
+) -> stores.expression.Expression:
+    """UpdateExpression adding delta to a stats item and setting its write time"""
+    names = {"#s0": "table_id", "#s1": LAST_WRITE_AT, "#s2": APPROXIMATE_SIZE}
+    values = {
+        ":s0": table_id,
+        ":s1": stores.dynamo_db.to_dynamo_value(written_at),
+        ":s2": delta.size,
+    }
+    adds = ["#s2 :s2"]
+    for category, count in sorted(delta.counts.items()):
+        if count:
+            index = len(names)
+            names[f"#s{index}"] = COUNT_PREFIX + category
+            values[f":s{index}"] = count
+            adds.append(f"#s{index} :s{index}")
+    return stores.expression.Expression(
+        expression="SET #s0 = :s0, #s1 = :s1 ADD " + ", ".join(adds),
+        names=names,
+        values=values,
+    )
+
+
+def stats_item(stats: schema.response_model.TableStats) -> dict:
+    """stats item of stats"""
+    return {
+        "id": stats_key(stats.table_id),
+        "table_id": stats.table_id,
+        APPROXIMATE_SIZE: stats.approximate_size,
+        LAST_WRITE_AT: stats.last_write_at,
+        **{
+            COUNT_PREFIX + category: count
+            for category, count in stats.category_count.items()
+        },
+    }
+
+
+def stats_from_item(
+    table_id: str, item: dict | None
+) -> schema.response_model.TableStats:
+    """statistics of a stats item, all zero when there is none"""
+    item = item or {}
+    category_count = {
+        category: int(item.get(COUNT_PREFIX + category, 0))
+        for category in schema.common.RecordCategory
+    }
+    last_write_at = item.get(LAST_WRITE_AT)
+    return schema.response_model.TableStats(
+        table_id=table_id,
+        record_count=sum(category_count.values()),
+        category_count=category_count,
+        approximate_size=int(item.get(APPROXIMATE_SIZE, 0)),
+        last_write_at=(
+            record_row.to_datetime(last_write_at) if last_write_at is not None else None
+        ),
+    )
+
+
+def with_last_write(
+    table: schema.table.TableInfo, stats: schema.response_model.TableStats
+) -> schema.table.TableInfo:
+    """table with table_last_edit moved to the last record write when later"""
+    last_edit = table.table_last_edit
+    if last_edit.tzinfo is None:
+        last_edit = last_edit.replace(tzinfo=datetime.UTC)
+    if stats.last_write_at is None or stats.last_write_at <= last_edit:
+        return table
+    return table.model_copy(update={"table_last_edit": stats.last_write_at})
+
+
+class TableStatsService:
+    """Statistics of virtual tables, in the stats items of the master table"""
+
+    def __init__(self, table_name: str, pool: stores.backend.StoragePool | None = None):
+        self.db_client: stores.backend.StorageClient
+        if pool is None:
+            self.db_client = stores.dynamo_db.DynamoClient(table_name)
+        else:
+            self.db_client = pool.get_client(table_name)
+
+    def get_stats(self, table_id: str) -> schema.response_model.TableStats:
+        """statistics of table_id"""
+        return stats_from_item(table_id, self.db_client.get_by_id(stats_key(table_id)))
+
+    def apply(self, table_id: str, delta: StatsDelta):
+        """add delta to the statistics of table_id, setting its write time now"""
+        self.db_client.patch_item(
+            stats_key(table_id),
+            update=update_expression(
+                table_id, delta, datetime.datetime.now(datetime.UTC)
+            ),
+            return_values="NONE",
+        )
+
+    def save(self, stats: schema.response_model.TableStats):
+        """replace the statistics of a table"""
+        self.db_client.create_item(stats_item(stats))
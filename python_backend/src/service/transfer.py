@@ -0,0 +1,484 @@
+"""Export and import whole virtual tables
+
+Export reads a virtual table as independent streams in parallel: one query
+per category on an index partitioned by table_id when query_planner finds
+one that covers category, otherwise the segments of a parallel scan filtered
+by table_id. Each stream reads one page at a time and writes it to its own
+chunked part files, NDJSON or Parquet, so memory stays bounded by a page per
+stream. Index based export only sees records carrying the index attributes,
+run scripts/backfill_record_index.py first on tables written before them.
+
+Import reads part files in name order and writes records in batches through
+DynamoClient.batch_write, paced by a token bucket of write capacity units
+sized from the table's provisioned capacity.
+
+Both keep a checkpoint file, updated only after a part is complete (export)
+or a batch is written (import), and resume from it when run again.
+"""
+
+import concurrent.futures
+import dataclasses
+import json
+import math
+import os
+import pathlib
+import threading
+from typing import Callable, Iterator, Protocol
+
+import config
+import orjson
+import schema
+import stores
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from service import (
+    change_feed,
+    query_compiler,
+    query_planner,
+    record,
+    record_row,
+    table_stats,
+)
+
+FORMATS = ("ndjson", "parquet")
+EXPORT_CHECKPOINT = "export-checkpoint.json"
+IMPORT_ERRORS = "import-errors.ndjson"
+WRITE_UNIT_SIZE = 1024
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+Progress = Callable[[dict], None]
+# pages of a stream from a start key
+Pages = Callable[[dict | None], Iterator[dict]]
+
+
+def _encode_key(key: dict | None) -> dict | None:
+    if key is None:
+        return None
+    return {name: _serializer.serialize(value) for name, value in key.items()}
+
+
+def _decode_key(key: dict | None) -> dict | None:
+    if key is None:
+        return None
+    return {name: _deserializer.deserialize(value) for name, value in key.items()}
+
+
+def load_checkpoint(path: pathlib.Path) -> dict | None:
+    """read checkpoint, None when there is none yet"""
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_checkpoint(path: pathlib.Path, content: dict):
+    """replace checkpoint atomically"""
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_text(json.dumps(content))
+    os.replace(temporary_path, path)
+
+
+################################################
+# Part files
+################################################
+
+
+class PartWriter(Protocol):
+    """writer of one part file"""
+
+    def write(self, rows: list[record_row.RecordRow]):
+        """append rows to the part"""
+
+    def close(self):
+        """complete the part"""
+
+
+class _NdjsonPartWriter:
+    """one JSON record per line, fsynced on close"""
+
+    def __init__(self, path: pathlib.Path):
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+
+    def write(self, rows: list[record_row.RecordRow]):
+        self._file.write(b"".join(row.to_json() + b"\n" for row in rows))
+
+    def close(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def _parquet_schema():
+    import pyarrow  # pylint: disable=import-outside-toplevel
+
+    timestamp = pyarrow.timestamp("us", tz="UTC")
+    return pyarrow.schema(
+        [
+            ("id", pyarrow.string()),
+            ("table_id", pyarrow.string()),
+            ("category", pyarrow.string()),
+            ("record_created_at", timestamp),
+            ("record_updated_at", timestamp),
+            ("record", pyarrow.string()),
+        ]
+    )
+
+
+class _ParquetPartWriter:
+    """one row group per page, record bodies as JSON strings"""
+
+    def __init__(self, path: pathlib.Path):
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+
+        self._schema = _parquet_schema()
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows: list[record_row.RecordRow]):
+        import pyarrow  # pylint: disable=import-outside-toplevel
+
+        self._writer.write_table(
+            pyarrow.Table.from_pydict(
+                {
+                    "id": [row.id for row in rows],
+                    "table_id": [row.table_id for row in rows],
+                    "category": [row.category for row in rows],
+                    "record_created_at": [row.record_created_at for row in rows],
+                    "record_updated_at": [row.record_updated_at for row in rows],
+                    "record": [record_row.dumps(row.record).decode() for row in rows],
+                },
+                schema=self._schema,
+            )
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+_WRITERS: dict[str, Callable[[pathlib.Path], PartWriter]] = {
+    "ndjson": _NdjsonPartWriter,
+    "parquet": _ParquetPartWriter,
+}
+
+
+def _read_ndjson(path: pathlib.Path) -> Iterator[dict]:
+    with open(path, "rb") as file:
+        for line in file:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def _read_parquet(path: pathlib.Path, batch_size: int = 1000) -> Iterator[dict]:
+    import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size):
+        for row in batch.to_pylist():
+            row["record"] = orjson.loads(row["record"])
+            yield row
+
+
+_READERS = {".ndjson": _read_ndjson, ".parquet": _read_parquet}
+
+
+def part_files(directory: pathlib.Path) -> list[pathlib.Path]:
+    """exported part files of directory in import order"""
+    return sorted(path for path in directory.iterdir() if path.suffix in _READERS)
+
+
+################################################
+# Export
+################################################
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportStream:
+    """independently readable slice of a virtual table
+
+    Attributes:
+        name (str): stream name, prefix of its part files
+        pages (Pages): pages from a start key
+    """
+
+    name: str
+    pages: Pages
+
+
+def export_streams(
+    db_client: stores.backend.StorageClient,
+    table_id: str,
+    segments: int = 4,
+    page_size: int = 1000,
+) -> list[ExportStream]:
+    """split a virtual table into streams read in parallel"""
+    plans = {
+        category: query_planner.plan_query(db_client.metadata, table_id, category)
+        for category in schema.common.RecordCategory
+    }
+    if all(query_planner.CATEGORY in plan.key_predicates for plan in plans.values()):
+
+        def query_pages(plan: query_planner.QueryPlan) -> Pages:
+            return lambda start_key: db_client.iter_query_pages(
+                key_condition_expression=plan.key_condition,
+                filter_expression=plan.filter_expression,
+                start_key=start_key,
+                page_size=page_size,
+                index_name=plan.index_name,
+            )
+
+        return [
+            ExportStream(name=category.lower(), pages=query_pages(plan))
+            for category, plan in plans.items()
+        ]
+
+    filter_expression = query_compiler.compile_filter(category=None, table_id=table_id)
+
+    def scan_pages(segment: int) -> Pages:
+        return lambda start_key: db_client.iter_scan_pages(
+            filter_expression=filter_expression,
+            start_key=start_key,
+            page_size=page_size,
+            segment=segment,
+            total_segments=segments,
+        )
+
+    return [
+        ExportStream(name=f"segment-{segment:04d}", pages=scan_pages(segment))
+        for segment in range(segments)
+    ]
+
+
+def export_table(
+    db_client: stores.backend.StorageClient,
+    table_id: str,
+    directory: str | pathlib.Path,
+    file_format: str = "ndjson",
+    segments: int = 4,
+    chunk_rows: int = 100_000,
+    page_size: int = 1000,
+    progress: Progress | None = None,
+    max_threads: int | None = None,
+) -> dict:
+    """export records of a virtual table into part files of directory
+
+    Args:
+        db_client (stores.backend.StorageClient): client of the record table
+        table_id (str): virtual table to export
+        directory (str | pathlib.Path): output directory, also holding the
+            checkpoint; exporting into it again resumes the export
+        file_format (str): "ndjson" or "parquet" (needs pyarrow)
+        segments (int): parallel scan segments when no index fits
+        chunk_rows (int): rows per part file, rounded up to whole pages
+        page_size (int): items read per request
+        progress (Progress | None): called with the checkpoint after each part
+        max_threads (int | None): streams read at once, defaults to
+            config.Settings.transfer_export_threads, further streams wait
+
+    Returns:
+        dict: checkpoint of the completed export
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = directory / EXPORT_CHECKPOINT
+    checkpoint = load_checkpoint(checkpoint_path) or {
+        "table_id": table_id,
+        "format": file_format,
+        "rows": 0,
+        "streams": {},
+    }
+    if checkpoint["table_id"] != table_id or checkpoint["format"] != file_format:
+        raise ValueError(f"{directory} holds another export")
+    writer_type = _WRITERS[file_format]
+    lock = threading.Lock()
+
+    def commit(state: dict, path: pathlib.Path | None, rows: int, last_key):
+        with lock:
+            if path is not None:
+                state["files"].append(path.name)
+                state["part"] += 1
+            state["rows"] += rows
+            checkpoint["rows"] += rows
+            state["start_key"] = _encode_key(last_key)
+            state["done"] = last_key is None
+            save_checkpoint(checkpoint_path, checkpoint)
+            if progress is not None:
+                progress(checkpoint)
+
+    def run(stream: ExportStream):
+        with lock:
+            state = checkpoint["streams"].setdefault(
+                stream.name, {"start_key": None, "part": 0, "rows": 0, "files": []}
+            )
+            if state.get("done"):
+                return
+            start_key = _decode_key(state["start_key"])
+        writer: PartWriter | None = None
+        path = None
+        rows = 0
+        try:
+            for page in stream.pages(start_key):
+                items = page.get("Items", [])
+                if items:
+                    if writer is None:
+                        # a part left over by an interrupted run is rewritten
+                        path = directory / (
+                            f"{stream.name}-{state['part']:05d}.{file_format}"
+                        )
+                        writer = writer_type(path)
+                    writer.write(record_row.from_items(items))
+                    rows += len(items)
+                last_key = page.get("LastEvaluatedKey")
+                if writer is not None and (rows >= chunk_rows or last_key is None):
+                    writer.close()
+                    writer = None
+                    commit(state, path, rows, last_key)
+                    rows = 0
+                elif writer is None and last_key is None:
+                    commit(state, None, 0, None)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    streams = export_streams(db_client, table_id, segments, page_size)
+    if max_threads is None:
+        max_threads = config.settings.transfer_export_threads
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, min(len(streams), max_threads))
+    ) as executor:
+        for future in [executor.submit(run, stream) for stream in streams]:
+            future.result()
+    return checkpoint
+
+
+################################################
+# Import
+################################################
+
+
+def default_write_rate(metadata: stores.table_metadata.TableMetadata) -> float:
+    """write units per second for imports, 0 for unlimited"""
+    if metadata.write_capacity_units is not None:
+        return (
+            metadata.write_capacity_units
+            * config.settings.transfer_write_capacity_ratio
+        )
+    return config.settings.transfer_write_units_per_second
+
+
+def write_units(item: dict) -> int:
+    """approximate write capacity units of putting item"""
+    return max(1, math.ceil(len(record_row.dumps(item)) / WRITE_UNIT_SIZE))
+
+
+def import_table(
+    db_client: stores.backend.StorageClient,
+    table_id: str,
+    directory: str | pathlib.Path,
+    checkpoint_path: str | pathlib.Path | None = None,
+    batch_size: int = 500,
+    write_units_per_second: float | None = None,
+    progress: Progress | None = None,
+    stats: table_stats.TableStatsService | None = None,
+) -> dict:
+    """import exported part files of directory into a virtual table
+
+    Records keep their ids and are moved to table_id, so an export can be
+    restored into the same table or copied into another one. Records failing
+    validation or writes are counted and listed in import-errors.ndjson next
+    to the checkpoint.
+
+    Args:
+        db_client (stores.backend.StorageClient): client of the record table
+        table_id (str): virtual table to import into
+        directory (str | pathlib.Path): directory of part files
+        checkpoint_path (str | pathlib.Path | None): checkpoint file, defaults
+            to import-checkpoint-<table_id>.json in directory
+        batch_size (int): records written per checkpoint
+        write_units_per_second (float | None): write rate, defaults to
+            default_write_rate of the table, 0 for unlimited
+        progress (Progress | None): called with the checkpoint after each batch
+        stats (table_stats.TableStatsService | None): statistics updated with
+            every batch, records replaced by the import read first
+
+    Returns:
+        dict: checkpoint of the completed import
+    """
+    directory = pathlib.Path(directory)
+    checkpoint_path = pathlib.Path(
+        checkpoint_path or directory / f"import-checkpoint-{table_id}.json"
+    )
+    errors_path = checkpoint_path.parent / IMPORT_ERRORS
+    checkpoint = load_checkpoint(checkpoint_path) or {
+        "table_id": table_id,
+        "rows": 0,
+        "failed": 0,
+        "files": {},
+    }
+    if write_units_per_second is None:
+        write_units_per_second = default_write_rate(db_client.metadata)
+    bucket = stores.rate_limit.TokenBucket(write_units_per_second)
+
+    def write_batch(
+        documents: list[dict],
+    ) -> tuple[int, list[dict], dict[str, table_stats.StatsDelta]]:
+        records = []
+        errors = []
+        for document in documents:
+            try:
+                record_item = schema.table.Record.model_validate(document)
+            except ValueError as e:
+                errors.append({"id": document.get("id"), "error": str(e)})
+                continue
+            record_item.table_id = table_id
+            records.append(record_item)
+        items = [record.record_item(record_item) for record_item in records]
+        bucket.acquire(sum(write_units(item) for item in items))
+        previous: list[dict | None] = (
+            record.read_previous(db_client, items)
+            if stats is not None
+            else [None] * len(items)
+        )
+        results = db_client.batch_write(items)
+        record.invalidate_table_results(table_id)
+        for record_item, result in zip(records, results):
+            record.item_cache.invalidate(table_id, record_item.id)
+            if not result["success"]:
+                errors.append({"id": record_item.id, "error": result["error"]})
+        record.change_broker.publish(table_id, change_feed.RELOAD)
+        record.search_index.index(record.written_items(items, results))
+        written = sum(result["success"] for result in results)
+        return written, errors, table_stats.batch_deltas(items, results, previous)
+
+    def commit(path: pathlib.Path, rows_read: int, done: bool, batch: list[dict]):
+        written, errors, deltas = write_batch(batch) if batch else (0, [], {})
+        if errors:
+            with open(errors_path, "ab") as file:
+                file.write(b"".join(orjson.dumps(error) + b"\n" for error in errors))
+        checkpoint["files"][path.name] = {"rows": rows_read, "done": done}
+        checkpoint["rows"] += written
+        checkpoint["failed"] += len(errors)
+        save_checkpoint(checkpoint_path, checkpoint)
+        # after the checkpoint, so that a resumed import does not count the
+        # batch again
+        if stats is not None:
+            for delta in deltas.values():
+                record.update_stats(stats, table_id, delta)
+        if progress is not None:
+            progress(checkpoint)
+
+    for path in part_files(directory):
+        state = checkpoint["files"].get(path.name, {"rows": 0, "done": False})
+        if state["done"]:
+            continue
+        batch = []
+        rows_read = 0
+        for document in _READERS[path.suffix](path):
+            rows_read += 1
+            if rows_read <= state["rows"]:
+                continue
+            batch.append(document)
+            if len(batch) >= batch_size:
+                commit(path, rows_read, False, batch)
+                batch = []
+        commit(path, rows_read, True, batch)
+    return checkpoint
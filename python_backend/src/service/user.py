@@ -1,35 +1,53 @@
-"""User related services"""
+"""User related services
+
+Tables of a user are items of their own in the master table, see
+service.table_index, not the table list of the user item.
+"""
 
 import schema
 import stores
+from service import access
+from service import table_index
 
 
 class UserService:
     """User related services"""
 
-    def __init__(self, table_name: str):
-        self.db_client = stores.dynamo_db.DynamoClient(table_name)
+    def __init__(self, table_name: str, pool: stores.backend.StoragePool | None = None):
+        self.db_client: stores.backend.StorageClient
+        if pool is None:
+            self.db_client = stores.dynamo_db.DynamoClient(table_name)
+        else:
+            self.db_client = pool.get_client(table_name)
 
     def create_user(self, user_info: schema.table.UserInfo):
-        """create user"""
-        response = self.db_client.create_item(item=user_info.model_dump())
+        """create user, and a table item for every table of user_info"""
+        response = self.db_client.create_item(
+            item=user_info.model_dump(exclude={"table"})
+        )
+        for table in user_info.table:
+            self.create_table(table)
         return response
 
-    def get_user_by_id(self, user_id: str) -> schema.table.UserInfo:
+    def get_user_by_id(self, user_id: str) -> dict | None:
         """read user"""
         response = self.db_client.get_by_id(user_id)
         # TODO: convert response to schema
         return response
 
     def update_user(self, user_info: schema.table.UserInfo) -> schema.table.UserInfo:
-        """update user"""
-        user_id = user_info.pop("id")
-        username = user_info.pop("username")
+        """update user, and update or create every table of user_info"""
+        updates = user_info.model_dump(exclude={"table"})
+        user_id = updates.pop("id")
+        username = updates.pop("username")
         response = self.db_client.update_item(
             partition_key_value=user_id,
             sort_key_value=username,
-            updates=user_info,
+            updates=updates,
         )
+        for table in user_info.table:
+            if self.update_table(table) is None:
+                self.create_table(table)
         # TODO: convert response to schema
         return response
 
@@ -37,8 +55,140 @@ class UserService:
         """delete user"""
         return self.db_client.delete_item(partition_key_value=user_id)
 
-    def get_user_tables(self, user_id: str) -> list[schema.table.TableInfo]:
-        """get user tables"""
+    def get_user_tables(self, user_id: str) -> list[schema.response_model.TableSummary]:
+        """tables owned by or shared with user, every page"""
+        tables = []
+        for relation in (table_index.OWNER, table_index.SHARED):
+            tables.extend(self.list_tables(user_id, relation)[0])
+        return tables
+
+    def list_tables(
+        self,
+        user_id: str,
+        relation: str,
+        limit: int | None = None,
+        start_key: dict | None = None,
+    ) -> tuple[list[schema.response_model.TableSummary], dict | None]:
+        """one page of the tables user owns or that are shared with user
 
-        user_info = self.get_user_by_id(user_id)
-        return user_info.get("table", [])
+        Args:
+            relation (str): table_index.OWNER or table_index.SHARED
+
+        Returns:
+            tuple[list[TableSummary], dict | None]: tables and the key to
+                resume from
+        """
+        items, next_key = self.db_client.query(
+            filter_expression=None,
+            key_condition_expression=table_index.listing_condition(user_id, relation),
+            limit=limit,
+            start_key=start_key,
+            index_name=table_index.MEMBER_INDEX,
+            projection=table_index.LISTING_ATTRIBUTES,
+        )
+        return [table_index.summary(item) for item in items], next_key
+
+    def get_table(self, table_id: str) -> schema.table.TableInfo | None:
+        """read table, None when not found"""
+        item = self.db_client.get_by_id(table_index.table_key(table_id))
+        return table_index.table_from_item(item) if item is not None else None
+
+    def get_tables(
+        self, table_ids: list[str]
+    ) -> dict[str, schema.table.TableInfo | None]:
+        """read tables with batched reads, None per table not found
+
+        Raises:
+            RuntimeError: a table could not be read
+        """
+        metadata = self.db_client.metadata
+        results = self.db_client.batch_get(
+            [
+                metadata.build_key(table_index.table_key(table_id))
+                for table_id in table_ids
+            ]
+        )
+        tables = {}
+        for table_id, result in zip(table_ids, results):
+            if result["error"] is not None:
+                raise RuntimeError(f"Table {table_id} not read: {result['error']}")
+            item = result["item"]
+            tables[table_id] = (
+                table_index.table_from_item(item) if item is not None else None
+            )
+        return tables
+
+    def create_table(self, table: schema.table.TableInfo) -> schema.table.TableInfo:
+        """write a new table and the memberships of its users
+
+        Raises:
+            table_index.TableExistsError: a table with the id of table exists,
+                it is left unchanged
+            RuntimeError: memberships could not be written
+        """
+        try:
+            self.db_client.create_item(
+                item=table_index.table_item(table),
+                condition=table_index.new_table_condition(),
+            )
+        except stores.dynamo_db.ConditionFailedError as e:
+            raise table_index.TableExistsError(f"Table {table.id} exists") from e
+        access.invalidate(table.id)
+        self._write_members(None, table)
+        return table
+
+    def update_table(
+        self, table: schema.table.TableInfo
+    ) -> schema.table.TableInfo | None:
+        """replace a table, adding and removing memberships of its users, None
+        when not found
+
+        Callers check that the requesting user owns the table.
+
+        Raises:
+            RuntimeError: memberships could not be written
+        """
+        previous = self.get_table(table.id)
+        if previous is None:
+            return None
+        try:
+            self.db_client.create_item(
+                item=table_index.table_item(table),
+                condition=table_index.existing_table_condition(),
+            )
+        except stores.dynamo_db.ConditionFailedError:
+            return None
+        access.invalidate(table.id)
+        self._write_members(previous, table)
+        return table
+
+    def _write_members(
+        self, previous: schema.table.TableInfo | None, table: schema.table.TableInfo
+    ):
+        """write the memberships of table, deleting those only previous has"""
+        results = self.db_client.batch_write(table_index.member_items(table))
+        failed = [result["error"] for result in results if not result["success"]]
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} memberships of table {table.id} not written: "
+                f"{failed[0]}"
+            )
+        for user_id in table_index.removed_members(previous, table):
+            self.db_client.delete_item(table_index.member_key(table.id, user_id))
+
+    def delete_table(self, table_id: str) -> bool:
+        """delete table and its memberships, False when not found"""
+        table = self.get_table(table_id)
+        if table is None:
+            return False
+        list(
+            self.db_client.pool.executor.map(
+                lambda user_id: self.db_client.delete_item(
+                    table_index.member_key(table_id, user_id)
+                ),
+                table_index.members(table),
+            )
+        )
+        self.db_client.delete_item(table_index.table_key(table_id))
+        access.invalidate(table_id)
+        return True
@@ -0,0 +1,92 @@
+"""Warm-up of a server worker before it serves requests
+
+Without it, the first requests of every worker pay for what is created on
+first use: the dynamo db client with its connections and credentials, the
+DescribeTable calls behind the cached table metadata, the database of the
+search index and the first run of the request path (record validation,
+stored item, row serialisation, filter compilation). main.lifespan runs
+the warm-up when config.Settings.warmup is set, so an autoscaled worker
+only takes traffic once its first requests are as fast as the following
+ones.
+"""
+
+import time
+
+import config
+import schema
+import stores
+from service import query_compiler, record, record_row
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def warm_pool(pool: stores.backend.StoragePool, settings: config.Settings) -> float:
+    """create the clients of the record and master tables and describe them
+
+    Returns:
+        float: milliseconds taken
+    """
+    start = time.perf_counter()
+    for table_name in (settings.record_table_name, settings.master_table_name):
+        _ = pool.get_client(table_name).metadata
+    return _elapsed_ms(start)
+
+
+async def warm_async_pool(
+    pool: stores.backend.AsyncStoragePool, settings: config.Settings
+) -> float:
+    """async counterpart of warm_pool"""
+    start = time.perf_counter()
+    for table_name in (settings.record_table_name, settings.master_table_name):
+        await pool.get_client(table_name).metadata()
+    return _elapsed_ms(start)
+
+
+def warm_models() -> float:
+    """run a sample record through the request path, without storing it
+
+    Returns:
+        float: milliseconds taken
+    """
+    start = time.perf_counter()
+    sample = schema.table.Record(
+        table_id="warmup",
+        category=schema.common.RecordCategory.RECORD,
+        record={"text": "warmup", "number": 1, "nested": {"list": [1.5, "a"]}},
+    )
+    sample = schema.table.Record.model_validate_json(
+        sample.model_dump_json(by_alias=True)
+    )
+    record_row.RecordRow.from_item(record.record_item(sample)).to_json()
+    schema.request.PatchRecord.model_validate({"record": {"text": None}})
+    query_compiler.compile_filter(
+        category=sample.category,
+        record_condition=[
+            schema.request.FieldCondition(
+                field="text",
+                field_type=schema.common.FieldType.STRING,
+                operation=schema.common.Operator.EQ,
+                value="warmup",
+            )
+        ],
+        table_id=sample.table_id,
+    )
+    return _elapsed_ms(start)
+
+
+def warm_up(
+    pool: stores.backend.StoragePool, settings: config.Settings
+) -> dict[str, float]:
+    """warm the storage pool, the search index and the request models
+
+    Returns:
+        dict[str, float]: milliseconds taken per step
+    """
+    timings = {"tables_ms": warm_pool(pool, settings)}
+    start = time.perf_counter()
+    record.search_index.open()
+    timings["search_index_ms"] = _elapsed_ms(start)
+    timings["models_ms"] = warm_models()
+    return timings
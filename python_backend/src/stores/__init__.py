@@ -1,2 +1,10 @@
 """init stores"""
+
+from stores import expression
+from stores import rate_limit
 from stores import dynamo_db
+from stores import table_metadata
+from stores import async_dynamo_db
+from stores import expression_eval
+from stores import sqlite_db
+from stores import backend
@@ -0,0 +1,783 @@
+"""asyncio dynamo db store
+
+Same interface as stores.dynamo_db.DynamoClient, built on a shared aiobotocore
+client so that the event loop never blocks on dynamo db I/O.
+"""
+
+import asyncio
+import contextlib
+import functools
+import time
+from typing import AsyncIterator
+
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from loguru import logger
+from stores import batching, dynamo_db, expression, rate_limit, table_metadata
+from telemetry import tracing
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def serialize_item(item: dict) -> dict:
+    """convert python item to dynamo db attribute values"""
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+
+def deserialize_item(item: dict) -> dict:
+    """convert dynamo db attribute values to python item"""
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def _deserialize_attributes(response: dict) -> dict:
+    # the returned item of a write, python values like the sync client
+    if "Attributes" in response:
+        response["Attributes"] = deserialize_item(response["Attributes"])
+    return response
+
+
+def handle_async_client_error(func):
+    """handle client error"""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except (dynamo_db.ConditionFailedError, dynamo_db.InvalidPathError):
+            raise
+        except (ClientError, BaseException) as e:  # pylint: disable=broad-except
+            logger.error(e)
+            raise e
+
+    return wrapper
+
+
+class AsyncTableMetadataCache:
+    """Async counterpart of table_metadata.TableMetadataCache"""
+
+    def __init__(self, pool: "AsyncDynamoClientPool", ttl: float = 300):
+        self._pool = pool
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, table_metadata.TableMetadata]] = {}
+        # one describe of a table at a time, others wait for its result
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def get(self, table_name: str) -> table_metadata.TableMetadata:
+        """get metadata of table, describe it when missing or expired"""
+        loop = asyncio.get_running_loop()
+        entry = self._entries.get(table_name)
+        if entry is not None and entry[0] > loop.time():
+            return entry[1]
+        async with self._locks.setdefault(table_name, asyncio.Lock()):
+            entry = self._entries.get(table_name)
+            if entry is not None and entry[0] > loop.time():
+                return entry[1]
+            description = await self._pool.client().describe_table(TableName=table_name)
+            metadata = table_metadata.TableMetadata.from_description(description)
+            self._entries[table_name] = (loop.time() + self.ttl, metadata)
+            self._pool.throughput.provision(metadata)
+            return metadata
+
+    def invalidate(self, table_name: str | None = None):
+        """forget metadata of table, or of all tables when table_name is None"""
+        if table_name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(table_name, None)
+
+
+class AsyncDynamoClientPool:
+    """Process-wide registry of async dynamo db clients keyed by table name
+
+    A single aiobotocore client (and its aiohttp connection pool) is shared by
+    every table. Call open() once on startup and close() on shutdown, both
+    from the event loop serving requests.
+
+    Like stores.dynamo_db.DynamoClientPool, requests go through the capacity
+    governor of their table and concurrent reads may be coalesced.
+    """
+
+    def __init__(
+        self,
+        region_name: str | None = None,
+        endpoint_url: str | None = None,
+        max_pool_connections: int = 50,
+        tcp_keepalive: bool = True,
+        connect_timeout: float = 5,
+        read_timeout: float = 10,
+        metadata_ttl: float = 300,
+        throughput: rate_limit.ThroughputRegistry | None = None,
+        coalesce_reads: bool = False,
+        coalesce_window: float = 0.002,
+    ):
+        # aiobotocore brings aiohttp, imported only by servers in async mode
+        import aiobotocore.config  # pylint: disable=import-outside-toplevel
+        import aiobotocore.session  # pylint: disable=import-outside-toplevel
+
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self.config = aiobotocore.config.AioConfig(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=tcp_keepalive,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries=dynamo_db.NO_RETRIES,
+        )
+        self._session = aiobotocore.session.get_session()
+        self._exit_stack = contextlib.AsyncExitStack()
+        self._client = None
+        self._clients: dict[str, AsyncDynamoClient] = {}
+        self.throughput = throughput or rate_limit.ThroughputRegistry()
+        self.coalesce_reads = coalesce_reads
+        self.coalesce_window = coalesce_window
+        self.metadata_cache = AsyncTableMetadataCache(self, ttl=metadata_ttl)
+
+    async def open(self):
+        """create shared low-level client"""
+        if self._client is None:
+            self._client = await self._exit_stack.enter_async_context(
+                self._session.create_client(
+                    "dynamodb",
+                    region_name=self.region_name,
+                    endpoint_url=self.endpoint_url,
+                    config=self.config,
+                )
+            )
+
+    def client(self):
+        """get shared low-level dynamo db client"""
+        if self._client is None:
+            raise RuntimeError("AsyncDynamoClientPool is not opened")
+        return self._client
+
+    def get_client(self, table_name: str) -> "AsyncDynamoClient":
+        """get async dynamo client of table, create one if not exists"""
+        dynamo_client = self._clients.get(table_name)
+        if dynamo_client is None:
+            dynamo_client = AsyncDynamoClient(table_name, pool=self)
+            self._clients[table_name] = dynamo_client
+        return dynamo_client
+
+    async def close(self):
+        """close shared client and forget registered clients"""
+        await self._exit_stack.aclose()
+        self._client = None
+        self._clients.clear()
+        self.metadata_cache.invalidate()
+
+
+class AsyncDynamoClient:
+    """Async DynamoDB client"""
+
+    def __init__(self, table_name: str, pool: AsyncDynamoClientPool):
+        self.table_name = table_name
+        self.pool = pool
+        self._get_batcher = None
+        if pool.coalesce_reads:
+            self._get_batcher = batching.AsyncGetBatcher(
+                self.batch_get, window=pool.coalesce_window
+            )
+
+    @property
+    def client(self):
+        """shared low-level dynamo db client"""
+        return self.pool.client()
+
+    async def metadata(self) -> table_metadata.TableMetadata:
+        """cached key schema and indexes of table"""
+        return await self.pool.metadata_cache.get(self.table_name)
+
+    @property
+    def throughput(self) -> rate_limit.TableThroughput:
+        """capacity governor of table"""
+        return self.pool.throughput.get(self.table_name)
+
+    async def _request(self, operation: str, count: int = 1, **params) -> dict:
+        """send a request within the capacity of the table
+
+        See stores.dynamo_db.DynamoClient._request.
+
+        Args:
+            operation (str): low-level client method, e.g. query
+            count (int): items of a batch request
+        """
+        throughput = self.throughput
+        kind = rate_limit.operation_kind(operation)
+        request = getattr(self.client, operation)
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+        attempt = 0
+        while True:
+            reserved, wait = throughput.reserve(operation, count)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            start = time.perf_counter()
+            try:
+                response = await request(**params)
+            except rate_limit.REQUEST_ERRORS as e:
+                tracing.record_call(
+                    operation,
+                    self.table_name,
+                    kind,
+                    time.perf_counter() - start,
+                    error=rate_limit.error_name(e),
+                )
+                await asyncio.sleep(throughput.backoff(operation, reserved, e, attempt))
+                attempt += 1
+                continue
+            duration = time.perf_counter() - start
+            units = throughput.record(operation, reserved, response, count)
+            tracing.record_call(
+                operation,
+                self.table_name,
+                kind,
+                duration,
+                response=response,
+                consumed_units=units,
+            )
+            return response
+
+    async def _build_key(self, partition_key_value, sort_key_value=None) -> dict:
+        metadata = await self.metadata()
+        return serialize_item(metadata.build_key(partition_key_value, sort_key_value))
+
+    @staticmethod
+    def _build_conditions(
+        key_condition_expression=None, filter_expression=None
+    ) -> dict:
+        """render conditions into low-level request parameters"""
+        builder = ConditionExpressionBuilder()
+        params: dict = {}
+        names: dict = {}
+        values: dict = {}
+        for param_name, condition, is_key_condition in (
+            ("KeyConditionExpression", key_condition_expression, True),
+            ("FilterExpression", filter_expression, False),
+        ):
+            if condition is None:
+                continue
+            if isinstance(condition, expression.Expression):
+                params[param_name] = condition.expression
+                names.update(condition.names)
+                values.update(condition.values)
+                continue
+            built = builder.build_expression(
+                condition, is_key_condition=is_key_condition
+            )
+            params[param_name] = built.condition_expression
+            names.update(built.attribute_name_placeholders)
+            values.update(built.attribute_value_placeholders)
+        if names:
+            params["ExpressionAttributeNames"] = names
+        if values:
+            params["ExpressionAttributeValues"] = serialize_item(values)
+        return params
+
+    def _query_params(
+        self, key_condition_expression, filter_expression=None, index_name=None
+    ) -> dict:
+        params = self._build_conditions(key_condition_expression, filter_expression)
+        params["TableName"] = self.table_name
+        if index_name is not None:
+            params["IndexName"] = index_name
+        return params
+
+    @handle_async_client_error
+    async def _query_page(self, start_key: dict | None = None, **params) -> dict:
+        """run a single query request, items and keys in python types"""
+        return await self._request_page("query", start_key, params)
+
+    @handle_async_client_error
+    async def _scan_page(self, start_key: dict | None = None, **params) -> dict:
+        """run a single scan request, items and keys in python types"""
+        return await self._request_page("scan", start_key, params)
+
+    async def _request_page(
+        self, operation: str, start_key: dict | None, params: dict
+    ) -> dict:
+        if start_key is not None:
+            params["ExclusiveStartKey"] = serialize_item(start_key)
+        response = await self._request(operation, **params)
+        response["Items"] = [
+            deserialize_item(item) for item in response.get("Items", [])
+        ]
+        if "LastEvaluatedKey" in response:
+            response["LastEvaluatedKey"] = deserialize_item(
+                response["LastEvaluatedKey"]
+            )
+        return response
+
+    async def iter_query_pages(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> AsyncIterator[dict]:
+        """query dynamo page by page, following LastEvaluatedKey lazily"""
+        params = self._query_params(
+            key_condition_expression, filter_expression, index_name
+        )
+        if page_size is not None:
+            params["Limit"] = page_size
+        if select is not None:
+            params["Select"] = select
+        if projection is not None:
+            expression.add_condition(
+                params, "ProjectionExpression", expression.projection(projection)
+            )
+        while True:
+            response = await self._query_page(start_key=start_key, **params)
+            yield response
+            start_key = response.get("LastEvaluatedKey")
+            if start_key is None:
+                return
+
+    async def iter_scan_pages(
+        self,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        segment: int | None = None,
+        total_segments: int | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> AsyncIterator[dict]:
+        """scan dynamo page by page, optionally a single segment of a parallel scan"""
+        params = self._build_conditions(filter_expression=filter_expression)
+        params["TableName"] = self.table_name
+        if page_size is not None:
+            params["Limit"] = page_size
+        if total_segments is not None:
+            params["Segment"] = segment
+            params["TotalSegments"] = total_segments
+        if select is not None:
+            params["Select"] = select
+        if projection is not None:
+            expression.add_condition(
+                params, "ProjectionExpression", expression.projection(projection)
+            )
+        while True:
+            response = await self._scan_page(start_key=start_key, **params)
+            yield response
+            start_key = response.get("LastEvaluatedKey")
+            if start_key is None:
+                return
+
+    async def iter_query(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+    ) -> AsyncIterator[dict]:
+        """query dynamo item by item, fetching the next page only when needed"""
+        async for page in self.iter_query_pages(
+            key_condition_expression=key_condition_expression,
+            filter_expression=filter_expression,
+            start_key=start_key,
+            page_size=page_size,
+            index_name=index_name,
+        ):
+            for item in page["Items"]:
+                yield item
+
+    async def query(
+        self,
+        filter_expression,
+        key_condition_expression,
+        limit: int | None = None,
+        start_key: dict | None = None,
+        index_name: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> tuple[list[dict], dict | None]:
+        """query up to limit items across pages
+
+        Args:
+            projection (list[str] | tuple[str, ...] | None): attributes read,
+                None for whole items
+
+        Returns:
+            tuple[list[dict], dict | None]: items and the key to resume from,
+                None when there are no more items
+        """
+        params = self._query_params(
+            key_condition_expression, filter_expression, index_name
+        )
+        if projection is not None:
+            expression.add_condition(
+                params, "ProjectionExpression", expression.projection(projection)
+            )
+        return await self._collect(self._query_page, params, limit, start_key)
+
+    async def scan(
+        self,
+        filter_expression=None,
+        limit: int | None = None,
+        start_key: dict | None = None,
+    ) -> tuple[list[dict], dict | None]:
+        """scan up to limit items across pages
+
+        Returns:
+            tuple[list[dict], dict | None]: items and the key to resume from,
+                None when there are no more items
+        """
+        params = self._build_conditions(filter_expression=filter_expression)
+        params["TableName"] = self.table_name
+        return await self._collect(self._scan_page, params, limit, start_key)
+
+    @staticmethod
+    async def _collect(
+        request, params: dict, limit: int | None, start_key: dict | None
+    ) -> tuple[list[dict], dict | None]:
+        items: list[dict] = []
+        while True:
+            if limit is not None:
+                params["Limit"] = limit - len(items)
+            response = await request(start_key=start_key, **params)
+            items.extend(response["Items"])
+            start_key = response.get("LastEvaluatedKey")
+            if start_key is None or (limit is not None and len(items) >= limit):
+                return items, start_key
+
+    async def iter_scan(
+        self, filter_expression=None, start_key: dict | None = None
+    ) -> AsyncIterator[dict]:
+        """scan dynamo item by item, fetching the next page only when needed"""
+        async for page in self.iter_scan_pages(
+            filter_expression=filter_expression, start_key=start_key
+        ):
+            for item in page["Items"]:
+                yield item
+
+    async def read_stats(
+        self,
+        key_condition_expression=None,
+        filter_expression=None,
+        index_name: str | None = None,
+    ) -> dict:
+        """items evaluated, matched and read units consumed by a query or scan
+
+        Runs the request with Select=COUNT, which reads the same items.
+        read_units is None when dynamo db does not report consumed capacity.
+        """
+        if key_condition_expression is not None:
+            params = self._query_params(
+                key_condition_expression, filter_expression, index_name
+            )
+            request = self._query_page
+        else:
+            params = self._build_conditions(filter_expression=filter_expression)
+            params["TableName"] = self.table_name
+            request = self._scan_page
+        params["Select"] = "COUNT"
+        params["ReturnConsumedCapacity"] = "TOTAL"
+        pages = []
+        start_key = None
+        while True:
+            response = await request(start_key=start_key, **params)
+            pages.append(response)
+            start_key = response.get("LastEvaluatedKey")
+            if start_key is None:
+                return dynamo_db.sum_read_stats(pages)
+
+    async def query_count(
+        self,
+        filter_expression,
+        key_condition_expression,
+        index_name: str | None = None,
+    ) -> int:
+        """count matching items across all pages"""
+        count = 0
+        async for page in self.iter_query_pages(
+            key_condition_expression=key_condition_expression,
+            filter_expression=filter_expression,
+            index_name=index_name,
+            select="COUNT",
+        ):
+            count += page["Count"]
+        return count
+
+    async def _scan_segment_count(
+        self, filter_expression, segment, total_segments
+    ) -> int:
+        count = 0
+        async for page in self.iter_scan_pages(
+            filter_expression=filter_expression,
+            segment=segment,
+            total_segments=total_segments,
+            select="COUNT",
+        ):
+            count += page["Count"]
+        return count
+
+    async def scan_count(self, filter_expression=None, total_segments: int = 1) -> int:
+        """count matching items with a parallel scan split into total_segments"""
+        if total_segments <= 1:
+            return await self._scan_segment_count(filter_expression, None, None)
+        counts = await asyncio.gather(
+            *(
+                self._scan_segment_count(filter_expression, segment, total_segments)
+                for segment in range(total_segments)
+            )
+        )
+        return sum(counts)
+
+    async def _key_tuple(self, item: dict) -> tuple:
+        metadata = await self.metadata()
+        return tuple(item[key] for key in metadata.key_attributes)
+
+    async def batch_write(self, items: list[dict], max_attempts: int = 8) -> list[dict]:
+        """put items with BatchWriteItem
+
+        Items are sent in chunks of 25 concurrently, unprocessed items are
+        retried with jittered backoff.
+
+        Returns:
+            list[dict]: per item {"success": bool, "error": str | None}, in
+                order of items
+        """
+        items = [dynamo_db.to_dynamo_value(item) for item in items]
+        results = [{"success": True, "error": None} for _ in items]
+        await asyncio.gather(
+            *(
+                self._batch_write_chunk(items, chunk, results, max_attempts)
+                for chunk in dynamo_db.chunked(dynamo_db.BATCH_WRITE_LIMIT, len(items))
+            )
+        )
+        return results
+
+    async def _batch_write_chunk(
+        self, items: list[dict], pending: list[int], results: list[dict], max_attempts
+    ):
+        for attempt in range(max_attempts):
+            if attempt:
+                self.throughput.throttled("batch_write_item")
+                await asyncio.sleep(rate_limit.full_jitter_delay(attempt))
+            try:
+                response = await self._request(
+                    "batch_write_item",
+                    count=len(pending),
+                    RequestItems={
+                        self.table_name: [
+                            {"PutRequest": {"Item": serialize_item(items[index])}}
+                            for index in pending
+                        ]
+                    },
+                )
+            except (ClientError, rate_limit.CapacityExceededError) as e:
+                logger.error(e)
+                for index in pending:
+                    results[index] = {"success": False, "error": str(e)}
+                return
+            unprocessed = {
+                await self._key_tuple(deserialize_item(request["PutRequest"]["Item"]))
+                for request in response.get("UnprocessedItems", {}).get(
+                    self.table_name, []
+                )
+            }
+            pending = [
+                index
+                for index in pending
+                if await self._key_tuple(items[index]) in unprocessed
+            ]
+            if not pending:
+                return
+        for index in pending:
+            results[index] = {
+                "success": False,
+                "error": f"Unprocessed after {max_attempts} attempts",
+            }
+
+    async def batch_get(self, keys: list[dict], max_attempts: int = 8) -> list[dict]:
+        """get items by primary key with BatchGetItem
+
+        Keys are sent in chunks of 100 concurrently, unprocessed keys are
+        retried with jittered backoff. Keys must be unique.
+
+        Returns:
+            list[dict]: per key {"item": dict | None, "error": str | None}, in
+                order of keys, item is None when not found or failed
+        """
+        results: list[dict] = [{"item": None, "error": None} for _ in keys]
+        await asyncio.gather(
+            *(
+                self._batch_get_chunk(keys, chunk, results, max_attempts)
+                for chunk in dynamo_db.chunked(dynamo_db.BATCH_GET_LIMIT, len(keys))
+            )
+        )
+        return results
+
+    async def _batch_get_chunk(
+        self, keys: list[dict], pending: list[int], results: list[dict], max_attempts
+    ):
+        for attempt in range(max_attempts):
+            if attempt:
+                self.throughput.throttled("batch_get_item")
+                await asyncio.sleep(rate_limit.full_jitter_delay(attempt))
+            try:
+                response = await self._request(
+                    "batch_get_item",
+                    count=len(pending),
+                    RequestItems={
+                        self.table_name: {
+                            "Keys": [serialize_item(keys[index]) for index in pending]
+                        }
+                    },
+                )
+            except (ClientError, rate_limit.CapacityExceededError) as e:
+                logger.error(e)
+                for index in pending:
+                    results[index] = {"item": None, "error": str(e)}
+                return
+            index_by_key = {
+                await self._key_tuple(keys[index]): index for index in pending
+            }
+            for item in response.get("Responses", {}).get(self.table_name, []):
+                item = deserialize_item(item)
+                results[index_by_key[await self._key_tuple(item)]]["item"] = item
+            unprocessed = {
+                await self._key_tuple(deserialize_item(key))
+                for key in response.get("UnprocessedKeys", {})
+                .get(self.table_name, {})
+                .get("Keys", [])
+            }
+            pending = [
+                index
+                for index in pending
+                if await self._key_tuple(keys[index]) in unprocessed
+            ]
+            if not pending:
+                return
+        for index in pending:
+            results[index] = {
+                "item": None,
+                "error": f"Unprocessed after {max_attempts} attempts",
+            }
+
+    @handle_async_client_error
+    async def get_by_id(
+        self, partition_key_value: str, sort_key_value: str | None = None
+    ):
+        """get item from dynamo"""
+        if self._get_batcher is not None:
+            metadata = await self.metadata()
+            result = await self._get_batcher.get(
+                metadata.build_key(partition_key_value, sort_key_value)
+            )
+            if result["error"] is None:
+                return result["item"]
+        key = await self._build_key(partition_key_value, sort_key_value)
+        response = await self._request("get_item", TableName=self.table_name, Key=key)
+        item = response.get("Item")
+        return deserialize_item(item) if item is not None else None
+
+    @handle_async_client_error
+    async def create_item(
+        self,
+        item: dict,
+        return_values: str | None = None,
+        condition: expression.Expression | None = None,
+    ):
+        """create new item, see dynamo_db.DynamoClient.create_item
+
+        Raises:
+            dynamo_db.ConditionFailedError: condition did not hold, nothing was
+                written
+        """
+        params: dict = {"ReturnValues": return_values} if return_values else {}
+        expression.add_condition(params, "ConditionExpression", condition)
+        if "ExpressionAttributeValues" in params:
+            params["ExpressionAttributeValues"] = serialize_item(
+                params["ExpressionAttributeValues"]
+            )
+        try:
+            response = await self._request(
+                "put_item",
+                TableName=self.table_name,
+                Item=serialize_item(dynamo_db.to_dynamo_value(item)),
+                **params,
+            )
+        except ClientError as e:
+            raise dynamo_db.update_error(e) from e
+        return _deserialize_attributes(response)
+
+    @handle_async_client_error
+    async def update_item(self, partition_key_value, sort_key_value=None, updates=None):
+        """update item"""
+        key = await self._build_key(partition_key_value, sort_key_value)
+        if updates is None:
+            return
+
+        update_expression_parts = []
+        expression_attribute_names = {}
+        expression_attribute_values = {}
+        for attr, value in updates.items():
+            update_expression_parts.append(f"#{attr} = :{attr}")
+            expression_attribute_names[f"#{attr}"] = attr
+            expression_attribute_values[f":{attr}"] = dynamo_db.to_dynamo_value(value)
+
+        response = await self._request(
+            "update_item",
+            TableName=self.table_name,
+            Key=key,
+            UpdateExpression="SET " + ", ".join(update_expression_parts),
+            ExpressionAttributeNames=expression_attribute_names,
+            ExpressionAttributeValues=serialize_item(expression_attribute_values),
+            ReturnValues="UPDATED_NEW",
+        )
+        return deserialize_item(response.get("Attributes", {}))
+
+    @handle_async_client_error
+    async def patch_item(
+        self,
+        partition_key_value,
+        sort_key_value=None,
+        update: expression.Expression | None = None,
+        condition: expression.Expression | None = None,
+        return_values: str = "ALL_NEW",
+    ) -> dict:
+        """apply a rendered update expression, returns the updated item
+
+        See dynamo_db.DynamoClient.patch_item for return_values.
+
+        Raises:
+            dynamo_db.ConditionFailedError: condition did not hold, nothing was
+                written
+            dynamo_db.InvalidPathError: a nested path of update has no parent map
+        """
+        key = await self._build_key(partition_key_value, sort_key_value)
+        params = expression.add_condition({}, "UpdateExpression", update)
+        expression.add_condition(params, "ConditionExpression", condition)
+        if "ExpressionAttributeValues" in params:
+            params["ExpressionAttributeValues"] = serialize_item(
+                params["ExpressionAttributeValues"]
+            )
+        try:
+            response = await self._request(
+                "update_item",
+                TableName=self.table_name,
+                Key=key,
+                ReturnValues=return_values,
+                **params,
+            )
+        except ClientError as e:
+            raise dynamo_db.update_error(e) from e
+        return deserialize_item(response.get("Attributes", {}))
+
+    @handle_async_client_error
+    async def delete_item(
+        self, partition_key_value, sort_key_value=None, return_values: str | None = None
+    ):
+        """delete item, see dynamo_db.DynamoClient.delete_item"""
+        key = await self._build_key(partition_key_value, sort_key_value)
+        params: dict = {"ReturnValues": return_values} if return_values else {}
+        response = await self._request(
+            "delete_item", TableName=self.table_name, Key=key, **params
+        )
+        return _deserialize_attributes(response)
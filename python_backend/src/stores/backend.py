@@ -0,0 +1,280 @@
+"""Storage backend protocols
+
+The services program against these protocols instead of a concrete store:
+
+- StoragePool: clients per table, with the capacity governors and the
+  executor of fan-out calls
+- StorageClient: reads and writes of one table, items as native python
+  values, conditions as stores.expression.Expression or boto3 condition
+  objects
+
+stores.dynamo_db.DynamoClientPool implements them against dynamo db and
+stores.sqlite_db.SqliteClientPool against an embedded sqlite database,
+AsyncStoragePool and AsyncStorageClient are their async counterparts.
+"""
+
+import concurrent.futures
+from typing import AsyncIterator, Iterator, Protocol
+
+from stores import expression, rate_limit, table_metadata
+
+
+class StorageClient(Protocol):
+    """reads and writes of one table"""
+
+    table_name: str
+
+    @property
+    def pool(self) -> "StoragePool":
+        """pool the client belongs to"""
+
+    @property
+    def metadata(self) -> table_metadata.TableMetadata:
+        """key schema and indexes of table"""
+
+    def iter_query_pages(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> Iterator[dict]:
+        """query responses page by page"""
+
+    def iter_scan_pages(
+        self,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        segment: int | None = None,
+        total_segments: int | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> Iterator[dict]:
+        """scan responses page by page"""
+
+    def iter_query(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+    ) -> Iterator[dict]:
+        """items of a query"""
+
+    def query(
+        self,
+        filter_expression,
+        key_condition_expression,
+        limit: int | None = None,
+        start_key: dict | None = None,
+        index_name: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> tuple[list[dict], dict | None]:
+        """up to limit items of a query and the key to resume from"""
+
+    def scan(
+        self, filter_expression=None, limit: int | None = None, start_key=None
+    ) -> tuple[list[dict], dict | None]:
+        """up to limit items of a scan and the key to resume from"""
+
+    def iter_scan(self, filter_expression=None, start_key=None) -> Iterator[dict]:
+        """items of a scan"""
+
+    def read_stats(
+        self,
+        key_condition_expression=None,
+        filter_expression=None,
+        index_name: str | None = None,
+    ) -> dict:
+        """count, scanned count and read units of a query or scan"""
+
+    def query_count(
+        self, filter_expression, key_condition_expression, index_name=None
+    ) -> int:
+        """items matching a query"""
+
+    def scan_count(self, filter_expression=None, total_segments: int = 1) -> int:
+        """items matching a scan"""
+
+    def batch_write(self, items: list[dict], max_attempts: int = 8) -> list[dict]:
+        """put items, per item {"success": bool, "error": str | None}"""
+
+    def batch_get(self, keys: list[dict], max_attempts: int = 8) -> list[dict]:
+        """items by key, per key {"item": dict | None, "error": str | None}"""
+
+    def get_by_id(self, partition_key_value, sort_key_value=None) -> dict | None:
+        """item by primary key"""
+
+    def create_item(
+        self,
+        item: dict,
+        return_values: str | None = None,
+        condition: expression.Expression | None = None,
+    ):
+        """put item if condition holds, "ALL_OLD" return_values gives the
+        replaced item"""
+
+    def update_item(self, partition_key_value, sort_key_value=None, updates=None):
+        """set top-level attributes of an item"""
+
+    def patch_item(
+        self,
+        partition_key_value,
+        sort_key_value=None,
+        update: expression.Expression | None = None,
+        condition: expression.Expression | None = None,
+        return_values: str = "ALL_NEW",
+    ) -> dict:
+        """apply an update expression under condition, returns the item"""
+
+    def delete_item(
+        self, partition_key_value, sort_key_value=None, return_values: str | None = None
+    ):
+        """delete item by primary key, "ALL_OLD" return_values gives the item"""
+
+
+class StoragePool(Protocol):
+    """clients per table of a store"""
+
+    throughput: rate_limit.ThroughputRegistry
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """worker threads for fanning out calls"""
+
+    def get_client(self, table_name: str) -> StorageClient:
+        """client of table"""
+
+    def close(self):
+        """release the connections of the store"""
+
+
+class AsyncStorageClient(Protocol):
+    """async counterpart of StorageClient"""
+
+    table_name: str
+
+    async def metadata(self) -> table_metadata.TableMetadata:
+        """key schema and indexes of table"""
+
+    def iter_query_pages(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> AsyncIterator[dict]:
+        """query responses page by page"""
+
+    def iter_scan_pages(
+        self,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        segment: int | None = None,
+        total_segments: int | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> AsyncIterator[dict]:
+        """scan responses page by page"""
+
+    def iter_query(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+    ) -> AsyncIterator[dict]:
+        """items of a query"""
+
+    async def query(
+        self,
+        filter_expression,
+        key_condition_expression,
+        limit: int | None = None,
+        start_key: dict | None = None,
+        index_name: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> tuple[list[dict], dict | None]:
+        """up to limit items of a query and the key to resume from"""
+
+    async def scan(
+        self, filter_expression=None, limit: int | None = None, start_key=None
+    ) -> tuple[list[dict], dict | None]:
+        """up to limit items of a scan and the key to resume from"""
+
+    def iter_scan(self, filter_expression=None, start_key=None) -> AsyncIterator[dict]:
+        """items of a scan"""
+
+    async def read_stats(
+        self,
+        key_condition_expression=None,
+        filter_expression=None,
+        index_name: str | None = None,
+    ) -> dict:
+        """count, scanned count and read units of a query or scan"""
+
+    async def query_count(
+        self, filter_expression, key_condition_expression, index_name=None
+    ) -> int:
+        """items matching a query"""
+
+    async def scan_count(self, filter_expression=None, total_segments: int = 1) -> int:
+        """items matching a scan"""
+
+    async def batch_write(self, items: list[dict], max_attempts: int = 8) -> list[dict]:
+        """put items, per item {"success": bool, "error": str | None}"""
+
+    async def batch_get(self, keys: list[dict], max_attempts: int = 8) -> list[dict]:
+        """items by key, per key {"item": dict | None, "error": str | None}"""
+
+    async def get_by_id(self, partition_key_value, sort_key_value=None) -> dict | None:
+        """item by primary key"""
+
+    async def create_item(
+        self,
+        item: dict,
+        return_values: str | None = None,
+        condition: expression.Expression | None = None,
+    ):
+        """put item if condition holds, "ALL_OLD" return_values gives the
+        replaced item"""
+
+    async def update_item(self, partition_key_value, sort_key_value=None, updates=None):
+        """set top-level attributes of an item"""
+
+    async def patch_item(
+        self,
+        partition_key_value,
+        sort_key_value=None,
+        update: expression.Expression | None = None,
+        condition: expression.Expression | None = None,
+        return_values: str = "ALL_NEW",
+    ) -> dict:
+        """apply an update expression under condition, returns the item"""
+
+    async def delete_item(
+        self, partition_key_value, sort_key_value=None, return_values: str | None = None
+    ):
+        """delete item by primary key, "ALL_OLD" return_values gives the item"""
+
+
+class AsyncStoragePool(Protocol):
+    """async counterpart of StoragePool"""
+
+    throughput: rate_limit.ThroughputRegistry
+
+    def get_client(self, table_name: str) -> AsyncStorageClient:
+        """client of table"""
+
+    async def close(self):
+        """release the connections of the store"""
@@ -0,0 +1,139 @@
+"""Coalescing queue of single item reads
+
+Under load many handlers read different items of the same table at the same
+moment. GetBatcher queues these GetItem calls for a few milliseconds and sends
+them as one BatchGetItem request, trading a bounded delay for fewer requests
+against a throttled table. Keys failing in the batch are reported back so that
+the caller can fall back to reading them one by one.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable
+
+# keys of one BatchGetItem request
+BATCH_GET_LIMIT = 100
+_FAILED = {"item": None, "error": "Batch failed"}
+
+
+def _key_id(key: dict) -> tuple:
+    return tuple(sorted(key.items()))
+
+
+class _Batch:
+    __slots__ = ("keys", "results", "full", "done")
+
+    def __init__(self):
+        self.keys: dict[tuple, dict] = {}
+        self.results: dict[tuple, dict] = {}
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class GetBatcher:
+    """Merge concurrent item reads of a table into BatchGetItem requests
+
+    The first caller of a batch waits up to window seconds, or until
+    max_keys keys are queued, then fetches every queued key at once.
+
+    Args:
+        batch_get (Callable): stores.dynamo_db.DynamoClient.batch_get of table
+        window (float): seconds a batch stays open for more keys
+        max_keys (int): keys of a full batch
+    """
+
+    def __init__(
+        self,
+        batch_get: Callable[[list[dict]], list[dict]],
+        window: float = 0.002,
+        max_keys: int = BATCH_GET_LIMIT,
+    ):
+        self._batch_get = batch_get
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._batch: _Batch | None = None
+
+    def get(self, key: dict) -> dict:
+        """read item of key, {"item": dict | None, "error": str | None}"""
+        key_id = _key_id(key)
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if batch is None:
+                batch = self._batch = _Batch()
+            batch.keys.setdefault(key_id, key)
+            if len(batch.keys) >= self.max_keys:
+                self._batch = None
+                batch.full.set()
+        if not leader:
+            batch.done.wait()
+            return batch.results.get(key_id, _FAILED)
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+        try:
+            results = self._batch_get(list(batch.keys.values()))
+            batch.results = dict(zip(batch.keys, results))
+        except Exception:  # pylint: disable=broad-exception-caught
+            # waiters fall back to single reads, which raise the error
+            pass
+        finally:
+            batch.done.set()
+        return batch.results.get(key_id, _FAILED)
+
+
+class AsyncGetBatcher:
+    """Async counterpart of GetBatcher
+
+    Args:
+        batch_get (Callable): stores.async_dynamo_db.AsyncDynamoClient.batch_get
+        window (float): seconds a batch stays open for more keys
+        max_keys (int): keys of a full batch
+    """
+
+    def __init__(
+        self,
+        batch_get: Callable[[list[dict]], Awaitable[list[dict]]],
+        window: float = 0.002,
+        max_keys: int = BATCH_GET_LIMIT,
+    ):
+        self._batch_get = batch_get
+        self.window = window
+        self.max_keys = max_keys
+        self._keys: dict[tuple, dict] = {}
+        self._done: asyncio.Future | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get(self, key: dict) -> dict:
+        """read item of key, {"item": dict | None, "error": str | None}"""
+        key_id = _key_id(key)
+        if self._done is None:
+            loop = asyncio.get_running_loop()
+            self._done = loop.create_future()
+            self._timer = loop.call_later(self.window, self._flush)
+        done = self._done
+        self._keys.setdefault(key_id, key)
+        if len(self._keys) >= self.max_keys:
+            self._flush()
+        results = await asyncio.shield(done)
+        return results.get(key_id, _FAILED)
+
+    def _flush(self):
+        if self._done is None:
+            return
+        self._timer.cancel()
+        task = asyncio.ensure_future(self._run(self._keys, self._done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._keys, self._done, self._timer = {}, None, None
+
+    async def _run(self, keys: dict[tuple, dict], done: asyncio.Future):
+        try:
+            results = await self._batch_get(list(keys.values()))
+            done.set_result(dict(zip(keys, results)))
+        except Exception:  # pylint: disable=broad-exception-caught
+            # waiters fall back to single reads, which raise the error
+            done.set_result({})
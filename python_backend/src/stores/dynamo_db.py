@@ -1,13 +1,23 @@
 """dynamo db store"""
 
+import concurrent.futures
+import datetime
+import decimal
+import enum
 import json
+import threading
+import time
+from typing import Iterable, Iterator
 
 import boto3
+import botocore.config
 import schema
 from boto3 import dynamodb
 from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 from loguru import logger
+from stores import batching, expression, rate_limit, table_metadata
+from telemetry import tracing
 
 #######################
 # CRUD for master table
@@ -17,12 +27,111 @@ from loguru import logger
 # delete user record
 
 
+def to_dynamo_value(value):
+    """convert python value to a type accepted by dynamo db
+
+    floats become Decimal and datetimes become epoch timestamps, nested dicts
+    and lists are converted recursively.
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime.datetime):
+        return decimal.Decimal(str(value.timestamp()))
+    if isinstance(value, float):
+        return decimal.Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: to_dynamo_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo_value(item) for item in value]
+    return value
+
+
+RECORD_TABLE_INDEX = "table_id-category_created_at-index"
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = batching.BATCH_GET_LIMIT
+# botocore sends every request once, the capacity governor of the table owns
+# retries, see DynamoClient._request
+NO_RETRIES = {"total_max_attempts": 1}
+
+
+def record_table_definition(table_name: str) -> dict:
+    """CreateTable parameters of the record table"""
+    return {
+        "TableName": table_name,
+        "KeySchema": [
+            {"AttributeName": "id", "KeyType": "HASH"},
+            {"AttributeName": "table_id", "KeyType": "RANGE"},
+        ],
+        "AttributeDefinitions": [
+            {"AttributeName": "id", "AttributeType": "S"},
+            {"AttributeName": "table_id", "AttributeType": "S"},
+            {"AttributeName": "category_created_at", "AttributeType": "S"},
+        ],
+        # records of a virtual table by category and created time, see
+        # service.query_planner
+        "GlobalSecondaryIndexes": [
+            {
+                "IndexName": RECORD_TABLE_INDEX,
+                "KeySchema": [
+                    {"AttributeName": "table_id", "KeyType": "HASH"},
+                    {"AttributeName": "category_created_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+    }
+
+
+def chunked(size: int, length: int) -> list[list[int]]:
+    """split indexes of a sequence of length into chunks of size"""
+    return [
+        list(range(start, min(start + size, length)))
+        for start in range(0, length, size)
+    ]
+
+
+def sum_read_stats(pages: Iterable[dict]) -> dict:
+    """sum Count, ScannedCount and consumed read units of COUNT pages"""
+    stats: dict = {"count": 0, "scanned_count": 0, "read_units": None}
+    for page in pages:
+        stats["count"] += page["Count"]
+        stats["scanned_count"] += page["ScannedCount"]
+        capacity = page.get("ConsumedCapacity")
+        if capacity is not None:
+            stats["read_units"] = (stats["read_units"] or 0) + float(
+                capacity["CapacityUnits"]
+            )
+    return stats
+
+
+class ConditionFailedError(Exception):
+    """the condition of a conditional write did not hold"""
+
+
+class InvalidPathError(ValueError):
+    """a nested path of an update goes through a map the item does not have"""
+
+
+def update_error(error: ClientError) -> Exception:
+    """expected outcome of a failed conditional update, or error itself"""
+    code = rate_limit.error_code(error)
+    if code == "ConditionalCheckFailedException":
+        return ConditionFailedError(str(error))
+    if code == "ValidationException" and "document path" in str(error):
+        return InvalidPathError(str(error))
+    return error
+
+
 def handle_client_error(func):
     """handle client error"""
 
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except (ConditionFailedError, InvalidPathError):
+            raise
         except (ClientError, BaseException) as e:  # pylint: disable=broad-except
             logger.error(e)
             raise e
@@ -30,87 +139,624 @@ def handle_client_error(func):
     return wrapper
 
 
+class DynamoClientPool:
+    """Process-wide registry of dynamo db clients keyed by table name
+
+    boto3 sessions and resources are not thread safe, so every worker thread
+    gets its own resource (and table objects), created once from the shared
+    session and reused for the lifetime of the thread. The low-level client is
+    thread safe and shared by all threads.
+
+    max_pool_connections sizes the pool of the shared client and, separately,
+    the pool of every thread's resource, so the process may open up to
+    (threads + 1) * max_pool_connections connections. A resource is only used
+    by its thread, one request at a time, so it keeps one connection in
+    practice and only the shared client fills its pool.
+
+    Requests of every client go through the capacity governor of their table
+    in throughput, see stores.rate_limit. With coalesce_reads, concurrent
+    get_by_id calls of a table are sent together as BatchGetItem requests.
+    """
+
+    def __init__(
+        self,
+        region_name: str | None = None,
+        endpoint_url: str | None = None,
+        max_pool_connections: int = 50,
+        tcp_keepalive: bool = True,
+        connect_timeout: float = 5,
+        read_timeout: float = 10,
+        metadata_ttl: float = 300,
+        max_workers: int = 16,
+        throughput: rate_limit.ThroughputRegistry | None = None,
+        coalesce_reads: bool = False,
+        coalesce_window: float = 0.002,
+    ):
+        self.endpoint_url = endpoint_url
+        self.config = botocore.config.Config(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=tcp_keepalive,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries=NO_RETRIES,
+        )
+        self._session = boto3.session.Session(region_name=region_name)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._client = None
+        self._clients: dict[str, DynamoClient] = {}
+        self.max_workers = max_workers
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self.throughput = throughput or rate_limit.ThroughputRegistry()
+        self.coalesce_reads = coalesce_reads
+        self.coalesce_window = coalesce_window
+        self.metadata_cache = table_metadata.TableMetadataCache(
+            self.client, ttl=metadata_ttl, on_load=self.throughput.provision
+        )
+
+    def resource(self):
+        """get dynamo db resource of current thread"""
+        resource = getattr(self._local, "resource", None)
+        if resource is None:
+            with self._lock:
+                resource = self._session.resource(
+                    "dynamodb", endpoint_url=self.endpoint_url, config=self.config
+                )
+            self._local.resource = resource
+            self._local.tables = {}
+        return resource
+
+    def table(self, table_name: str):
+        """get dynamo db table of current thread"""
+        resource = self.resource()
+        table = self._local.tables.get(table_name)
+        if table is None:
+            table = resource.Table(table_name)
+            self._local.tables[table_name] = table
+        return table
+
+    def client(self):
+        """get shared low-level dynamo db client"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._session.client(
+                        "dynamodb", endpoint_url=self.endpoint_url, config=self.config
+                    )
+        return self._client
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """shared worker threads for fanning out dynamo db calls"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="dynamo-worker",
+                    )
+        return self._executor
+
+    def get_client(self, table_name: str) -> "DynamoClient":
+        """get dynamo client of table, create one if not exists"""
+        dynamo_client = self._clients.get(table_name)
+        if dynamo_client is None:
+            with self._lock:
+                dynamo_client = self._clients.get(table_name)
+                if dynamo_client is None:
+                    dynamo_client = DynamoClient(table_name, pool=self)
+                    self._clients[table_name] = dynamo_client
+        return dynamo_client
+
+    def close(self):
+        """close shared client and forget registered clients"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            self._clients.clear()
+        self.metadata_cache.invalidate()
+
+
 class DynamoClient:
     """DynamoDB client"""
 
-    def __init__(self, table_name: str):
+    def __init__(self, table_name: str, pool: DynamoClientPool | None = None):
         self.table_name = table_name
-        self.dynamodb = boto3.resource("dynamodb")
-        self.table = self.dynamodb.Table(table_name)
-
-    def _get_partition_key(self, table_name: str):
-        """get partition key"""
-        client = boto3.client("dynamodb")
-        table_description = client.describe_table(TableName=table_name)
-        key_schema = table_description["Table"]["KeySchema"]
-        for key in key_schema:
-            if key["KeyType"] == "HASH":
-                partition_key_name = key["AttributeName"]
-                break
-        return partition_key_name
-
-    def _get_sort_key(self, table_name: str):
-        """get sort key"""
-        client = boto3.client("dynamodb")
-        table_description = client.describe_table(TableName=table_name)
-        key_schema = table_description["Table"]["KeySchema"]
-        for key in key_schema:
-            if key["KeyType"] == "RANGE":
-                sort_key_name = key["AttributeName"]
-                break
-        return sort_key_name
+        self.pool = pool if pool is not None else DynamoClientPool()
+        self._get_batcher = None
+        if self.pool.coalesce_reads:
+            self._get_batcher = batching.GetBatcher(
+                self.batch_get, window=self.pool.coalesce_window
+            )
+
+    @property
+    def dynamodb(self):
+        """dynamo db resource of current thread"""
+        return self.pool.resource()
+
+    @property
+    def table(self):
+        """dynamo db table of current thread"""
+        return self.pool.table(self.table_name)
+
+    @property
+    def metadata(self) -> table_metadata.TableMetadata:
+        """cached key schema and indexes of table"""
+        return self.pool.metadata_cache.get(self.table_name)
+
+    @property
+    def throughput(self) -> rate_limit.TableThroughput:
+        """capacity governor of table"""
+        return self.pool.throughput.get(self.table_name)
+
+    def _request(self, operation: str, request, count: int = 1, **params) -> dict:
+        """send a request within the capacity of the table
+
+        Waits for the units the request is expected to consume, retries
+        throttling and transient errors with full jitter backoff and settles
+        the units with the ConsumedCapacity of the response. Every attempt
+        is recorded as a telemetry.tracing span.
+
+        Args:
+            operation (str): dynamo db operation of request, e.g. query
+            request (Callable): boto3 method sending the request
+            count (int): items of a batch request
+        """
+        throughput = self.throughput
+        kind = rate_limit.operation_kind(operation)
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+        attempt = 0
+        while True:
+            reserved, wait = throughput.reserve(operation, count)
+            if wait > 0:
+                time.sleep(wait)
+            start = time.perf_counter()
+            try:
+                response = request(**params)
+            except rate_limit.REQUEST_ERRORS as e:
+                tracing.record_call(
+                    operation,
+                    self.table_name,
+                    kind,
+                    time.perf_counter() - start,
+                    error=rate_limit.error_name(e),
+                )
+                time.sleep(throughput.backoff(operation, reserved, e, attempt))
+                attempt += 1
+                continue
+            duration = time.perf_counter() - start
+            units = throughput.record(operation, reserved, response, count)
+            tracing.record_call(
+                operation,
+                self.table_name,
+                kind,
+                duration,
+                response=response,
+                consumed_units=units,
+            )
+            return response
 
     def _create_table(self, user_id):
         """create table"""
-        table = self.dynamodb.create_table(
-            TableName=user_id,
-            KeySchema=[
-                {"AttributeName": "id", "KeyType": "HASH"},
-                {"AttributeName": "table_id", "KeyType": "RANGE"},
-            ],
-            AttributeDefinitions=[
-                {"AttributeName": "id", "AttributeType": "S"},
-                {"AttributeName": "table_id", "AttributeType": "S"},
-            ],
-            ProvisionedThroughput={"ReadCapacityUnits": 1, "WriteCapacityUnits": 1},
-        )
+        capacity = {"ReadCapacityUnits": 1, "WriteCapacityUnits": 1}
+        definition = record_table_definition(user_id)
+        for index in definition["GlobalSecondaryIndexes"]:
+            index["ProvisionedThroughput"] = capacity
+        table = self.dynamodb.create_table(**definition, ProvisionedThroughput=capacity)
         table.wait_until_exists()
+        self.pool.metadata_cache.invalidate(user_id)
         return table
 
+    @staticmethod
+    def _query_params(
+        key_condition_expression, filter_expression=None, index_name=None
+    ) -> dict:
+        params: dict = {}
+        expression.add_condition(
+            params, "KeyConditionExpression", key_condition_expression
+        )
+        expression.add_condition(params, "FilterExpression", filter_expression)
+        if index_name is not None:
+            params["IndexName"] = index_name
+        return params
+
+    @handle_client_error
+    def _query_page(self, **params) -> dict:
+        """run a single query request"""
+        return self._request("query", self.table.query, **params)
+
     @handle_client_error
-    def query(self, filter_expression, key_condition_expression, limit, start_key):
-        """query dynamo"""
-        response = self.table.query(
-            KeyConditionExpression=key_condition_expression,
-            FilterExpression=filter_expression,
-            limit=limit,
-            ExclusiveStartKey=start_key,
+    def _scan_page(self, **params) -> dict:
+        """run a single scan request"""
+        return self._request("scan", self.table.scan, **params)
+
+    @staticmethod
+    def _iter_pages(request, params: dict, start_key: dict | None) -> Iterator[dict]:
+        while True:
+            if start_key is not None:
+                params["ExclusiveStartKey"] = start_key
+            response = request(**params)
+            yield response
+            start_key = response.get("LastEvaluatedKey")
+            if start_key is None:
+                return
+
+    def iter_query_pages(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> Iterator[dict]:
+        """query dynamo page by page, following LastEvaluatedKey lazily"""
+        params = self._query_params(
+            key_condition_expression, filter_expression, index_name
+        )
+        if page_size is not None:
+            params["Limit"] = page_size
+        if select is not None:
+            params["Select"] = select
+        if projection is not None:
+            expression.add_condition(
+                params, "ProjectionExpression", expression.projection(projection)
+            )
+        return self._iter_pages(self._query_page, params, start_key)
+
+    def iter_scan_pages(
+        self,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        segment: int | None = None,
+        total_segments: int | None = None,
+        select: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> Iterator[dict]:
+        """scan dynamo page by page, optionally a single segment of a parallel scan"""
+        params: dict = {}
+        expression.add_condition(params, "FilterExpression", filter_expression)
+        if page_size is not None:
+            params["Limit"] = page_size
+        if total_segments is not None:
+            params["Segment"] = segment
+            params["TotalSegments"] = total_segments
+        if select is not None:
+            params["Select"] = select
+        if projection is not None:
+            expression.add_condition(
+                params, "ProjectionExpression", expression.projection(projection)
+            )
+        return self._iter_pages(self._scan_page, params, start_key)
+
+    def iter_query(
+        self,
+        key_condition_expression,
+        filter_expression=None,
+        start_key: dict | None = None,
+        page_size: int | None = None,
+        index_name: str | None = None,
+    ) -> Iterator[dict]:
+        """query dynamo item by item, fetching the next page only when needed"""
+        for page in self.iter_query_pages(
+            key_condition_expression=key_condition_expression,
+            filter_expression=filter_expression,
+            start_key=start_key,
+            page_size=page_size,
+            index_name=index_name,
+        ):
+            yield from page.get("Items", [])
+
+    def query(
+        self,
+        filter_expression,
+        key_condition_expression,
+        limit: int | None = None,
+        start_key: dict | None = None,
+        index_name: str | None = None,
+        projection: list[str] | tuple[str, ...] | None = None,
+    ) -> tuple[list[dict], dict | None]:
+        """query up to limit items across pages
+
+        Args:
+            projection (list[str] | tuple[str, ...] | None): attributes read,
+                None for whole items
+
+        Returns:
+            tuple[list[dict], dict | None]: items and the key to resume from,
+                None when there are no more items
+        """
+        params = self._query_params(
+            key_condition_expression, filter_expression, index_name
+        )
+        if projection is not None:
+            expression.add_condition(
+                params, "ProjectionExpression", expression.projection(projection)
+            )
+        return self._collect(self._query_page, params, limit, start_key)
+
+    def scan(
+        self,
+        filter_expression=None,
+        limit: int | None = None,
+        start_key: dict | None = None,
+    ) -> tuple[list[dict], dict | None]:
+        """scan up to limit items across pages
+
+        Returns:
+            tuple[list[dict], dict | None]: items and the key to resume from,
+                None when there are no more items
+        """
+        params: dict = {}
+        expression.add_condition(params, "FilterExpression", filter_expression)
+        return self._collect(self._scan_page, params, limit, start_key)
+
+    @staticmethod
+    def _collect(
+        request, params: dict, limit: int | None, start_key: dict | None
+    ) -> tuple[list[dict], dict | None]:
+        items: list[dict] = []
+        while True:
+            if limit is not None:
+                # filtered pages may return fewer items than evaluated, ask for
+                # the remainder only so that no item is read and dropped
+                params["Limit"] = limit - len(items)
+            if start_key is not None:
+                params["ExclusiveStartKey"] = start_key
+            response = request(**params)
+            items.extend(response.get("Items", []))
+            start_key = response.get("LastEvaluatedKey")
+            if start_key is None or (limit is not None and len(items) >= limit):
+                return items, start_key
+
+    def iter_scan(
+        self, filter_expression=None, start_key: dict | None = None
+    ) -> Iterator[dict]:
+        """scan dynamo item by item, fetching the next page only when needed"""
+        for page in self.iter_scan_pages(
+            filter_expression=filter_expression, start_key=start_key
+        ):
+            yield from page.get("Items", [])
+
+    def read_stats(
+        self,
+        key_condition_expression=None,
+        filter_expression=None,
+        index_name: str | None = None,
+    ) -> dict:
+        """items evaluated, matched and read units consumed by a query or scan
+
+        Runs the request with Select=COUNT, which reads the same items.
+        read_units is None when dynamo db does not report consumed capacity.
+        """
+        if key_condition_expression is not None:
+            params = self._query_params(
+                key_condition_expression, filter_expression, index_name
+            )
+            request = self._query_page
+        else:
+            params = {}
+            expression.add_condition(params, "FilterExpression", filter_expression)
+            request = self._scan_page
+        params["Select"] = "COUNT"
+        params["ReturnConsumedCapacity"] = "TOTAL"
+        return sum_read_stats(self._iter_pages(request, params, None))
+
+    def query_count(
+        self,
+        filter_expression,
+        key_condition_expression,
+        index_name: str | None = None,
+    ) -> int:
+        """count matching items across all pages"""
+        return sum(
+            page["Count"]
+            for page in self.iter_query_pages(
+                key_condition_expression=key_condition_expression,
+                filter_expression=filter_expression,
+                index_name=index_name,
+                select="COUNT",
+            )
         )
-        return response.get("Items")
-
-    def query_count(self, filter_expression, key_condition_expression):
-        """query dynamo"""
-        response = self.table.query(
-            KeyConditionExpression=key_condition_expression,
-            FilterExpression=filter_expression,
-            setSelect="COUNT",
+
+    def _scan_segment_count(self, filter_expression, segment, total_segments) -> int:
+        return sum(
+            page["Count"]
+            for page in self.iter_scan_pages(
+                filter_expression=filter_expression,
+                segment=segment,
+                total_segments=total_segments,
+                select="COUNT",
+            )
         )
-        return response.get("Count")
+
+    def scan_count(self, filter_expression=None, total_segments: int = 1) -> int:
+        """count matching items with a parallel scan split into total_segments"""
+        if total_segments <= 1:
+            return self._scan_segment_count(filter_expression, None, None)
+        futures = [
+            self.pool.executor.submit(
+                self._scan_segment_count, filter_expression, segment, total_segments
+            )
+            for segment in range(total_segments)
+        ]
+        return sum(future.result() for future in futures)
+
+    def _key_tuple(self, item: dict) -> tuple:
+        return tuple(item[key] for key in self.metadata.key_attributes)
+
+    def batch_write(self, items: list[dict], max_attempts: int = 8) -> list[dict]:
+        """put items with BatchWriteItem
+
+        Items are sent in chunks of 25 concurrently on the pool executor,
+        unprocessed items are retried with jittered backoff.
+
+        Returns:
+            list[dict]: per item {"success": bool, "error": str | None}, in
+                order of items
+        """
+        items = [to_dynamo_value(item) for item in items]
+        results = [{"success": True, "error": None} for _ in items]
+        futures = [
+            self.pool.executor.submit(
+                self._batch_write_chunk, items, chunk, results, max_attempts
+            )
+            for chunk in chunked(BATCH_WRITE_LIMIT, len(items))
+        ]
+        for future in futures:
+            future.result()
+        return results
+
+    def _batch_write_chunk(
+        self, items: list[dict], pending: list[int], results: list[dict], max_attempts
+    ):
+        for attempt in range(max_attempts):
+            if attempt:
+                self.throughput.throttled("batch_write_item")
+                time.sleep(rate_limit.full_jitter_delay(attempt))
+            try:
+                response = self._request(
+                    "batch_write_item",
+                    self.dynamodb.batch_write_item,
+                    count=len(pending),
+                    RequestItems={
+                        self.table_name: [
+                            {"PutRequest": {"Item": items[index]}} for index in pending
+                        ]
+                    },
+                )
+            except (ClientError, rate_limit.CapacityExceededError) as e:
+                logger.error(e)
+                for index in pending:
+                    results[index] = {"success": False, "error": str(e)}
+                return
+            unprocessed = {
+                self._key_tuple(request["PutRequest"]["Item"])
+                for request in response.get("UnprocessedItems", {}).get(
+                    self.table_name, []
+                )
+            }
+            pending = [
+                index
+                for index in pending
+                if self._key_tuple(items[index]) in unprocessed
+            ]
+            if not pending:
+                return
+        for index in pending:
+            results[index] = {
+                "success": False,
+                "error": f"Unprocessed after {max_attempts} attempts",
+            }
+
+    def batch_get(self, keys: list[dict], max_attempts: int = 8) -> list[dict]:
+        """get items by primary key with BatchGetItem
+
+        Keys are sent in chunks of 100 concurrently on the pool executor,
+        unprocessed keys are retried with jittered backoff. Keys must be unique.
+
+        Returns:
+            list[dict]: per key {"item": dict | None, "error": str | None}, in
+                order of keys, item is None when not found or failed
+        """
+        results: list[dict] = [{"item": None, "error": None} for _ in keys]
+        futures = [
+            self.pool.executor.submit(
+                self._batch_get_chunk, keys, chunk, results, max_attempts
+            )
+            for chunk in chunked(BATCH_GET_LIMIT, len(keys))
+        ]
+        for future in futures:
+            future.result()
+        return results
+
+    def _batch_get_chunk(
+        self, keys: list[dict], pending: list[int], results: list[dict], max_attempts
+    ):
+        for attempt in range(max_attempts):
+            if attempt:
+                self.throughput.throttled("batch_get_item")
+                time.sleep(rate_limit.full_jitter_delay(attempt))
+            try:
+                response = self._request(
+                    "batch_get_item",
+                    self.dynamodb.batch_get_item,
+                    count=len(pending),
+                    RequestItems={
+                        self.table_name: {"Keys": [keys[index] for index in pending]}
+                    },
+                )
+            except (ClientError, rate_limit.CapacityExceededError) as e:
+                logger.error(e)
+                for index in pending:
+                    results[index] = {"item": None, "error": str(e)}
+                return
+            index_by_key = {self._key_tuple(keys[index]): index for index in pending}
+            for item in response.get("Responses", {}).get(self.table_name, []):
+                results[index_by_key[self._key_tuple(item)]]["item"] = item
+            unprocessed = {
+                self._key_tuple(key)
+                for key in response.get("UnprocessedKeys", {})
+                .get(self.table_name, {})
+                .get("Keys", [])
+            }
+            pending = [
+                index
+                for index in pending
+                if self._key_tuple(keys[index]) in unprocessed
+            ]
+            if not pending:
+                return
+        for index in pending:
+            results[index] = {
+                "item": None,
+                "error": f"Unprocessed after {max_attempts} attempts",
+            }
 
     @handle_client_error
-    def get_by_id(self, partition_key_value: str, sort_key_value: str):
+    def get_by_id(self, partition_key_value: str, sort_key_value: str | None = None):
         """get item from dynamo"""
-        partition_key = self._get_partition_key(self.table_name)
-        sort_key = self._get_sort_key(self.table_name)
-        response = self.table.get_item(
-            Key={partition_key: partition_key_value, sort_key: sort_key_value}
-        )
+        key = self.metadata.build_key(partition_key_value, sort_key_value)
+        if self._get_batcher is not None:
+            result = self._get_batcher.get(key)
+            if result["error"] is None:
+                return result["item"]
+        response = self._request("get_item", self.table.get_item, Key=key)
         return response.get("Item")
 
     @handle_client_error
-    def create_item(self, item: dict):
-        """create new item"""
-        response = self.table.put_item(Item=item)
+    def create_item(
+        self,
+        item: dict,
+        return_values: str | None = None,
+        condition: expression.Expression | None = None,
+    ):
+        """create new item
+
+        Args:
+            item (dict): item to put
+            return_values (str | None): "ALL_OLD" to get the replaced item in
+                the Attributes of the response
+            condition (expression.Expression | None): condition the replaced
+                item must meet, e.g. that there is none
+
+        Raises:
+            ConditionFailedError: condition did not hold, nothing was written
+        """
+        params: dict = {"ReturnValues": return_values} if return_values else {}
+        expression.add_condition(params, "ConditionExpression", condition)
+        try:
+            response = self._request(
+                "put_item", self.table.put_item, Item=to_dynamo_value(item), **params
+            )
+        except ClientError as e:
+            raise update_error(e) from e
         return response
 
     @handle_client_error
@@ -118,26 +764,29 @@ class DynamoClient:
         """update item"""
 
         # Construct the key for the item to update
-        key = {"partition_key": partition_key_value}
-        if sort_key_value:
-            key["sort_key"] = sort_key_value
+        key = self.metadata.build_key(partition_key_value, sort_key_value)
         # Construct the UpdateExpression and ExpressionAttributeValues
         update_expression_parts = []
+        expression_attribute_names = {}
         expression_attribute_values = {}
 
         if updates is None:
             return
 
         for attr, value in updates.items():
-            update_expression_parts.append(f"{attr} = :{attr}")
-            expression_attribute_values[f":{attr}"] = value
+            update_expression_parts.append(f"#{attr} = :{attr}")
+            expression_attribute_names[f"#{attr}"] = attr
+            expression_attribute_values[f":{attr}"] = to_dynamo_value(value)
 
         update_expression = "SET " + ", ".join(update_expression_parts)
 
         # Perform the update operation
-        response = self.table.update_item(
+        response = self._request(
+            "update_item",
+            self.table.update_item,
             Key=key,
             UpdateExpression=update_expression,
+            ExpressionAttributeNames=expression_attribute_names,
             ExpressionAttributeValues=expression_attribute_values,
             ReturnValues="UPDATED_NEW",  # Return the updated attributes
         )
@@ -147,14 +796,52 @@ class DynamoClient:
         return updated_attributes
 
     @handle_client_error
-    def delete_item(self, partition_key_value, sort_key_value=None):
-        """delete item"""
+    def patch_item(
+        self,
+        partition_key_value,
+        sort_key_value=None,
+        update: expression.Expression | None = None,
+        condition: expression.Expression | None = None,
+        return_values: str = "ALL_NEW",
+    ) -> dict:
+        """apply a rendered update expression, returns the updated item
+
+        With return_values "UPDATED_OLD" it returns the attributes changed by
+        the update as they were before it, "ALL_OLD" the whole item before it,
+        "NONE" returns nothing.
+
+        Raises:
+            ConditionFailedError: condition did not hold, nothing was written
+            InvalidPathError: a nested path of update has no parent map
+        """
+        key = self.metadata.build_key(partition_key_value, sort_key_value)
+        params = expression.add_condition({}, "UpdateExpression", update)
+        expression.add_condition(params, "ConditionExpression", condition)
+        try:
+            response = self._request(
+                "update_item",
+                self.table.update_item,
+                Key=key,
+                ReturnValues=return_values,
+                **params,
+            )
+        except ClientError as e:
+            raise update_error(e) from e
+        return response.get("Attributes", {})
+
+    @handle_client_error
+    def delete_item(
+        self, partition_key_value, sort_key_value=None, return_values: str | None = None
+    ):
+        """delete item, with return_values "ALL_OLD" the deleted one is returned
+        in the Attributes of the response"""
         # Construct the key for the item to delete
-        key = {"partition_key": partition_key_value}
-        if sort_key_value:
-            key["sort_key"] = sort_key_value
+        key = self.metadata.build_key(partition_key_value, sort_key_value)
+        params: dict = {"ReturnValues": return_values} if return_values else {}
 
         # Perform the delete operation
-        response = self.table.delete_item(Key=key)
+        response = self._request(
+            "delete_item", self.table.delete_item, Key=key, **params
+        )
 
         return response
@@ -0,0 +1,47 @@
+"""Pre-rendered condition expressions"""
+
+import dataclasses
+from typing import Any
+
+
+@dataclasses.dataclass(frozen=True)
+class Expression:
+    """condition expression already rendered with its own placeholders
+
+    Placeholders must not clash with the #n*/:v* ones boto3 generates for
+    condition objects used in the same request.
+
+    Attributes:
+        expression (str): condition expression, e.g. "#f0 = :f0"
+        names (dict[str, str]): attribute name placeholders
+        values (dict[str, Any]): attribute value placeholders
+    """
+
+    expression: str
+    names: dict[str, str]
+    values: dict[str, Any]
+
+
+def add_condition(params: dict, param_name: str, condition) -> dict:
+    """set a condition parameter of a request from a boto3 condition or Expression
+
+    boto3 renders condition objects itself and merges its placeholders into
+    the ones set here.
+    """
+    if condition is None:
+        return params
+    if isinstance(condition, Expression):
+        params[param_name] = condition.expression
+        if condition.names:
+            params.setdefault("ExpressionAttributeNames", {}).update(condition.names)
+        if condition.values:
+            params.setdefault("ExpressionAttributeValues", {}).update(condition.values)
+    else:
+        params[param_name] = condition
+    return params
+
+
+def projection(attributes: list[str] | tuple[str, ...]) -> Expression:
+    """ProjectionExpression of top-level attributes, with #p* placeholders"""
+    names = {f"#p{index}": name for index, name in enumerate(attributes)}
+    return Expression(expression=", ".join(names), names=names, values={})
@@ -0,0 +1,641 @@
+"""Evaluate dynamo db expressions on items, for stores without dynamo db
+
+Condition, key condition and update expressions are parsed once per
+expression string into small syntax trees (kept in a bounded LRU) and
+evaluated on items in the typed form of the low-level API, e.g.
+{"N": "1.5"} or {"M": {...}}, with the ExpressionAttributeNames and
+ExpressionAttributeValues of the request. Semantics follow dynamo db:
+
+- comparing values of different types is false, only <> of a missing
+  attribute is true
+- functions of missing attributes are false, except attribute_not_exists
+- the values of SET are computed on the item before the update
+- nested SET, REMOVE, ADD and DELETE need their parent document, else
+  ExpressionError with a "document path" message, like the
+  ValidationException of dynamo db
+
+Invalid expressions raise ExpressionError as well.
+"""
+
+import base64
+import decimal
+import functools
+import re
+from typing import Any, Callable
+
+Typed = dict[str, Any]
+Path = tuple[tuple[str, Any], ...]
+Evaluator = Callable[[dict, dict, dict], Any]
+
+INVALID_PATH = (
+    "The document path provided in the update expression is invalid for update"
+)
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<name>#[A-Za-z0-9_]+)|(?P<value>:[A-Za-z0-9_]+)|(?P<number>\d+)"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*)|(?P<op><>|<=|>=|[=<>(),.\[\]+\-]))"
+)
+_COMPARATORS = ("=", "<>", "<", "<=", ">", ">=")
+_CLAUSES = ("SET", "REMOVE", "ADD", "DELETE")
+
+
+class ExpressionError(ValueError):
+    """an expression is invalid, or invalid for the item it is applied to"""
+
+
+class _Tokens:
+    """tokens of an expression with one token lookahead"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens: list[tuple[str, str]] = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = _TOKEN.match(expression, position)
+            if match is None or match.lastgroup is None or match.end() == position:
+                raise ExpressionError(f"Invalid expression: {self.expression!r}")
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> tuple[str, str]:
+        """token at offset from the position, empty strings past the end"""
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else ("", "")
+
+    def keyword(self, *words: str) -> str | None:
+        """consume the next token when it is one of words, case insensitive"""
+        kind, text = self.peek()
+        if kind == "word" and text.upper() in words:
+            self.position += 1
+            return text.upper()
+        return None
+
+    def take(self, text: str | None = None) -> tuple[str, str]:
+        kind, token = self.peek()
+        if not kind or (text is not None and token != text):
+            expected = f"{text!r}" if text is not None else "more"
+            raise ExpressionError(
+                f"Expected {expected} at token {self.position} of "
+                f"{self.expression!r}"
+            )
+        self.position += 1
+        return kind, token
+
+    def done(self) -> bool:
+        return self.position >= len(self.tokens)
+
+
+# syntax
+
+
+def _path(tokens: _Tokens) -> Path:
+    parts: list[tuple[str, Any]] = []
+    kind, text = tokens.take()
+    if kind not in ("name", "word"):
+        raise ExpressionError(f"Expected attribute in {tokens.expression!r}")
+    parts.append(("name", text))
+    while tokens.peek()[1] in (".", "["):
+        if tokens.take()[1] == ".":
+            kind, text = tokens.take()
+            if kind not in ("name", "word"):
+                raise ExpressionError(f"Expected attribute in {tokens.expression!r}")
+            parts.append(("name", text))
+        else:
+            kind, text = tokens.take()
+            if kind != "number":
+                raise ExpressionError(f"Expected list index in {tokens.expression!r}")
+            parts.append(("index", int(text)))
+            tokens.take("]")
+    return tuple(parts)
+
+
+def _operand(tokens: _Tokens) -> tuple:
+    kind, text = tokens.peek()
+    if kind == "value":
+        tokens.take()
+        return ("value", text)
+    if kind == "word" and text.lower() == "size" and tokens.peek(1)[1] == "(":
+        tokens.take()
+        tokens.take("(")
+        path = _path(tokens)
+        tokens.take(")")
+        return ("size", path)
+    return ("path", _path(tokens))
+
+
+def _condition(tokens: _Tokens) -> tuple:
+    node = _conjunction(tokens)
+    while tokens.keyword("OR"):
+        node = ("or", node, _conjunction(tokens))
+    return node
+
+
+def _conjunction(tokens: _Tokens) -> tuple:
+    node = _negation(tokens)
+    while tokens.keyword("AND"):
+        node = ("and", node, _negation(tokens))
+    return node
+
+
+def _negation(tokens: _Tokens) -> tuple:
+    if tokens.keyword("NOT"):
+        return ("not", _negation(tokens))
+    return _predicate(tokens)
+
+
+def _predicate(tokens: _Tokens) -> tuple:
+    kind, text = tokens.peek()
+    if text == "(":
+        tokens.take()
+        node = _condition(tokens)
+        tokens.take(")")
+        return node
+    if kind == "word" and text.lower() != "size" and tokens.peek(1)[1] == "(":
+        tokens.take()
+        tokens.take("(")
+        arguments = [_operand(tokens)]
+        while tokens.peek()[1] == ",":
+            tokens.take()
+            arguments.append(_operand(tokens))
+        tokens.take(")")
+        return ("function", text.lower(), tuple(arguments))
+    left = _operand(tokens)
+    if tokens.keyword("BETWEEN"):
+        low = _operand(tokens)
+        if not tokens.keyword("AND"):
+            raise ExpressionError(f"Expected AND of BETWEEN in {tokens.expression!r}")
+        return ("between", left, low, _operand(tokens))
+    if tokens.keyword("IN"):
+        tokens.take("(")
+        options = [_operand(tokens)]
+        while tokens.peek()[1] == ",":
+            tokens.take()
+            options.append(_operand(tokens))
+        tokens.take(")")
+        return ("in", left, tuple(options))
+    _, comparator = tokens.take()
+    if comparator not in _COMPARATORS:
+        raise ExpressionError(f"Unknown comparator {comparator!r}")
+    return ("compare", comparator, left, _operand(tokens))
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_condition(expression: str) -> tuple:
+    """syntax tree of a condition or key condition expression
+
+    Raises:
+        ExpressionError: expression is invalid
+    """
+    tokens = _Tokens(expression)
+    node = _condition(tokens)
+    if not tokens.done():
+        raise ExpressionError(f"Unexpected token in {expression!r}")
+    return node
+
+
+def _set_value(tokens: _Tokens) -> tuple:
+    node = _set_operand(tokens)
+    if tokens.peek()[1] in ("+", "-"):
+        _, operator = tokens.take()
+        node = ("arithmetic", operator, node, _set_operand(tokens))
+    return node
+
+
+def _set_operand(tokens: _Tokens) -> tuple:
+    kind, text = tokens.peek()
+    if (
+        kind == "word"
+        and text.lower() in ("if_not_exists", "list_append")
+        and tokens.peek(1)[1] == "("
+    ):
+        tokens.take()
+        tokens.take("(")
+        first = _set_operand(tokens)
+        tokens.take(",")
+        second = _set_operand(tokens)
+        tokens.take(")")
+        return (text.lower(), first, second)
+    return _operand(tokens)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_update(expression: str) -> dict[str, list]:
+    """actions of an update expression per clause
+
+    Returns:
+        dict[str, list]: "SET" [(path, value node)], "REMOVE" [path],
+            "ADD" and "DELETE" [(path, value node)]
+
+    Raises:
+        ExpressionError: expression is invalid
+    """
+    tokens = _Tokens(expression)
+    actions: dict[str, list] = {clause: [] for clause in _CLAUSES}
+    while not tokens.done():
+        clause = tokens.keyword(*_CLAUSES)
+        if clause is None:
+            raise ExpressionError(
+                f"Expected SET, REMOVE, ADD or DELETE in {expression!r}"
+            )
+        while True:
+            path = _path(tokens)
+            if clause == "SET":
+                tokens.take("=")
+                actions[clause].append((path, _set_value(tokens)))
+            elif clause == "REMOVE":
+                actions[clause].append(path)
+            else:
+                actions[clause].append((path, _operand(tokens)))
+            if tokens.peek()[1] != ",":
+                break
+            tokens.take()
+    return actions
+
+
+# typed values
+
+
+def number(typed: Typed) -> decimal.Decimal:
+    """Decimal of a typed number"""
+    return decimal.Decimal(typed["N"])
+
+
+def _kind(typed: Typed) -> str:
+    return next(iter(typed))
+
+
+def _scalar(typed: Typed) -> Any:
+    kind, raw = next(iter(typed.items()))
+    if kind == "N":
+        return decimal.Decimal(raw)
+    if kind in ("SS", "BS"):
+        return frozenset(raw)
+    if kind == "NS":
+        return frozenset(decimal.Decimal(item) for item in raw)
+    return raw
+
+
+def equal(left: Typed | None, right: Typed | None) -> bool:
+    """dynamo db equality of two typed values, numbers by value"""
+    if left is None or right is None:
+        return left is right
+    kind = _kind(left)
+    if kind != _kind(right):
+        return False
+    if kind == "M":
+        return left["M"].keys() == right["M"].keys() and all(
+            equal(value, right["M"][key]) for key, value in left["M"].items()
+        )
+    if kind == "L":
+        return len(left["L"]) == len(right["L"]) and all(
+            equal(a, b) for a, b in zip(left["L"], right["L"])
+        )
+    return _scalar(left) == _scalar(right)
+
+
+def _ordered(left: Typed | None, right: Typed | None) -> tuple[Any, Any] | None:
+    if left is None or right is None:
+        return None
+    kind = _kind(left)
+    if kind != _kind(right) or kind not in ("N", "S", "B"):
+        return None
+    return _scalar(left), _scalar(right)
+
+
+def resolve(item: dict, path: Path, names: dict) -> Typed | None:
+    """typed value at path of item, None when missing"""
+    value: Typed = {"M": item}
+    for kind, part in path:
+        if kind == "index":
+            values = value.get("L")
+            if values is None or part >= len(values):
+                return None
+            value = values[part]
+        else:
+            members = value.get("M")
+            name = _name(part, names)
+            if members is None or name not in members:
+                return None
+            value = members[name]
+    return value
+
+
+def _name(part: str, names: dict) -> str:
+    if part[0] != "#":
+        return part
+    try:
+        return names[part]
+    except KeyError as e:
+        raise ExpressionError(f"Undefined attribute name {part}") from e
+
+
+def attribute_value(token: str, values: dict) -> Typed:
+    """typed value of a :placeholder"""
+    try:
+        return values[token]
+    except KeyError as e:
+        raise ExpressionError(f"Undefined attribute value {token}") from e
+
+
+def _size(typed: Typed | None) -> Typed | None:
+    if typed is None:
+        return None
+    kind, raw = next(iter(typed.items()))
+    if kind in ("N", "BOOL", "NULL"):
+        return None
+    if kind == "B":
+        raw = _bytes(raw)
+    return {"N": str(len(raw))}
+
+
+def _bytes(raw) -> bytes:
+    return base64.b64decode(raw) if isinstance(raw, str) else bytes(raw)
+
+
+def _operand_evaluator(node: tuple) -> Evaluator:
+    kind = node[0]
+    if kind == "value":
+        token = node[1]
+        return lambda item, names, values: attribute_value(token, values)
+    if kind == "size":
+        path = node[1]
+        return lambda item, names, values: _size(resolve(item, path, names))
+    path = node[1]
+    return lambda item, names, values: resolve(item, path, names)
+
+
+def _compare(comparator: str, left: Typed | None, right: Typed | None) -> bool:
+    if comparator == "=":
+        return left is not None and equal(left, right)
+    if comparator == "<>":
+        return not equal(left, right)
+    pair = _ordered(left, right)
+    if pair is None:
+        return False
+    a, b = pair
+    if comparator == "<":
+        return a < b
+    if comparator == "<=":
+        return a <= b
+    if comparator == ">":
+        return a > b
+    return a >= b
+
+
+def _contains(container: Typed | None, member: Typed | None) -> bool:
+    if container is None or member is None:
+        return False
+    kind = _kind(container)
+    if kind == "S":
+        return _kind(member) == "S" and member["S"] in container["S"]
+    if kind in ("SS", "NS", "BS"):
+        return _kind(member) == kind[0] and _scalar(member) in _scalar(container)
+    if kind == "L":
+        return any(equal(element, member) for element in container["L"])
+    return False
+
+
+def _begins_with(value: Typed | None, prefix: Typed | None) -> bool:
+    if value is None or prefix is None or _kind(value) != _kind(prefix):
+        return False
+    if _kind(value) == "S":
+        return value["S"].startswith(prefix["S"])
+    if _kind(value) == "B":
+        return _bytes(value["B"]).startswith(_bytes(prefix["B"]))
+    return False
+
+
+_FUNCTIONS: dict[str, tuple[int, Callable[..., bool]]] = {
+    "attribute_exists": (1, lambda value: value is not None),
+    "attribute_not_exists": (1, lambda value: value is None),
+    "attribute_type": (
+        2,
+        lambda value, kind: value is not None
+        and kind is not None
+        and _kind(value) == kind.get("S"),
+    ),
+    "begins_with": (2, _begins_with),
+    "contains": (2, _contains),
+}
+
+
+def _evaluator(node: tuple) -> Callable[[dict, dict, dict], bool]:
+    kind = node[0]
+    if kind in ("and", "or"):
+        left, right = _evaluator(node[1]), _evaluator(node[2])
+        if kind == "and":
+            return lambda item, names, values: left(item, names, values) and right(
+                item, names, values
+            )
+        return lambda item, names, values: left(item, names, values) or right(
+            item, names, values
+        )
+    if kind == "not":
+        inner = _evaluator(node[1])
+        return lambda item, names, values: not inner(item, names, values)
+    if kind == "compare":
+        comparator = node[1]
+        left, right = _operand_evaluator(node[2]), _operand_evaluator(node[3])
+        return lambda item, names, values: _compare(
+            comparator, left(item, names, values), right(item, names, values)
+        )
+    if kind == "between":
+        value, low, high = (_operand_evaluator(operand) for operand in node[1:])
+
+        def between(item, names, values) -> bool:
+            current = value(item, names, values)
+            return _compare(">=", current, low(item, names, values)) and _compare(
+                "<=", current, high(item, names, values)
+            )
+
+        return between
+    if kind == "in":
+        value = _operand_evaluator(node[1])
+        options = [_operand_evaluator(option) for option in node[2]]
+
+        def is_in(item, names, values) -> bool:
+            current = value(item, names, values)
+            return current is not None and any(
+                equal(current, option(item, names, values)) for option in options
+            )
+
+        return is_in
+    name, arguments = node[1], node[2]
+    if name not in _FUNCTIONS or len(arguments) != _FUNCTIONS[name][0]:
+        raise ExpressionError(f"Unknown function {name} of {len(arguments)} arguments")
+    function = _FUNCTIONS[name][1]
+    evaluators = [_operand_evaluator(argument) for argument in arguments]
+    return lambda item, names, values: function(
+        *(evaluate(item, names, values) for evaluate in evaluators)
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_condition(expression: str) -> Callable[[dict, dict, dict], bool]:
+    """predicate of a condition expression on (item, names, values)
+
+    Raises:
+        ExpressionError: expression is invalid
+    """
+    return _evaluator(parse_condition(expression))
+
+
+def matches(item: dict, expression: str | None, names: dict, values: dict) -> bool:
+    """whether typed item matches condition expression, True without one"""
+    if expression is None:
+        return True
+    return compile_condition(expression)(item, names, values)
+
+
+# updates
+
+
+def _set_evaluator(node: tuple, item: dict, names: dict, values: dict) -> Typed:
+    kind = node[0]
+    if kind == "if_not_exists":
+        if node[1][0] != "path":
+            raise ExpressionError("if_not_exists takes an attribute path first")
+        current = resolve(item, node[1][1], names)
+        return (
+            current
+            if current is not None
+            else _set_evaluator(node[2], item, names, values)
+        )
+    if kind == "list_append":
+        first = _set_evaluator(node[1], item, names, values)
+        second = _set_evaluator(node[2], item, names, values)
+        if _kind(first) != "L" or _kind(second) != "L":
+            raise ExpressionError("list_append takes two lists")
+        return {"L": [*first["L"], *second["L"]]}
+    if kind == "arithmetic":
+        left = _set_evaluator(node[2], item, names, values)
+        right = _set_evaluator(node[3], item, names, values)
+        if _kind(left) != "N" or _kind(right) != "N":
+            raise ExpressionError("Arithmetic operands must be numbers")
+        result = (
+            number(left) + number(right)
+            if node[1] == "+"
+            else number(left) - number(right)
+        )
+        return {"N": str(result)}
+    if kind == "value":
+        return attribute_value(node[1], values)
+    if kind == "size":
+        raise ExpressionError("size() is not valid in an update")
+    value = resolve(item, node[1], names)
+    if value is None:
+        raise ExpressionError(
+            "The provided expression refers to an attribute that does not exist "
+            "in the item"
+        )
+    return value
+
+
+def _parent(item: dict, path: Path, names: dict) -> Typed | None:
+    if len(path) == 1:
+        return {"M": item}
+    return resolve(item, path[:-1], names)
+
+
+def _assign(item: dict, path: Path, names: dict, value: Typed):
+    parent = _parent(item, path, names)
+    kind, part = path[-1]
+    if kind == "name" and parent is not None and "M" in parent:
+        parent["M"][_name(part, names)] = value
+    elif kind == "index" and parent is not None and "L" in parent:
+        if part < len(parent["L"]):
+            parent["L"][part] = value
+        else:
+            parent["L"].append(value)
+    else:
+        raise ExpressionError(INVALID_PATH)
+
+
+def _remove(item: dict, path: Path, names: dict):
+    parent = _parent(item, path, names)
+    kind, part = path[-1]
+    if kind == "name" and parent is not None and "M" in parent:
+        parent["M"].pop(_name(part, names), None)
+    elif kind == "index" and parent is not None and "L" in parent:
+        if part < len(parent["L"]):
+            del parent["L"][part]
+    else:
+        raise ExpressionError(INVALID_PATH)
+
+
+def _add(current: Typed | None, value: Typed) -> Typed:
+    kind = _kind(value)
+    if current is not None and _kind(current) != kind:
+        raise ExpressionError("ADD operand type does not match the attribute")
+    if kind == "N":
+        total = number(value) + (number(current) if current is not None else 0)
+        return {"N": str(total)}
+    if kind in ("SS", "NS", "BS"):
+        existing = current[kind] if current is not None else []
+        merged = dict.fromkeys(existing)
+        merged.update(dict.fromkeys(value[kind]))
+        return {kind: list(merged)}
+    raise ExpressionError("ADD takes a number or a set")
+
+
+def _delete(current: Typed | None, value: Typed) -> Typed | None:
+    kind = _kind(value)
+    if kind not in ("SS", "NS", "BS"):
+        raise ExpressionError("DELETE takes a set")
+    if current is None:
+        return None
+    if _kind(current) != kind:
+        raise ExpressionError("DELETE operand type does not match the attribute")
+    removed = _scalar(value)
+    remaining = [
+        element for element in current[kind] if _scalar({kind: [element]}) - removed
+    ]
+    return {kind: remaining} if remaining else None
+
+
+def apply_update(item: dict, expression: str, names: dict, values: dict) -> dict:
+    """apply an update expression to a typed item in place
+
+    Returns:
+        dict: item
+
+    Raises:
+        ExpressionError: expression is invalid, or a path is invalid for item
+    """
+    actions = parse_update(expression)
+    # every value is computed on the item as it was before the update
+    assignments = [
+        (path, _set_evaluator(node, item, names, values))
+        for path, node in actions["SET"]
+    ]
+    for path, value in assignments:
+        _assign(item, path, names, value)
+    for path in actions["REMOVE"]:
+        _remove(item, path, names)
+    for path, node in actions["ADD"]:
+        operand = attribute_value(node[1], values) if node[0] == "value" else None
+        if operand is None:
+            raise ExpressionError("ADD takes an attribute value")
+        _assign(item, path, names, _add(resolve(item, path, names), operand))
+    for path, node in actions["DELETE"]:
+        operand = attribute_value(node[1], values) if node[0] == "value" else None
+        if operand is None:
+            raise ExpressionError("DELETE takes an attribute value")
+        remaining = _delete(resolve(item, path, names), operand)
+        if remaining is None:
+            _remove(item, path, names)
+        else:
+            _assign(item, path, names, remaining)
+    return item
+
+
+def projection(item: dict, expression: str, names: dict) -> dict:
+    """top-level attributes of typed item named by a projection expression"""
+    projected = {}
+    for part in expression.split(","):
+        name = _name(part.strip(), names)
+        if name in item:
+            projected[name] = item[name]
+    return projected
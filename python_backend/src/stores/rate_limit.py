@@ -0,0 +1,459 @@
+"""Rate limiting of dynamo db capacity
+
+Every table gets a TableThroughput governor with a token bucket of read units
+and one of write units. A request reserves the units it is expected to consume
+before it is sent, and the ConsumedCapacity of its response settles the
+difference, so that the buckets follow what dynamo db actually charged.
+
+The rate of a bucket adapts like TCP congestion control: it starts at the
+provisioned capacity of the table (unlimited for on-demand tables unless
+configured), drops multiplicatively on every throttling error and grows back
+additively while requests succeed. Requests wait for capacity instead of
+failing, for at most max_wait seconds, after which CapacityExceededError is
+raised so that callers can answer 503 with Retry-After.
+
+The retries of botocore are turned off (stores.dynamo_db.NO_RETRIES), so every
+attempt goes through the governor, which sees and counts every throttle and
+also retries the transient network errors botocore would have retried.
+"""
+
+import random
+import threading
+import time
+
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectionError as BotocoreConnectionError,
+    ReadTimeoutError,
+)
+from loguru import logger
+
+READ = "read"
+WRITE = "write"
+READ_OPERATIONS = {"get_item", "batch_get_item", "query", "scan"}
+THROTTLING_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+# transient network errors, retried like RETRYABLE_ERROR_CODES: failed and
+# timed out connections (EndpointConnectionError, ConnectTimeoutError),
+# connections reset by the peer and reads timing out
+NETWORK_ERRORS = (BotocoreConnectionError, ConnectionClosedError, ReadTimeoutError)
+# errors a request is retried on, see TableThroughput.backoff
+REQUEST_ERRORS = (ClientError, *NETWORK_ERRORS)
+
+
+class CapacityExceededError(Exception):
+    """Table capacity stays exhausted longer than callers may wait
+
+    Attributes:
+        retry_after (float): seconds until capacity is expected to be available
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def full_jitter_delay(attempt: int, base: float = 0.05, cap: float = 5) -> float:
+    """seconds to wait before retry attempt, exponential with full jitter"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def error_code(error: Exception) -> str | None:
+    """dynamo db error code of a client error, None for other errors"""
+    if not isinstance(error, ClientError):
+        return None
+    return error.response.get("Error", {}).get("Code")
+
+
+def error_name(error: Exception) -> str:
+    """error code of a client error, class name of other errors"""
+    return error_code(error) or type(error).__name__
+
+
+def is_retryable(error: Exception) -> bool:
+    """whether the error is throttling or transient"""
+    if isinstance(error, NETWORK_ERRORS):
+        return True
+    return error_code(error) in RETRYABLE_ERROR_CODES
+
+
+def is_throttling(error: Exception) -> bool:
+    """whether the error reports exhausted capacity"""
+    return error_code(error) in THROTTLING_ERROR_CODES
+
+
+def operation_kind(operation: str) -> str:
+    """READ or WRITE capacity used by a dynamo db operation"""
+    return READ if operation in READ_OPERATIONS else WRITE
+
+
+def consumed_units(response: dict, table_name: str) -> float | None:
+    """capacity units a response reports for table, None when not reported
+
+    Single item operations, queries and scans report one ConsumedCapacity,
+    batch operations a list with one entry per table.
+    """
+    capacity = response.get("ConsumedCapacity")
+    if capacity is None:
+        return None
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    units = [
+        float(entry["CapacityUnits"])
+        for entry in capacity
+        if entry.get("TableName", table_name) == table_name and "CapacityUnits" in entry
+    ]
+    return sum(units) if units else None
+
+
+class TokenBucket:
+    """Thread-safe token bucket, e.g. of write capacity units per second
+
+    Args:
+        rate (float): tokens added per second, unlimited when 0 or less
+        burst (float | None): maximum tokens saved up, defaults to one second
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated_at) * self.rate
+            )
+        self._updated_at = now
+
+    def reserve(self, tokens: float = 1, max_wait: float | None = None) -> float:
+        """take tokens without blocking, return seconds to wait before using them
+
+        Requests larger than burst are let through once the bucket is full,
+        leaving it in debt, so that they are not blocked forever.
+
+        Raises:
+            CapacityExceededError: the wait would be longer than max_wait, no
+                tokens are taken
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (min(tokens, self.burst) - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise CapacityExceededError(
+                    f"Capacity of {tokens:g} units not available within "
+                    f"{max_wait:g} seconds",
+                    retry_after=wait,
+                )
+            # reserve now, later callers queue behind the debt
+            self._tokens -= tokens
+        return wait
+
+    def acquire(self, tokens: float = 1) -> float:
+        """take tokens, blocking until available, return seconds waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def adjust(self, tokens: float):
+        """give back tokens, or take more when negative, e.g. once the actual
+        cost of a reserved request is known"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.burst, self._tokens + tokens)
+
+    def set_rate(self, rate: float, burst: float | None = None):
+        """change rate and burst, keeping the tokens saved up so far"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.rate <= 0 < rate:
+                # unlimited buckets do not count tokens, start full
+                self._tokens = burst if burst is not None else max(rate, 1)
+            self.rate = rate
+            self.burst = burst if burst is not None else max(rate, 1)
+            self._tokens = min(self._tokens, self.burst)
+
+
+class _Capacity:
+    """adaptive bucket and counters of one kind of capacity of a table"""
+
+    def __init__(self, rate: float, burst_seconds: float):
+        self.burst_seconds = burst_seconds
+        self.ceiling: float | None = rate if rate > 0 else None
+        self.bucket = TokenBucket(rate, burst=self._burst(rate))
+        self.estimates: dict[str, float] = {}
+        self.adjusted_at = time.monotonic()
+        self.window_start = time.monotonic()
+        self.window_units = 0.0
+        self.observed_rate = 0.0
+        self.counters = {
+            "requests": 0,
+            "throttled": 0,
+            "retries": 0,
+            "rejected": 0,
+            "failed": 0,
+            "consumed_units": 0.0,
+            "wait_seconds": 0.0,
+            "backoff_seconds": 0.0,
+        }
+
+    def _burst(self, rate: float) -> float:
+        return max(rate * self.burst_seconds, 1)
+
+    def set_rate(self, rate: float):
+        self.bucket.set_rate(rate, burst=self._burst(rate))
+        self.adjusted_at = time.monotonic()
+
+    def observe(self, units: float, now: float):
+        """track units consumed per second over windows of one second"""
+        self.window_units += units
+        elapsed = now - self.window_start
+        if elapsed >= 1:
+            self.observed_rate = self.window_units / elapsed
+            self.window_start = now
+            self.window_units = 0.0
+
+
+class TableThroughput:
+    """Adaptive read and write capacity governor of a table
+
+    Args:
+        table_name (str): table name
+        read_units_per_second (float): starting read rate, 0 for unlimited
+        write_units_per_second (float): starting write rate, 0 for unlimited
+        max_attempts (int): attempts of a request before giving up
+        max_wait (float): seconds a request may wait for capacity
+        burst_seconds (float): seconds of unused capacity saved up
+        decrease (float): rate multiplier on throttling
+        increase (float): share of the rate added per second without throttling
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        read_units_per_second: float = 0,
+        write_units_per_second: float = 0,
+        max_attempts: int = 8,
+        max_wait: float = 2,
+        burst_seconds: float = 5,
+        decrease: float = 0.7,
+        increase: float = 0.1,
+    ):
+        self.table_name = table_name
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+        self.decrease = decrease
+        self.increase = increase
+        self._lock = threading.Lock()
+        self._capacity = {
+            READ: _Capacity(read_units_per_second, burst_seconds),
+            WRITE: _Capacity(write_units_per_second, burst_seconds),
+        }
+        self._provisioned: tuple[float | None, float | None] | None = None
+
+    def provision(self, read_units: float | None, write_units: float | None):
+        """cap rates at the provisioned capacity of the table, None for on-demand"""
+        if self._provisioned == (read_units, write_units):
+            return
+        with self._lock:
+            self._provisioned = (read_units, write_units)
+            for kind, units in ((READ, read_units), (WRITE, write_units)):
+                if units is None:
+                    continue
+                capacity = self._capacity[kind]
+                capacity.ceiling = float(units)
+                rate = capacity.bucket.rate
+                if rate <= 0 or rate > units:
+                    capacity.set_rate(float(units))
+
+    def reserve(self, operation: str, count: int = 1) -> tuple[float, float]:
+        """reserve the expected units of a request
+
+        Args:
+            operation (str): dynamo db operation, e.g. query or put_item
+            count (int): items of a batch operation
+
+        Returns:
+            tuple[float, float]: reserved units and seconds to wait before
+                sending the request
+
+        Raises:
+            CapacityExceededError: capacity is not available within max_wait
+        """
+        capacity = self._capacity[operation_kind(operation)]
+        estimate = capacity.estimates.get(operation, 1.0) * count
+        try:
+            wait = capacity.bucket.reserve(estimate, max_wait=self.max_wait)
+        except CapacityExceededError:
+            with self._lock:
+                capacity.counters["rejected"] += 1
+            raise
+        with self._lock:
+            capacity.counters["requests"] += 1
+            capacity.counters["wait_seconds"] += wait
+        return estimate, wait
+
+    def record(
+        self, operation: str, reserved: float, response: dict, count: int = 1
+    ) -> float | None:
+        """settle reserved units with the ConsumedCapacity of the response
+
+        Returns:
+            float | None: units consumed, None when not reported
+        """
+        capacity = self._capacity[operation_kind(operation)]
+        units = consumed_units(response, self.table_name)
+        if units is None:
+            return None
+        capacity.bucket.adjust(reserved - units)
+        now = time.monotonic()
+        with self._lock:
+            capacity.counters["consumed_units"] += units
+            previous = capacity.estimates.get(operation, units / count)
+            capacity.estimates[operation] = 0.8 * previous + 0.2 * units / count
+            capacity.observe(units, now)
+            if now - capacity.adjusted_at >= 1:
+                self._increase(capacity)
+        return units
+
+    def _increase(self, capacity: _Capacity):
+        rate = capacity.bucket.rate
+        if rate <= 0:
+            return
+        rate += max(1.0, rate * self.increase)
+        if capacity.ceiling is None and rate > 2 * capacity.observed_rate:
+            # on-demand table well above demand again, stop limiting it
+            rate = 0
+        elif capacity.ceiling is not None:
+            rate = min(rate, capacity.ceiling)
+        capacity.set_rate(rate)
+
+    def throttled(self, operation: str):
+        """lower the rate after dynamo db throttled a request"""
+        kind = operation_kind(operation)
+        capacity = self._capacity[kind]
+        with self._lock:
+            capacity.counters["throttled"] += 1
+            rate = capacity.bucket.rate
+            if rate <= 0:
+                rate = max(capacity.observed_rate, capacity.window_units, 1.0)
+            rate = max(1.0, rate * self.decrease)
+            capacity.set_rate(rate)
+        logger.warning(
+            "Throttled {operation} on {table}, {kind} rate lowered",
+            operation=operation,
+            table=self.table_name,
+            kind=kind,
+            rate=round(rate, 1),
+        )
+
+    def backoff(
+        self, operation: str, reserved: float, error: Exception, attempt: int
+    ) -> float:
+        """seconds to wait before retrying a request that failed with error,
+        a ClientError or one of NETWORK_ERRORS
+
+        Raises:
+            Exception: error is not retryable, or transient errors persist
+            CapacityExceededError: still throttled after max_attempts
+        """
+        capacity = self._capacity[operation_kind(operation)]
+        # failed requests consume no capacity
+        capacity.bucket.adjust(reserved)
+        if not is_retryable(error):
+            raise error
+        throttling = is_throttling(error)
+        if throttling:
+            self.throttled(operation)
+        if attempt + 1 >= self.max_attempts:
+            with self._lock:
+                capacity.counters["failed"] += 1
+            if throttling:
+                raise CapacityExceededError(
+                    f"{operation} on {self.table_name} throttled "
+                    f"{self.max_attempts} times",
+                    retry_after=full_jitter_delay(attempt + 1),
+                ) from error
+            raise error
+        delay = full_jitter_delay(attempt + 1)
+        with self._lock:
+            capacity.counters["retries"] += 1
+            capacity.counters["backoff_seconds"] += delay
+        return delay
+
+    def snapshot(self) -> dict:
+        """current rates and counters per kind of capacity"""
+        with self._lock:
+            return {
+                kind: {
+                    "rate": capacity.bucket.rate if capacity.bucket.rate > 0 else None,
+                    "ceiling": capacity.ceiling,
+                    **capacity.counters,
+                }
+                for kind, capacity in self._capacity.items()
+            }
+
+
+class ThroughputRegistry:
+    """TableThroughput of every table, shared by the sync and async pools
+
+    Args:
+        read_units_per_second (float): starting read rate of tables without
+            provisioned capacity, 0 for unlimited until throttled
+        write_units_per_second (float): starting write rate of tables without
+            provisioned capacity, 0 for unlimited until throttled
+        max_attempts (int): attempts of a request before giving up
+        max_wait (float): seconds a request may wait for capacity
+    """
+
+    def __init__(
+        self,
+        read_units_per_second: float = 0,
+        write_units_per_second: float = 0,
+        max_attempts: int = 8,
+        max_wait: float = 2,
+    ):
+        self.options: dict = {
+            "read_units_per_second": read_units_per_second,
+            "write_units_per_second": write_units_per_second,
+            "max_attempts": max_attempts,
+            "max_wait": max_wait,
+        }
+        self._lock = threading.Lock()
+        self._tables: dict[str, TableThroughput] = {}
+
+    def get(self, table_name: str) -> TableThroughput:
+        """get governor of table, create one if not exists"""
+        throughput = self._tables.get(table_name)
+        if throughput is None:
+            with self._lock:
+                throughput = self._tables.get(table_name)
+                if throughput is None:
+                    throughput = TableThroughput(table_name, **self.options)
+                    self._tables[table_name] = throughput
+        return throughput
+
+    def provision(self, metadata):
+        """apply provisioned capacity of described table metadata"""
+        self.get(metadata.table_name).provision(*metadata.provisioned_capacity())
+
+    def snapshot(self) -> dict:
+        """rates and counters of every table"""
+        with self._lock:
+            tables = dict(self._tables)
+        return {name: throughput.snapshot() for name, throughput in tables.items()}
@@ -0,0 +1,1144 @@
+"""Embedded sqlite store speaking the dynamo db API
+
+SqliteEngine serves the dynamo db operations the clients of
+stores.dynamo_db and stores.async_dynamo_db send (get, put, update and
+delete of items, query, scan, batch get and write, create and describe
+table), with the request and response shapes of the low-level botocore
+client, so that both clients, the query planner and the services run
+unchanged against a local database file or an in-memory one.
+
+Every dynamo db table is a sqlite table (pk, sk, item) keyed by its
+partition and sort key, the item being the typed JSON of the low-level API.
+Every secondary index is a JSON1 expression index on the key attributes of
+the index, e.g. json_extract(item, '$."table_id"."S"'), partial on items
+having them like a sparse dynamo db index, so queries of an index are
+index range scans in key order. Number keys are stored as text ordering like
+the numbers, see number_key, so that they keep all their digits. Condition,
+filter and update expressions are evaluated by stores.expression_eval,
+failures are raised as the ClientError dynamo db would return
+(ConditionalCheckFailedException, ValidationException,
+ResourceNotFoundException). Item sizes are counted like dynamo db does, see
+item_size.
+
+Files are opened in WAL mode, so readers do not block the writer, and
+connections are reused from a bounded pool. Writes needing the current item
+(conditions, update expressions) run in a BEGIN IMMEDIATE transaction. An
+in-memory database lives in a single connection, shared by every request.
+
+SqliteClientPool and AsyncSqliteClientPool plug the engine in as the pools
+of stores.dynamo_db and stores.async_dynamo_db.
+"""
+
+import asyncio
+import base64
+import contextlib
+import copy
+import decimal
+import queue
+import sqlite3
+import threading
+from typing import Any, Iterator
+
+import orjson
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from stores import async_dynamo_db, dynamo_db, expression_eval, rate_limit
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_ITEM_SIZE = 400 * 1024
+MEMORY = ":memory:"
+_COMPLEMENT = str.maketrans("0123456789", "9876543210")
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def client_error(code: str, message: str, operation: str) -> ClientError:
+    """ClientError of a dynamo db error response"""
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def _identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def number_key(raw: str | None) -> str | None:
+    """text of a dynamo db number ordering like the number, exact to every digit
+
+    The sign comes first, then the biased decimal exponent and the significant
+    digits, complemented for negative numbers, e.g. "1" is "25001", "1.5" is
+    "250015" and "-1.5" is "049984~".
+    """
+    if raw is None:
+        return None
+    sign, digits, exponent = decimal.Decimal(raw).as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError(f"Number is not finite: {raw}")
+    text = "".join(map(str, digits))
+    significant = text.rstrip("0")
+    if not significant:
+        return "1"
+    adjusted = exponent + len(text) - 1
+    if not sign:
+        return f"2{adjusted + 500:03d}{significant}"
+    complement = significant.translate(_COMPLEMENT)
+    # a longer mantissa is a smaller negative number, "~" sorts after digits
+    return f"0{499 - adjusted:03d}{complement}~"
+
+
+def _sql_value(typed: dict) -> Any:
+    """sqlite value of a typed key attribute"""
+    kind, raw = next(iter(typed.items()))
+    if kind == "N":
+        return number_key(raw)
+    if kind == "B":
+        return base64.b64decode(raw) if isinstance(raw, str) else bytes(raw)
+    return raw
+
+
+def _value_size(kind: str, raw: Any) -> int:
+    if kind == "S":
+        return len(raw.encode())
+    if kind == "N":
+        digits = decimal.Decimal(raw).as_tuple().digits
+        significant = "".join(map(str, digits)).strip("0")
+        return (len(significant) + 1) // 2 + 1
+    if kind == "B":
+        return len(base64.b64decode(raw) if isinstance(raw, str) else raw)
+    if kind in ("SS", "NS", "BS"):
+        return sum(_value_size(kind[0], value) for value in raw)
+    if kind == "M":
+        return 3 + sum(
+            len(name.encode()) + 1 + _value_size(*next(iter(value.items())))
+            for name, value in raw.items()
+        )
+    if kind == "L":
+        return 3 + sum(1 + _value_size(*next(iter(value.items()))) for value in raw)
+    # BOOL and NULL
+    return 1
+
+
+def item_size(item: dict) -> int:
+    """size of a typed item as dynamo db counts it against MAX_ITEM_SIZE
+
+    The bytes of every attribute name and value: UTF-8 strings, raw binary,
+    a byte per two significant digits of a number plus one, and for lists
+    and maps 3 bytes plus a byte per element.
+    """
+    return sum(
+        len(name.encode()) + _value_size(*next(iter(value.items())))
+        for name, value in item.items()
+    )
+
+
+def _encode_binary(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dump_item(item: dict) -> str:
+    """stored JSON of a typed item, binary values base64 encoded"""
+    return orjson.dumps(item, default=_encode_binary).decode()
+
+
+def _decode_binary(typed: dict) -> dict:
+    kind, raw = next(iter(typed.items()))
+    if kind == "B":
+        return {"B": base64.b64decode(raw)}
+    if kind == "BS":
+        return {"BS": [base64.b64decode(value) for value in raw]}
+    if kind == "M":
+        return {"M": {key: _decode_binary(value) for key, value in raw.items()}}
+    if kind == "L":
+        return {"L": [_decode_binary(value) for value in raw]}
+    return typed
+
+
+def load_item(text: str) -> dict:
+    """typed item of stored JSON"""
+    item = orjson.loads(text)
+    # only items with binary values need a walk
+    if '"B' in text:
+        item = {key: _decode_binary(value) for key, value in item.items()}
+    return item
+
+
+class _Schema:
+    """keys of a table or index as sqlite expressions over its rows"""
+
+    def __init__(self, hash_key: str, range_key: str | None, sql: dict[str, str]):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.hash_sql = sql[hash_key]
+        self.range_sql = sql[range_key] if range_key is not None else None
+
+
+class _Table:
+    """definition of a table with the sqlite expressions of its keys"""
+
+    def __init__(self, definition: dict):
+        self.definition = definition
+        self.name = definition["TableName"]
+        self.sql_name = _identifier("t_" + self.name)
+        self.types = {
+            attribute["AttributeName"]: attribute["AttributeType"]
+            for attribute in definition["AttributeDefinitions"]
+        }
+        hash_key, range_key = _key_schema(definition["KeySchema"])
+        self.key = _Schema(
+            hash_key,
+            range_key,
+            {hash_key: "pk", **({range_key: "sk"} if range_key else {})},
+        )
+        self.indexes: dict[str, _Schema] = {}
+        for index in definition.get("GlobalSecondaryIndexes", []) + definition.get(
+            "LocalSecondaryIndexes", []
+        ):
+            index_hash, index_range = _key_schema(index["KeySchema"])
+            sql = {hash_key: "pk"}
+            if range_key is not None:
+                sql[range_key] = "sk"
+            for attribute in (index_hash, index_range):
+                if attribute is not None and attribute not in sql:
+                    sql[attribute] = self._attribute_sql(attribute)
+            self.indexes[index["IndexName"]] = _Schema(index_hash, index_range, sql)
+
+    def _attribute_sql(self, attribute: str) -> str:
+        kind = self.types[attribute]
+        path = _literal(f'$."{attribute}"."{kind}"')
+        if kind == "N":
+            return f"dynamo_number(json_extract(item, {path}))"
+        return f"json_extract(item, {path})"
+
+    def ddl(self) -> list[str]:
+        """statements creating the sqlite table and index of every index"""
+        statements = [
+            f"CREATE TABLE IF NOT EXISTS {self.sql_name} "
+            "(pk NOT NULL, sk NOT NULL, item TEXT NOT NULL, PRIMARY KEY (pk, sk)) "
+            "WITHOUT ROWID"
+        ]
+        for name, index in self.indexes.items():
+            columns = [index.hash_sql]
+            if index.range_sql is not None:
+                columns.append(index.range_sql)
+            # key columns are never null, and the planner cannot match a
+            # partial index on them being not null
+            present = " AND ".join(
+                f"{column} IS NOT NULL"
+                for column in columns
+                if column not in ("pk", "sk")
+            )
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS "
+                f"{_identifier('i_' + self.name + '_' + name)} ON {self.sql_name} "
+                f"({', '.join(columns)})" + (f" WHERE {present}" if present else "")
+            )
+        return statements
+
+    def row_key(self, item: dict, operation: str) -> tuple[Any, Any]:
+        """(pk, sk) of an item or key"""
+        try:
+            hash_value = item[self.key.hash_key]
+            range_value = (
+                item[self.key.range_key] if self.key.range_key is not None else None
+            )
+        except KeyError as e:
+            raise client_error(
+                "ValidationException",
+                "The provided key element does not match the schema",
+                operation,
+            ) from e
+        return _sql_value(hash_value), (
+            _sql_value(range_value) if range_value is not None else ""
+        )
+
+    def key_of(self, item: dict, index: _Schema | None = None) -> dict:
+        """typed primary key of item, with the index keys when index is set"""
+        attributes = [self.key.hash_key]
+        if self.key.range_key is not None:
+            attributes.append(self.key.range_key)
+        if index is not None:
+            attributes += [index.hash_key] + (
+                [index.range_key] if index.range_key is not None else []
+            )
+        return {attribute: item[attribute] for attribute in dict.fromkeys(attributes)}
+
+    def description(self, item_count: int) -> dict:
+        """DescribeTable response of the table"""
+        table = {
+            **self.definition,
+            "TableStatus": "ACTIVE",
+            "ItemCount": item_count,
+            "BillingModeSummary": {"BillingMode": "PAY_PER_REQUEST"},
+        }
+        for field in ("GlobalSecondaryIndexes", "LocalSecondaryIndexes"):
+            if field in table:
+                table[field] = [
+                    {**index, "IndexStatus": "ACTIVE"} for index in table[field]
+                ]
+        return {"Table": table}
+
+
+def _key_schema(key_schema: list[dict]) -> tuple[str, str | None]:
+    hash_key: str | None = None
+    range_key: str | None = None
+    for element in key_schema:
+        if element["KeyType"] == "HASH":
+            hash_key = element["AttributeName"]
+        else:
+            range_key = element["AttributeName"]
+    if hash_key is None:
+        raise ValueError("Key schema has no HASH key")
+    return hash_key, range_key
+
+
+def _flatten_and(node: tuple) -> list[tuple]:
+    if node[0] == "and":
+        return _flatten_and(node[1]) + _flatten_and(node[2])
+    return [node]
+
+
+def _path_name(operand: tuple, names: dict) -> str | None:
+    if operand[0] != "path" or len(operand[1]) != 1:
+        return None
+    part = operand[1][0][1]
+    return names.get(part) if part.startswith("#") else part
+
+
+def _prefix_upper_bound(prefix: str) -> str | None:
+    """smallest string greater than every string starting with prefix"""
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SqliteEngine:
+    """dynamo db tables in a sqlite database
+
+    Args:
+        path (str): database file, or ":memory:" for a database living as long
+            as the engine
+        max_connections (int): connections of the pool, 1 for ":memory:"
+        busy_timeout (float): seconds a writer waits for the lock of another
+    """
+
+    def __init__(
+        self, path: str = MEMORY, max_connections: int = 8, busy_timeout: float = 5
+    ):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.max_connections = 1 if path == MEMORY else max_connections
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+        self._tables: dict[str, _Table] = {}
+        with self.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS _tables "
+                "(name TEXT PRIMARY KEY, definition TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        # expression of the index keys of number attributes
+        connection.create_function("dynamo_number", 1, number_key, deterministic=True)
+        if self.path != MEMORY:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            self._connections.append(connection)
+        return connection
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """connection of the pool, opened when none is idle"""
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            finally:
+                if connection.in_transaction:
+                    connection.rollback()
+                self._idle.put(connection)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """connection in a write transaction, committed when the block succeeds"""
+        with self.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self):
+        """close every connection, an in-memory database is dropped"""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._idle = queue.LifoQueue()
+
+    def _table(self, name: str, operation: str) -> _Table:
+        table = self._tables.get(name)
+        if table is None:
+            with self.connection() as connection:
+                row = connection.execute(
+                    "SELECT definition FROM _tables WHERE name = ?", (name,)
+                ).fetchone()
+            if row is None:
+                raise client_error(
+                    "ResourceNotFoundException",
+                    f"Requested resource not found: Table: {name} not found",
+                    operation,
+                )
+            table = _Table(orjson.loads(row[0]))
+            self._tables[name] = table
+        return table
+
+    # tables
+
+    def create_table(self, **params) -> dict:
+        """create a table and its indexes, like CreateTable"""
+        definition = {
+            field: params[field]
+            for field in (
+                "TableName",
+                "KeySchema",
+                "AttributeDefinitions",
+                "GlobalSecondaryIndexes",
+                "LocalSecondaryIndexes",
+            )
+            if field in params
+        }
+        # capacity of the table and its indexes does not apply
+        if "GlobalSecondaryIndexes" in definition:
+            definition["GlobalSecondaryIndexes"] = [
+                {
+                    field: value
+                    for field, value in index.items()
+                    if field != "ProvisionedThroughput"
+                }
+                for index in definition["GlobalSecondaryIndexes"]
+            ]
+        table = _Table(definition)
+        with self.transaction() as connection:
+            if connection.execute(
+                "SELECT 1 FROM _tables WHERE name = ?", (table.name,)
+            ).fetchone():
+                raise client_error(
+                    "ResourceInUseException",
+                    f"Table already exists: {table.name}",
+                    "CreateTable",
+                )
+            connection.execute(
+                "INSERT INTO _tables (name, definition) VALUES (?, ?)",
+                (table.name, orjson.dumps(definition).decode()),
+            )
+            for statement in table.ddl():
+                connection.execute(statement)
+        self._tables[table.name] = table
+        return {"TableDescription": table.description(0)["Table"]}
+
+    # the operations take the keyword arguments of the low-level dynamo db API
+    # (TableName, Key, Item, RequestItems) that the clients send, hence the
+    # invalid-name suppressions
+    def describe_table(  # pylint: disable=invalid-name
+        self, TableName: str, **_
+    ) -> dict:
+        """definition of a table, like DescribeTable"""
+        table = self._table(TableName, "DescribeTable")
+        with self.connection() as connection:
+            (count,) = connection.execute(
+                f"SELECT count(*) FROM {table.sql_name}"
+            ).fetchone()
+        return table.description(count)
+
+    def list_tables(self, **_) -> dict:
+        """names of the tables, like ListTables"""
+        with self.connection() as connection:
+            rows = connection.execute("SELECT name FROM _tables ORDER BY name")
+            return {"TableNames": [name for (name,) in rows]}
+
+    # items
+
+    @staticmethod
+    def _evaluate(operation: str, function, *args):
+        try:
+            return function(*args)
+        except expression_eval.ExpressionError as e:
+            raise client_error("ValidationException", str(e), operation) from e
+
+    def _check(self, operation: str, item: dict, params: dict):
+        condition = params.get("ConditionExpression")
+        if condition is None:
+            return
+        holds = self._evaluate(
+            operation,
+            expression_eval.matches,
+            item,
+            condition,
+            params.get("ExpressionAttributeNames", {}),
+            params.get("ExpressionAttributeValues", {}),
+        )
+        if not holds:
+            raise client_error(
+                "ConditionalCheckFailedException",
+                "The conditional request failed",
+                operation,
+            )
+
+    @staticmethod
+    def _stored(item: dict, operation: str) -> str:
+        text = dump_item(item)
+        if item_size(item) > MAX_ITEM_SIZE:
+            raise client_error(
+                "ValidationException",
+                "Item size has exceeded the maximum allowed size",
+                operation,
+            )
+        return text
+
+    @staticmethod
+    def _read(connection: sqlite3.Connection, table: _Table, key: tuple) -> dict | None:
+        row = connection.execute(
+            f"SELECT item FROM {table.sql_name} WHERE pk = ? AND sk = ?", key
+        ).fetchone()
+        return load_item(row[0]) if row is not None else None
+
+    def get_item(  # pylint: disable=invalid-name
+        self, TableName: str, Key: dict, **params
+    ) -> dict:
+        """item by primary key, like GetItem"""
+        table = self._table(TableName, "GetItem")
+        key = table.row_key(Key, "GetItem")
+        with self.connection() as connection:
+            item = self._read(connection, table, key)
+        if item is None:
+            return {}
+        return {"Item": self._project(item, params)}
+
+    def put_item(  # pylint: disable=invalid-name
+        self, TableName: str, Item: dict, **params
+    ) -> dict:
+        """write an item, like PutItem"""
+        table = self._table(TableName, "PutItem")
+        key = table.row_key(Item, "PutItem")
+        text = self._stored(Item, "PutItem")
+        statement = (
+            f"INSERT OR REPLACE INTO {table.sql_name} (pk, sk, item) VALUES (?, ?, ?)"
+        )
+        if "ConditionExpression" not in params and params.get("ReturnValues") != (
+            "ALL_OLD"
+        ):
+            with self.connection() as connection:
+                connection.execute(statement, (*key, text))
+            return {}
+        with self.transaction() as connection:
+            previous = self._read(connection, table, key)
+            self._check("PutItem", previous or {}, params)
+            connection.execute(statement, (*key, text))
+        if params.get("ReturnValues") == "ALL_OLD" and previous is not None:
+            return {"Attributes": previous}
+        return {}
+
+    def update_item(  # pylint: disable=invalid-name
+        self, TableName: str, Key: dict, **params
+    ) -> dict:
+        """apply an update expression, like UpdateItem"""
+        table = self._table(TableName, "UpdateItem")
+        key = table.row_key(Key, "UpdateItem")
+        with self.transaction() as connection:
+            previous = self._read(connection, table, key)
+            self._check("UpdateItem", previous or {}, params)
+            item = copy.deepcopy(previous) if previous is not None else dict(Key)
+            if "UpdateExpression" in params:
+                self._evaluate(
+                    "UpdateItem",
+                    expression_eval.apply_update,
+                    item,
+                    params["UpdateExpression"],
+                    params.get("ExpressionAttributeNames", {}),
+                    params.get("ExpressionAttributeValues", {}),
+                )
+            if table.row_key(item, "UpdateItem") != key:
+                raise client_error(
+                    "ValidationException",
+                    "Cannot update attribute of the key",
+                    "UpdateItem",
+                )
+            connection.execute(
+                f"INSERT OR REPLACE INTO {table.sql_name} (pk, sk, item) "
+                "VALUES (?, ?, ?)",
+                (*key, self._stored(item, "UpdateItem")),
+            )
+        return {"Attributes": _returned(params.get("ReturnValues"), previous, item)}
+
+    def delete_item(  # pylint: disable=invalid-name
+        self, TableName: str, Key: dict, **params
+    ) -> dict:
+        """delete an item by primary key, like DeleteItem"""
+        table = self._table(TableName, "DeleteItem")
+        key = table.row_key(Key, "DeleteItem")
+        statement = f"DELETE FROM {table.sql_name} WHERE pk = ? AND sk = ?"
+        if "ConditionExpression" not in params and params.get("ReturnValues") != (
+            "ALL_OLD"
+        ):
+            with self.connection() as connection:
+                connection.execute(statement, key)
+            return {}
+        with self.transaction() as connection:
+            previous = self._read(connection, table, key)
+            self._check("DeleteItem", previous or {}, params)
+            connection.execute(statement, key)
+        if params.get("ReturnValues") == "ALL_OLD" and previous is not None:
+            return {"Attributes": previous}
+        return {}
+
+    def batch_get_item(  # pylint: disable=invalid-name
+        self, RequestItems: dict, **_
+    ) -> dict:
+        """items by primary key of several tables, like BatchGetItem"""
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self._table(table_name, "BatchGetItem")
+            keys = [table.row_key(key, "BatchGetItem") for key in request["Keys"]]
+            pairs = ", ".join("(?, ?)" for _ in keys)
+            with self.connection() as connection:
+                rows = connection.execute(
+                    f"SELECT item FROM {table.sql_name} WHERE (pk, sk) IN "
+                    f"(VALUES {pairs})",
+                    [value for key in keys for value in key],
+                ).fetchall()
+            responses[table_name] = [
+                self._project(load_item(text), request) for (text,) in rows
+            ]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(  # pylint: disable=invalid-name
+        self, RequestItems: dict, **_
+    ) -> dict:
+        """put and delete items of several tables, like BatchWriteItem"""
+        with self.transaction() as connection:
+            for table_name, requests in RequestItems.items():
+                table = self._table(table_name, "BatchWriteItem")
+                puts = []
+                deletes = []
+                for request in requests:
+                    if "PutRequest" in request:
+                        item = request["PutRequest"]["Item"]
+                        puts.append(
+                            (
+                                *table.row_key(item, "BatchWriteItem"),
+                                self._stored(item, "BatchWriteItem"),
+                            )
+                        )
+                    else:
+                        deletes.append(
+                            table.row_key(
+                                request["DeleteRequest"]["Key"], "BatchWriteItem"
+                            )
+                        )
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {table.sql_name} (pk, sk, item) "
+                    "VALUES (?, ?, ?)",
+                    puts,
+                )
+                connection.executemany(
+                    f"DELETE FROM {table.sql_name} WHERE pk = ? AND sk = ?", deletes
+                )
+        return {"UnprocessedItems": {}}
+
+    # reads of many items
+
+    def _project(self, item: dict, params: dict) -> dict:
+        if "ProjectionExpression" not in params:
+            return item
+        return self._evaluate(
+            "Query",
+            expression_eval.projection,
+            item,
+            params["ProjectionExpression"],
+            params.get("ExpressionAttributeNames", {}),
+        )
+
+    def _key_conditions(
+        self, schema: _Schema, params: dict
+    ) -> tuple[list[str], list[Any]]:
+        """sqlite conditions and arguments of KeyConditionExpression"""
+        names = params.get("ExpressionAttributeNames", {})
+        values = params.get("ExpressionAttributeValues", {})
+
+        def value(operand: tuple) -> Any:
+            if operand[0] != "value":
+                raise expression_eval.ExpressionError("Key conditions take values")
+            return _sql_value(expression_eval.attribute_value(operand[1], values))
+
+        node = expression_eval.parse_condition(params["KeyConditionExpression"])
+        conditions: list[str] = []
+        arguments: list[Any] = []
+        has_hash = False
+        for term in _flatten_and(node):
+            kind = term[0]
+            if kind == "compare":
+                attribute, operands = _path_name(term[2], names), [term[3]]
+            elif kind == "between":
+                attribute, operands = _path_name(term[1], names), list(term[2:])
+            elif kind == "function" and term[1] == "begins_with":
+                attribute, operands = _path_name(term[2][0], names), [term[2][1]]
+            else:
+                attribute, operands = None, []
+            if attribute == schema.hash_key and kind == "compare" and term[1] == "=":
+                has_hash = True
+                conditions.append(f"{schema.hash_sql} = ?")
+            elif attribute is None or attribute != schema.range_key:
+                raise expression_eval.ExpressionError(
+                    "Query key condition not supported"
+                )
+            elif kind == "compare" and term[1] != "<>":
+                conditions.append(f"{schema.range_sql} {term[1]} ?")
+            elif kind == "between":
+                conditions.append(f"{schema.range_sql} BETWEEN ? AND ?")
+            elif kind == "function":
+                prefix = value(operands[0])
+                upper = _prefix_upper_bound(prefix)
+                conditions.append(f"{schema.range_sql} >= ?")
+                if upper is not None:
+                    conditions.append(f"{schema.range_sql} < ?")
+                    operands.append(("upper", upper))
+            else:
+                raise expression_eval.ExpressionError(
+                    "Query key condition not supported"
+                )
+            arguments += [
+                operand[1] if operand[0] == "upper" else value(operand)
+                for operand in operands
+            ]
+        if not has_hash:
+            raise expression_eval.ExpressionError(
+                "Query condition missed key schema element"
+            )
+        return conditions, arguments
+
+    def _page(
+        self,
+        operation: str,
+        table: _Table,
+        schema: _Schema | None,
+        conditions: list[str],
+        arguments: list[Any],
+        order: list[str],
+        params: dict,
+    ) -> dict:
+        """one page of the rows matching conditions, in order"""
+        descending = params.get("ScanIndexForward", True) is False
+        filter_expression = params.get("FilterExpression")
+        names = params.get("ExpressionAttributeNames", {})
+        values = params.get("ExpressionAttributeValues", {})
+        count_only = params.get("Select") == "COUNT"
+        where = " AND ".join(conditions) or "1"
+
+        if count_only and filter_expression is None and "Limit" not in params:
+            start = params.get("ExclusiveStartKey")
+            if start is not None:
+                where += f" AND ({', '.join(order)}) > ({', '.join('?' * len(order))})"
+                arguments = arguments + self._start(table, schema, start)
+            with self.connection() as connection:
+                (count,) = connection.execute(
+                    f"SELECT count(*) FROM {table.sql_name} WHERE {where}", arguments
+                ).fetchone()
+            return {"Count": count, "ScannedCount": count}
+
+        start = params.get("ExclusiveStartKey")
+        if start is not None:
+            comparator = "<" if descending else ">"
+            where += (
+                f" AND ({', '.join(order)}) {comparator} "
+                f"({', '.join('?' * len(order))})"
+            )
+            arguments = arguments + self._start(table, schema, start)
+        direction = " DESC" if descending else ""
+        limit = params.get("Limit", DEFAULT_PAGE_SIZE)
+        # one more row tells whether the page is the last one
+        with self.connection() as connection:
+            rows = connection.execute(
+                f"SELECT item FROM {table.sql_name} WHERE {where} ORDER BY "
+                f"{', '.join(column + direction for column in order)} LIMIT ?",
+                [*arguments, limit + 1],
+            ).fetchall()
+        more = len(rows) > limit
+        evaluated = [load_item(text) for (text,) in rows[:limit]]
+        items = evaluated
+        if filter_expression is not None:
+            predicate = self._evaluate(
+                operation, expression_eval.compile_condition, filter_expression
+            )
+            items = [
+                item
+                for item in evaluated
+                if self._evaluate(operation, predicate, item, names, values)
+            ]
+        response: dict = {"Count": len(items), "ScannedCount": len(evaluated)}
+        if not count_only:
+            response["Items"] = [self._project(item, params) for item in items]
+        if more:
+            response["LastEvaluatedKey"] = table.key_of(evaluated[-1], schema)
+        return response
+
+    @staticmethod
+    def _start(table: _Table, schema: _Schema | None, start: dict) -> list[Any]:
+        """sqlite values of the order columns of ExclusiveStartKey"""
+        pk, sk = table.row_key(start, "Query")
+        if schema is None:
+            return [pk, sk]
+        if schema is table.key:
+            return [sk]
+        values = [pk, sk]
+        if schema.range_key is not None:
+            values.insert(0, _sql_value(start[schema.range_key]))
+        return values
+
+    def query(self, TableName: str, **params) -> dict:  # pylint: disable=invalid-name
+        """page of the items of a partition of the table or an index, like Query"""
+        table = self._table(TableName, "Query")
+        index_name = params.get("IndexName")
+        if index_name is None:
+            schema = table.key
+            order = ["sk"]
+        else:
+            if index_name not in table.indexes:
+                raise client_error(
+                    "ValidationException",
+                    f"The table does not have the specified index: {index_name}",
+                    "Query",
+                )
+            schema = table.indexes[index_name]
+            order = [schema.range_sql, "pk", "sk"] if schema.range_sql else ["pk", "sk"]
+        conditions, arguments = self._evaluate(
+            "Query", self._key_conditions, schema, params
+        )
+        if schema.range_sql not in (None, "sk"):
+            # an index only has the items with its keys
+            conditions.append(f"{schema.range_sql} IS NOT NULL")
+        return self._page("Query", table, schema, conditions, arguments, order, params)
+
+    def scan(self, TableName: str, **params) -> dict:  # pylint: disable=invalid-name
+        """page of the items of the table or a segment of it, like Scan"""
+        table = self._table(TableName, "Scan")
+        conditions: list[str] = []
+        arguments: list[Any] = []
+        if "TotalSegments" in params:
+            # segments by the last two characters of the partition key
+            conditions.append(
+                "(unicode(substr(CAST(pk AS TEXT), -1)) * 31 "
+                "+ coalesce(unicode(substr(CAST(pk AS TEXT), -2, 1)), 0)) % ? = ?"
+            )
+            arguments += [params["TotalSegments"], params["Segment"]]
+        return self._page(
+            "Scan", table, None, conditions, arguments, ["pk", "sk"], params
+        )
+
+
+def _returned(return_values: str | None, previous: dict | None, item: dict) -> dict:
+    """Attributes of an UpdateItem response"""
+    previous = previous or {}
+    if return_values == "ALL_NEW":
+        return item
+    if return_values == "ALL_OLD":
+        return previous
+    changed = [
+        name
+        for name in item.keys() | previous.keys()
+        if not expression_eval.equal(item.get(name), previous.get(name))
+    ]
+    if return_values == "UPDATED_NEW":
+        return {name: item[name] for name in changed if name in item}
+    if return_values == "UPDATED_OLD":
+        return {name: previous[name] for name in changed if name in previous}
+    return {}
+
+
+def serialize(value: dict) -> dict:
+    """typed attributes of native ones"""
+    return {name: _serializer.serialize(item) for name, item in value.items()}
+
+
+def deserialize(value: dict) -> dict:
+    """native attributes of typed ones"""
+    return {name: _deserializer.deserialize(item) for name, item in value.items()}
+
+
+class SqliteTable:
+    """Table of the engine with the interface of a boto3 Table resource
+
+    Takes and returns native values, and renders boto3 condition objects
+    like the resource layer of boto3.
+    """
+
+    _CONDITIONS = {
+        "KeyConditionExpression": True,
+        "FilterExpression": False,
+        "ConditionExpression": False,
+    }
+
+    def __init__(self, engine: SqliteEngine, name: str):
+        self.engine = engine
+        self.name = name
+
+    def _params(self, params: dict) -> dict:
+        params = dict(params, TableName=self.name)
+        builder = ConditionExpressionBuilder()
+        for field, is_key_condition in self._CONDITIONS.items():
+            condition = params.get(field)
+            if isinstance(condition, ConditionBase):
+                built = builder.build_expression(
+                    condition, is_key_condition=is_key_condition
+                )
+                params[field] = built.condition_expression
+                params["ExpressionAttributeNames"] = {
+                    **params.get("ExpressionAttributeNames", {}),
+                    **built.attribute_name_placeholders,
+                }
+                params["ExpressionAttributeValues"] = {
+                    **params.get("ExpressionAttributeValues", {}),
+                    **built.attribute_value_placeholders,
+                }
+        for field in ("Item", "Key", "ExclusiveStartKey", "ExpressionAttributeValues"):
+            if field in params:
+                params[field] = serialize(params[field])
+        return params
+
+    @staticmethod
+    def _response(response: dict) -> dict:
+        for field in ("Item", "Attributes", "LastEvaluatedKey"):
+            if field in response:
+                response[field] = deserialize(response[field])
+        if "Items" in response:
+            response["Items"] = [deserialize(item) for item in response["Items"]]
+        return response
+
+    def get_item(self, **params) -> dict:
+        """see SqliteEngine.get_item"""
+        return self._response(self.engine.get_item(**self._params(params)))
+
+    def put_item(self, **params) -> dict:
+        """see SqliteEngine.put_item"""
+        return self._response(self.engine.put_item(**self._params(params)))
+
+    def update_item(self, **params) -> dict:
+        """see SqliteEngine.update_item"""
+        return self._response(self.engine.update_item(**self._params(params)))
+
+    def delete_item(self, **params) -> dict:
+        """see SqliteEngine.delete_item"""
+        return self._response(self.engine.delete_item(**self._params(params)))
+
+    def query(self, **params) -> dict:
+        """see SqliteEngine.query"""
+        return self._response(self.engine.query(**self._params(params)))
+
+    def scan(self, **params) -> dict:
+        """see SqliteEngine.scan"""
+        return self._response(self.engine.scan(**self._params(params)))
+
+    def wait_until_exists(self):
+        """tables of the engine exist once created"""
+
+
+class SqliteResource:
+    """Engine with the interface of a boto3 dynamo db service resource"""
+
+    def __init__(self, engine: SqliteEngine):
+        self.engine = engine
+
+    # Table and the batch operations mirror the boto3 resource API
+    def Table(self, name: str) -> SqliteTable:  # pylint: disable=invalid-name
+        """table of the engine"""
+        return SqliteTable(self.engine, name)
+
+    def create_table(self, **params) -> SqliteTable:
+        """create a table, see SqliteEngine.create_table"""
+        self.engine.create_table(**params)
+        return self.Table(params["TableName"])
+
+    def batch_get_item(  # pylint: disable=invalid-name
+        self, RequestItems: dict, **_
+    ) -> dict:
+        """see SqliteEngine.batch_get_item"""
+        response = self.engine.batch_get_item(
+            RequestItems={
+                name: {**request, "Keys": [serialize(key) for key in request["Keys"]]}
+                for name, request in RequestItems.items()
+            }
+        )
+        response["Responses"] = {
+            name: [deserialize(item) for item in items]
+            for name, items in response["Responses"].items()
+        }
+        return response
+
+    def batch_write_item(  # pylint: disable=invalid-name
+        self, RequestItems: dict, **_
+    ) -> dict:
+        """see SqliteEngine.batch_write_item"""
+        return self.engine.batch_write_item(
+            RequestItems={
+                name: [
+                    (
+                        {
+                            "PutRequest": {
+                                "Item": serialize(request["PutRequest"]["Item"])
+                            }
+                        }
+                        if "PutRequest" in request
+                        else {
+                            "DeleteRequest": {
+                                "Key": serialize(request["DeleteRequest"]["Key"])
+                            }
+                        }
+                    )
+                    for request in requests
+                ]
+                for name, requests in RequestItems.items()
+            }
+        )
+
+
+class SqliteClientPool(dynamo_db.DynamoClientPool):
+    """DynamoClientPool whose clients read and write a SqliteEngine
+
+    The pool closes the engine when closed.
+    """
+
+    def __init__(
+        self,
+        engine: SqliteEngine,
+        metadata_ttl: float = 300,
+        max_workers: int = 16,
+        throughput: rate_limit.ThroughputRegistry | None = None,
+    ):
+        super().__init__(
+            metadata_ttl=metadata_ttl, max_workers=max_workers, throughput=throughput
+        )
+        self.engine = engine
+        self._resource = SqliteResource(engine)
+        self._tables: dict[str, SqliteTable] = {}
+
+    def resource(self) -> SqliteResource:
+        """resource of the engine, shared by every thread"""
+        return self._resource
+
+    def table(self, table_name: str) -> SqliteTable:
+        """table of the engine"""
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables.setdefault(
+                table_name, SqliteTable(self.engine, table_name)
+            )
+        return table
+
+    def client(self) -> SqliteEngine:
+        """the engine, which speaks the low-level client API"""
+        return self.engine
+
+    def close(self):
+        """close the clients and the engine"""
+        super().close()
+        self.engine.close()
+
+
+class AsyncSqliteClient:
+    """SqliteEngine with the interface of an aiobotocore dynamo db client
+
+    Calls run on the default executor of the event loop.
+    """
+
+    def __init__(self, engine: SqliteEngine):
+        self.engine = engine
+
+    async def _call(self, operation: str, params: dict) -> dict:
+        return await asyncio.to_thread(getattr(self.engine, operation), **params)
+
+    async def describe_table(self, **params) -> dict:
+        """see SqliteEngine.describe_table"""
+        return await self._call("describe_table", params)
+
+    async def get_item(self, **params) -> dict:
+        """see SqliteEngine.get_item"""
+        return await self._call("get_item", params)
+
+    async def put_item(self, **params) -> dict:
+        """see SqliteEngine.put_item"""
+        return await self._call("put_item", params)
+
+    async def update_item(self, **params) -> dict:
+        """see SqliteEngine.update_item"""
+        return await self._call("update_item", params)
+
+    async def delete_item(self, **params) -> dict:
+        """see SqliteEngine.delete_item"""
+        return await self._call("delete_item", params)
+
+    async def query(self, **params) -> dict:
+        """see SqliteEngine.query"""
+        return await self._call("query", params)
+
+    async def scan(self, **params) -> dict:
+        """see SqliteEngine.scan"""
+        return await self._call("scan", params)
+
+    async def batch_get_item(self, **params) -> dict:
+        """see SqliteEngine.batch_get_item"""
+        return await self._call("batch_get_item", params)
+
+    async def batch_write_item(self, **params) -> dict:
+        """see SqliteEngine.batch_write_item"""
+        return await self._call("batch_write_item", params)
+
+
+class AsyncSqliteClientPool(async_dynamo_db.AsyncDynamoClientPool):
+    """AsyncDynamoClientPool whose clients read and write a SqliteEngine
+
+    The engine is left open on close, it belongs to the SqliteClientPool
+    sharing it.
+    """
+
+    def __init__(
+        self,
+        engine: SqliteEngine,
+        metadata_ttl: float = 300,
+        throughput: rate_limit.ThroughputRegistry | None = None,
+    ):
+        super().__init__(metadata_ttl=metadata_ttl, throughput=throughput)
+        self.engine = engine
+
+    async def open(self):
+        """create the client of the engine"""
+        if self._client is None:
+            self._client = AsyncSqliteClient(self.engine)
+
+    async def close(self):
+        """forget the client and registered clients"""
+        self._client = None
+        self._clients.clear()
+        self.metadata_cache.invalidate()
@@ -0,0 +1,200 @@
+"""cached dynamo db table metadata"""
+
+import dataclasses
+import threading
+import time
+from typing import Any, Callable
+
+
+@dataclasses.dataclass(frozen=True)
+class IndexMetadata:
+    """key schema of a secondary index
+
+    Attributes:
+        name (str): index name
+        partition_key (str): partition key attribute of the index
+        sort_key (str | None): sort key attribute of the index
+        projection_type (str): ALL, KEYS_ONLY or INCLUDE
+        is_global (bool): global or local secondary index
+        read_capacity_units (int | None): provisioned reads of a global index
+        write_capacity_units (int | None): provisioned writes of a global index
+    """
+
+    name: str
+    partition_key: str
+    sort_key: str | None
+    projection_type: str
+    is_global: bool
+    read_capacity_units: int | None = None
+    write_capacity_units: int | None = None
+
+
+@dataclasses.dataclass(frozen=True)
+class TableMetadata:
+    """key schema, indexes and attribute types of a table
+
+    Attributes:
+        table_name (str): table name
+        partition_key (str): partition key attribute
+        sort_key (str | None): sort key attribute
+        attribute_types (dict[str, str]): attribute name to S, N or B
+        indexes (tuple[IndexMetadata, ...]): global and local secondary indexes
+        read_capacity_units (int | None): provisioned reads, None when on-demand
+        write_capacity_units (int | None): provisioned writes, None when on-demand
+    """
+
+    table_name: str
+    partition_key: str
+    sort_key: str | None
+    attribute_types: dict[str, str]
+    indexes: tuple[IndexMetadata, ...] = ()
+    read_capacity_units: int | None = None
+    write_capacity_units: int | None = None
+
+    @classmethod
+    def from_description(cls, description: dict) -> "TableMetadata":
+        """build metadata from DescribeTable response"""
+        table = description["Table"]
+        partition_key, sort_key = _parse_key_schema(table["KeySchema"])
+        throughput = table.get("ProvisionedThroughput", {})
+        indexes = []
+        for is_global, index_field in (
+            (True, "GlobalSecondaryIndexes"),
+            (False, "LocalSecondaryIndexes"),
+        ):
+            for index in table.get(index_field, []):
+                index_partition_key, index_sort_key = _parse_key_schema(
+                    index["KeySchema"]
+                )
+                index_throughput = index.get("ProvisionedThroughput", {})
+                indexes.append(
+                    IndexMetadata(
+                        name=index["IndexName"],
+                        partition_key=index_partition_key,
+                        sort_key=index_sort_key,
+                        projection_type=index["Projection"]["ProjectionType"],
+                        is_global=is_global,
+                        read_capacity_units=index_throughput.get("ReadCapacityUnits")
+                        or None,
+                        write_capacity_units=index_throughput.get("WriteCapacityUnits")
+                        or None,
+                    )
+                )
+        return cls(
+            table_name=table["TableName"],
+            partition_key=partition_key,
+            sort_key=sort_key,
+            attribute_types={
+                attribute["AttributeName"]: attribute["AttributeType"]
+                for attribute in table.get("AttributeDefinitions", [])
+            },
+            indexes=tuple(indexes),
+            # on-demand tables report 0
+            read_capacity_units=throughput.get("ReadCapacityUnits") or None,
+            write_capacity_units=throughput.get("WriteCapacityUnits") or None,
+        )
+
+    @property
+    def key_attributes(self) -> tuple[str, ...]:
+        """attributes forming the primary key"""
+        if self.sort_key is None:
+            return (self.partition_key,)
+        return (self.partition_key, self.sort_key)
+
+    def provisioned_capacity(self) -> tuple[int | None, int | None]:
+        """read and write units of table and global indexes together
+
+        ConsumedCapacity TOTAL counts the units of the table and of every index
+        a request touches, so the provisioned units are summed the same way.
+        None when the table is on-demand.
+        """
+        capacity = []
+        for field in ("read_capacity_units", "write_capacity_units"):
+            units = getattr(self, field)
+            if units is not None:
+                units += sum(getattr(index, field) or 0 for index in self.indexes)
+            capacity.append(units)
+        return capacity[0], capacity[1]
+
+    def build_key(self, partition_key_value: Any, sort_key_value: Any = None) -> dict:
+        """build primary key of an item"""
+        key = {self.partition_key: partition_key_value}
+        if self.sort_key is not None:
+            if sort_key_value is None:
+                raise ValueError(
+                    f"Table {self.table_name} requires sort key {self.sort_key}"
+                )
+            key[self.sort_key] = sort_key_value
+        return key
+
+
+def _parse_key_schema(key_schema: list[dict]) -> tuple[str, str | None]:
+    partition_key = None
+    sort_key = None
+    for key in key_schema:
+        if key["KeyType"] == "HASH":
+            partition_key = key["AttributeName"]
+        elif key["KeyType"] == "RANGE":
+            sort_key = key["AttributeName"]
+    if partition_key is None:
+        raise ValueError(f"Key schema without partition key: {key_schema}")
+    return partition_key, sort_key
+
+
+class TableMetadataCache:
+    """Describe each table once and keep its metadata for ttl seconds
+
+    Args:
+        client_factory (Callable): returns a low-level dynamo db client
+        ttl (float): seconds before metadata is described again
+        on_load (Callable | None): called with metadata whenever a table is
+            described
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        ttl: float = 300,
+        on_load: Callable[[TableMetadata], None] | None = None,
+    ):
+        self._client_factory = client_factory
+        self.ttl = ttl
+        self._on_load = on_load
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[float, TableMetadata]] = {}
+        # one describe of a table at a time, others wait for its result
+        self._table_locks: dict[str, threading.Lock] = {}
+
+    def _table_lock(self, table_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._table_locks.get(table_name)
+            if lock is None:
+                lock = self._table_locks[table_name] = threading.Lock()
+            return lock
+
+    def get(self, table_name: str) -> TableMetadata:
+        """get metadata of table, describe it when missing or expired
+
+        A slow describe of one table does not hold up the lookups of others.
+        """
+        entry = self._entries.get(table_name)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        with self._table_lock(table_name):
+            entry = self._entries.get(table_name)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            description = self._client_factory().describe_table(TableName=table_name)
+            metadata = TableMetadata.from_description(description)
+            self._entries[table_name] = (time.monotonic() + self.ttl, metadata)
+            if self._on_load is not None:
+                self._on_load(metadata)
+            return metadata
+
+    def invalidate(self, table_name: str | None = None):
+        """forget metadata of table, or of all tables when table_name is None"""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(table_name, None)
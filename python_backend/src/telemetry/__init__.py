@@ -0,0 +1,8 @@
+"""init telemetry"""
+
+from telemetry import metrics
+from telemetry import tracing
+from telemetry import logs
+from telemetry import profiler
+from telemetry import middleware
+from telemetry import collectors
@@ -0,0 +1,98 @@
+"""Metrics collected from existing snapshots when /metrics is scraped"""
+
+from typing import Callable, Iterable
+
+from telemetry import metrics
+
+_GOVERNOR_COUNTERS = (
+    (
+        "requests",
+        "dynamo_governor_requests_total",
+        "Requests admitted by the capacity governor",
+    ),
+    ("throttled", "dynamo_throttled_total", "Requests throttled by dynamo db"),
+    ("retries", "dynamo_retries_total", "Retries of throttled or failed requests"),
+    (
+        "rejected",
+        "dynamo_capacity_rejected_total",
+        "Requests rejected waiting for capacity",
+    ),
+    ("failed", "dynamo_retries_exhausted_total", "Requests failed after every attempt"),
+    (
+        "wait_seconds",
+        "dynamo_capacity_wait_seconds_total",
+        "Seconds waited for capacity",
+    ),
+    (
+        "backoff_seconds",
+        "dynamo_backoff_seconds_total",
+        "Seconds waited before retries",
+    ),
+)
+
+
+def throughput_collector(
+    snapshot: Callable[[], dict],
+) -> Callable[[], Iterable[tuple[str, str, str, metrics.Samples]]]:
+    """metrics of stores.rate_limit.ThroughputRegistry.snapshot"""
+
+    def collect():
+        tables = snapshot()
+        samples = [
+            ({"table": table, "kind": kind}, counters)
+            for table, kinds in tables.items()
+            for kind, counters in kinds.items()
+        ]
+        for field, name, documentation in (
+            (
+                "rate",
+                "dynamo_capacity_rate_units",
+                "Current governed rate, units per second",
+            ),
+            (
+                "ceiling",
+                "dynamo_capacity_ceiling_units",
+                "Provisioned or configured units per second",
+            ),
+        ):
+            yield name, "gauge", documentation, [
+                (labels, counters[field])
+                for labels, counters in samples
+                if counters[field] is not None
+            ]
+        for field, name, documentation in _GOVERNOR_COUNTERS:
+            yield name, "counter", documentation, [
+                (labels, counters[field]) for labels, counters in samples
+            ]
+
+    return collect
+
+
+def coalescing_collector(
+    snapshot: Callable[[], dict],
+) -> Callable[[], Iterable[tuple[str, str, str, metrics.Samples]]]:
+    """metrics of service.single_flight.CoalescingStats.snapshot"""
+
+    def collect():
+        operations = snapshot()
+        for field, name, kind, documentation in (
+            ("requests", "record_reads_total", "counter", "Record reads requested"),
+            (
+                "backend_calls",
+                "record_read_backend_calls_total",
+                "counter",
+                "Record reads sent to dynamo db after coalescing",
+            ),
+            (
+                "coalescing_ratio",
+                "record_read_coalescing_ratio",
+                "gauge",
+                "Share of record reads served by a call in flight",
+            ),
+        ):
+            yield name, kind, documentation, [
+                ({"operation": operation}, values[field])
+                for operation, values in operations.items()
+            ]
+
+    return collect
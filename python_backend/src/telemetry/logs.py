@@ -0,0 +1,173 @@
+"""Structured, sampled logging through a background sink
+
+configure() replaces the default loguru handler with one that writes text or
+JSON lines from a background thread (loguru enqueue), so the request thread
+only formats a short line and puts it on a queue. Fields are passed as keyword
+arguments, e.g. ``logger.info("Export table", table_id=table_id)``: loguru
+keeps them in record["extra"], rendered as key=value pairs or JSON fields.
+
+TimingMiddleware writes one access line per request with the route, path
+parameters, status, latency and dynamo db usage, instead of every handler
+formatting its arguments. Lines that carry a route go through RouteFilter, a
+minimum level and a sample rate per route, so hot routes can be sampled down
+while warnings and errors are always written. Record bodies are only logged
+at DEBUG and lazily, so they are not serialized unless DEBUG is enabled.
+"""
+
+import random
+import sys
+import traceback
+from typing import TYPE_CHECKING, Callable, TextIO
+
+import orjson
+from loguru import logger
+from telemetry import tracing
+
+if TYPE_CHECKING:
+    # only defined by the loguru stubs
+    from loguru import Record
+
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | "
+    "{name}:{function}:{line} - {message}"
+)
+
+# levels below this one are sampled, the ones from it are always written
+SAMPLED_BELOW = "WARNING"
+
+
+def parse_route_options(value: str, convert: Callable[[str], object]) -> dict:
+    """parse "GET /path=value,POST /other=value" into {route: value}
+
+    Raises:
+        ValueError: an entry is not route=value or its value does not convert
+    """
+    options = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        route, separator, option = entry.rpartition("=")
+        if not separator or not route.strip():
+            raise ValueError(f"Invalid route option: {entry!r}")
+        options[route.strip()] = convert(option.strip())
+    return options
+
+
+class RouteFilter:
+    """Level and sampling of log lines bound to a route
+
+    Lines without a "route" field, and lines at WARNING or above, always pass.
+
+    Args:
+        sample_rate (float): share of route lines written, from 0 to 1
+        route_sample_rates (dict[str, float] | None): sample rate per route,
+            e.g. {"GET /table/{table_id}/record/{record_id}": 0.01}
+        route_levels (dict[str, str] | None): minimum level per route
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        route_sample_rates: dict[str, float] | None = None,
+        route_levels: dict[str, str] | None = None,
+    ):
+        self.sample_rate = sample_rate
+        self.route_sample_rates = route_sample_rates or {}
+        self.route_levels = {
+            route: logger.level(level.upper()).no
+            for route, level in (route_levels or {}).items()
+        }
+        self._always = logger.level(SAMPLED_BELOW).no
+
+    def __call__(self, record: "Record") -> bool:
+        route = record["extra"].get("route")
+        if route is None:
+            return True
+        level = record["level"].no
+        if level < self.route_levels.get(route, 0):
+            return False
+        if level >= self._always:
+            return True
+        rate = self.route_sample_rates.get(route, self.sample_rate)
+        return rate >= 1 or random.random() < rate
+
+
+def text_format(record: "Record") -> str:
+    """loguru format of a text line, fields appended as key=value"""
+    fields = "".join(f" {key}={{extra[{key}]}}" for key in record["extra"])
+    return TEXT_FORMAT + fields + "\n{exception}"
+
+
+def json_format(record: "Record") -> str:
+    """loguru format of a JSON line, fields at the top level"""
+    document = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        **record["extra"],
+    }
+    if record["exception"] is not None:
+        document["exception"] = "".join(
+            traceback.format_exception(*record["exception"])
+        )
+    # read back by the template, so braces in values are never parsed
+    record["extra"]["_json"] = orjson.dumps(document, default=str).decode()
+    return "{extra[_json]}\n"
+
+
+def configure(
+    level: str = "INFO",
+    serialize: bool = False,
+    enqueue: bool = True,
+    route_filter: RouteFilter | None = None,
+    sink: TextIO = sys.stderr,
+) -> int:
+    """replace loguru handlers with one structured, filtered handler
+
+    Args:
+        level (str): minimum level, DEBUG also logs record bodies
+        serialize (bool): write JSON lines instead of text
+        enqueue (bool): write from a background thread
+        route_filter (RouteFilter | None): level and sampling per route
+        sink (TextIO): stream written to
+
+    Returns:
+        int: loguru handler id
+    """
+    logger.remove()
+    return logger.add(
+        sink,
+        level=level.upper(),
+        format=json_format if serialize else text_format,
+        filter=route_filter,
+        enqueue=enqueue,
+        # diagnose prints local variables of tracebacks, record bodies included
+        diagnose=False,
+    )
+
+
+def log_request(
+    method: str,
+    route: str,
+    status: int,
+    duration: float,
+    *,
+    path_params: dict,
+    trace: tracing.RequestTrace,
+):
+    """access line of a request, WARNING for server errors"""
+    summary = trace.summary()
+    logger.log(
+        "WARNING" if status >= 500 else "INFO",
+        "{route} {status}",
+        route=f"{method} {route}",
+        status=status,
+        latency_ms=round(duration * 1000, 2),
+        dynamo_calls=summary["calls"],
+        read_units=summary["read_units"],
+        write_units=summary["write_units"],
+        **path_params,
+    )
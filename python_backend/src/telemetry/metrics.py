@@ -0,0 +1,239 @@
+"""In-process metrics rendered in the Prometheus text format
+
+A deliberately small subset of the Prometheus client: labelled counters and
+histograms with fixed buckets, plus collectors that turn existing snapshots
+(e.g. the capacity governor counters) into samples when /metrics is scraped.
+Recording a sample takes one lock and a bisect.
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Iterable
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+# (labels, value) pairs of one metric
+Samples = Iterable[tuple[dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    content = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+    return "{" + content + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label values
+
+    Args:
+        name (str): metric name
+        documentation (str): HELP text
+        labelnames (tuple[str, ...]): label names, values are passed in order
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        """add amount to the counter of label values"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        """sample lines"""
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} "
+            f"{_format_value(value)}"
+            for labels, value in values.items()
+        ]
+
+
+class Histogram:
+    """Cumulative histogram per label values
+
+    Args:
+        name (str): metric name
+        documentation (str): HELP text
+        labelnames (tuple[str, ...]): label names, values are passed in order
+        buckets (tuple[float, ...]): upper bounds, +Inf is added
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # per label values: counts per bucket (last one +Inf), sum
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        """record value for label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> list[str]:
+        """sample lines, buckets are cumulative"""
+        with self._lock:
+            values = {
+                labels: (list(entry[0]), entry[1])
+                for labels, entry in self._values.items()
+            }
+        lines = []
+        for labels, (counts, total) in values.items():
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                bucket_labels = _format_labels(
+                    {**label_dict, "le": _format_value(bound)}
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(label_dict)} {_format_value(total)}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(label_dict)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics of the process and collectors read when rendering"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[
+            Callable[[], Iterable[tuple[str, str, str, Samples]]]
+        ] = []
+
+    def counter(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> Counter:
+        """create and register a counter"""
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> Histogram:
+        """create and register a histogram"""
+        metric = Histogram(name, documentation, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(
+        self, collector: Callable[[], Iterable[tuple[str, str, str, Samples]]]
+    ):
+        """register a function returning (name, type, help, samples) per metric"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    for labels, value in samples
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request",
+    ("method", "route", "status"),
+)
+dynamo_request_duration = registry.histogram(
+    "dynamo_request_duration_seconds",
+    "Latency of a dynamo db request, one per attempt",
+    ("operation", "table"),
+)
+dynamo_request_errors = registry.counter(
+    "dynamo_request_errors_total",
+    "Dynamo db requests failed, by error code",
+    ("operation", "table", "code"),
+)
+dynamo_consumed_units = registry.counter(
+    "dynamo_consumed_capacity_units_total",
+    "Read or write capacity units reported by ConsumedCapacity",
+    ("operation", "table", "kind"),
+)
+dynamo_items_returned = registry.counter(
+    "dynamo_items_returned_total",
+    "Items returned by queries, scans and reads",
+    ("operation", "table"),
+)
+dynamo_items_scanned = registry.counter(
+    "dynamo_items_scanned_total",
+    "Items evaluated by queries and scans before filtering",
+    ("operation", "table"),
+)
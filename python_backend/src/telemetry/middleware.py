@@ -0,0 +1,93 @@
+"""ASGI timing middleware
+
+A plain ASGI middleware rather than a BaseHTTPMiddleware, so that responses,
+streamed ones included, pass through without an extra task or buffering.
+"""
+
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from telemetry import logs, metrics, profiler, tracing
+
+
+def server_timing_header(trace: tracing.RequestTrace, duration: float) -> str:
+    """Server-Timing header value of a request, durations in milliseconds"""
+    summary = trace.summary()
+    return (
+        f"app;dur={duration * 1000:.1f}, "
+        f"dynamo;dur={summary['seconds'] * 1000:.1f};"
+        f'desc="{summary["calls"]} calls, {summary["read_units"]:g} RCU, '
+        f'{summary["write_units"]:g} WCU"'
+    )
+
+
+class TimingMiddleware:
+    """Time requests into http_request_duration_seconds
+
+    Opens the tracing.RequestTrace collecting the dynamo db calls of the
+    request, and optionally reports them in a Server-Timing header, writes an
+    access log line and hands slow requests to a profiler.
+
+    Args:
+        app (ASGIApp): wrapped application
+        server_timing (bool): add a Server-Timing header to responses
+        slow_request_profiler (profiler.SlowRequestProfiler | None): profiler
+            of slow requests
+        access_log (bool): log every request with logs.log_request
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        server_timing: bool = False,
+        slow_request_profiler: profiler.SlowRequestProfiler | None = None,
+        access_log: bool = False,
+    ):
+        self.app = app
+        self.server_timing = server_timing
+        self.profiler = slow_request_profiler
+        self.access_log = access_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        trace = tracing.RequestTrace()
+        token = tracing.current_trace.set(trace)
+        profile_start = self.profiler.begin() if self.profiler is not None else None
+        status = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        server_timing_header(trace, time.perf_counter() - start),
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            tracing.current_trace.reset(token)
+            # path template of the matched route, keeps label cardinality low
+            route = getattr(scope.get("route"), "path", "unmatched")
+            duration = time.perf_counter() - start
+            metrics.http_request_duration.observe(
+                duration, scope["method"], route, str(status)
+            )
+            if self.access_log:
+                logs.log_request(
+                    scope["method"],
+                    route,
+                    status,
+                    duration,
+                    path_params=scope.get("path_params", {}),
+                    trace=trace,
+                )
+            if self.profiler is not None and profile_start is not None:
+                self.profiler.end(profile_start, f"{scope['method']} {route}")
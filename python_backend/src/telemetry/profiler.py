@@ -0,0 +1,131 @@
+"""Opt-in sampling profiler for slow requests
+
+While requests are in flight, a daemon thread samples the stacks of every
+thread at a fixed interval into a bounded ring buffer. When a request ends
+slower than the threshold, the samples taken during it are folded into
+collapsed stacks (root first, ";" separated, as flame graph tools read them)
+and handed to the report hook, which logs the most frequent ones by default.
+
+Samples are not tied to a request: with the async io mode every request
+shares the event loop thread, so a report shows everything the process did
+while the slow request ran. Threads idle in threading, queue or selectors
+waits are skipped.
+"""
+
+import collections
+import sys
+import threading
+import time
+from typing import Callable
+
+from loguru import logger
+
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+# (request name, seconds, collapsed stack counts)
+ReportHook = Callable[[str, float, collections.Counter], None]
+
+
+def log_report(name: str, duration: float, stacks: collections.Counter, top: int = 5):
+    """default report hook, log the most sampled stacks"""
+    lines = [f"{count} {stack}" for stack, count in stacks.most_common(top)]
+    logger.warning(
+        f"Slow request {name} took {duration:.3f}s, "
+        f"{sum(stacks.values())} samples:\n" + "\n".join(lines)
+    )
+
+
+def collapse(frame, max_depth: int = 64) -> str | None:
+    """collapsed stack of frame, None when the thread is idle"""
+    if frame.f_code.co_filename.endswith(_IDLE_MODULES):
+        return None
+    names: list[str] = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Sample thread stacks while requests run, report the slow ones
+
+    Args:
+        threshold (float): seconds from which a request is reported
+        interval (float): seconds between samples
+        max_samples (int): samples kept, older ones are dropped
+        report (ReportHook | None): called for every slow request, defaults
+            to log_report
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        interval: float = 0.005,
+        max_samples: int = 50_000,
+        report: ReportHook | None = None,
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        self.report = report or log_report
+        self._samples: collections.deque[tuple[float, str]] = collections.deque(
+            maxlen=max_samples
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """start sampler thread"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="slow-request-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """stop sampler thread"""
+        self._stopped.set()
+        self._active.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.is_set():
+            self._active.wait()
+            now = time.monotonic()
+            # pylint: disable-next=protected-access
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = collapse(frame)
+                if stack is not None:
+                    self._samples.append((now, stack))
+            time.sleep(self.interval)
+
+    def begin(self) -> float:
+        """mark a request started, returns its start time for end()"""
+        with self._lock:
+            self._in_flight += 1
+            self._active.set()
+        return time.monotonic()
+
+    def end(self, started: float, name: str):
+        """mark a request finished, report it when slower than threshold"""
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._active.clear()
+        duration = now - started
+        if duration < self.threshold:
+            return
+        stacks = collections.Counter(
+            stack for sampled_at, stack in list(self._samples) if sampled_at >= started
+        )
+        self.report(name, duration, stacks)
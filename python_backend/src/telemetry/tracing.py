@@ -0,0 +1,118 @@
+"""Spans of dynamo db calls per request
+
+TimingMiddleware opens a RequestTrace for every request in a context variable.
+DynamoClient and AsyncDynamoClient report each request they send with
+record_call, which feeds the metrics and, when a trace is open, the trace of
+the current request, read back for the Server-Timing header. Threadpool
+handlers see the trace because Starlette copies the context into the worker
+thread.
+"""
+
+import contextvars
+import dataclasses
+
+from telemetry import metrics
+
+
+@dataclasses.dataclass(slots=True)
+class Span:
+    """one dynamo db request
+
+    Attributes:
+        operation (str): dynamo db operation, e.g. query
+        table (str): table name
+        kind (str): "read" or "write" capacity used by the operation
+        duration (float): seconds until the response or error
+        consumed_units (float | None): ConsumedCapacity of the response
+        returned (int | None): items returned
+        scanned (int | None): items evaluated by a query or scan
+        error (str | None): error code of a failed request
+    """
+
+    operation: str
+    table: str
+    kind: str
+    duration: float
+    consumed_units: float | None = None
+    returned: int | None = None
+    scanned: int | None = None
+    error: str | None = None
+
+
+@dataclasses.dataclass(slots=True)
+class RequestTrace:
+    """dynamo db spans of one HTTP request"""
+
+    spans: list[Span] = dataclasses.field(default_factory=list)
+
+    def summary(self) -> dict:
+        """calls, seconds and units read and written by the request"""
+        summary = {"calls": 0, "seconds": 0.0, "read_units": 0.0, "write_units": 0.0}
+        for span in self.spans:
+            summary["calls"] += 1
+            summary["seconds"] += span.duration
+            if span.consumed_units is not None:
+                summary[f"{span.kind}_units"] += span.consumed_units
+        return summary
+
+
+current_trace: contextvars.ContextVar[RequestTrace | None] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+
+def _item_counts(response: dict) -> tuple[int | None, int | None]:
+    if "Count" in response:
+        return response["Count"], response.get("ScannedCount")
+    if "Item" in response:
+        return 1, None
+    if "Responses" in response:
+        return sum(len(items) for items in response["Responses"].values()), None
+    return None, None
+
+
+def record_call(
+    operation: str,
+    table: str,
+    kind: str,
+    duration: float,
+    *,
+    response: dict | None = None,
+    consumed_units: float | None = None,
+    error: str | None = None,
+):
+    """record a dynamo db request in the metrics and the current trace
+
+    Args:
+        operation (str): dynamo db operation, e.g. query
+        table (str): table name
+        kind (str): "read" or "write" capacity used by the operation
+        duration (float): seconds until the response or error
+        response (dict | None): response of a successful request
+        consumed_units (float | None): ConsumedCapacity of the response
+        error (str | None): error code of a failed request
+    """
+    metrics.dynamo_request_duration.observe(duration, operation, table)
+    span = Span(
+        operation=operation,
+        table=table,
+        kind=kind,
+        duration=duration,
+        consumed_units=consumed_units,
+        error=error,
+    )
+    if error is not None:
+        metrics.dynamo_request_errors.inc(operation, table, error)
+    elif response is not None:
+        span.returned, span.scanned = _item_counts(response)
+        if consumed_units is not None:
+            metrics.dynamo_consumed_units.inc(
+                operation, table, kind, amount=consumed_units
+            )
+        if span.returned is not None:
+            metrics.dynamo_items_returned.inc(operation, table, amount=span.returned)
+        if span.scanned is not None:
+            metrics.dynamo_items_scanned.inc(operation, table, amount=span.scanned)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.spans.append(span)
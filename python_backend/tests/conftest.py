@@ -0,0 +1,183 @@
+"""Fixtures of the test suite
+
+Storage tests run against both backends: an in-process moto server standing
+in for dynamo db, and an in-memory sqlite database, see stores.sqlite_db.
+Every test gets tables of its own and a copy of config.settings it may change.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+import boto3
+import config
+import pytest
+import schema
+import service
+import stores
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+BACKENDS = ["dynamodb", "sqlite"]
+
+
+def free_port() -> int:
+    """find an unused local port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def moto_endpoint():
+    """endpoint of an in-process moto server, shared by the session"""
+    from moto.server import (  # pylint: disable=import-outside-toplevel
+        ThreadedMotoServer,
+    )
+
+    # werkzeug logs every request of the server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    port = free_port()
+    server = ThreadedMotoServer(port=port, verbose=False)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def settings(monkeypatch) -> config.Settings:
+    """copy of config.settings used by the code under test"""
+    test_settings = config.settings.model_copy(
+        update={
+            "cursor_secret": "test-secret",
+            "warmup": False,
+            "access_log": False,
+            "log_enqueue": False,
+            "record_table_name": f"record_{uuid.uuid4().hex[:8]}",
+            "master_table_name": f"master_{uuid.uuid4().hex[:8]}",
+        }
+    )
+    monkeypatch.setattr(config, "settings", test_settings)
+    return test_settings
+
+
+@pytest.fixture
+def table_id() -> str:
+    """id of a virtual table no other test writes"""
+    return f"table-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def new_record(table_id):
+    """factory of RECORD records of the test's virtual table
+
+    The factory takes the record content and other Record fields, e.g.
+    new_record({"name": "a"}, record_created_at=created_at).
+    """
+
+    def create(content: dict | None = None, **fields) -> schema.table.Record:
+        return schema.table.Record(
+            **{
+                "table_id": table_id,
+                "category": schema.common.RecordCategory.RECORD,
+                "record": content if content is not None else {},
+                **fields,
+            }
+        )
+
+    return create
+
+
+@pytest.fixture
+def post_record(client):
+    """create a record through the API, returns it"""
+
+    def post(record: schema.table.Record) -> schema.table.Record:
+        response = client.post(
+            f"/record/{record.table_id}",
+            json=record.model_dump(mode="json", by_alias=True),
+        )
+        assert response.status_code == 200
+        return record
+
+    return post
+
+
+def create_dynamo_tables(endpoint_url: str, settings: config.Settings):
+    """create the record and master tables of settings in dynamo db"""
+    client = boto3.client("dynamodb", endpoint_url=endpoint_url)
+    for definition in (
+        stores.dynamo_db.record_table_definition(settings.record_table_name),
+        service.storage.master_table_definition(settings.master_table_name),
+    ):
+        client.create_table(**definition, BillingMode="PAY_PER_REQUEST")
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, settings) -> str:
+    """storage backend of the test, with its tables created"""
+    settings.storage_backend = request.param
+    if request.param == "sqlite":
+        settings.sqlite_path = stores.sqlite_db.MEMORY
+    else:
+        settings.dynamo_endpoint_url = request.getfixturevalue("moto_endpoint")
+        create_dynamo_tables(settings.dynamo_endpoint_url, settings)
+    return request.param
+
+
+@pytest.fixture
+def pool(backend, settings) -> stores.backend.StoragePool:
+    """storage pool of the backend, see service.storage"""
+    storage_pool = service.storage.create_pool(
+        settings, stores.rate_limit.ThroughputRegistry()
+    )
+    yield storage_pool
+    storage_pool.close()
+
+
+@pytest.fixture
+def run_async(pool, settings):
+    """run a coroutine function taking the async pool of the backend"""
+
+    def run(scenario):
+        async def main():
+            async_pool = await service.storage.open_async_pool(
+                settings, pool.throughput, pool
+            )
+            try:
+                return await scenario(async_pool)
+            finally:
+                await async_pool.close()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def record_state(monkeypatch):
+    """fresh caches and change broker of service.record, search disabled"""
+    monkeypatch.setattr(
+        service.record, "item_cache", service.record_cache.LRURecordCache()
+    )
+    monkeypatch.setattr(
+        service.record, "change_broker", service.change_feed.MemoryChangeBroker()
+    )
+    monkeypatch.setattr(service.record, "search_index", service.search.SearchIndex())
+
+
+@pytest.fixture
+def client(backend, settings, record_state):
+    """test client of the app in sync io mode"""
+    from fastapi.testclient import (  # pylint: disable=import-outside-toplevel
+        TestClient,
+    )
+
+    import main  # pylint: disable=import-outside-toplevel
+
+    with TestClient(main.app) as test_client:
+        yield test_client
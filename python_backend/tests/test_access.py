@@ -0,0 +1,98 @@
+import pytest
+
+SECRET = "gateway-secret"
+
+
+@pytest.fixture
+def transfer_dir(settings, tmp_path):
+    settings.transfer_dir = str(tmp_path)
+
+
+@pytest.fixture
+def gated_client(transfer_dir, client, settings):
+    settings.access_control = True
+    settings.gateway_secret = SECRET
+    return client
+
+
+def as_user(user_id: str) -> dict[str, str]:
+    """headers of a request of user_id through the gateway"""
+    return {"X-User-Id": user_id, "X-Gateway-Secret": SECRET}
+
+
+def create_table(client, table_id: str, owner: str):
+    return client.post(
+        "/table",
+        json={"id": table_id, "tableName": table_id, "tableOwner": owner},
+        headers=as_user(owner),
+    )
+
+
+def test_user_id_header_is_trusted_from_the_gateway(gated_client):
+    response = gated_client.get(
+        "/user/alice/tables",
+        headers={"X-User-Id": "alice", "X-Gateway-Secret": SECRET},
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("gateway_headers", [{}, {"X-Gateway-Secret": "guess"}])
+def test_user_id_header_is_ignored_without_the_gateway(gated_client, gateway_headers):
+    response = gated_client.get(
+        "/user/alice/tables", headers={"X-User-Id": "alice", **gateway_headers}
+    )
+    assert response.status_code == 401
+
+
+def test_user_id_header_is_trusted_without_gateway_secret(client, settings):
+    settings.access_control = True
+    assert (
+        client.get("/user/alice/tables", headers={"X-User-Id": "bob"}).status_code
+        == 403
+    )
+    assert (
+        client.get("/user/alice/tables", headers={"X-User-Id": "alice"}).status_code
+        == 200
+    )
+
+
+def test_tables_are_not_taken_over_by_reusing_their_id(gated_client, table_id):
+    assert create_table(gated_client, table_id, "alice").status_code == 200
+    assert create_table(gated_client, table_id, "mallory").status_code == 409
+    response = gated_client.get(f"/table/{table_id}", headers=as_user("alice"))
+    assert response.json()["tableOwner"] == "alice"
+    assert (
+        gated_client.get(f"/table/{table_id}", headers=as_user("mallory")).status_code
+        == 403
+    )
+    tables = gated_client.get("/user/alice/tables", headers=as_user("alice")).json()
+    assert [table["id"] for table in tables] == [table_id]
+
+
+def test_jobs_need_access_to_their_table(gated_client, table_id):
+    assert create_table(gated_client, table_id, "alice").status_code == 200
+    job = gated_client.post(
+        f"/table/{table_id}/export", json={}, headers=as_user("alice")
+    ).json()
+    job_path = f"/jobs/{job['id']}"
+    assert gated_client.get(job_path, headers=as_user("alice")).status_code == 200
+    assert gated_client.get(job_path, headers=as_user("mallory")).status_code == 403
+    assert (
+        gated_client.post(f"{job_path}/resume", headers=as_user("mallory")).status_code
+        == 403
+    )
+
+
+def test_import_needs_read_access_to_the_source_table(gated_client, table_id):
+    assert create_table(gated_client, table_id, "alice").status_code == 200
+    job = gated_client.post(
+        f"/table/{table_id}/export", json={}, headers=as_user("alice")
+    ).json()
+    copy_id = f"{table_id}-copy"
+    assert create_table(gated_client, copy_id, "mallory").status_code == 200
+    response = gated_client.post(
+        f"/table/{copy_id}/import",
+        json={"sourceJobId": job["id"]},
+        headers=as_user("mallory"),
+    )
+    assert response.status_code == 403
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+import schema
+from service import aggregation
+
+PRICES = {"fruit": [1, 2, 3, 4], "bread": [10, 20]}
+
+
+@pytest.fixture
+def priced(table_id, new_record, post_record):
+    """records of PRICES, one per price, and one without price"""
+    for kind, prices in PRICES.items():
+        for price in prices:
+            post_record(new_record({"kind": kind, "price": price}))
+    post_record(new_record({"kind": "bread", "name": "unpriced"}))
+    return table_id
+
+
+def aggregate(client, table_id: str, **query):
+    return client.post(f"/table/{table_id}/records:aggregate", json=query)
+
+
+def test_count_sum_and_percentile_per_group(client, priced):
+    response = aggregate(
+        client,
+        priced,
+        groupBy=["kind"],
+        aggregates=[
+            {"function": "COUNT"},
+            {"function": "COUNT", "field": "price"},
+            {"function": "SUM", "field": "price"},
+            {"function": "PERCENTILE", "field": "price", "percentile": 50},
+        ],
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["matchedCount"] == 7
+    assert not body["approximate"]
+    assert body["groups"] == [
+        {
+            "key": {"kind": "bread"},
+            "count": 3,
+            "values": {"count": 3, "count_price": 2, "sum_price": 30, "p50_price": 15},
+        },
+        {
+            "key": {"kind": "fruit"},
+            "count": 4,
+            "values": {"count": 4, "count_price": 4, "sum_price": 10, "p50_price": 2.5},
+        },
+    ]
+
+
+def test_whole_table_aggregate_of_no_records(client, table_id):
+    response = aggregate(
+        client,
+        table_id,
+        aggregates=[{"function": "COUNT"}, {"function": "SUM", "field": "price"}],
+    )
+    assert response.status_code == 200
+    assert response.json()["groups"] == [
+        {"key": {}, "count": 0, "values": {"count": 0, "sum_price": None}}
+    ]
+
+
+def test_too_many_groups_is_bad_request(client, settings, priced):
+    settings.aggregate_max_groups = 1
+    response = aggregate(
+        client, priced, groupBy=["kind"], aggregates=[{"function": "COUNT"}]
+    )
+    assert response.status_code == 400
+    assert "more than 1 groups" in response.json()["detail"]
+
+
+def test_percentile_requires_a_percentile(client, table_id):
+    response = aggregate(
+        client, table_id, aggregates=[{"function": "PERCENTILE", "field": "price"}]
+    )
+    assert response.status_code == 422
+
+
+def test_percentiles_beyond_the_sample_are_approximate():
+    percentile = schema.request.Aggregate(
+        function=schema.common.AggregateFunction.PERCENTILE, field="n", percentile=50
+    )
+    result = aggregation.Aggregation([], [percentile], sample_size=100)
+    numbers = list(range(1001))
+    random.Random(1).shuffle(numbers)
+    for start in range(0, len(numbers), 250):
+        result.add_page([{"n": n} for n in numbers[start : start + 250]])
+    aggregated = result.result()
+    assert aggregated.approximate
+    assert aggregated.matched_count == 1001
+    assert 300 < aggregated.groups[0].values["p50_n"] < 700
@@ -0,0 +1,53 @@
+import json
+
+from routers import responses
+from service import async_record
+
+CONTENT = {"count": 3, "price": 9.5, "nested": {"scores": [1, 2.25]}, "name": "a"}
+
+
+def test_batch_get_keeps_numbers(client, table_id, new_record):
+    records = [new_record(CONTENT) for _ in range(3)]
+    response = client.post(
+        f"/table/{table_id}/records:batchCreate",
+        json={
+            "records": [
+                record.model_dump(mode="json", by_alias=True) for record in records
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["successCount"] == 3
+    ids = [record.id for record in records]
+    response = client.post(
+        f"/table/{table_id}/records:batchGet", json={"recordIds": [*ids, "missing"]}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(row["id"] for row in body["records"]) == sorted(ids)
+    for row in body["records"]:
+        assert row["record"] == CONTENT
+        assert isinstance(row["record"]["count"], int)
+        assert row["version"] == 1
+    assert body["results"][-1] == {
+        "id": "missing",
+        "success": False,
+        "error": "Not found",
+    }
+    assert all(result["success"] for result in body["results"][:-1])
+
+
+def test_async_batch_get_keeps_numbers(
+    run_async, settings, record_state, table_id, new_record
+):
+    record = new_record(CONTENT)
+
+    async def scenario(pool):
+        service = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await service.create_record(record)
+        return await service.batch_get_records(table_id, [record.id, record.id])
+
+    rows, results = run_async(scenario)
+    body = json.loads(responses.batch_get_response(rows, results).body)
+    assert [row["record"] for row in body["records"]] == [CONTENT]
+    assert [result["id"] for result in body["results"]] == [record.id]
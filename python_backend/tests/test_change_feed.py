@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+import orjson
+from service import async_record, change_feed, record
+
+
+class FakeRedis:
+    """redis client counting and publishing to a list, recording the threads"""
+
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+        self.published: list[dict] = []
+        self.threads: set[int] = set()
+
+    def incr(self, key: str) -> int:
+        self.threads.add(threading.get_ident())
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    def publish(self, channel: str, data: bytes):
+        self.threads.add(threading.get_ident())
+        self.published.append(orjson.loads(data))
+
+    def register_script(self, source: str):
+        # the publish script of RedisChangeBroker, run in python
+        assert "PUBLISH" in source
+
+        def publish(keys: list[str], args: list) -> int:
+            sequence = self.incr(keys[0])
+            self.publish(args[0], b'{"sequence":%d,' % sequence + args[1][1:])
+            return sequence
+
+        return publish
+
+
+def test_subscribers_receive_and_resume_events():
+    broker = change_feed.MemoryChangeBroker(history=10)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        subscription = broker.subscribe("t", None, loop)
+        broker.publish("t", change_feed.CREATE, "a", 1)
+        broker.publish("other", change_feed.CREATE, "b", 1)
+        broker.publish("t", change_feed.UPDATE, "a", 2)
+        events = await subscription.next_events(1)
+        broker.unsubscribe(subscription)
+        resumed = broker.subscribe("t", broker.event_id(events[0]), loop)
+        return events, await resumed.next_events(1)
+
+    events, replayed = asyncio.run(scenario())
+    assert [(e.sequence, e.operation, e.version) for e in events] == [
+        (1, change_feed.CREATE, 1),
+        (2, change_feed.UPDATE, 2),
+    ]
+    assert replayed == events[1:]
+
+
+def test_resuming_unknown_events_resets():
+    broker = change_feed.MemoryChangeBroker(history=2)
+    for version in range(5):
+        broker.publish("t", change_feed.UPDATE, "a", version)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        return [
+            await broker.subscribe(
+                "t", change_feed.EventId.parse(event_id), loop
+            ).next_events(1)
+            # expired, of another broker and malformed
+            for event_id in (f"{broker.epoch}.1", "elsewhere.4", f"{broker.epoch}.x")
+        ]
+
+    for events in asyncio.run(scenario()):
+        assert [(e.operation, e.sequence) for e in events] == [(change_feed.RESET, 5)]
+
+
+def test_slow_subscriber_is_closed():
+    broker = change_feed.MemoryChangeBroker(buffer_size=2)
+
+    async def scenario():
+        subscription = broker.subscribe("t", None, asyncio.get_running_loop())
+        for version in range(3):
+            broker.publish("t", change_feed.UPDATE, "a", version)
+        return await subscription.next_events(1), await subscription.next_events(1)
+
+    buffered, closed = asyncio.run(scenario())
+    # the buffered events are drained before the subscription ends
+    assert [event.version for event in buffered] == [0, 1]
+    assert closed is None
+
+
+def test_redis_events_are_numbered_by_redis():
+    client = FakeRedis()
+    broker = change_feed.RedisChangeBroker(client)
+    assert broker.blocking and not change_feed.MemoryChangeBroker().blocking
+    broker.publish("t", change_feed.CREATE, "a", 1)
+    broker.publish("t", change_feed.DELETE, "a")
+    assert [event["sequence"] for event in client.published] == [1, 2]
+    event = change_feed.ChangeEvent.from_dict(client.published[1])
+    assert str(broker.event_id(event)) == "redis.2"
+    assert change_feed.EventId.parse("redis.2") == broker.event_id(event)
+
+
+def test_async_service_publishes_to_redis_off_the_event_loop(
+    monkeypatch, run_async, settings, record_state, table_id, new_record
+):
+    client = FakeRedis()
+    monkeypatch.setattr(record, "change_broker", change_feed.RedisChangeBroker(client))
+    created = new_record()
+
+    async def scenario(pool):
+        service = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await service.create_record(created)
+        await service.batch_create_records([created.model_copy(update={"id": "other"})])
+        await service.delete_record(table_id, created.id)
+        return threading.get_ident()
+
+    loop_thread = run_async(scenario)
+    assert [event["operation"] for event in client.published] == [
+        change_feed.CREATE,
+        change_feed.RELOAD,
+        change_feed.DELETE,
+    ]
+    assert client.threads and loop_thread not in client.threads
@@ -0,0 +1,90 @@
+import decimal
+import json
+
+import pytest
+from routers import pagination
+from service import cursor
+
+
+def test_cursor_round_trip(settings):
+    start_key = {"id": "a", "table_id": "t", "version": decimal.Decimal(3)}
+    token = cursor.encode_cursor(start_key, "t")
+    assert cursor.decode_cursor(token, "t") == start_key
+
+
+def test_no_cursor_without_start_key(settings):
+    assert cursor.encode_cursor(None, "t") is None
+    assert cursor.decode_cursor(None, "t") is None
+
+
+def test_cursor_of_another_table_is_rejected(settings):
+    token = cursor.encode_cursor({"id": "a", "table_id": "t"}, "t")
+    with pytest.raises(cursor.InvalidCursorError, match="another table"):
+        cursor.decode_cursor(token, "other")
+
+
+@pytest.mark.parametrize("token", ["garbage", "a.b.c", "!!!.???"])
+def test_malformed_cursor_is_rejected(settings, token):
+    with pytest.raises(cursor.InvalidCursorError):
+        cursor.decode_cursor(token, "t")
+
+
+def test_tampered_cursor_is_rejected(settings):
+    token = cursor.encode_cursor({"id": "a", "table_id": "t"}, "t")
+    forged = cursor.encode_cursor({"id": "b", "table_id": "t"}, "t")
+    # payload of one cursor with the signature of another
+    tampered = forged.split(".")[0] + "." + token.split(".")[1]
+    with pytest.raises(cursor.InvalidCursorError, match="signature"):
+        cursor.decode_cursor(tampered, "t")
+
+
+def test_cursor_signed_with_another_secret_is_rejected(settings):
+    token = cursor.encode_cursor({"id": "a", "table_id": "t"}, "t")
+    settings.cursor_secret = "rotated"
+    with pytest.raises(cursor.InvalidCursorError, match="signature"):
+        cursor.decode_cursor(token, "t")
+
+
+@pytest.fixture
+def create_records(new_record, post_record):
+    """create count records through the API, returns their ids"""
+
+    def create(count: int) -> set[str]:
+        return {post_record(new_record({"index": index})).id for index in range(count)}
+
+    return create
+
+
+def test_pages_follow_cursors(client, table_id, create_records):
+    created = create_records(5)
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get(f"/table/{table_id}/record", params=params)
+        assert response.status_code == 200
+        seen.extend(row["id"] for row in response.json())
+        next_cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if next_cursor is None:
+            break
+        params["cursor"] = next_cursor
+    assert sorted(seen) == sorted(created)
+
+
+def test_invalid_cursor_is_bad_request(client, table_id, create_records):
+    create_records(3)
+    response = client.get(f"/table/{table_id}/record", params={"limit": 1})
+    next_cursor = response.headers[pagination.NEXT_CURSOR_HEADER]
+    other = client.get("/table/other/record", params={"cursor": next_cursor})
+    assert other.status_code == 400
+    tampered = client.get(
+        f"/table/{table_id}/record", params={"cursor": next_cursor + "x"}
+    )
+    assert tampered.status_code == 400
+
+
+def test_ndjson_streams_every_record(client, table_id, create_records):
+    created = create_records(4)
+    response = client.get(f"/table/{table_id}/record", params={"format": "ndjson"})
+    assert response.headers["content-type"] == pagination.NDJSON_MEDIA_TYPE
+    lines = response.text.splitlines()
+    assert {json.loads(line)["id"] for line in lines} == created
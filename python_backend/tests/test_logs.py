@@ -0,0 +1,94 @@
+import io
+import sys
+
+import fastapi
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from loguru import logger
+from telemetry import logs, middleware, tracing
+
+ROUTE = "GET /item/{item_id}"
+
+
+@pytest.fixture
+def json_logs():
+    """configure JSON logs into a buffer, returns a reader of its lines"""
+    sink = io.StringIO()
+
+    def configure(route_filter: logs.RouteFilter | None = None):
+        logs.configure(
+            serialize=True, enqueue=False, route_filter=route_filter, sink=sink
+        )
+        return lambda: [orjson.loads(line) for line in sink.getvalue().splitlines()]
+
+    yield configure
+    logger.remove()
+    logger.add(sys.stderr)
+
+
+def test_access_log_has_route_params_status_and_dynamo_usage(json_logs):
+    lines = json_logs()
+    app = fastapi.FastAPI()
+    app.add_middleware(middleware.TimingMiddleware, access_log=True)
+
+    @app.get("/item/{item_id}")
+    def get_item(item_id: str):
+        tracing.record_call(
+            "get_item",
+            "records",
+            "read",
+            0.002,
+            response={"Item": {}},
+            consumed_units=0.5,
+        )
+        return {"id": item_id}
+
+    with TestClient(app) as client:
+        client.get("/item/a")
+        client.get("/missing")
+    found, missing = lines()
+    assert found["level"] == "INFO"
+    assert found["message"] == f"{ROUTE} 200"
+    assert found["route"] == ROUTE
+    assert found["item_id"] == "a"
+    assert found["dynamo_calls"] == 1
+    assert found["read_units"] == 0.5
+    assert found["latency_ms"] >= 0
+    assert missing["route"] == "GET unmatched"
+    assert missing["status"] == 404
+
+
+def test_route_lines_are_sampled_below_warning(json_logs):
+    lines = json_logs(logs.RouteFilter(sample_rate=0))
+    logger.info("sampled out", route=ROUTE)
+    logger.warning("always written", route=ROUTE)
+    logger.info("not bound to a route")
+    assert [line["message"] for line in lines()] == [
+        "always written",
+        "not bound to a route",
+    ]
+
+
+def test_route_sample_rates_and_levels_override_the_default(json_logs):
+    lines = json_logs(
+        logs.RouteFilter(
+            sample_rate=0,
+            route_sample_rates={ROUTE: 1, "GET /health": 1},
+            route_levels={"GET /health": "warning"},
+        )
+    )
+    logger.info("route written", route=ROUTE)
+    logger.info("other route sampled out", route="GET /other")
+    logger.info("below the route level", route="GET /health")
+    logger.error("route error", route="GET /health")
+    assert [line["message"] for line in lines()] == ["route written", "route error"]
+
+
+def test_route_options_are_parsed():
+    assert logs.parse_route_options(f"{ROUTE}=0.01, GET /health=0", float) == {
+        ROUTE: 0.01,
+        "GET /health": 0,
+    }
+    with pytest.raises(ValueError, match="Invalid route option"):
+        logs.parse_route_options("GET /health", float)
@@ -0,0 +1,29 @@
+import config
+import main
+
+
+def test_configured_workers_are_served():
+    settings = config.Settings(server_workers=3)
+    assert main.worker_count(settings) == 3
+    assert main.server_options(settings)["workers"] == 3
+
+
+def test_defaults_keep_state_every_worker_needs():
+    errors = main.multi_worker_errors(config.Settings())
+    assert len(errors) == 2
+    assert errors[0].startswith("record_cache_backend")
+    assert errors[1].startswith("change_feed_backend")
+
+
+def test_shared_or_disabled_state_allows_workers():
+    settings = config.Settings(
+        record_cache_backend="redis",
+        change_feed_backend="none",
+        storage_backend="sqlite",
+        sqlite_path="records.db",
+    )
+    assert main.multi_worker_errors(settings) == []
+    settings.sqlite_path = ":memory:"
+    assert main.multi_worker_errors(settings) == [
+        "sqlite_path is :memory: and every worker would have its own database"
+    ]
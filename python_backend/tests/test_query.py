@@ -0,0 +1,77 @@
+import decimal
+
+import pydantic
+import pytest
+import schema
+
+QUERY_ROUTES = ["query", "count", "query/explain"]
+
+
+def condition(field: str, **options) -> dict:
+    return {"field": field, "fieldType": "NUMBER", "operation": "GT", **options}
+
+
+@pytest.mark.parametrize("field", ["price", "stock.count", "lines[0]", "a.b[1][2].c"])
+def test_field_paths_are_accepted(field):
+    schema.request.FieldCondition.model_validate(condition(field, value=1))
+
+
+@pytest.mark.parametrize("field", ["", ".", "a.", ".a", "a..b", "a[", "a[x]", "[0]"])
+def test_invalid_field_paths_are_rejected(field):
+    with pytest.raises(pydantic.ValidationError):
+        schema.request.FieldCondition.model_validate(condition(field, value=1))
+
+
+@pytest.mark.parametrize("value", ["abc", "NaN", "Infinity", True, None, [1]])
+def test_invalid_numbers_are_rejected(value):
+    with pytest.raises(pydantic.ValidationError):
+        schema.request.FieldCondition.model_validate(condition("price", value=value))
+
+
+def test_numbers_are_converted_to_decimals():
+    parsed = schema.request.FieldCondition.model_validate(
+        condition("price", operation="IS_IN", value=[1, "2.5"])
+    )
+    assert parsed.value == [decimal.Decimal(1), decimal.Decimal("2.5")]
+
+
+def test_is_in_is_capped_at_the_dynamo_db_operand_limit():
+    limit = schema.request.MAX_IS_IN_VALUES
+    schema.request.FieldCondition.model_validate(
+        condition("price", operation="IS_IN", value=list(range(limit)))
+    )
+    with pytest.raises(pydantic.ValidationError):
+        schema.request.FieldCondition.model_validate(
+            condition("price", operation="IS_IN", value=list(range(limit + 1)))
+        )
+
+
+@pytest.mark.parametrize("route", QUERY_ROUTES)
+def test_invalid_number_is_unprocessable(client, table_id, route):
+    response = client.request(
+        "GET",
+        f"/table/{table_id}/record/{route}",
+        json=[condition("price", operation="EQ", value="abc")],
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("route", QUERY_ROUTES)
+def test_invalid_field_is_unprocessable(client, table_id, route):
+    response = client.request(
+        "GET", f"/table/{table_id}/record/{route}", json=[condition("", value=1)]
+    )
+    assert response.status_code == 422
+
+
+def test_query_by_nested_field(client, table_id, new_record, post_record):
+    for count in (1, 5, 9):
+        post_record(new_record({"stock": {"count": count}}))
+    response = client.request(
+        "GET",
+        f"/table/{table_id}/record/query",
+        json=[condition("stock.count", value=4)],
+    )
+    assert response.status_code == 200
+    counts = sorted(row["record"]["stock"]["count"] for row in response.json())
+    assert counts == [5, 9]
@@ -0,0 +1,179 @@
+import asyncio
+import collections
+import http.server
+import json
+import threading
+
+import pytest
+import stores
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+from stores import rate_limit
+
+THROTTLED = {
+    "__type": "com.amazonaws.dynamodb.v20120810#ProvisionedThroughputExceededException",
+    "message": "The level of configured provisioned throughput was exceeded",
+}
+
+
+class ThrottlingStub(http.server.ThreadingHTTPServer):
+    """dynamo db endpoint describing any table and throttling every other call"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.attempts: collections.Counter = collections.Counter()
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):  # pylint: disable=invalid-name
+        params = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        operation = self.headers["X-Amz-Target"].split(".")[-1]
+        self.server.attempts[operation] += 1
+        if operation == "DescribeTable":
+            status, body = 200, {
+                "Table": {
+                    "TableName": params["TableName"],
+                    "TableStatus": "ACTIVE",
+                    "KeySchema": [{"AttributeName": "id", "KeyType": "HASH"}],
+                    "AttributeDefinitions": [
+                        {"AttributeName": "id", "AttributeType": "S"}
+                    ],
+                }
+            }
+        else:
+            status, body = 400, THROTTLED
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-amz-json-1.0")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThrottlingStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_governor_owns_every_retry(stub):
+    throughput = rate_limit.ThroughputRegistry(max_attempts=3, max_wait=2)
+    pool = stores.dynamo_db.DynamoClientPool(
+        region_name="us-east-1", endpoint_url=stub.endpoint_url, throughput=throughput
+    )
+    try:
+        with pytest.raises(rate_limit.CapacityExceededError):
+            pool.get_client("stub").get_by_id("a")
+    finally:
+        pool.close()
+    # one HTTP attempt per attempt of the governor, none hidden in botocore
+    assert stub.attempts["GetItem"] == 3
+    counters = throughput.snapshot()["stub"]["read"]
+    assert counters["throttled"] == 3
+    assert counters["retries"] == 2
+    assert counters["failed"] == 1
+
+
+def test_async_governor_owns_every_retry(stub):
+    throughput = rate_limit.ThroughputRegistry(max_attempts=3, max_wait=2)
+
+    async def scenario():
+        pool = stores.async_dynamo_db.AsyncDynamoClientPool(
+            region_name="us-east-1",
+            endpoint_url=stub.endpoint_url,
+            throughput=throughput,
+        )
+        await pool.open()
+        try:
+            await pool.get_client("stub").get_by_id("a")
+        finally:
+            await pool.close()
+
+    with pytest.raises(rate_limit.CapacityExceededError):
+        asyncio.run(scenario())
+    assert stub.attempts["GetItem"] == 3
+    assert throughput.snapshot()["stub"]["read"]["throttled"] == 3
+
+
+def client_error(code: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, "GetItem")
+
+
+def test_throttling_lowers_the_rate_and_gives_up_after_max_attempts():
+    throughput = rate_limit.TableThroughput(
+        "t", read_units_per_second=100, max_attempts=2
+    )
+    reserved, _ = throughput.reserve("get_item")
+    error = client_error("ProvisionedThroughputExceededException")
+    assert throughput.backoff("get_item", reserved, error, 0) >= 0
+    assert throughput.snapshot()["read"]["rate"] == pytest.approx(70)
+    with pytest.raises(rate_limit.CapacityExceededError) as raised:
+        throughput.backoff("get_item", reserved, error, 1)
+    assert raised.value.retry_after >= 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        EndpointConnectionError(endpoint_url="http://dynamodb"),
+        ReadTimeoutError(endpoint_url="http://dynamodb"),
+    ],
+)
+def test_network_errors_are_retried_and_return_their_units(error):
+    throughput = rate_limit.TableThroughput(
+        "t", write_units_per_second=1, burst_seconds=1, max_attempts=2
+    )
+    reserved, _ = throughput.reserve("put_item")
+    assert throughput.backoff("put_item", reserved, error, 0) >= 0
+    # the units of the failed attempt are back in the bucket
+    assert throughput.reserve("put_item")[1] == 0
+    snapshot = throughput.snapshot()["write"]
+    assert snapshot["retries"] == 1
+    assert snapshot["throttled"] == 0
+    with pytest.raises(type(error)):
+        throughput.backoff("put_item", reserved, error, 1)
+
+
+def test_errors_that_are_not_transient_are_raised_at_once():
+    throughput = rate_limit.TableThroughput("t")
+    error = client_error("ValidationException")
+    with pytest.raises(ClientError):
+        throughput.backoff("put_item", 1, error, 0)
+    assert throughput.snapshot()["write"]["throttled"] == 0
+
+
+def test_responses_settle_the_reserved_units():
+    throughput = rate_limit.TableThroughput("t", write_units_per_second=10)
+    reserved, _ = throughput.reserve("put_item")
+    units = throughput.record(
+        "put_item", reserved, {"ConsumedCapacity": {"CapacityUnits": 4.0}}
+    )
+    assert units == 4.0
+    assert throughput.snapshot()["write"]["consumed_units"] == 4.0
+
+
+def test_capacity_exhausted_longer_than_max_wait_is_rejected():
+    bucket = rate_limit.TokenBucket(rate=1, burst=1)
+    assert bucket.reserve(1) == 0
+    with pytest.raises(rate_limit.CapacityExceededError) as raised:
+        bucket.reserve(1, max_wait=0.1)
+    assert raised.value.retry_after > 0.1
+
+
+def test_provisioned_capacity_caps_the_rate():
+    throughput = rate_limit.TableThroughput("t", read_units_per_second=500)
+    throughput.provision(50, None)
+    snapshot = throughput.snapshot()
+    assert snapshot["read"]["rate"] == 50
+    assert snapshot["read"]["ceiling"] == 50
+    assert snapshot["write"]["rate"] is None
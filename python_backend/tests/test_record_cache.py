@@ -0,0 +1,122 @@
+import decimal
+import threading
+import time
+
+from service import async_record, record, record_cache
+
+
+class FakeRedis:
+    """redis client keeping values in a dict, recording the calling threads"""
+
+    def __init__(self):
+        self.values: dict[str, str] = {}
+        self.threads: set[int] = set()
+
+    def get(self, key: str) -> str | None:
+        self.threads.add(threading.get_ident())
+        return self.values.get(key)
+
+    def set(self, key: str, value: str, ex: int):
+        self.threads.add(threading.get_ident())
+        assert ex >= 1
+        self.values[key] = value
+
+    def delete(self, key: str):
+        self.threads.add(threading.get_ident())
+        self.values.pop(key, None)
+
+    def register_script(self, source: str):
+        # the lua scripts of RedisRecordCache, run in python
+        return self._invalidate if "INCR" in source else self._fill
+
+    def _fill(self, keys: list[str], args: list) -> int:
+        self.threads.add(threading.get_ident())
+        if self.values.get(keys[0], "0") != args[0]:
+            return 0
+        self.values[keys[1]] = args[1]
+        return 1
+
+    def _invalidate(self, keys: list[str], args: list) -> int:
+        self.threads.add(threading.get_ident())
+        self.values[keys[0]] = str(int(self.values.get(keys[0], "0")) + 1)
+        self.values.pop(keys[1], None)
+        return 1
+
+
+def test_lru_cache_evicts_and_expires():
+    cache = record_cache.LRURecordCache(maxsize=2, ttl=30, negative_ttl=0.01)
+    cache.set("t", "a", {"id": "a"})
+    cache.set("t", "b", None)
+    assert cache.get("t", "a") == (True, {"id": "a"})
+    assert cache.get("t", "b") == (True, None)
+    cache.set("t", "c", {"id": "c"})
+    # a was used least recently
+    assert cache.get("t", "a") == (False, None)
+    time.sleep(0.02)
+    assert cache.get("t", "b") == (False, None)
+    assert cache.stats()["evictions"] == 1
+    assert not cache.blocking
+
+
+def test_fill_after_invalidation_is_dropped():
+    cache = record_cache.LRURecordCache()
+    token = cache.fill_token("t", "a")
+    cache.invalidate("t", "a")
+    cache.set("t", "a", {"id": "a", "version": 1}, token)
+    assert cache.get("t", "a") == (False, None)
+
+
+def test_redis_fill_after_invalidation_of_another_worker_is_dropped():
+    client = FakeRedis()
+    reader = record_cache.RedisRecordCache(client)
+    writer = record_cache.RedisRecordCache(client)
+    token = reader.fill_token("t", "a")
+    writer.invalidate("t", "a")
+    reader.set("t", "a", {"id": "a", "version": 1}, token)
+    assert reader.get("t", "a") == (False, None)
+    token = reader.fill_token("t", "a")
+    reader.set("t", "a", {"id": "a", "version": 2}, token)
+    assert writer.get("t", "a") == (True, {"id": "a", "version": 2})
+
+
+def test_redis_cache_round_trips_typed_values():
+    cache = record_cache.RedisRecordCache(FakeRedis())
+    assert cache.blocking
+    item = {"id": "a", "version": decimal.Decimal(2), "record": {"x": [1, "y"]}}
+    cache.set("t", "a", item)
+    cache.set("t", "missing", None)
+    assert cache.get("t", "a") == (True, item)
+    assert cache.get("t", "missing") == (True, None)
+    cache.invalidate("t", "a")
+    assert cache.get("t", "a") == (False, None)
+    assert cache.stats() == {
+        "hits": 1,
+        "negative_hits": 1,
+        "misses": 1,
+        "evictions": 0,
+    }
+
+
+def test_async_service_calls_redis_off_the_event_loop(
+    monkeypatch, run_async, settings, record_state, table_id, new_record
+):
+    client = FakeRedis()
+    monkeypatch.setattr(record, "item_cache", record_cache.RedisRecordCache(client))
+    created = new_record({"n": 1})
+
+    async def scenario(pool):
+        loop_thread = threading.get_ident()
+        service = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await service.create_record(created)
+        first = await service.get_record_by_id(table_id, created.id)
+        second = await service.get_record_by_id(table_id, created.id)
+        await service.batch_create_records([new_record({"n": 2})])
+        await service.delete_record(table_id, created.id)
+        gone = await service.get_record_by_id(table_id, created.id)
+        return loop_thread, first, second, gone
+
+    loop_thread, first, second, gone = run_async(scenario)
+    assert first.id == second.id == created.id
+    assert gone is None
+    assert client.threads and loop_thread not in client.threads
+    assert record.item_cache.hits == 1
@@ -0,0 +1,22 @@
+import routers
+
+
+def served(router) -> set[tuple]:
+    """path, methods, response model and parameters of every route"""
+    return {
+        (
+            route.path,
+            frozenset(route.methods),
+            str(route.response_model),
+            route.name,
+            tuple(param.name for param in route.dependant.query_params),
+            tuple(param.name for param in route.dependant.body_params),
+        )
+        for route in router.routes
+    }
+
+
+def test_sync_and_async_routers_serve_the_same_api():
+    sync_routes = served(routers.record.router)
+    assert len(sync_routes) == 13
+    assert served(routers.async_record.router) == sync_routes
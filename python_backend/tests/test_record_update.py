@@ -0,0 +1,115 @@
+import datetime
+
+import pytest
+import schema
+from service import async_record, query_planner, record, record_update
+
+CREATED_AT = datetime.datetime(2020, 1, 2, tzinfo=datetime.UTC)
+
+
+@pytest.fixture
+def created(new_record) -> schema.table.Record:
+    """record created at CREATED_AT, not stored yet"""
+    return new_record({"name": "a"}, record_created_at=CREATED_AT)
+
+
+def test_put_rejects_another_record_id(client, table_id, created, post_record):
+    post_record(created)
+    response = client.put(
+        f"/table/{table_id}/record/{created.id}",
+        json={
+            "id": "other",
+            "tableId": table_id,
+            "category": created.category,
+            "record": {"name": "b"},
+        },
+    )
+    assert response.status_code == 400
+    assert client.get(f"/table/{table_id}/record/other").status_code == 404
+
+
+def test_put_without_id_and_created_at_keeps_them(
+    client, table_id, created, post_record
+):
+    post_record(created)
+    response = client.put(
+        f"/table/{table_id}/record/{created.id}",
+        json={
+            "tableId": table_id,
+            "category": created.category,
+            "record": {"name": "b"},
+        },
+    )
+    assert response.status_code == 200
+    body = client.get(f"/table/{table_id}/record/{created.id}").json()
+    assert body["record"] == {"name": "b"}
+    assert datetime.datetime.fromisoformat(body["recordCreatedAt"]) == CREATED_AT
+
+
+def test_kept_created_at_orders_the_category_index(pool, settings, table_id, created):
+    service = record.RecordService(settings.record_table_name, pool)
+    service.create_record(created)
+    replacing = created.model_copy(
+        update={
+            "record": {"name": "b"},
+            "record_created_at": datetime.datetime.now(datetime.UTC),
+        }
+    )
+    service.update_record(replacing, keep_created_at=True)
+    item = service.db_client.get_by_id(
+        partition_key_value=created.id, sort_key_value=table_id
+    )
+    assert item[query_planner.CATEGORY_CREATED_AT] == (
+        query_planner.category_created_at(created.category, CREATED_AT)
+    )
+
+
+def test_async_put_keeps_created_at(
+    run_async, settings, record_state, table_id, created
+):
+
+    async def scenario(pool):
+        service = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await service.create_record(created)
+        replacing = created.model_copy(
+            update={
+                "record": {"name": "b"},
+                "record_created_at": datetime.datetime.now(datetime.UTC),
+            }
+        )
+        return await service.update_record(replacing, keep_created_at=True)
+
+    row = run_async(scenario)
+    assert row.record_created_at == CREATED_AT
+
+
+def test_create_rejects_an_existing_record(client, table_id, created, post_record):
+    post_record(created)
+    client.put(
+        f"/table/{table_id}/record/{created.id}",
+        json={
+            "tableId": table_id,
+            "category": created.category,
+            "record": {"name": "b"},
+        },
+    )
+    response = client.post(
+        f"/record/{table_id}", json=created.model_dump(mode="json", by_alias=True)
+    )
+    assert response.status_code == 409
+    body = client.get(f"/table/{table_id}/record/{created.id}").json()
+    assert body["record"] == {"name": "b"}
+    assert body["version"] == 2
+
+
+def test_async_create_rejects_an_existing_record(
+    run_async, settings, record_state, table_id, created
+):
+
+    async def scenario(pool):
+        service = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await service.create_record(created)
+        with pytest.raises(record_update.RecordExistsError):
+            await service.create_record(created)
+
+    run_async(scenario)
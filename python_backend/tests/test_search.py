@@ -0,0 +1,94 @@
+import config
+import pytest
+import service
+import stores
+from service import search
+
+
+@pytest.fixture
+def index():
+    search_index = search.SqliteSearchIndex(stores.sqlite_db.MEMORY)
+    yield search_index
+    search_index.close()
+
+
+def item(table_id: str, record_id: str, content, category="record") -> dict:
+    return {"table_id": table_id, "id": record_id, "category": category, **content}
+
+
+def test_record_text_holds_nested_strings():
+    content = {"name": "Ada", "tags": ["math", {"deep": "engine"}], "year": 1843}
+    assert search.record_text(content).split("\n") == ["Ada", "math", "engine"]
+
+
+def test_search_without_words_finds_nothing(index):
+    assert search.match_expression("t", "*** !!") is None
+    assert index.search("t", "***") == []
+
+
+def test_search_ranks_matches_of_every_word(index):
+    index.index(
+        [
+            item("t", "a", {"record": {"title": "red apple pie"}}),
+            item("t", "b", {"record": {"title": "apple", "note": "apple red"}}),
+            item("t", "c", {"record": {"title": "green pear"}}),
+            item("other", "d", {"record": {"title": "red apple"}}),
+        ]
+    )
+    assert {record_id for record_id, _ in index.search("t", "red apple")} == {
+        "a",
+        "b",
+    }
+    assert [record_id for record_id, _ in index.search("t", "pea*")] == ["c"]
+    assert [record_id for record_id, _ in index.search("t", "APPLE", limit=1)] == ["b"]
+    assert index.search("t", "apple", category="tag") == []
+
+
+def test_reindexed_and_removed_records(index):
+    index.index([item("t", "a", {"record": {"title": "old"}})])
+    index.index([item("t", "a", {"record": {"title": "new"}})])
+    assert index.search("t", "old") == []
+    assert [record_id for record_id, _ in index.search("t", "new")] == ["a"]
+    index.remove("t", ["a", "missing"])
+    assert index.search("t", "new") == []
+    index.index([item("t", "b", {"record": {"title": "new"}})])
+    index.clear_table("t")
+    assert index.search("t", "new") == []
+
+
+def search_ids(client, table_id: str, query: str) -> list[str]:
+    response = client.get(f"/table/{table_id}/record/search", params={"q": query})
+    assert response.status_code == 200
+    return [row["id"] for row in response.json()]
+
+
+def test_search_is_disabled_by_default(client, table_id):
+    default = config.Settings().search_backend
+    assert not search.create_search_index(default).enabled
+    response = client.get(f"/table/{table_id}/record/search", params={"q": "a"})
+    assert response.status_code == 404
+
+
+def test_record_writes_update_the_index(
+    client, table_id, monkeypatch, index, new_record, post_record
+):
+    monkeypatch.setattr(service.record, "search_index", index)
+    kept = post_record(new_record({"title": "blue whale"})).id
+    deleted = post_record(new_record({"title": "blue shark"})).id
+    assert sorted(search_ids(client, table_id, "blue")) == sorted([kept, deleted])
+    assert client.delete(f"/table/{table_id}/record/{deleted}").status_code == 200
+    assert search_ids(client, table_id, "blue") == [kept]
+
+
+def test_rebuild_indexes_records_written_elsewhere(
+    client, table_id, monkeypatch, index, new_record, post_record
+):
+    # written while search was disabled
+    written = [post_record(new_record({"title": f"song {n}"})).id for n in range(3)]
+    monkeypatch.setattr(service.record, "search_index", index)
+    index.index([item(table_id, "stale", {"record": {"title": "song"}})])
+    assert search_ids(client, table_id, "song") == []
+    response = client.post(f"/table/{table_id}/search:rebuild")
+    assert response.status_code == 200
+    assert response.json()["indexedCount"] == 3
+    assert sorted(search_ids(client, table_id, "song")) == sorted(written)
@@ -0,0 +1,111 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+from service import async_record, record, single_flight
+
+READERS = 8
+
+
+def wait_for_requests(stats: single_flight.CoalescingStats, operation: str):
+    """block until READERS requests of operation joined their flight"""
+    deadline = time.monotonic() + 5
+    while stats.snapshot().get(operation, {}).get("requests", 0) < READERS:
+        if time.monotonic() > deadline:
+            raise AssertionError("readers did not join the flight")
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def flight_stats(monkeypatch) -> single_flight.CoalescingStats:
+    """fresh read flights of service.record and service.async_record"""
+    stats = single_flight.CoalescingStats()
+    monkeypatch.setattr(record, "read_flight", single_flight.SingleFlight(stats))
+    monkeypatch.setattr(
+        async_record, "read_flight", single_flight.AsyncSingleFlight(stats)
+    )
+    return stats
+
+
+def test_waiters_share_the_error_of_the_call():
+    flight = single_flight.SingleFlight(single_flight.CoalescingStats())
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait()
+        raise RuntimeError("backend down")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "read", "key", failing)
+        started.wait()
+        waiter = executor.submit(flight.do, "read", "key", failing)
+        while flight.stats.snapshot()["read"]["requests"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, waiter):
+            with pytest.raises(RuntimeError, match="backend down"):
+                future.result()
+    assert flight.stats.snapshot()["read"]["backend_calls"] == 1
+
+
+def test_concurrent_identical_reads_make_one_storage_call(
+    pool, settings, record_state, flight_stats, monkeypatch, new_record
+):
+    service = record.RecordService(settings.record_table_name, pool)
+    created = new_record({"name": "a"})
+    service.create_record(created)
+    record.item_cache.invalidate(created.table_id, created.id)
+    get_by_id = service.db_client.get_by_id
+    calls = []
+
+    def counted_get_by_id(*args, **kwargs):
+        calls.append(args)
+        wait_for_requests(flight_stats, "get_record")
+        return get_by_id(*args, **kwargs)
+
+    monkeypatch.setattr(service.db_client, "get_by_id", counted_get_by_id)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=READERS) as executor:
+        rows = list(
+            executor.map(
+                lambda _: service.get_record_by_id(created.table_id, created.id),
+                range(READERS),
+            )
+        )
+    assert len(calls) == 1
+    assert {row.id for row in rows} == {created.id}
+    assert flight_stats.snapshot()["get_record"]["coalesced"] == READERS - 1
+
+
+def test_async_concurrent_identical_reads_make_one_storage_call(
+    run_async, settings, record_state, flight_stats, new_record
+):
+    created = new_record({"name": "a"})
+    calls = []
+
+    async def scenario(pool):
+        service = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await service.create_record(created)
+        record.item_cache.invalidate(created.table_id, created.id)
+        get_by_id = service.db_client.get_by_id
+
+        async def counted_get_by_id(*args, **kwargs):
+            calls.append(args)
+            while flight_stats.snapshot()["get_record"]["requests"] < READERS:
+                await asyncio.sleep(0.001)
+            return await get_by_id(*args, **kwargs)
+
+        service.db_client.get_by_id = counted_get_by_id
+        return await asyncio.gather(
+            *(
+                service.get_record_by_id(created.table_id, created.id)
+                for _ in range(READERS)
+            )
+        )
+
+    rows = run_async(scenario)
+    assert len(calls) == 1
+    assert {row.id for row in rows} == {created.id}
@@ -0,0 +1,199 @@
+"""conformance of stores.sqlite_db: the same calls against moto and sqlite"""
+
+import uuid
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from stores import sqlite_db
+
+from conftest import BACKENDS
+
+BIG = ["9007199254740992", "9007199254740993", "12345678901234567890123456789012345678"]
+
+
+@pytest.fixture(params=BACKENDS)
+def dynamo(request):
+    """low-level dynamo db client of the backend"""
+    if request.param == "sqlite":
+        engine = sqlite_db.SqliteEngine()
+        yield engine
+        engine.close()
+    else:
+        yield boto3.client(
+            "dynamodb", endpoint_url=request.getfixturevalue("moto_endpoint")
+        )
+
+
+@pytest.fixture
+def table(dynamo) -> str:
+    """table keyed by a string and a number, with an index on a number"""
+    name = f"conformance_{uuid.uuid4().hex[:8]}"
+    dynamo.create_table(
+        TableName=name,
+        KeySchema=[
+            {"AttributeName": "p", "KeyType": "HASH"},
+            {"AttributeName": "n", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "p", "AttributeType": "S"},
+            {"AttributeName": "n", "AttributeType": "N"},
+            {"AttributeName": "g", "AttributeType": "S"},
+            {"AttributeName": "score", "AttributeType": "N"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "by_score",
+                "KeySchema": [
+                    {"AttributeName": "g", "KeyType": "HASH"},
+                    {"AttributeName": "score", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return name
+
+
+def put(dynamo, table: str, n: str, **attributes):
+    dynamo.put_item(
+        TableName=table, Item={"p": {"S": "a"}, "n": {"N": n}, **attributes}
+    )
+
+
+def query(dynamo, table: str, **params) -> list[str]:
+    """range keys of every page of a query"""
+    keys = []
+    while True:
+        response = dynamo.query(TableName=table, **params)
+        keys += [item["n"]["N"] for item in response["Items"]]
+        if "LastEvaluatedKey" not in response:
+            return keys
+        params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+NUMBERS = ["-1.5", "-1", "-0.25", "0", "0.1", "1", "1.5", "10", "2E+3", *BIG]
+
+
+def test_number_keys_are_exact_and_ordered(dynamo, table):
+    for n in reversed(NUMBERS):
+        put(dynamo, table, n, v={"S": n})
+    key = {":p": {"S": "a"}}
+    ascending = query(
+        dynamo,
+        table,
+        KeyConditionExpression="p = :p",
+        ExpressionAttributeValues=key,
+        Limit=3,
+    )
+    assert [float(n) for n in ascending] == sorted(float(n) for n in NUMBERS)
+    assert ascending[-3:] == BIG
+    descending = query(
+        dynamo,
+        table,
+        KeyConditionExpression="p = :p",
+        ExpressionAttributeValues=key,
+        ScanIndexForward=False,
+    )
+    assert descending == list(reversed(ascending))
+    for n in BIG:
+        item = dynamo.get_item(TableName=table, Key={"p": {"S": "a"}, "n": {"N": n}})
+        assert item["Item"]["v"] == {"S": n}
+
+
+def test_number_key_conditions(dynamo, table):
+    for n in NUMBERS:
+        put(dynamo, table, n)
+    between = query(
+        dynamo,
+        table,
+        KeyConditionExpression="p = :p AND n BETWEEN :low AND :high",
+        ExpressionAttributeValues={
+            ":p": {"S": "a"},
+            ":low": {"N": "-1"},
+            ":high": {"N": "1"},
+        },
+    )
+    assert between == ["-1", "-0.25", "0", "0.1", "1"]
+    above = query(
+        dynamo,
+        table,
+        KeyConditionExpression="p = :p AND n > :n",
+        ExpressionAttributeValues={":p": {"S": "a"}, ":n": {"N": BIG[0]}},
+    )
+    assert above == BIG[1:]
+
+
+def test_index_orders_by_number(dynamo, table):
+    scores = ["3", "-2", BIG[1], BIG[0], "0.5"]
+    for index, score in enumerate(scores):
+        put(dynamo, table, str(index), g={"S": "g"}, score={"N": score})
+    put(dynamo, table, "99")  # not in the index
+    keys = query(
+        dynamo,
+        table,
+        IndexName="by_score",
+        KeyConditionExpression="g = :g",
+        ExpressionAttributeValues={":g": {"S": "g"}},
+        Limit=2,
+    )
+    assert keys == ["1", "4", "0", "3", "2"]
+
+
+def test_item_size_counts_bytes_of_names_and_values(dynamo, table):
+    # escaped in JSON, but one byte per character in dynamo db
+    put(dynamo, table, "1", v={"S": '"' * 300_000})
+    # one character of JSON text, but two bytes of UTF-8
+    with pytest.raises(ClientError) as raised:
+        put(dynamo, table, "2", v={"S": "é" * 210_000})
+    assert raised.value.response["Error"]["Code"] == "ValidationException"
+    listed = {"L": [{"N": "1"}] * 50_000}
+    put(dynamo, table, "3", v=listed)
+    item = dynamo.get_item(TableName=table, Key={"p": {"S": "a"}, "n": {"N": "3"}})
+    assert len(item["Item"]["v"]["L"]) == 50_000
+
+
+def test_conditional_writes(dynamo, table):
+    put(dynamo, table, "1", v={"N": "1"})
+    with pytest.raises(ClientError) as raised:
+        dynamo.put_item(
+            TableName=table,
+            Item={"p": {"S": "a"}, "n": {"N": "1"}},
+            ConditionExpression="attribute_not_exists(p)",
+        )
+    assert raised.value.response["Error"]["Code"] == ("ConditionalCheckFailedException")
+    response = dynamo.update_item(
+        TableName=table,
+        Key={"p": {"S": "a"}, "n": {"N": "1"}},
+        UpdateExpression="SET v = v + :one, w = :w",
+        ConditionExpression="v = :one",
+        ExpressionAttributeValues={":one": {"N": "1"}, ":w": {"S": "x"}},
+        ReturnValues="UPDATED_NEW",
+    )
+    assert response["Attributes"] == {"v": {"N": "2"}, "w": {"S": "x"}}
+    deleted = dynamo.delete_item(
+        TableName=table,
+        Key={"p": {"S": "a"}, "n": {"N": "1"}},
+        ReturnValues="ALL_OLD",
+    )
+    assert deleted["Attributes"]["v"] == {"N": "2"}
+
+
+def test_filter_and_count(dynamo, table):
+    for index in range(6):
+        put(dynamo, table, str(index), even={"BOOL": index % 2 == 0})
+    response = dynamo.query(
+        TableName=table,
+        KeyConditionExpression="p = :p",
+        FilterExpression="even = :true",
+        ExpressionAttributeValues={":p": {"S": "a"}, ":true": {"BOOL": True}},
+        Select="COUNT",
+    )
+    assert (response["Count"], response["ScannedCount"]) == (3, 6)
+    batch = dynamo.batch_get_item(
+        RequestItems={
+            table: {"Keys": [{"p": {"S": "a"}, "n": {"N": n}} for n in ("0", "5")]}
+        }
+    )
+    assert sorted(item["n"]["N"] for item in batch["Responses"][table]) == ["0", "5"]
@@ -0,0 +1,82 @@
+import asyncio
+import collections
+import concurrent.futures
+import threading
+
+from stores import async_dynamo_db, rate_limit, table_metadata
+
+
+def description(table_name: str) -> dict:
+    return {
+        "Table": {
+            "TableName": table_name,
+            "KeySchema": [{"AttributeName": "id", "KeyType": "HASH"}],
+            "AttributeDefinitions": [{"AttributeName": "id", "AttributeType": "S"}],
+        }
+    }
+
+
+class SlowDescribe:
+    """client whose describe of table "slow" waits until released"""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.calls: collections.Counter = collections.Counter()
+
+    def describe_table(self, TableName: str) -> dict:  # pylint: disable=invalid-name
+        self.calls[TableName] += 1
+        if TableName == "slow":
+            assert self.released.wait(5)
+        return description(TableName)
+
+
+def test_slow_describe_only_holds_up_its_table():
+    client = SlowDescribe()
+    cache = table_metadata.TableMetadataCache(lambda: client)
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(cache.get, "slow") for _ in range(3)]
+        fast = executor.submit(cache.get, "fast")
+        assert fast.result(timeout=2).partition_key == "id"
+        client.released.set()
+        assert {future.result(timeout=5).table_name for future in slow} == {"slow"}
+    # waiting lookups took the result of the first describe
+    assert client.calls == {"slow": 1, "fast": 1}
+
+
+def test_async_slow_describe_only_holds_up_its_table():
+    calls: collections.Counter = collections.Counter()
+
+    class Client:
+        def __init__(self):
+            self.released = asyncio.Event()
+
+        async def describe_table(
+            self, TableName: str
+        ) -> dict:  # pylint: disable=invalid-name
+            calls[TableName] += 1
+            if TableName == "slow":
+                await self.released.wait()
+            return description(TableName)
+
+    class Pool:
+        throughput = rate_limit.ThroughputRegistry()
+
+        def __init__(self):
+            self.describing = Client()
+
+        def client(self):
+            return self.describing
+
+    async def scenario():
+        pool = Pool()
+        cache = async_dynamo_db.AsyncTableMetadataCache(pool)
+        slow = [asyncio.create_task(cache.get("slow")) for _ in range(3)]
+        await asyncio.sleep(0)
+        fast = await asyncio.wait_for(cache.get("fast"), 2)
+        pool.describing.released.set()
+        return fast, await asyncio.gather(*slow)
+
+    fast, slow = asyncio.run(scenario())
+    assert fast.table_name == "fast"
+    assert {metadata.table_name for metadata in slow} == {"slow"}
+    assert calls == {"slow": 1, "fast": 1}
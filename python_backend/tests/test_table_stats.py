@@ -0,0 +1,103 @@
+import schema
+from service import async_record, change_feed, record, table_stats
+
+
+def stats(client, table_id: str, rebuild: bool = False) -> dict:
+    if rebuild:
+        response = client.post(f"/table/{table_id}/stats:rebuild")
+    else:
+        response = client.get(f"/table/{table_id}/stats")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_patches_count_their_size(client, table_id, new_record, post_record):
+    record_item = post_record(new_record({"name": "a", "views": 1}))
+    post_record(new_record({"name": "b"}))
+    response = client.patch(
+        f"/table/{table_id}/record/{record_item.id}",
+        json={"record": {"note": "x" * 500, "name": None}, "increment": {"views": 2}},
+    )
+    assert response.status_code == 200
+    assert response.json()["record"] == {"note": "x" * 500, "views": 3}
+    maintained = stats(client, table_id)
+    assert maintained["recordCount"] == 2
+    assert maintained["approximateSize"] > 500
+    # the maintained size matches a recount of the stored records
+    recounted = stats(client, table_id, rebuild=True)
+    assert recounted["approximateSize"] == maintained["approximateSize"]
+    response = client.delete(f"/table/{table_id}/record/{record_item.id}")
+    assert response.status_code == 200
+    remaining = stats(client, table_id)
+    assert remaining["recordCount"] == 1
+    assert remaining["approximateSize"] == (
+        stats(client, table_id, rebuild=True)["approximateSize"]
+    )
+
+
+def test_resent_batches_replace_their_records(client, table_id, new_record):
+    records = [new_record({"name": name}) for name in "abc"]
+    body = {
+        "records": [record.model_dump(mode="json", by_alias=True) for record in records]
+    }
+    for _ in range(2):
+        response = client.post(f"/table/{table_id}/records:batchCreate", json=body)
+        assert response.status_code == 200
+    maintained = stats(client, table_id)
+    assert maintained["recordCount"] == 3
+    recounted = stats(client, table_id, rebuild=True)
+    assert recounted["approximateSize"] == maintained["approximateSize"]
+
+
+def failing_apply(*_):
+    raise RuntimeError("stats table unavailable")
+
+
+def test_failed_stats_do_not_fail_writes(
+    client, table_id, monkeypatch, new_record, post_record
+):
+    monkeypatch.setattr(table_stats.TableStatsService, "apply", failing_apply)
+    published = []
+    monkeypatch.setattr(
+        record.change_broker, "publish", lambda *event: published.append(event)
+    )
+    record_item = post_record(new_record({"name": "a"}))
+    response = client.patch(
+        f"/table/{table_id}/record/{record_item.id}", json={"record": {"name": "b"}}
+    )
+    assert response.status_code == 200
+    response = client.get(f"/table/{table_id}/record/{record_item.id}")
+    assert response.json()["record"] == {"name": "b"}
+    assert client.delete(f"/table/{table_id}/record/{record_item.id}").status_code == (
+        200
+    )
+    assert [event[1] for event in published] == [
+        change_feed.CREATE,
+        change_feed.PATCH,
+        change_feed.DELETE,
+    ]
+
+
+def test_async_stats_are_best_effort_and_count_patches(
+    run_async, settings, record_state, table_id, monkeypatch, new_record
+):
+    record_item = new_record({"name": "a"})
+    patch = schema.request.PatchRecord(record={"note": "y" * 300})
+
+    async def scenario(pool):
+        records = async_record.AsyncRecordService(settings.record_table_name, pool)
+        await records.create_record(record_item)
+        before = await records.stats.get_stats(table_id)
+        await records.patch_record(table_id, record_item.id, patch)
+        after = await records.stats.get_stats(table_id)
+        with monkeypatch.context() as patched:
+            patched.setattr(records.stats, "apply", failing_apply)
+            row = await records.patch_record(
+                table_id, record_item.id, schema.request.PatchRecord(record={"n": 1})
+            )
+        return before, after, row
+
+    before, after, row = run_async(scenario)
+    assert after.approximate_size >= before.approximate_size + 300
+    assert row.record == {"name": "a", "note": "y" * 300, "n": 1}
+    assert row.version == 3
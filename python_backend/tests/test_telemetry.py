@@ -0,0 +1,67 @@
+import fastapi
+import pytest
+from fastapi.testclient import TestClient
+from telemetry import metrics, middleware, profiler, tracing
+
+
+def timed_app(**options) -> fastapi.FastAPI:
+    """app of one route making two traced dynamo db calls, under TimingMiddleware"""
+    app = fastapi.FastAPI()
+    app.add_middleware(middleware.TimingMiddleware, **options)
+
+    @app.get("/item/{item_id}")
+    def get_item(item_id: str):
+        tracing.record_call(
+            "get_item",
+            "records",
+            "read",
+            0.002,
+            response={"Item": {}},
+            consumed_units=0.5,
+        )
+        tracing.record_call(
+            "put_item", "records", "write", 0.003, response={}, consumed_units=1.0
+        )
+        return {"id": item_id}
+
+    return app
+
+
+def test_server_timing_reports_dynamo_calls_and_units():
+    with TestClient(timed_app(server_timing=True)) as client:
+        response = client.get("/item/a")
+    assert response.status_code == 200
+    app_timing, dynamo_timing = response.headers["Server-Timing"].split(", ", 1)
+    assert app_timing.startswith("app;dur=")
+    assert dynamo_timing == 'dynamo;dur=5.0;desc="2 calls, 0.5 RCU, 1 WCU"'
+
+
+def test_server_timing_is_off_by_default():
+    with TestClient(timed_app()) as client:
+        response = client.get("/item/a")
+    assert "Server-Timing" not in response.headers
+
+
+def test_requests_are_observed_by_route_template():
+    with TestClient(timed_app()) as client:
+        client.get("/item/a")
+        client.get("/item/b")
+    rendered = metrics.registry.render()
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/item/{item_id}",'
+        'status="200"}' in rendered
+    )
+
+
+@pytest.mark.parametrize("threshold, reported", [(0, True), (60, False)])
+def test_slow_requests_are_reported(threshold, reported):
+    reports = []
+    slow_request_profiler = profiler.SlowRequestProfiler(
+        threshold, report=lambda *report: reports.append(report)
+    )
+    app = timed_app(slow_request_profiler=slow_request_profiler)
+    with TestClient(app) as client:
+        client.get("/item/a")
+    assert [name for name, _, _ in reports] == (
+        ["GET /item/{item_id}"] if reported else []
+    )
@@ -0,0 +1,191 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+import schema
+from service import jobs, record, table_stats, transfer
+
+RECORD_COUNT = 5
+
+
+@pytest.fixture
+def records(pool, settings, record_state, new_record) -> record.RecordService:
+    """service of the record table, RECORD_COUNT records stored"""
+    service = record.RecordService(settings.record_table_name, pool)
+    for index in range(RECORD_COUNT):
+        service.create_record(new_record({"index": index, "name": f"record {index}"}))
+    return service
+
+
+def stored(records: record.RecordService, table_id: str) -> dict[str, dict]:
+    """content of every record of table_id by id"""
+    return {row.id: row.record for row in records.iter_records(table_id)}
+
+
+def fail_once(progress=None):
+    """progress callback raising on its first call, like an interrupted job"""
+    calls = []
+
+    def report(checkpoint: dict):
+        if not calls:
+            calls.append(checkpoint)
+            raise RuntimeError("interrupted")
+        if progress is not None:
+            progress(checkpoint)
+
+    return report
+
+
+@pytest.mark.parametrize("file_format", transfer.FORMATS)
+def test_export_and_import_copy_a_table(
+    records, pool, settings, table_id, tmp_path, file_format
+):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    db_client = pool.get_client(settings.record_table_name)
+    exported = transfer.export_table(
+        db_client,
+        table_id,
+        tmp_path,
+        file_format=file_format,
+        segments=2,
+        chunk_rows=2,
+        page_size=2,
+    )
+    assert exported["rows"] == RECORD_COUNT
+    copy_id = f"{table_id}-copy"
+    imported = transfer.import_table(
+        db_client, copy_id, tmp_path, batch_size=2, write_units_per_second=0
+    )
+    assert imported["rows"] == RECORD_COUNT
+    assert imported["failed"] == 0
+    assert stored(records, copy_id) == stored(records, table_id)
+
+
+def test_segments_beyond_the_export_threads_wait_for_one(
+    records, pool, settings, table_id, tmp_path
+):
+    db_client = pool.get_client(settings.record_table_name)
+    exported = transfer.export_table(
+        db_client, table_id, tmp_path, segments=8, page_size=2, max_threads=2
+    )
+    assert exported["rows"] == RECORD_COUNT
+
+
+def test_interrupted_export_and_import_resume(
+    records, pool, settings, table_id, tmp_path
+):
+    db_client = pool.get_client(settings.record_table_name)
+    options = {"segments": 2, "chunk_rows": 1, "page_size": 1}
+    with pytest.raises(RuntimeError, match="interrupted"):
+        transfer.export_table(
+            db_client, table_id, tmp_path, progress=fail_once(), **options
+        )
+    assert transfer.export_table(db_client, table_id, tmp_path, **options)["rows"] == (
+        RECORD_COUNT
+    )
+    copy_id = f"{table_id}-copy"
+    with pytest.raises(RuntimeError, match="interrupted"):
+        transfer.import_table(
+            db_client, copy_id, tmp_path, batch_size=2, progress=fail_once()
+        )
+    imported = transfer.import_table(db_client, copy_id, tmp_path, batch_size=2)
+    # the batch written before the interruption is not counted twice
+    assert imported["rows"] == RECORD_COUNT
+    assert stored(records, copy_id) == stored(records, table_id)
+
+
+def wait(manager: jobs.JobManager, job_id: str):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        # finished jobs are saved after their status is set
+        saved = transfer.load_checkpoint(manager.job_directory(job_id) / jobs.JOB_FILE)
+        if job.status in ("completed", "failed") and saved["status"] == job.status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_failed_stats_do_not_fail_imports(
+    records, pool, settings, table_id, tmp_path, monkeypatch
+):
+    db_client = pool.get_client(settings.record_table_name)
+    transfer.export_table(db_client, table_id, tmp_path)
+
+    def failing_apply(*_):
+        raise RuntimeError("stats table unavailable")
+
+    stats = table_stats.TableStatsService(settings.master_table_name, pool)
+    monkeypatch.setattr(stats, "apply", failing_apply)
+    imported = transfer.import_table(
+        db_client,
+        f"{table_id}-copy",
+        tmp_path,
+        batch_size=2,
+        write_units_per_second=0,
+        stats=stats,
+    )
+    assert imported["rows"] == RECORD_COUNT
+
+
+def test_failed_job_resumes_after_a_restart(
+    records, pool, settings, table_id, tmp_path, monkeypatch
+):
+    export_table = transfer.export_table
+    monkeypatch.setattr(
+        transfer,
+        "export_table",
+        lambda *args, progress, **kwargs: export_table(
+            *args, progress=fail_once(progress), **kwargs
+        ),
+    )
+    manager = jobs.JobManager(pool, directory=str(tmp_path))
+    job = manager.submit_export(table_id, schema.request.ExportTable())
+    assert wait(manager, job.id).status == "failed"
+    copy_id = f"{table_id}-copy"
+    with pytest.raises(RuntimeError, match="failed"):
+        manager.submit_import(copy_id, schema.request.ImportTable(source_job_id=job.id))
+    manager.shutdown()
+    # a new manager finds the job in its directory
+    restarted = jobs.JobManager(pool, directory=str(tmp_path))
+    assert restarted.get(job.id).error == "interrupted"
+    restarted.resume(job.id)
+    resumed = wait(restarted, job.id)
+    assert resumed.status == "completed"
+    assert resumed.progress["rows"] == RECORD_COUNT
+    imported = restarted.submit_import(
+        copy_id, schema.request.ImportTable(source_job_id=job.id)
+    )
+    assert wait(restarted, imported.id).status == "completed"
+    assert stored(records, copy_id) == stored(records, table_id)
+    missing = schema.request.ImportTable(source_job_id="missing")
+    assert restarted.submit_import(copy_id, missing) is None
+    restarted.shutdown()
+
+
+def test_concurrent_resumes_start_a_job_once(
+    records, pool, table_id, tmp_path, monkeypatch
+):
+    manager = jobs.JobManager(pool, directory=str(tmp_path))
+    job = manager.submit_export(table_id, schema.request.ExportTable())
+    wait(manager, job.id)
+    submitted = []
+    monkeypatch.setattr(
+        manager._executor, "submit", lambda *args: submitted.append(args)
+    )
+    barrier = threading.Barrier(8)
+
+    def resume():
+        barrier.wait()
+        try:
+            return manager.resume(job.id)
+        except RuntimeError:
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        resumed = list(executor.map(lambda _: resume(), range(8)))
+    assert sum(result is not None for result in resumed) == 1
+    assert len(submitted) == 1
+    manager.shutdown()